@@ -0,0 +1,55 @@
+"""
+Backtest decision rules against stored readings
+
+Replays every reading in the window through the current engine thresholds
+(or --baseline overrides) and through --set overrides, then prints how
+action counts, water volume and alert rates would change.
+
+Usage:
+    python backtest.py --set SOIL_MOISTURE_LOW=35 --set SOIL_MOISTURE_CRITICAL=18
+    python backtest.py --set HEAT_STRESS_TEMP=33 --start 2026-01-01 --workers 8 --output report.json
+"""
+import argparse
+import json
+from datetime import datetime
+
+import database
+from services.backtesting import run_backtest
+from services.decision_engine import DecisionEngine
+
+def _rule(text: str) -> tuple:
+    name, _, value = text.partition("=")
+    if name.upper() not in DecisionEngine.RULE_NAMES or not value:
+        raise argparse.ArgumentTypeError(
+            f"expected NAME=VALUE with NAME in {', '.join(DecisionEngine.RULE_NAMES)}")
+    return name.upper(), float(value)
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--set", dest="candidate", type=_rule, action="append", default=[],
+                        metavar="NAME=VALUE", help="candidate threshold override")
+    parser.add_argument("--baseline", type=_rule, action="append", default=[],
+                        metavar="NAME=VALUE", help="baseline threshold override")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--sensor", dest="sensor_ids", action="append",
+                        help="restrict to these sensors (repeatable)")
+    parser.add_argument("--workers", type=int, help="processes (default: CPU count)")
+    parser.add_argument("--db", default=database.DATABASE_URL)
+    parser.add_argument("--output", help="write the report as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_backtest(args.db, dict(args.candidate), dict(args.baseline),
+                          start=args.start, end=args.end,
+                          sensor_ids=args.sensor_ids, workers=args.workers)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Online backup of the database (see services/backup.py)
+
+The API keeps ingesting while the copy runs; the result is a consistent,
+self-contained database file. Restore by stopping the API and copying the
+backup over DATABASE_URL.
+
+Usage:
+    python backup_db.py data/backups/before-upgrade.db --verify
+    python backup_db.py --scheduled                   # into BACKUP_DIR, keeps BACKUP_KEEP
+    python backup_db.py --scheduled --every 3600 --keep 24
+    python backup_db.py --snapshot                    # retake the analytics snapshot
+    python backup_db.py --list
+"""
+import argparse
+import json
+import logging
+import time
+
+import database
+from config.settings import get_settings
+from services.backup import (backup_database, list_backups, refresh_snapshot,
+                             scheduled_backup)
+
+def main(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("destination", nargs="?", help="backup file to write")
+    mode.add_argument("--scheduled", action="store_true",
+                      help="timestamped backup into --dir, then prune to --keep")
+    mode.add_argument("--snapshot", action="store_true", help="refresh SNAPSHOT_PATH")
+    mode.add_argument("--list", action="store_true", help="list backups in --dir")
+    parser.add_argument("--verify", action="store_true", help="quick_check the copy")
+    parser.add_argument("--dir", default=settings.backup_dir)
+    parser.add_argument("--keep", type=int, default=settings.backup_keep)
+    parser.add_argument("--every", type=float,
+                        help="with --scheduled: keep running, one backup per interval (seconds)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    source = database.DATABASE_URL
+    if args.list:
+        print(json.dumps([{"path": str(path), "bytes": path.stat().st_size}
+                          for path in list_backups(args.dir)], indent=2))
+    elif args.snapshot:
+        print(json.dumps(refresh_snapshot(source, settings.snapshot_path), indent=2))
+    elif args.scheduled:
+        while True:
+            result = scheduled_backup(source, args.dir, args.every or 0, args.keep)
+            print(json.dumps(result, indent=2))
+            if not args.every:
+                break
+            time.sleep(args.every)
+    else:
+        print(json.dumps(backup_database(source, args.destination, verify=args.verify),
+                         indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,36 @@
 # ===== database.py =====
 import sqlite3
 from contextlib import contextmanager
-from typing import Generator
+from pathlib import Path
+from typing import Callable, Generator, List
 
-DATABASE_URL = "data/agri.db"
+from config.settings import get_settings
+from query_profiler import ProfilingConnection
+from utils.metrics import DB_CONNECTIONS_OPEN, DB_CONNECTIONS_OPENED
+
+def _sqlite_path(url: str) -> str:
+    """Filesystem path from a sqlite:/// URL"""
+    prefix = "sqlite:///"
+    return url[len(prefix):] if url.startswith(prefix) else url
+
+DATABASE_URL = _sqlite_path(get_settings().database_url)
 
 def init_db():
-    """Initialize database schema"""
-    conn = sqlite3.connect(DATABASE_URL)
+    """
+    Bring the schema up to date (see migrations.py)
+    Only pending migrations run; when the schema is current this reads the
+    schema version and returns without any DDL.
+    """
+    from migrations import migrate
+    Path(DATABASE_URL).parent.mkdir(parents=True, exist_ok=True)
+    migrate(DATABASE_URL)
+
+def create_baseline_schema(conn: sqlite3.Connection):
+    """
+    Schema version 1: the tables and index the original init_db created
+    IF NOT EXISTS throughout, so databases created by the unversioned
+    init_db are adopted as they are; later migrations add the rest.
+    """
     cursor = conn.cursor()
     
     # Sensor readings table
@@ -39,19 +62,266 @@ def init_db():
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     """)
+
+def create_state_schema(conn: sqlite3.Connection):
+    """
+    Schema version 6: per-sensor and per-zone state kept on write
+    IF NOT EXISTS throughout: databases written by the unversioned releases
+    that introduced these tables keep them. Fresh tables start empty and
+    are filled by migration 6's chunked sensor_latest backfill; its inserts
+    fill zone_state through the triggers.
+    """
+    cursor = conn.cursor()
+    
+    # Latest reading + recommendation status per sensor, maintained on write,
+    # so farm-wide views read one row per sensor instead of scanning history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sensor_latest (
+            sensor_id TEXT PRIMARY KEY,
+            reading_id INTEGER NOT NULL,
+            soil_moisture REAL NOT NULL,
+            temperature REAL NOT NULL,
+            humidity REAL NOT NULL,
+            timestamp DATETIME NOT NULL,
+            last_action TEXT,
+            last_priority TEXT,
+            alert_count INTEGER NOT NULL DEFAULT 0,
+            recommended_at DATETIME
+        )
+    """)
+    
+    # Sensor metadata: where it is and what it measures for.
+    # plot_area_m2 / root_depth_m NULL means "use the settings default"
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sensors (
+            sensor_id TEXT PRIMARY KEY,
+            zone TEXT,
+            field TEXT,
+            crop_type TEXT NOT NULL DEFAULT 'tomato',
+            plot_area_m2 REAL,
+            root_depth_m REAL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sensors_zone ON sensors(zone)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sensors_field ON sensors(field)")
+    
+    # Per-zone running totals over sensor_latest, kept current by triggers
+    # so zone summaries never aggregate per-sensor rows at read time
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS zone_state (
+            zone TEXT PRIMARY KEY,
+            sensor_count INTEGER NOT NULL DEFAULT 0,
+            reporting_count INTEGER NOT NULL DEFAULT 0,
+            moisture_sum REAL NOT NULL DEFAULT 0,
+            temperature_sum REAL NOT NULL DEFAULT 0,
+            humidity_sum REAL NOT NULL DEFAULT 0,
+            alerting_count INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME
+        )
+    """)
+    for statement in _ZONE_TRIGGERS:
+        cursor.execute(statement)
     
-    conn.commit()
-    conn.close()
+    # Time-to-threshold forecast per sensor: regression sums updated on
+    # ingest (services/moisture_forecast.py) and crossing times indexed so
+    # "critical within N hours" is a range scan
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sensor_forecast (
+            sensor_id TEXT PRIMARY KEY,
+            sw REAL NOT NULL,
+            st REAL NOT NULL,
+            sm REAL NOT NULL,
+            stt REAL NOT NULL,
+            stm REAL NOT NULL,
+            n_points INTEGER NOT NULL,
+            last_hours REAL NOT NULL,
+            last_moisture REAL NOT NULL,
+            slope_per_hour REAL,
+            critical_at DATETIME,
+            low_at DATETIME,
+            updated_at DATETIME
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sensor_forecast_critical_at
+        ON sensor_forecast(critical_at) WHERE critical_at IS NOT NULL
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sensor_forecast_low_at
+        ON sensor_forecast(low_at) WHERE low_at IS NOT NULL
+    """)
+
+def _zone_delta_sql(sign: str, sensor_id: str, zone: str) -> str:
+    """Add (+) or remove (-) one sensor's latest state from its zone totals"""
+    latest = "(SELECT {} FROM sensor_latest WHERE sensor_id = " + sensor_id + ")"
+    return f"""
+        UPDATE zone_state SET
+            sensor_count = sensor_count {sign} 1,
+            reporting_count = reporting_count {sign} {latest.format("COUNT(*)")},
+            moisture_sum = moisture_sum {sign} COALESCE({latest.format("soil_moisture")}, 0),
+            temperature_sum = temperature_sum {sign} COALESCE({latest.format("temperature")}, 0),
+            humidity_sum = humidity_sum {sign} COALESCE({latest.format("humidity")}, 0),
+            alerting_count = alerting_count {sign} COALESCE({latest.format("alert_count > 0")}, 0),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE zone = {zone};
+    """
+
+# Not INSERT OR IGNORE: the conflict policy of the outer statement (an
+# upsert on sensors) overrides the one written inside a trigger
+_ENSURE_ZONE_SQL = """
+        INSERT INTO zone_state (zone)
+        SELECT NEW.zone WHERE NEW.zone IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM zone_state WHERE zone = NEW.zone);
+"""
+
+_ZONE_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_sensors_insert_zone
+    AFTER INSERT ON sensors WHEN NEW.zone IS NOT NULL
+    BEGIN
+        {_ENSURE_ZONE_SQL}
+        {_zone_delta_sql("+", "NEW.sensor_id", "NEW.zone")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_sensors_move_zone
+    AFTER UPDATE OF zone ON sensors WHEN OLD.zone IS NOT NEW.zone
+    BEGIN
+        {_zone_delta_sql("-", "OLD.sensor_id", "OLD.zone")}
+        {_ENSURE_ZONE_SQL}
+        {_zone_delta_sql("+", "NEW.sensor_id", "NEW.zone")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_sensors_delete_zone
+    AFTER DELETE ON sensors WHEN OLD.zone IS NOT NULL
+    BEGIN
+        {_zone_delta_sql("-", "OLD.sensor_id", "OLD.zone")}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_sensor_latest_insert_zone
+    AFTER INSERT ON sensor_latest
+    BEGIN
+        UPDATE zone_state SET
+            reporting_count = reporting_count + 1,
+            moisture_sum = moisture_sum + NEW.soil_moisture,
+            temperature_sum = temperature_sum + NEW.temperature,
+            humidity_sum = humidity_sum + NEW.humidity,
+            alerting_count = alerting_count + (NEW.alert_count > 0),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE zone = (SELECT zone FROM sensors WHERE sensor_id = NEW.sensor_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_sensor_latest_update_zone
+    AFTER UPDATE ON sensor_latest
+    BEGIN
+        UPDATE zone_state SET
+            moisture_sum = moisture_sum + NEW.soil_moisture - OLD.soil_moisture,
+            temperature_sum = temperature_sum + NEW.temperature - OLD.temperature,
+            humidity_sum = humidity_sum + NEW.humidity - OLD.humidity,
+            alerting_count = alerting_count + (NEW.alert_count > 0) - (OLD.alert_count > 0),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE zone = (SELECT zone FROM sensors WHERE sensor_id = NEW.sensor_id);
+    END
+    """,
+)
+
+def refresh_zone_state(conn: sqlite3.Connection):
+    """
+    Recompute zone_state from sensors + sensor_latest (one row per sensor)
+    The triggers keep it current afterwards; this only seeds or repairs it.
+    """
+    conn.execute("DELETE FROM zone_state")
+    conn.execute("""
+        INSERT INTO zone_state
+            (zone, sensor_count, reporting_count, moisture_sum, temperature_sum,
+             humidity_sum, alerting_count, updated_at)
+        SELECT s.zone, COUNT(*), COUNT(l.sensor_id),
+               COALESCE(SUM(l.soil_moisture), 0), COALESCE(SUM(l.temperature), 0),
+               COALESCE(SUM(l.humidity), 0), COALESCE(SUM(l.alert_count > 0), 0),
+               CURRENT_TIMESTAMP
+        FROM sensors s
+        LEFT JOIN sensor_latest l ON l.sensor_id = s.sensor_id
+        WHERE s.zone IS NOT NULL
+        GROUP BY s.zone
+    """)
+
+def refresh_latest_state(conn: sqlite3.Connection):
+    """
+    Rebuild sensor_latest reading columns from sensor_readings
+    Needed after rows are written outside DataService (bulk loads, datagen).
+    Recommendation status columns are kept.
+    """
+    conn.execute("""
+        INSERT INTO sensor_latest
+            (sensor_id, reading_id, soil_moisture, temperature, humidity, timestamp)
+        SELECT r.sensor_id, r.id, r.soil_moisture, r.temperature, r.humidity, r.timestamp
+        FROM sensor_readings r
+        JOIN (
+            SELECT sensor_id, MAX(timestamp) AS timestamp
+            FROM sensor_readings
+            GROUP BY sensor_id
+        ) latest ON latest.sensor_id = r.sensor_id AND latest.timestamp = r.timestamp
+        WHERE true
+        ON CONFLICT(sensor_id) DO UPDATE SET
+            reading_id = excluded.reading_id,
+            soil_moisture = excluded.soil_moisture,
+            temperature = excluded.temperature,
+            humidity = excluded.humidity,
+            timestamp = excluded.timestamp
+    """)
+
+class Connection(sqlite3.Connection):
+    """
+    sqlite3 connection with after-commit callbacks
+    In-memory state that mirrors the database (hot tier, ingest listeners)
+    must only change once the write is durable: callbacks registered
+    during a transaction run after it commits and are dropped on rollback.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._after_commit: List[Callable[[], None]] = []
+
+    def after_commit(self, callback: Callable[[], None]):
+        """Run callback once the open transaction commits (now if none is open)"""
+        if self.in_transaction:
+            self._after_commit.append(callback)
+        else:
+            callback()
+
+    def commit(self):
+        super().commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        super().rollback()
+        self._after_commit.clear()
+
+class _ProfilingConnection(ProfilingConnection, Connection):
+    pass
 
 @contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
+def get_db() -> Generator[Connection, None, None]:
     """
     Database connection context manager
-    ⚠️ ISSUE: No connection pooling
+    ⚠️ ISSUE: No connection pooling (open/total counts exported as metrics)
     ⚠️ ISSUE: Row factory not set for easy dict access
     """
-    conn = sqlite3.connect(DATABASE_URL)
+    Path(DATABASE_URL).parent.mkdir(parents=True, exist_ok=True)
+    # FastAPI may open the connection in a worker thread and use it in the
+    # event loop thread, so the same-thread check has to be relaxed
+    # Opt-in statement timing / slow-query log (see query_profiler.py)
+    factory = _ProfilingConnection if get_settings().query_profiling_enabled else Connection
+    conn = sqlite3.connect(DATABASE_URL, check_same_thread=False, factory=factory)
     conn.row_factory = sqlite3.Row  # ✅ Returns dict-like rows
+    DB_CONNECTIONS_OPENED.inc()
+    DB_CONNECTIONS_OPEN.inc()
     try:
         yield conn
         conn.commit()
@@ -59,4 +329,51 @@ def get_db() -> Generator[sqlite3.Connection, None, None]:
         conn.rollback()
         raise
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+        DB_CONNECTIONS_OPEN.dec()
+
+def get_db_session() -> Generator[Connection, None, None]:
+    """
+    FastAPI dependency around get_db
+    Depends() needs a plain generator, not a context manager object.
+    Its commit runs after the response has been sent: routes whose response
+    must follow a durable write (and its after-commit callbacks) commit first.
+    """
+    with get_db() as conn:
+        yield conn
+
+@contextmanager
+def get_snapshot_db() -> Generator[sqlite3.Connection, None, None]:
+    """
+    Read-only connection to the analytics snapshot (services/backup.py)
+    immutable=1: refreshes rename a new copy over the file instead of
+    writing to it, so SQLite can skip locking and change detection.
+    """
+    path = Path(get_settings().snapshot_path).resolve()
+    factory = ProfilingConnection if get_settings().query_profiling_enabled else sqlite3.Connection
+    conn = sqlite3.connect(f"{path.as_uri()}?mode=ro&immutable=1", uri=True,
+                           check_same_thread=False, factory=factory)
+    conn.row_factory = sqlite3.Row
+    DB_CONNECTIONS_OPENED.inc()
+    DB_CONNECTIONS_OPEN.inc()
+    try:
+        yield conn
+    finally:
+        conn.close()
+        DB_CONNECTIONS_OPEN.dec()
+
+def get_analytics_db_session() -> Generator[sqlite3.Connection, None, None]:
+    """
+    FastAPI dependency for heavy read-only queries (analytics, exports)
+    Served from the snapshot when it is enabled, taken and on the current
+    schema, so they never contend with ingestion; the live database otherwise.
+    """
+    from migrations import latest_version
+    settings = get_settings()
+    if settings.snapshot_enabled and Path(settings.snapshot_path).exists():
+        with get_snapshot_db() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= latest_version():
+                yield conn
+                return
+    with get_db() as conn:
+        yield conn
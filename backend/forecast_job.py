@@ -0,0 +1,35 @@
+"""
+Batch refit of every sensor's time-to-threshold forecast
+
+Readings are folded into the forecasts as they arrive; this job refits
+all sensors from their newest readings (late readings included). Run it
+from cron or a scheduler; the API also runs it every
+FORECAST_REFRESH_INTERVAL_SECONDS.
+
+Usage:
+    python forecast_job.py
+    python forecast_job.py --window 384
+"""
+import argparse
+import time
+
+from config.settings import get_settings
+from database import get_db, init_db
+from services.data_service import DataService
+
+def main(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--window", type=int, default=settings.forecast_window_readings,
+                        help="newest readings per sensor used for the fit")
+    args = parser.parse_args(argv)
+
+    init_db()
+    started = time.perf_counter()
+    with get_db() as conn:
+        count = DataService(conn).rebuild_forecasts(args.window)
+    print(f"Refit {count} sensor forecasts in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Bulk import of historical sensor readings (see services/bulk_import.py)
+
+Files need the columns sensor_id, soil_moisture, temperature, humidity and
+timestamp (ISO 8601; UTC offsets are converted to UTC); --column maps other
+names onto them. Rows the API would reject are skipped and can be written
+to a rejects file. Interrupted imports resume from their last committed
+chunk; rerunning a finished file does nothing.
+
+Restart the API afterwards: the hot readings tier and the sensor health
+tracker are seeded from the database on startup.
+
+Usage:
+    python import_readings.py history_2024.csv history_2025.csv
+    python import_readings.py export.parquet --chunk-rows 100000
+    python import_readings.py logger.csv --column sensor_id=probe --column soil_moisture=vwc
+    python import_readings.py logger.csv --rejects rejected.csv
+    python import_readings.py --status
+"""
+import argparse
+import csv
+import json
+import logging
+from contextlib import ExitStack
+from pathlib import Path
+
+import database
+from database import init_db
+from services.bulk_import import COLUMNS, ReadingImporter, connect, import_status
+
+def _column_mapping(pairs):
+    mapping = {}
+    for pair in pairs:
+        column, sep, source = pair.partition("=")
+        if not sep or column not in COLUMNS:
+            raise argparse.ArgumentTypeError(
+                f"--column expects <{'|'.join(COLUMNS)}>=<name in file>, got {pair!r}")
+        mapping[column] = source
+    return mapping
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help=".csv or .parquet files")
+    parser.add_argument("--status", action="store_true", help="show import checkpoints and exit")
+    parser.add_argument("--chunk-rows", type=int, help="rows per transaction and checkpoint")
+    parser.add_argument("--cache-mb", type=int, help="SQLite page cache of the import")
+    parser.add_argument("--column", action="append", default=[], metavar="COLUMN=NAME",
+                        help="file column holding a reading column (repeatable)")
+    parser.add_argument("--rejects", help="write rejected rows with the reason to this CSV")
+    parser.add_argument("--restart", action="store_true", help="ignore earlier checkpoints")
+    indexes = parser.add_mutually_exclusive_group()
+    indexes.add_argument("--defer-indexes", dest="defer_indexes", action="store_true",
+                         default=None, help="drop indexes during the load (default: into an empty table)")
+    indexes.add_argument("--keep-indexes", dest="defer_indexes", action="store_false",
+                         help="never drop indexes (the API keeps serving while importing)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        columns = _column_mapping(args.column)
+    except argparse.ArgumentTypeError as exc:
+        parser.error(str(exc))
+
+    init_db()
+    conn = connect(database.DATABASE_URL, args.cache_mb)
+    try:
+        if args.status or not args.files:
+            print(json.dumps(import_status(conn), indent=2, default=str))
+            return
+        with ExitStack() as stack:
+            on_reject = None
+            if args.rejects:
+                rejects = stack.enter_context(open(args.rejects, "a", newline=""))
+                writer = csv.writer(rejects)
+                if rejects.tell() == 0:
+                    writer.writerow(["source", "row", "reason", *COLUMNS])
+
+                def on_reject(source, row, reason, values):
+                    writer.writerow([source, row, reason, *(values[c] for c in COLUMNS)])
+
+            importer = ReadingImporter(conn, chunk_rows=args.chunk_rows,
+                                       defer_indexes=args.defer_indexes, on_reject=on_reject)
+            results = [importer.import_file(Path(path), columns=columns, restart=args.restart)
+                       for path in args.files]
+            summary = importer.finish()
+        print(json.dumps({"files": results, **summary}, indent=2, default=str))
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
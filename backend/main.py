@@ -1,14 +1,43 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
-from datetime import datetime
-from typing import Optional, List
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field, root_validator, validator
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, List
+import argparse
+import asyncio
+import logging
+import os
+import numpy as np
 import uvicorn
 
-from database import get_db, init_db
+from config.settings import get_settings
+import database
+from database import get_analytics_db_session, get_db_session, init_db
 from models import SensorReading, Recommendation
-from services.decision_engine import DecisionEngine
-from services.data_service import DataService
+from services.decision_engine import ALERT_TYPES, DecisionEngine
+from services.data_service import FIELD_EVENT_KINDS, DataService
+from services.anomaly_detector import get_anomaly_detector
+from services.backtesting import run_backtest
+from services.backup import list_backups, refresh_snapshot, scheduled_backup, snapshot_age
+from services.hot_readings import get_hot_readings
+from services.ingest_guard import get_ingest_guard
+from services import moisture_simulation
+from services.sensor_health import get_sensor_health
+from services.shared_cache import get_shared_cache
+from services.single_flight import get_single_flight
+from services.irrigation_scheduler import hours_until, priority_rank, schedule_irrigation
+from services.strategies.strategy_factory import StrategyFactory
+from middleware.auth import verify_api_key
+from middleware.metrics import MetricsMiddleware
+from middleware.rate_limit import RateLimitMiddleware, get_rate_limiter, retry_after
+from query_profiler import get_query_profiler
+from utils.logger import setup_logging
+from utils.metrics import REGISTRY, INGEST_IN_FLIGHT
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Smart Agriculture API",
@@ -16,6 +45,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Middleware added later wraps the earlier ones
+if settings.rate_limit_enabled:
+    app.add_middleware(RateLimitMiddleware)  # inside CORS: 429s carry CORS headers
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -25,10 +58,135 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)  # outermost: 429s are timed too
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
+    setup_logging()
     init_db()
+    _warm_hot_readings()
+    _seed_sensor_health()
+    get_ingest_guard().subscribe(get_anomaly_detector().observe_reading)
+    get_ingest_guard().subscribe(get_sensor_health().observe_reading)
+    if settings.cache_enabled:
+        get_ingest_guard().subscribe(_invalidate_sensor_cache)
+    if settings.forecast_refresh_interval_seconds > 0:
+        app.state.forecast_task = asyncio.create_task(_forecast_refresh_loop())
+    if settings.health_check_interval_seconds > 0:
+        app.state.health_task = asyncio.create_task(_sensor_health_loop())
+    if settings.backup_interval_seconds > 0:
+        app.state.backup_task = asyncio.create_task(_backup_loop())
+    if settings.snapshot_enabled:
+        app.state.snapshot_task = asyncio.create_task(_snapshot_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for name in ("forecast_task", "health_task", "backup_task", "snapshot_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+
+def _warm_hot_readings():
+    if get_hot_readings() is None:
+        return
+    with database.get_db() as conn:
+        count = DataService(conn).warm_hot_readings()
+    logger.info("Hot readings tier warmed with %d sensors", count)
+
+def _seed_sensor_health():
+    with database.get_db() as conn:
+        get_sensor_health().seed(DataService(conn).get_last_seen().items())
+
+def _stored_last_seen(sensor_ids: List[str]) -> Dict[str, str]:
+    with database.get_db() as conn:
+        return DataService(conn).get_last_seen(sensor_ids)
+
+def check_sensor_health() -> List[dict]:
+    """Take silent sensors offline, and back online, as confirmed by sensor_latest"""
+    events = get_sensor_health().check(_stored_last_seen)
+    for event in events:
+        if event["event"] == "offline":
+            logger.warning("Sensor %s offline: silent for %ds", event["sensor_id"],
+                           event["silent_seconds"])
+        else:
+            logger.info("Sensor %s back online after %ds", event["sensor_id"],
+                        event["silent_seconds"])
+    return events
+
+async def _sensor_health_loop():
+    """Scheduled offline detection (pops only the deadlines that passed)"""
+    while True:
+        await asyncio.sleep(settings.health_check_interval_seconds)
+        try:
+            await run_in_threadpool(check_sensor_health)
+        except Exception:
+            logger.exception("Sensor health check failed")
+
+def _sensor_alerts(sensor_id: str) -> List[str]:
+    """Streaming alerts attached to a recommendation: anomalies + offline/back online"""
+    return get_anomaly_detector().alerts_for(sensor_id) + get_sensor_health().alerts_for(sensor_id)
+
+def rebuild_forecasts() -> int:
+    """Batch refit of every sensor's time-to-threshold forecast"""
+    with database.get_db() as conn:
+        return DataService(conn).rebuild_forecasts(settings.forecast_window_readings)
+
+async def _forecast_refresh_loop():
+    """Scheduled batch refit (each worker runs it; the refit is idempotent)"""
+    while True:
+        await asyncio.sleep(settings.forecast_refresh_interval_seconds)
+        try:
+            count = await run_in_threadpool(rebuild_forecasts)
+            logger.info("Refreshed forecasts for %d sensors", count)
+        except Exception:
+            logger.exception("Forecast refresh failed")
+
+def run_backup(interval_seconds: float) -> Optional[dict]:
+    """Online backup into BACKUP_DIR if the newest is older than the interval; keeps BACKUP_KEEP"""
+    return scheduled_backup(database.DATABASE_URL, settings.backup_dir, interval_seconds,
+                            settings.backup_keep)
+
+async def _backup_loop():
+    """Scheduled backups (each worker checks; the first to find one due takes it)"""
+    while True:
+        try:
+            await run_in_threadpool(run_backup, settings.backup_interval_seconds)
+        except Exception:
+            logger.exception("Scheduled backup failed")
+        await asyncio.sleep(settings.backup_interval_seconds)
+
+def refresh_analytics_snapshot(max_age_seconds: float) -> Optional[dict]:
+    return refresh_snapshot(database.DATABASE_URL, settings.snapshot_path, max_age_seconds)
+
+async def _snapshot_loop():
+    """Keeps the analytics snapshot at most SNAPSHOT_REFRESH_SECONDS old (taken on startup if older)"""
+    while True:
+        try:
+            await run_in_threadpool(refresh_analytics_snapshot, settings.snapshot_refresh_seconds)
+        except Exception:
+            logger.exception("Snapshot refresh failed")
+        await asyncio.sleep(settings.snapshot_refresh_seconds)
+
+def _analytics_db_path() -> str:
+    """Database file for read-only batch work: the snapshot when there is one"""
+    if settings.snapshot_enabled and snapshot_age(settings.snapshot_path) is not None:
+        return settings.snapshot_path
+    return database.DATABASE_URL
+
+def _single_flight(route: str, params: tuple, compute):
+    """
+    Run compute() once for all concurrent requests with the same route +
+    params; the others wait for and return its result
+    """
+    if not settings.single_flight_enabled:
+        return compute()
+    return get_single_flight().do((route, params), compute, label=route)
+
+def _invalidate_sensor_cache(reading: dict):
+    """New data for a sensor: drop its cached responses in every worker"""
+    get_shared_cache().invalidate_sensor(reading["sensor_id"])
 
 # ===== Request/Response Models =====
 class SensorDataRequest(BaseModel):
@@ -49,6 +207,8 @@ class SensorDataResponse(BaseModel):
     temperature: float
     humidity: float
     timestamp: datetime
+    duplicate: bool = False  # reading was already stored (gateway retry)
+    late: bool = False       # older than the sensor's latest reading
     
 class RecommendationResponse(BaseModel):
     sensor_id: str
@@ -57,14 +217,111 @@ class RecommendationResponse(BaseModel):
     fertilization: dict
     alerts: List[str]
 
+class SensorBatchRequest(BaseModel):
+    sensor_ids: List[str] = Field(..., min_items=1)
+
+class SensorMetadataRequest(BaseModel):
+    zone: Optional[str] = Field(None, max_length=50)
+    field: Optional[str] = Field(None, max_length=50)
+    crop_type: str = Field("tomato", max_length=30)
+    plot_area_m2: Optional[float] = Field(None, gt=0)
+    root_depth_m: Optional[float] = Field(None, gt=0, le=5)
+
+class FieldEventRequest(BaseModel):
+    sensor_id: str = Field(..., min_length=1, max_length=50)
+    kind: str = Field(..., regex=f"^({'|'.join(FIELD_EVENT_KINDS)})$")
+    timestamp: Optional[datetime] = None  # when it was applied, defaults to now
+    product: Optional[str] = Field(None, max_length=100)
+    amount_kg: float = Field(0, ge=0)
+    n_kg: float = Field(0, ge=0)  # nutrient content of amount_kg
+    p_kg: float = Field(0, ge=0)
+    k_kg: float = Field(0, ge=0)
+    volume_l: float = Field(0, ge=0)  # irrigation water
+    note: Optional[str] = Field(None, max_length=500)
+    
+    @validator('timestamp', pre=True, always=True)
+    def set_timestamp(cls, v):
+        return v or datetime.utcnow()
+    
+    @validator('timestamp')
+    def naive_utc(cls, v):
+        # Stored as naive UTC text, so last-event comparisons order correctly
+        return v.astimezone(timezone.utc).replace(tzinfo=None) if v.tzinfo else v
+    
+    @root_validator(skip_on_failure=True)
+    def check_quantity(cls, values):
+        if values["kind"] == "fertilization" and values["amount_kg"] <= 0:
+            raise ValueError("fertilization events need amount_kg > 0")
+        if values["kind"] == "irrigation" and values["volume_l"] <= 0:
+            raise ValueError("irrigation events need volume_l > 0")
+        if values["n_kg"] + values["p_kg"] + values["k_kg"] > values["amount_kg"] + 1e-9:
+            raise ValueError("n_kg + p_kg + k_kg exceed amount_kg")
+        return values
+
+class FieldEventBatchRequest(BaseModel):
+    events: List[FieldEventRequest] = Field(..., min_items=1, max_items=settings.batch_max_ids)
+
+class BacktestRequest(BaseModel):
+    candidate: Dict[str, float] = Field(..., description="threshold overrides to evaluate")
+    baseline: Dict[str, float] = Field(default_factory=dict)
+    sensor_ids: List[str] = Field(..., min_items=1, max_items=settings.backtest_max_sensors)
+    end: Optional[datetime] = None    # defaults to now
+    start: Optional[datetime] = None  # defaults to end - BACKTEST_MAX_DAYS
+    workers: Optional[int] = Field(None, ge=1, le=64)
+    
+    @validator('end', pre=True, always=True)
+    def set_end(cls, v):
+        return v or datetime.utcnow()
+    
+    @validator('start', 'end')
+    def naive_utc(cls, v):
+        return v.astimezone(timezone.utc).replace(tzinfo=None) if v and v.tzinfo else v
+    
+    @root_validator(skip_on_failure=True)
+    def check_span(cls, values):
+        span = timedelta(days=settings.backtest_max_days)
+        if values["start"] is None:
+            values["start"] = values["end"] - span
+        if values["start"] > values["end"]:
+            raise ValueError("start is after end")
+        if values["end"] - values["start"] > span:
+            raise ValueError(f"span exceeds {settings.backtest_max_days} days; use backtest.py")
+        return values
+
+class IrrigationEvent(BaseModel):
+    hour: int = Field(..., ge=0)
+    volume_l: float = Field(..., ge=0)  # litres per sensor plot
+
+class SimulationPlan(BaseModel):
+    name: str = Field(..., max_length=50)
+    irrigation: List[IrrigationEvent] = []
+    temperature_offset: float = Field(0.0, ge=-20, le=20)
+
+class SimulationRequest(BaseModel):
+    sensor_ids: List[str] = Field(..., min_items=1)
+    hours: int = Field(24, ge=1, le=settings.simulation_max_hours)
+    plans: List[SimulationPlan] = Field(default_factory=list)
+    include_trajectories: bool = False
+
 # ===== Endpoints =====
+# Endpoints touching SQLite are plain `def`: FastAPI runs them in its
+# threadpool, so a blocking query never stalls the event loop.
 @app.post("/api/sensors/data", response_model=SensorDataResponse, status_code=201)
-async def ingest_sensor_data(data: SensorDataRequest, db=Depends(get_db)):
+def ingest_sensor_data(data: SensorDataRequest, response: Response,
+                       db=Depends(get_db_session)):
     """
     Ingest new sensor data
+    Idempotent: a retried reading returns 200 with the stored row
     ⚠️ ISSUE: No authentication
-    ⚠️ ISSUE: No rate limiting
+    Rate limited per sensor (429 + Retry-After) on top of the per-client
+    limit; duplicates get their token back
     """
+    if settings.rate_limit_enabled:
+        wait = get_rate_limiter().check_sensor(data.sensor_id)
+        if wait:
+            raise HTTPException(status_code=429, detail="Sensor rate limit exceeded",
+                                headers={"Retry-After": retry_after(wait)})
+    INGEST_IN_FLIGHT.inc()
     try:
         data_service = DataService(db)
         reading = data_service.save_sensor_reading(
@@ -74,44 +331,186 @@ async def ingest_sensor_data(data: SensorDataRequest, db=Depends(get_db)):
             humidity=data.humidity,
             timestamp=data.timestamp
         )
+        # Commit before answering (the dependency would commit after the
+        # response): listeners run now, and a failed commit is reported
+        db.commit()
+        if reading["duplicate"]:
+            if settings.rate_limit_enabled:
+                get_rate_limiter().refund_sensor(data.sensor_id)
+            response.status_code = 200
         return reading
     except Exception as e:
         # ⚠️ ISSUE: Exposing internal errors to client
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        INGEST_IN_FLIGHT.dec()
 
 @app.get("/api/sensors/current/{sensor_id}")
-async def get_current_data(sensor_id: str, db=Depends(get_db)):
+def get_current_data(sensor_id: str, db=Depends(get_db_session)):
     """
     Get latest reading for a sensor
     """
     data_service = DataService(db)
-    reading = data_service.get_latest_reading(sensor_id)
+    reading = _single_flight("/api/sensors/current/{sensor_id}", (sensor_id,),
+                             lambda: data_service.get_latest_reading(sensor_id))
     
     if not reading:
         raise HTTPException(status_code=404, detail="Sensor not found")
     
     return reading
 
+def _batch_ids(ids: List[str]) -> List[str]:
+    """Accept repeated and comma-separated ids; duplicates are coalesced (order kept)"""
+    sensor_ids = list(dict.fromkeys(
+        part.strip() for value in ids for part in value.split(",") if part.strip()))
+    if not sensor_ids:
+        raise HTTPException(status_code=422, detail="No sensor ids given")
+    if len(sensor_ids) > settings.batch_max_ids:
+        raise HTTPException(status_code=422,
+                            detail=f"At most {settings.batch_max_ids} sensor ids per request")
+    return sensor_ids
+
+def _current_batch(sensor_ids: List[str], db) -> dict:
+    readings = DataService(db).get_latest_readings(sensor_ids)
+    return {"readings": readings,
+            "missing": [s for s in sensor_ids if s not in readings]}
+
+@app.get("/api/sensors/current")
+def get_current_data_batch(ids: List[str] = Query(...), db=Depends(get_db_session)):
+    """
+    Latest reading of several sensors: ?ids=A,B or ?ids=A&ids=B
+    """
+    return _current_batch(_batch_ids(ids), db)
+
+@app.post("/api/sensors/current")
+def post_current_data_batch(request: SensorBatchRequest, db=Depends(get_db_session)):
+    """
+    Latest reading of several sensors, ids in the body (for long lists)
+    """
+    return _current_batch(_batch_ids(request.sensor_ids), db)
+
 @app.get("/api/sensors/history/{sensor_id}")
-async def get_sensor_history(
+def get_sensor_history(
     sensor_id: str, 
-    limit: int = 100,  # ⚠️ ISSUE: No max limit enforcement
-    db=Depends(get_db)
+    limit: int = Query(100, ge=1, le=settings.history_max_limit),
+    max_points: Optional[int] = Query(None, ge=3),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    method: str = Query("lttb", regex="^(lttb|minmax)$"),
+    db=Depends(get_db_session)
 ):
     """
     Get historical data for a sensor
+    With max_points (or a start/end window) the newest `limit` readings /
+    the window are downsampled server-side for charting (LTTB by default);
+    a window wider than history_max_limit rows keeps its newest rows and
+    is flagged "truncated"
+    """
+    data_service = DataService(db)
+    
+    def compute():
+        if max_points is None and start is None and end is None:
+            history = data_service.get_sensor_history(sensor_id, limit)
+            return {"sensor_id": sensor_id, "readings": history}
+        
+        # A window scans at most history_max_limit rows (its newest ones)
+        window_limit = settings.history_max_limit if (start or end) else limit
+        return data_service.get_sensor_history_downsampled(
+            sensor_id, max_points or settings.history_max_limit,
+            limit=window_limit, start=start, end=end, method=method)
+    
+    return _single_flight("/api/sensors/history/{sensor_id}",
+                          (sensor_id, limit, max_points, start, end, method), compute)
+
+@app.get("/api/sensors/stats/{sensor_id}")
+def get_sensor_stats(
+    sensor_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db=Depends(get_analytics_db_session)
+):
     """
+    Mean/min/max/std and p10/p50/p90 per metric over [start, end]
+    Computed server-side: constant response size for any window length
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=422, detail="start must be before end")
     data_service = DataService(db)
-    history = data_service.get_sensor_history(sensor_id, limit)
-    return {"sensor_id": sensor_id, "readings": history}
+    return _single_flight("/api/sensors/stats/{sensor_id}", (sensor_id, start, end),
+                          lambda: data_service.get_sensor_stats(sensor_id, start, end))
+
+_ALERT_PATTERN = f"^({'|'.join(ALERT_TYPES)})$"
+
+@app.get("/api/recommendations/history")
+def get_recommendations_history(
+    sensor_id: Optional[str] = None,
+    zone: Optional[str] = None,
+    action: Optional[str] = None,
+    priority: Optional[str] = None,
+    alert: Optional[str] = Query(None, regex=_ALERT_PATTERN),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=settings.history_max_limit),
+    explanations: bool = False,
+    db=Depends(get_analytics_db_session)
+):
+    """
+    Stored recommendations, newest first, filtered in SQL on typed columns
+    alert: an alert type (drought, heat_stress, ...); explanations=true adds
+    the explanation texts.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    recommendations = DataService(db).query_recommendations(
+        sensor_id=sensor_id, zone=zone, action=action, priority=priority, alert=alert,
+        start=start, end=end, limit=limit, explanations=explanations)
+    return {"count": len(recommendations), "recommendations": recommendations}
+
+@app.get("/api/recommendations/analytics")
+def get_recommendations_analytics(
+    group_by: str = Query("zone", regex=f"^({'|'.join(DataService.RECOMMENDATION_GROUPS)})$"),
+    sensor_id: Optional[str] = None,
+    zone: Optional[str] = None,
+    action: Optional[str] = None,
+    priority: Optional[str] = None,
+    alert: Optional[str] = Query(None, regex=_ALERT_PATTERN),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db=Depends(get_analytics_db_session)
+):
+    """
+    Recommendation counts per zone / sensor / day / action / priority
+    e.g. water_immediately actions per zone last week:
+    ?group_by=zone&action=water_immediately&start=<7 days ago>
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    groups = DataService(db).get_recommendation_analytics(
+        group_by=group_by, sensor_id=sensor_id, zone=zone, action=action,
+        priority=priority, alert=alert, start=start, end=end)
+    return {"group_by": group_by, "groups": groups}
 
 @app.get("/api/recommendations/{sensor_id}", response_model=RecommendationResponse)
-async def get_recommendations(sensor_id: str, db=Depends(get_db)):
+def get_recommendations(sensor_id: str, db=Depends(get_db_session)):
     """
     Generate recommendations for a sensor
     ✅ Good: Clear purpose
-    ⚠️ ISSUE: No caching, recalculates every time
+    Served from the shared cache until the sensor receives new data;
+    concurrent misses for a sensor share one evaluation (and one saved row)
     """
+    cache = get_shared_cache() if settings.cache_enabled else None
+    cache_key = f"recommendation:{sensor_id}"
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    return _single_flight("/api/recommendations/{sensor_id}", (sensor_id,),
+                          lambda: _evaluate_recommendation(sensor_id, db, cache, cache_key))
+
+def _evaluate_recommendation(sensor_id: str, db, cache, cache_key: str) -> dict:
+    # Read before the data: a result computed across an invalidation isn't cached
+    generation = cache.generation(sensor_id) if cache else None
     data_service = DataService(db)
     reading = data_service.get_latest_reading(sensor_id)
     
@@ -123,15 +522,138 @@ async def get_recommendations(sensor_id: str, db=Depends(get_db)):
     
     # Generate recommendation
     engine = DecisionEngine()
-    recommendation = engine.generate_recommendation(reading, history)
+    recommendation = engine.generate_recommendation(reading, history, _sensor_alerts(sensor_id),
+                                                    data_service.get_field_state(sensor_id))
     
     # Save recommendation
     data_service.save_recommendation(sensor_id, recommendation)
     
+    if cache:
+        cache.set(cache_key, recommendation, sensor_id=sensor_id, generation=generation)
+    
     return recommendation
 
+def _recommendations_batch(sensor_ids: List[str], db) -> dict:
+    cache = get_shared_cache() if settings.cache_enabled else None
+    recommendations = {}
+    if cache:
+        for sensor_id in sensor_ids:
+            cached = cache.get(f"recommendation:{sensor_id}")
+            if cached is not None:
+                recommendations[sensor_id] = cached
+    
+    pending = [s for s in sensor_ids if s not in recommendations]
+    if pending:
+        generations = {s: cache.generation(s) for s in pending} if cache else {}
+        data_service = DataService(db)
+        readings = data_service.get_latest_readings(pending)
+        histories = data_service.get_recent_histories(list(readings), limit=10)
+        field_states = data_service.get_field_states(list(readings))
+        engine = DecisionEngine()
+        generated = {
+            sensor_id: engine.generate_recommendation(
+                reading, histories[sensor_id], _sensor_alerts(sensor_id),
+                field_states.get(sensor_id))
+            for sensor_id, reading in readings.items()
+        }
+        data_service.save_recommendations(generated)
+        if cache:
+            for sensor_id, recommendation in generated.items():
+                cache.set(f"recommendation:{sensor_id}", recommendation, sensor_id=sensor_id,
+                          generation=generations[sensor_id])
+        recommendations.update(generated)
+    
+    return {"recommendations": {s: recommendations[s] for s in sensor_ids if s in recommendations},
+            "missing": [s for s in sensor_ids if s not in recommendations]}
+
+@app.get("/api/recommendations")
+def get_recommendations_batch(ids: List[str] = Query(...), db=Depends(get_db_session)):
+    """
+    Recommendations for several sensors: ?ids=A,B or ?ids=A&ids=B
+    Readings and histories are fetched with one query each for all sensors
+    """
+    return _recommendations_batch(_batch_ids(ids), db)
+
+@app.post("/api/recommendations")
+def post_recommendations_batch(request: SensorBatchRequest, db=Depends(get_db_session)):
+    """
+    Recommendations for several sensors, ids in the body (for long lists)
+    """
+    return _recommendations_batch(_batch_ids(request.sensor_ids), db)
+
+@app.post("/api/simulate")
+def simulate_moisture(request: SimulationRequest, db=Depends(get_db_session)):
+    """
+    Project soil moisture hour by hour under what-if irrigation plans
+    Drying rates are fitted per sensor from recent history; all plans and
+    sensors are simulated together as NumPy arrays. Results are columnar:
+    one list per outcome, aligned with `sensor_ids`.
+    """
+    plans = request.plans or [SimulationPlan(name="no_irrigation")]
+    if len(plans) > settings.simulation_max_plans:
+        raise HTTPException(status_code=422,
+                            detail=f"At most {settings.simulation_max_plans} plans per request")
+    if any(e.hour >= request.hours for plan in plans for e in plan.irrigation):
+        raise HTTPException(status_code=422, detail="Irrigation hour beyond the horizon")
+    
+    data_service = DataService(db)
+    requested = _batch_ids(request.sensor_ids)
+    readings = data_service.get_latest_readings(requested)
+    sensor_ids = [s for s in requested if s in readings]
+    if not sensor_ids:
+        raise HTTPException(status_code=404, detail="No data for sensors")
+    histories = data_service.get_recent_histories(
+        sensor_ids, limit=settings.simulation_history_readings)
+    metadata = data_service.get_sensors_metadata(sensor_ids)
+    
+    def column(values):
+        return np.array(values, dtype=np.float64)
+    
+    current = [readings[s] for s in sensor_ids]
+    rates = moisture_simulation.fit_drying_rates(
+        [histories[s] for s in sensor_ids], settings.simulation_default_drying_rate)
+    litres_per_point = column([
+        (metadata.get(s, {}).get("plot_area_m2") or settings.default_plot_area_m2)
+        * (metadata.get(s, {}).get("root_depth_m") or settings.root_depth_m) * 10
+        for s in sensor_ids])
+    irrigation = np.zeros((len(plans), request.hours))
+    for p, plan in enumerate(plans):
+        for event in plan.irrigation:
+            irrigation[p, event.hour] += event.volume_l
+    
+    trajectory = moisture_simulation.simulate(
+        column([r["soil_moisture"] for r in current]),
+        column([r["temperature"] for r in current]),
+        column([r["humidity"] for r in current]),
+        rates, litres_per_point, irrigation,
+        column([plan.temperature_offset for plan in plans]))
+    outcome = moisture_simulation.summarize(
+        trajectory, irrigation, settings.soil_moisture_critical, settings.soil_moisture_excess)
+    
+    results = []
+    for p, plan in enumerate(plans):
+        result = {"name": plan.name}
+        for key, values in outcome.items():
+            values = values[p]
+            if values.dtype.kind == "f":
+                values = np.round(values, 2)
+            result[key] = values.tolist()
+        result["hours_to_critical"] = [h if h >= 0 else None for h in result["hours_to_critical"]]
+        if request.include_trajectories:
+            result["trajectory"] = np.round(trajectory[p], 2).tolist()
+        results.append(result)
+    
+    return JSONResponse({
+        "hours": request.hours,
+        "sensor_ids": sensor_ids,
+        "missing": [s for s in requested if s not in readings],
+        "drying_rate_per_hour": np.round(rates, 3).tolist(),
+        "litres_per_point": np.round(litres_per_point, 1).tolist(),
+        "plans": results,
+    })
+
 @app.get("/api/sensors/list")
-async def list_sensors(db=Depends(get_db)):
+def list_sensors(db=Depends(get_db_session)):
     """
     List all sensors with latest data
     """
@@ -139,11 +661,329 @@ async def list_sensors(db=Depends(get_db)):
     sensors = data_service.get_all_sensors()
     return {"sensors": sensors}
 
+@app.get("/api/sensors/health")
+def get_sensors_health(limit: int = Query(100, ge=0, le=10_000),
+                       events: int = Query(50, ge=0, le=settings.health_event_log_size)):
+    """
+    Online/offline counts, the longest-silent offline sensors and the
+    newest offline / back_online events
+    A sensor is offline once it misses several of its usual reports
+    """
+    check_sensor_health()
+    return get_sensor_health().summary(limit=limit, events=events)
+
+@app.get("/api/sensors/{sensor_id}/health")
+def get_sensor_health_status(sensor_id: str):
+    check_sensor_health()
+    status = get_sensor_health().status(sensor_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Sensor not tracked")
+    return status
+
+@app.put("/api/sensors/{sensor_id}/metadata", dependencies=[Depends(verify_api_key)])
+def put_sensor_metadata(sensor_id: str, metadata: SensorMetadataRequest,
+                        db=Depends(get_db_session)):
+    """
+    Assign a sensor to a zone/field and describe its plot
+    Zone totals follow automatically (database triggers)
+    """
+    data_service = DataService(db)
+    saved = data_service.upsert_sensor_metadata(sensor_id, **metadata.dict())
+    db.commit()  # before invalidating, as in _record_field_events
+    if settings.cache_enabled:
+        get_shared_cache().invalidate_sensor(sensor_id)
+    return saved
+
+@app.get("/api/sensors/{sensor_id}/metadata")
+def get_sensor_metadata(sensor_id: str, db=Depends(get_db_session)):
+    metadata = DataService(db).get_sensor_metadata(sensor_id)
+    if not metadata:
+        raise HTTPException(status_code=404, detail="No metadata for sensor")
+    return metadata
+
+@app.get("/api/sensors/{sensor_id}/forecast")
+def get_sensor_forecast(sensor_id: str, db=Depends(get_db_session)):
+    """Moisture trend and forecast crossing times of one sensor"""
+    forecast = DataService(db).get_forecast(sensor_id)
+    if not forecast:
+        raise HTTPException(status_code=404, detail="No forecast for sensor")
+    return forecast
+
+def _record_field_events(events: List[FieldEventRequest], db) -> List[dict]:
+    stored = DataService(db).record_field_events([event.dict() for event in events])
+    # Commit before invalidating and answering (the dependency would commit after
+    # the response): a concurrent miss could otherwise re-cache the old advice
+    db.commit()
+    if settings.cache_enabled:
+        for sensor_id in {event["sensor_id"] for event in stored}:
+            get_shared_cache().invalidate_sensor(sensor_id)
+    return stored
+
+@app.post("/api/events", status_code=201, dependencies=[Depends(verify_api_key)])
+def post_field_event(event: FieldEventRequest, db=Depends(get_db_session)):
+    """
+    Log a fertilization or irrigation application
+    The sensor's last-application and totals follow (database triggers)
+    """
+    return _record_field_events([event], db)[0]
+
+@app.post("/api/events/batch", status_code=201, dependencies=[Depends(verify_api_key)])
+def post_field_events(request: FieldEventBatchRequest, db=Depends(get_db_session)):
+    """Log several applications in one transaction (e.g. a spreader's job report)"""
+    events = _record_field_events(request.events, db)
+    return {"count": len(events), "events": events}
+
+@app.delete("/api/events/{event_id}", status_code=204, dependencies=[Depends(verify_api_key)])
+def delete_field_event(event_id: int, db=Depends(get_db_session)):
+    event = DataService(db).delete_field_event(event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    db.commit()  # as in _record_field_events
+    if settings.cache_enabled:
+        get_shared_cache().invalidate_sensor(event["sensor_id"])
+
+@app.get("/api/sensors/{sensor_id}/events")
+def get_sensor_events(
+    sensor_id: str,
+    kind: Optional[str] = Query(None, regex=f"^({'|'.join(FIELD_EVENT_KINDS)})$"),
+    limit: int = Query(100, ge=1, le=1000),
+    db=Depends(get_db_session)
+):
+    """Logged applications of a sensor, newest first"""
+    events = DataService(db).get_field_events(sensor_id, kind, limit)
+    return {"sensor_id": sensor_id, "count": len(events), "events": events}
+
+@app.get("/api/sensors/{sensor_id}/events/summary")
+def get_sensor_events_summary(sensor_id: str, db=Depends(get_db_session)):
+    """Last application and cumulative totals by kind (null when none logged)"""
+    state = DataService(db).get_field_state(sensor_id)
+    return {"sensor_id": sensor_id, **{kind: state.get(kind) for kind in FIELD_EVENT_KINDS}}
+
+@app.get("/api/forecasts/crossing")
+def get_forecast_crossings(
+    hours: float = Query(6.0, gt=0, le=720),
+    threshold: str = Query("critical", regex="^(critical|low)$"),
+    include_current: bool = False,
+    db=Depends(get_db_session)
+):
+    """
+    Sensors forecast to drop below a threshold within `hours`
+    include_current also lists sensors already below it.
+    """
+    now = datetime.utcnow()
+    sensors = DataService(db).get_sensors_crossing(
+        threshold, before=now + timedelta(hours=hours),
+        after=None if include_current else now)
+    return {"threshold": threshold, "hours": hours, "count": len(sensors), "sensors": sensors}
+
+@app.post("/api/admin/forecasts/rebuild", dependencies=[Depends(verify_api_key)])
+def rebuild_forecasts_now():
+    """Run the forecast batch refit immediately"""
+    return {"sensors": rebuild_forecasts()}
+
+@app.post("/api/admin/backup", dependencies=[Depends(verify_api_key)])
+def backup_now():
+    """Online backup into BACKUP_DIR now (ingestion keeps writing), pruned to BACKUP_KEEP"""
+    result = run_backup(0)
+    if result is None:
+        raise HTTPException(status_code=409, detail="A backup is already in progress")
+    return result
+
+@app.get("/api/admin/backups", dependencies=[Depends(verify_api_key)])
+def list_database_backups():
+    """Scheduled / on-demand backups (newest first) and the analytics snapshot's age"""
+    backups = []
+    for path in reversed(list_backups(settings.backup_dir)):
+        stat = path.stat()
+        backups.append({"path": str(path), "bytes": stat.st_size,
+                        "taken_at": datetime.utcfromtimestamp(stat.st_mtime)})
+    age = snapshot_age(settings.snapshot_path) if settings.snapshot_enabled else None
+    return {"backups": backups,
+            "snapshot": {"enabled": settings.snapshot_enabled, "path": settings.snapshot_path,
+                         "age_seconds": None if age is None else round(age)}}
+
+@app.post("/api/admin/snapshot/refresh", dependencies=[Depends(verify_api_key)])
+def refresh_snapshot_now():
+    """Retake the analytics snapshot immediately"""
+    if not settings.snapshot_enabled:
+        raise HTTPException(status_code=404, detail="Snapshot disabled")
+    result = refresh_analytics_snapshot(0)
+    if result is None:
+        raise HTTPException(status_code=409, detail="A snapshot refresh is already in progress")
+    return result
+
+@app.get("/api/zones")
+def list_zones(db=Depends(get_db_session)):
+    """Zones with their sensor counts"""
+    return {"zones": DataService(db).get_zones()}
+
+@app.get("/api/zones/{zone}/summary")
+def get_zone_summary(zone: str, db=Depends(get_db_session)):
+    """
+    Zone averages and counts from pre-aggregated zone state
+    """
+    summary = DataService(db).get_zone_summary(
+        zone, settings.default_plot_area_m2, settings.root_depth_m)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    return summary
+
+@app.get("/api/zones/{zone}/recommendations")
+def get_zone_recommendations(zone: str, db=Depends(get_db_session)):
+    """
+    One recommendation for the whole zone
+    Evaluated on the zone's average reading; the water volume is the sum of
+    each reporting sensor's deficit, sized by its own crop and plot (as in
+    the irrigation schedule).
+    """
+    data_service = DataService(db)
+    summary = data_service.get_zone_summary(
+        zone, settings.default_plot_area_m2, settings.root_depth_m)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    if not summary["reporting_count"]:
+        raise HTTPException(status_code=404, detail="No data for zone")
+    
+    zone_reading = {
+        "sensor_id": zone,
+        "soil_moisture": summary["avg_soil_moisture"],
+        "temperature": summary["avg_temperature"],
+        "humidity": summary["avg_humidity"],
+    }
+    recommendation = DecisionEngine().generate_recommendation(zone_reading, [])
+    recommendation["irrigation"]["volume_l"] = sum(
+        StrategyFactory.for_sensor(row).required_volume_l(row["soil_moisture"], row["temperature"])
+        for row in data_service.get_irrigation_candidates(zone))
+    
+    del recommendation["sensor_id"]
+    return {"zone": zone, "summary": summary, **recommendation}
+
+@app.get("/api/irrigation/schedule")
+def get_irrigation_schedule(
+    budget_l: Optional[float] = Query(None, ge=0),
+    pump_l_per_hour: Optional[float] = Query(None, gt=0),
+    hours: int = Query(settings.schedule_horizon_hours, ge=1, le=168),
+    zone: Optional[str] = None,
+    db=Depends(get_db_session)
+):
+    """
+    Farm-wide irrigation schedule under the water budget and pump capacity
+    Each sensor plot's deficit (litres to reach the optimal minimum) is
+    served by priority, then forecast time to critical, then size.
+    """
+    budget_l = settings.irrigation_daily_budget_l if budget_l is None else budget_l
+    pump_l_per_hour = pump_l_per_hour or settings.pump_capacity_l_per_hour
+    rows = DataService(db).get_irrigation_candidates(zone)
+    
+    deficits = np.array([
+        StrategyFactory.for_sensor(row).required_volume_l(row["soil_moisture"], row["temperature"])
+        for row in rows])
+    priorities = [priority_rank(row["last_priority"], row["soil_moisture"],
+                                settings.soil_moisture_critical, settings.soil_moisture_low)
+                  for row in rows]
+    deadlines = hours_until([row["critical_at"] for row in rows], datetime.utcnow())
+    plan = schedule_irrigation(deficits, priorities, deadlines, budget_l,
+                               pump_l_per_hour, hours)
+    
+    allocated = plan["allocated_l"]
+    scheduled = [{
+        "sensor_id": rows[i]["sensor_id"],
+        "zone": rows[i]["zone"],
+        "priority": priorities[i],
+        "deficit_l": round(float(deficits[i]), 1),
+        "allocated_l": round(float(allocated[i]), 1),
+        "start_hour": int(plan["start_hour"][i]),
+        "end_hour": int(plan["end_hour"][i]),
+        "hours_to_critical": None if np.isinf(deadlines[i]) else round(float(deadlines[i]), 1),
+        "on_time": bool(plan["end_hour"][i] < deadlines[i]),
+    } for i in np.flatnonzero(allocated > 0)]
+    scheduled.sort(key=lambda item: (item["start_hour"], -item["priority"]))
+    
+    return JSONResponse({
+        "budget_l": budget_l,
+        "pump_l_per_hour": pump_l_per_hour,
+        "hours": hours,
+        "units": len(rows),
+        "requested_l": round(float(deficits.sum()), 1),
+        "allocated_l": round(float(allocated.sum()), 1),
+        "hourly_l": np.round(plan["hourly_l"], 1).tolist(),
+        "scheduled": scheduled,
+        # not (fully) served within budget/horizon
+        "deferred": [rows[i]["sensor_id"] for i in np.flatnonzero(deficits > allocated + 1e-6)],
+    })
+
+@app.get("/api/overview")
+def farm_overview(db=Depends(get_db_session)):
+    """
+    Latest state of every sensor in columnar form (one array per field)
+    Served from the sensor_latest table in a single query; returned as a
+    JSONResponse directly to skip response-model encoding of large arrays.
+    """
+    columns = DataService(db).get_overview(settings.soil_moisture_critical,
+                                           settings.soil_moisture_low)
+    return JSONResponse({"count": len(columns["sensor_id"]), "columns": columns})
+
+@app.post("/api/backtest", dependencies=[Depends(verify_api_key)])
+def backtest(request: BacktestRequest):
+    """
+    Compare two rule sets over stored readings (see backtest.py for the CLI)
+    Runs synchronously in a process pool, so the span and sensor count are
+    capped (BACKTEST_MAX_DAYS, BACKTEST_MAX_SENSORS); use the CLI beyond that.
+    """
+    try:
+        return run_backtest(_analytics_db_path(), request.candidate, request.baseline,
+                            start=request.start, end=request.end,
+                            sensor_ids=request.sensor_ids, workers=request.workers)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/api/admin/query-profile", dependencies=[Depends(verify_api_key)])
+async def query_profile(limit: int = 20, sort: str = "total_ms"):
+    """
+    Aggregated SQL statement statistics for this worker
+    sort: total_ms | avg_ms | max_ms | calls | slow_calls
+    """
+    if not settings.query_profiling_enabled:
+        raise HTTPException(status_code=404, detail="Query profiling disabled")
+    return get_query_profiler().report(limit=limit, sort=sort)
+
+@app.delete("/api/admin/query-profile", status_code=204, dependencies=[Depends(verify_api_key)])
+async def reset_query_profile():
+    """Start a fresh profiling window (e.g. before a load test)"""
+    get_query_profiler().reset()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (per worker process)"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(REGISTRY.render(),
+                             media_type="text/plain; version=0.0.4")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=app.title)
+    parser.add_argument("--host", default=settings.api_host)
+    parser.add_argument("--port", type=int, default=settings.api_port)
+    parser.add_argument("--workers", type=int, default=settings.workers,
+                        help="Worker processes (one per core); they share the "
+                             "database and the response cache")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    args = parse_args()
+    if args.workers > 1:
+        # Workers read settings from the environment (e.g. to turn off per-process tiers)
+        os.environ["WORKERS"] = str(args.workers)
+        # Multiple processes need an import string, not the app object
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        # The one process serving the API: per-process tiers see every write
+        if settings.hot_readings_enabled is None:
+            settings.hot_readings_enabled = True
+        uvicorn.run(app, host=args.host, port=args.port)
 
@@ -0,0 +1,40 @@
+"""
+Apply pending schema migrations (see migrations.py)
+
+The API applies them on startup as well; run this ahead of a rollout when
+a migration rebuilds or backfills a large table. Interrupted runs resume
+from their last committed chunk.
+
+Usage:
+    python migrate.py
+    python migrate.py --status
+    python migrate.py --target 2 --chunk-rows 5000
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from database import DATABASE_URL
+from migrations import migrate, migration_status
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="show versions and exit")
+    parser.add_argument("--target", type=int, help="stop after this version")
+    parser.add_argument("--chunk-rows", type=int, help="rows per chunk transaction")
+    parser.add_argument("--pause", type=float, help="seconds between chunks")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    Path(DATABASE_URL).parent.mkdir(parents=True, exist_ok=True)
+    if not args.status:
+        applied = migrate(DATABASE_URL, target=args.target, chunk_rows=args.chunk_rows,
+                          pause_seconds=args.pause)
+        print(f"Applied {len(applied)} migration(s): {applied}" if applied
+              else "Schema is up to date")
+    print(json.dumps(migration_status(DATABASE_URL), indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
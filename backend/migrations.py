@@ -0,0 +1,899 @@
+"""
+Versioned schema migrations
+
+The schema version lives in the database header (PRAGMA user_version), so
+startup compares one integer and runs no DDL when the schema is current.
+schema_migrations keeps the history of applied versions.
+
+A migration is a list of steps:
+- Transactional: statements (or callables taking the connection) applied
+  in one short transaction; for DDL that SQLite does in O(1), such as
+  CREATE TABLE or ALTER TABLE ... ADD COLUMN.
+- Chunked / Backfill: a statement (an UPDATE for Backfill) applied in
+  rowid chunks.
+- RebuildTable: online rebuild of a table into a new definition and index
+  set (SQLite builds an index in one statement that blocks writers for its
+  whole duration). A shadow table is created with the new indexes, mirror
+  triggers copy concurrent writes, existing rows are copied in rowid chunks,
+  and the tables are swapped in one short transaction; the retired table
+  is then emptied in chunks and dropped.
+
+A migration enabled by a setting (e.g. COMPACT_STORAGE) is optional: it
+runs once the setting is on, is recorded in schema_migrations only, and
+leaves user_version to the regular sequence, which continues past it
+whether it ran or not.
+
+Chunked steps commit every chunk together with their position in
+migration_progress and pause between chunks, so ingestion keeps writing
+while they run, and an interrupted migration resumes where it stopped.
+Every step takes the write lock (BEGIN IMMEDIATE) and re-reads its state,
+so several workers starting at once apply each step exactly once.
+
+Run large migrations ahead of a rollout with `python migrate.py`; the
+servers then find the schema current.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import database
+from config.settings import get_settings
+from services.compact_storage import COMPACT, METRICS, encode_sql, readings_layout
+from services.decision_engine import ALERT_BITS, ALERT_MARKERS
+
+logger = logging.getLogger(__name__)
+
+_BOOKKEEPING_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS migration_progress (
+        version INTEGER NOT NULL,
+        step INTEGER NOT NULL,
+        phase TEXT,
+        position INTEGER,
+        done INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (version, step)
+    )
+    """,
+)
+
+class Migration:
+    def __init__(self, version: int, name: str, steps: Sequence,
+                 enabled: Optional[Callable[[], bool]] = None):
+        self.version = version
+        self.name = name
+        self.steps = list(steps)
+        self.enabled = enabled  # optional migrations only
+
+    @property
+    def optional(self) -> bool:
+        return self.enabled is not None
+
+class Transactional:
+    """Statements or callables(conn) applied in one transaction"""
+
+    def __init__(self, *operations: Union[str, Callable[[sqlite3.Connection], None]]):
+        self.operations = operations
+
+    def run(self, runner: "MigrationRunner", version: int, step: int):
+        with runner.transaction():
+            if runner.progress(version, step)[0]:
+                return
+            for operation in self.operations:
+                if callable(operation):
+                    operation(runner.conn)
+                else:
+                    runner.conn.execute(operation)
+            runner.save(version, step, done=True)
+
+class Chunked:
+    """
+    A statement applied over `table` one rowid chunk per transaction
+    The statement limits itself to rowid > :low AND rowid <= :high. Rows
+    inserted while it runs are picked up until no rows are left past the
+    position; the application must write rows that arrive afterwards in the
+    new form itself.
+    """
+
+    def __init__(self, table: str, statement: str):
+        self.table = table
+        self.statement = statement
+
+    def run(self, runner: "MigrationRunner", version: int, step: int):
+        while True:
+            with runner.transaction():
+                done, _, position = runner.progress(version, step)
+                if done:
+                    return
+                upper = runner.next_chunk(self.table, position)
+                if upper is None:
+                    runner.save(version, step, done=True)
+                    return
+                runner.conn.execute(self.statement, {"low": position, "high": upper})
+                runner.save(version, step, position=upper)
+            runner.pause()
+
+class Backfill(Chunked):
+    """UPDATE table SET <assignments> WHERE <where>, in rowid chunks"""
+
+    def __init__(self, table: str, assignments: str, where: str = "1"):
+        super().__init__(table, f"""
+            UPDATE {table} SET {assignments}
+            WHERE rowid > :low AND rowid <= :high AND ({where})
+        """)
+
+class RebuildTable:
+    """
+    Online rebuild of `table` into create_sql plus indexes
+    create_sql / indexes use {table} for the table name. Index names must
+    differ from the current ones (both tables exist until the swap).
+    Columns present in both definitions are copied, rowids are kept; new
+    columns take their defaults. Triggers on the table are recreated on the
+    new one.
+    """
+
+    def __init__(self, table: str, create_sql: str, indexes: Sequence[str] = ()):
+        self.table = table
+        self.create_sql = create_sql
+        self.indexes = indexes
+        self.shadow = f"{table}__rebuild"
+        self.retired = f"{table}__retired"
+
+    def run(self, runner: "MigrationRunner", version: int, step: int):
+        conn = runner.conn
+        while True:
+            with runner.transaction():
+                done, phase, position = runner.progress(version, step)
+                if done:
+                    return
+                if phase is None:
+                    self._create(conn)
+                    runner.save(version, step, phase="copy")
+                elif phase == "copy":
+                    upper = runner.next_chunk(self.table, position)
+                    if upper is None:
+                        self._swap(conn)
+                        runner.save(version, step, phase="drop")
+                    else:
+                        self._copy(conn, position, upper)
+                        runner.save(version, step, phase="copy", position=upper)
+                else:
+                    deleted = conn.execute(f"""
+                        DELETE FROM {self.retired} WHERE rowid IN (
+                            SELECT rowid FROM {self.retired} LIMIT ?
+                        )
+                    """, (runner.chunk_rows,)).rowcount
+                    if not deleted:
+                        conn.execute(f"DROP TABLE {self.retired}")
+                        runner.save(version, step, done=True)
+                        return
+            runner.pause()
+
+    def _create(self, conn: sqlite3.Connection):
+        conn.execute(self.create_sql.format(table=self.shadow))
+        for statement in self.indexes:
+            conn.execute(statement.format(table=self.shadow))
+        for statement in self._mirror_triggers(conn):
+            conn.execute(statement)
+
+    def _copy(self, conn: sqlite3.Connection, low: int, high: int):
+        columns = ", ".join(["rowid"] + self._columns(conn))
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {self.shadow} ({columns})
+            SELECT {columns} FROM {self.table}
+            WHERE rowid > ? AND rowid <= ?
+        """, (low, high))
+
+    def _columns(self, conn: sqlite3.Connection) -> List[str]:
+        """Columns of both tables, without an INTEGER PRIMARY KEY (copied as rowid)"""
+        def info(table):
+            return conn.execute(f"PRAGMA table_info({table})").fetchall()
+
+        def rowid_alias(rows):
+            keys = [row for row in rows if row[5]]
+            if len(keys) == 1 and keys[0][2].upper() == "INTEGER":
+                return keys[0][1]
+            return None
+
+        old, new = info(self.table), info(self.shadow)
+        new_names = {row[1] for row in new}
+        skip = rowid_alias(old)
+        return [row[1] for row in old if row[1] in new_names and row[1] != skip]
+
+    def _mirror_triggers(self, conn: sqlite3.Connection) -> List[str]:
+        columns = self._columns(conn)
+        names = ", ".join(["rowid"] + columns)
+        values = ", ".join(f"NEW.{c}" for c in ["rowid"] + columns)
+        insert = f"INSERT INTO {self.shadow} ({names}) VALUES ({values});"
+        delete = f"DELETE FROM {self.shadow} WHERE rowid = OLD.rowid;"
+        return [
+            f"CREATE TRIGGER {self.shadow}_insert AFTER INSERT ON {self.table} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER {self.shadow}_update AFTER UPDATE ON {self.table} "
+            f"BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER {self.shadow}_delete AFTER DELETE ON {self.table} "
+            f"BEGIN {delete} END",
+        ]
+
+    def _swap(self, conn: sqlite3.Connection):
+        triggers = conn.execute("""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'trigger' AND tbl_name = ?
+        """, (self.table,)).fetchall()
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+        # Legacy renames leave references to the name in other triggers and
+        # views alone, so they follow the name to the new table
+        conn.execute("PRAGMA legacy_alter_table = ON")
+        try:
+            conn.execute(f"ALTER TABLE {self.table} RENAME TO {self.retired}")
+            conn.execute(f"ALTER TABLE {self.shadow} RENAME TO {self.table}")
+        finally:
+            conn.execute("PRAGMA legacy_alter_table = OFF")
+        for name, sql in triggers:
+            if not name.startswith(f"{self.shadow}_"):
+                conn.execute(sql)
+
+def _carry_sequence(conn: sqlite3.Connection, source: str, target: str):
+    """AUTOINCREMENT on target must not hand out ids of source rows deleted before the copy"""
+    seq = conn.execute("SELECT MAX(seq) FROM sqlite_sequence WHERE name IN (?, ?)",
+                       (source, target)).fetchone()[0]
+    if seq is not None:
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (target,))
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (target, seq))
+
+_READINGS = """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sensor_id TEXT NOT NULL,
+        soil_moisture REAL NOT NULL,
+        temperature REAL NOT NULL,
+        humidity REAL NOT NULL,
+        timestamp DATETIME NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_READING_COLUMNS = "id, sensor_id, soil_moisture, temperature, humidity, timestamp, created_at"
+
+class UniqueReadings(RebuildTable):
+    """
+    Online rebuild of sensor_readings with one row per (sensor_id, timestamp)
+    so gateway retries cannot duplicate data. Retries stored before are
+    dropped by the copy, keeping the lowest id (the copy stored first). The
+    unique index also serves the per-sensor history lookups, so
+    idx_sensor_timestamp goes with the retired table. Databases that
+    already have the index (unversioned releases) or the compact layout are
+    left as they are.
+    """
+
+    def __init__(self):
+        super().__init__("sensor_readings", _READINGS, [
+            "CREATE UNIQUE INDEX idx_sensor_readings_unique ON {table}(sensor_id, timestamp)"])
+
+    def run(self, runner: "MigrationRunner", version: int, step: int):
+        with runner.transaction():
+            done, phase, _ = runner.progress(version, step)
+            if not done and phase is None and self._unique(runner.conn):
+                runner.save(version, step, done=True)
+        super().run(runner, version, step)
+
+    def _unique(self, conn: sqlite3.Connection) -> bool:
+        if readings_layout(conn).compact:
+            return True
+        return conn.execute("""
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'index' AND name = 'idx_sensor_readings_unique' AND tbl_name = ?
+        """, (self.table,)).fetchone() is not None
+
+    def _copy(self, conn: sqlite3.Connection, low: int, high: int):
+        # A mirrored retry of an older, not yet copied reading gives way to it
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {self.shadow} ({_READING_COLUMNS})
+            SELECT {_READING_COLUMNS} FROM {self.table}
+            WHERE rowid > ? AND rowid <= ? ORDER BY rowid
+            ON CONFLICT(sensor_id, timestamp) DO UPDATE SET
+                id = excluded.id,
+                soil_moisture = excluded.soil_moisture,
+                temperature = excluded.temperature,
+                humidity = excluded.humidity,
+                created_at = excluded.created_at
+            WHERE excluded.id < {self.shadow}.id
+        """, (low, high))
+
+    def _mirror_triggers(self, conn: sqlite3.Connection) -> List[str]:
+        # OR IGNORE: a retry of a copied reading is not mirrored (and does
+        # not fail a plain INSERT on the old table)
+        values = ", ".join(f"NEW.{c}" for c in _READING_COLUMNS.split(", "))
+        insert = f"INSERT OR IGNORE INTO {self.shadow} ({_READING_COLUMNS}) VALUES ({values});"
+        delete = f"DELETE FROM {self.shadow} WHERE id = OLD.id;"
+        return [
+            f"CREATE TRIGGER {self.shadow}_insert AFTER INSERT ON {self.table} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER {self.shadow}_update AFTER UPDATE ON {self.table} "
+            f"BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER {self.shadow}_delete AFTER DELETE ON {self.table} "
+            f"BEGIN {delete} END",
+        ]
+
+    def _swap(self, conn: sqlite3.Connection):
+        _carry_sequence(conn, self.table, self.shadow)
+        super()._swap(conn)
+
+# Newest reading per sensor within one rowid chunk of sensor_readings; the
+# zone triggers fold each insert / update into zone_state
+_LATEST_BACKFILL = """
+    INSERT INTO sensor_latest
+        (sensor_id, reading_id, soil_moisture, temperature, humidity, timestamp)
+    SELECT sensor_id, id, soil_moisture, temperature, humidity, MAX(timestamp)
+    FROM sensor_readings
+    WHERE rowid > :low AND rowid <= :high
+    GROUP BY sensor_id
+    ON CONFLICT(sensor_id) DO UPDATE SET
+        reading_id = excluded.reading_id,
+        soil_moisture = excluded.soil_moisture,
+        temperature = excluded.temperature,
+        humidity = excluded.humidity,
+        timestamp = excluded.timestamp
+    WHERE excluded.timestamp > sensor_latest.timestamp
+"""
+
+_SENSOR_KEYS = """
+    CREATE TABLE sensor_keys (
+        sensor_key INTEGER PRIMARY KEY,
+        sensor_id TEXT NOT NULL UNIQUE
+    )
+"""
+
+_READINGS_COMPACT = """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sensor_key INTEGER NOT NULL,
+        soil_moisture INTEGER NOT NULL,  -- tenths of a percent
+        temperature INTEGER NOT NULL,  -- tenths of a degree
+        humidity INTEGER NOT NULL,  -- tenths of a percent
+        ts INTEGER NOT NULL  -- epoch seconds, UTC
+    )
+"""
+
+# Interns NEW.sensor_id (not INSERT OR IGNORE: the outer statement's conflict policy would win)
+_INTERN_SENSOR_SQL = """
+        INSERT INTO sensor_keys (sensor_id)
+        SELECT NEW.sensor_id
+        WHERE NOT EXISTS (SELECT 1 FROM sensor_keys WHERE sensor_id = NEW.sensor_id);
+"""
+
+def _encoded_values(row: str) -> str:
+    return encode_sql(f"{row}.sensor_id", [f"{row}.{m}" for m in METRICS], f"{row}.timestamp")
+
+# sensor_readings once compact: a view decoding readings_compact
+_COMPACT_VIEW = (
+    f"CREATE VIEW sensor_readings AS SELECT {COMPACT.columns()} FROM {COMPACT.source}",
+    f"""
+    CREATE TRIGGER trg_sensor_readings_insert
+    INSTEAD OF INSERT ON sensor_readings
+    BEGIN
+        {_INTERN_SENSOR_SQL}
+        INSERT INTO readings_compact (id, sensor_key, soil_moisture, temperature, humidity, ts)
+        VALUES (NEW.id, {_encoded_values("NEW")});
+    END
+    """,
+    """
+    CREATE TRIGGER trg_sensor_readings_delete
+    INSTEAD OF DELETE ON sensor_readings
+    BEGIN
+        DELETE FROM readings_compact WHERE id = OLD.id;
+    END
+    """,
+)
+
+class CompactReadings(RebuildTable):
+    """
+    Online conversion of sensor_readings to the compact layout
+    (services/compact_storage.py), the RebuildTable way: sensor_keys and
+    readings_compact are filled in rowid chunks while mirror triggers
+    encode concurrent writes, then one short transaction replaces the
+    table by the decoding view. Readings that collide once truncated to
+    whole seconds keep the copy stored first. sensor_latest is pointed at
+    the stored readings with one index seek per sensor. Other triggers on
+    sensor_readings go with the retired table (a view only takes INSTEAD OF
+    triggers).
+    """
+
+    def __init__(self):
+        super().__init__("sensor_readings", _READINGS_COMPACT, [
+            "CREATE UNIQUE INDEX idx_readings_compact_key ON {table}(sensor_key, ts)"])
+        self.shadow = COMPACT.table
+
+    def run(self, runner: "MigrationRunner", version: int, step: int):
+        with runner.transaction():
+            done, phase, _ = runner.progress(version, step)
+            if not done and phase is None and readings_layout(runner.conn).compact:
+                runner.save(version, step, done=True)  # converted by an earlier release
+        super().run(runner, version, step)
+
+    def _create(self, conn: sqlite3.Connection):
+        conn.execute(_SENSOR_KEYS)
+        super()._create(conn)
+
+    def _copy(self, conn: sqlite3.Connection, low: int, high: int):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO sensor_keys (sensor_id)
+            SELECT DISTINCT sensor_id FROM {self.table} WHERE rowid > ? AND rowid <= ?
+        """, (low, high))
+        # A mirrored write in the same second as an older, not yet copied
+        # reading gives way to it: the lowest id is the copy stored first
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {self.shadow}
+                (id, sensor_key, soil_moisture, temperature, humidity, ts)
+            SELECT s.id, {_encoded_values("s")} FROM {self.table} s
+            WHERE s.rowid > ? AND s.rowid <= ? ORDER BY s.rowid
+            ON CONFLICT(sensor_key, ts) DO UPDATE SET
+                id = excluded.id,
+                soil_moisture = excluded.soil_moisture,
+                temperature = excluded.temperature,
+                humidity = excluded.humidity
+            WHERE excluded.id < {self.shadow}.id
+        """, (low, high))
+
+    def _mirror_triggers(self, conn: sqlite3.Connection) -> List[str]:
+        insert = f"""
+            {_INTERN_SENSOR_SQL}
+            INSERT OR IGNORE INTO {self.shadow}
+                (id, sensor_key, soil_moisture, temperature, humidity, ts)
+            VALUES (NEW.id, {_encoded_values("NEW")});
+        """
+        delete = f"DELETE FROM {self.shadow} WHERE id = OLD.id;"
+        return [
+            f"CREATE TRIGGER {self.shadow}_insert AFTER INSERT ON {self.table} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER {self.shadow}_update AFTER UPDATE ON {self.table} "
+            f"BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER {self.shadow}_delete AFTER DELETE ON {self.table} "
+            f"BEGIN {delete} END",
+        ]
+
+    def _swap(self, conn: sqlite3.Connection):
+        for event in ("insert", "update", "delete"):
+            conn.execute(f"DROP TRIGGER {self.shadow}_{event}")
+        _carry_sequence(conn, self.table, self.shadow)
+        conn.execute("PRAGMA legacy_alter_table = ON")
+        try:
+            conn.execute(f"ALTER TABLE {self.table} RENAME TO {self.retired}")
+        finally:
+            conn.execute("PRAGMA legacy_alter_table = OFF")
+        for statement in _COMPACT_VIEW:
+            conn.execute(statement)
+        # Stored values are rounded and a same-second duplicate may be gone
+        conn.execute(f"""
+            UPDATE sensor_latest SET
+                (reading_id, soil_moisture, temperature, humidity, timestamp) = (
+                    SELECT {COMPACT.columns("id", *METRICS, "timestamp")}
+                    FROM {COMPACT.source}
+                    WHERE {COMPACT.sensor} = sensor_latest.sensor_id
+                    ORDER BY {COMPACT.timestamp} DESC LIMIT 1)
+            WHERE sensor_id IN (SELECT sensor_id FROM sensor_keys)
+        """)
+
+def _alert_mask_sql(json_column: str) -> str:
+    """SQL equivalent of decision_engine.alert_mask over a JSON array of alert messages"""
+    cases = " ".join(f"WHEN instr(value, '{marker}') THEN {ALERT_BITS[name]}"
+                     for name, marker in ALERT_MARKERS.items())
+    return f"""(
+        SELECT COALESCE(SUM(DISTINCT CASE {cases} END), 0)
+        FROM json_each({json_column}, '$.alerts')
+    )"""
+
+_RECOMMENDATIONS_V2 = """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sensor_id TEXT NOT NULL,
+        timestamp DATETIME NOT NULL,
+        action TEXT,
+        amount_ml INTEGER NOT NULL DEFAULT 0,
+        priority TEXT,
+        fertilization_needed INTEGER NOT NULL DEFAULT 0,
+        fertilization_type TEXT,
+        fertilization_kg REAL NOT NULL DEFAULT 0,
+        alert_mask INTEGER NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_TYPED_RECOMMENDATION_COLUMNS = ("id, sensor_id, timestamp, created_at, action, amount_ml, priority, "
+                                 "fertilization_needed, fertilization_type, fertilization_kg, alert_mask")
+
+def _typed_recommendation_sql(row: str) -> str:
+    """Values for _TYPED_RECOMMENDATION_COLUMNS from a pre-v2 row (its recommendation_data JSON)"""
+    data = f"{row}.recommendation_data"
+    return f"""
+        {row}.id, {row}.sensor_id, {row}.timestamp, {row}.created_at,
+        json_extract({data}, '$.irrigation.action'),
+        COALESCE(json_extract({data}, '$.irrigation.amount_ml'), 0),
+        json_extract({data}, '$.irrigation.priority'),
+        COALESCE(json_extract({data}, '$.fertilization.needed'), 0),
+        json_extract({data}, '$.fertilization.type'),
+        COALESCE(json_extract({data}, '$.fertilization.amount_kg'), 0),
+        {_alert_mask_sql(data)}
+    """
+
+def _explanation_sql(row: str) -> str:
+    """(recommendation_id, irrigation, fertilization, alerts) from a pre-v2 row"""
+    data = f"{row}.recommendation_data"
+    return f"""
+        {row}.id,
+        json_extract({data}, '$.irrigation.explanation'),
+        json_extract({data}, '$.fertilization.explanation'),
+        (SELECT group_concat(value, char(10)) FROM json_each({data}, '$.alerts'))
+    """
+
+class TypedRecommendations(RebuildTable):
+    """
+    Online rebuild of recommendations from JSON blobs into typed columns
+    The copy and the mirror triggers both derive the columns and the
+    recommendation_explanations row from recommendation_data, so rows that
+    servers still running the previous release write during the rebuild
+    arrive complete. Their writes fail once the swap drops
+    recommendation_data: replace them as soon as `python migrate.py` has
+    finished (the new release cannot write recommendations before that).
+    """
+
+    def __init__(self):
+        super().__init__("recommendations", _RECOMMENDATIONS_V2, [
+            "CREATE INDEX idx_recommendations_sensor_time ON {table}(sensor_id, timestamp DESC)",
+            "CREATE INDEX idx_recommendations_time ON {table}(timestamp)",
+            "CREATE INDEX idx_recommendations_action_time ON {table}(action, timestamp, sensor_id)",
+        ])
+
+    def _copy(self, conn: sqlite3.Connection, low: int, high: int):
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {self.shadow} ({_TYPED_RECOMMENDATION_COLUMNS})
+            SELECT {_typed_recommendation_sql("r")} FROM {self.table} r
+            WHERE r.rowid > ? AND r.rowid <= ?
+        """, (low, high))
+        conn.execute(f"""
+            INSERT OR IGNORE INTO recommendation_explanations
+                (recommendation_id, irrigation, fertilization, alerts)
+            SELECT {_explanation_sql("r")} FROM {self.table} r
+            WHERE r.rowid > ? AND r.rowid <= ?
+        """, (low, high))
+
+    def _mirror_triggers(self, conn: sqlite3.Connection) -> List[str]:
+        insert = f"""
+            INSERT OR IGNORE INTO {self.shadow} ({_TYPED_RECOMMENDATION_COLUMNS})
+            VALUES ({_typed_recommendation_sql("NEW")});
+            INSERT OR IGNORE INTO recommendation_explanations
+                (recommendation_id, irrigation, fertilization, alerts)
+            VALUES ({_explanation_sql("NEW")});
+        """
+        delete = f"""
+            DELETE FROM {self.shadow} WHERE id = OLD.id;
+            DELETE FROM recommendation_explanations WHERE recommendation_id = OLD.id;
+        """
+        return [
+            f"CREATE TRIGGER {self.shadow}_insert AFTER INSERT ON {self.table} "
+            f"BEGIN {insert} END",
+            f"CREATE TRIGGER {self.shadow}_update AFTER UPDATE ON {self.table} "
+            f"BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER {self.shadow}_delete AFTER DELETE ON {self.table} "
+            f"BEGIN {delete} END",
+        ]
+
+    def _swap(self, conn: sqlite3.Connection):
+        _carry_sequence(conn, self.table, self.shadow)
+        super()._swap(conn)
+
+_FIELD_EVENT_TOTALS = ("amount_kg", "n_kg", "p_kg", "k_kg", "volume_l")
+
+def _field_event_totals_sql(sign: str, row: str) -> str:
+    return ",\n".join(f"total_{column} = total_{column} {sign} {row}.{column}"
+                       for column in _FIELD_EVENT_TOTALS)
+
+# Last event and running totals per (sensor, kind), kept by triggers so the
+# engine reads them with one primary-key seek. Same zone_state-style upkeep:
+# not INSERT OR IGNORE, as the outer statement's conflict policy would win.
+_FIELD_EVENT_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_field_events_insert
+    AFTER INSERT ON field_events
+    BEGIN
+        INSERT INTO field_event_state (sensor_id, kind)
+        SELECT NEW.sensor_id, NEW.kind
+        WHERE NOT EXISTS (SELECT 1 FROM field_event_state
+                          WHERE sensor_id = NEW.sensor_id AND kind = NEW.kind);
+        UPDATE field_event_state SET
+            event_count = event_count + 1,
+            {_field_event_totals_sql("+", "NEW")}
+        WHERE sensor_id = NEW.sensor_id AND kind = NEW.kind;
+        UPDATE field_event_state SET
+            last_event_id = NEW.id, last_at = NEW.timestamp, last_product = NEW.product,
+            last_amount_kg = NEW.amount_kg, last_volume_l = NEW.volume_l
+        WHERE sensor_id = NEW.sensor_id AND kind = NEW.kind
+            AND (last_at IS NULL OR NEW.timestamp >= last_at);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_field_events_delete
+    AFTER DELETE ON field_events
+    BEGIN
+        UPDATE field_event_state SET
+            event_count = event_count - 1,
+            {_field_event_totals_sql("-", "OLD")}
+        WHERE sensor_id = OLD.sensor_id AND kind = OLD.kind;
+        -- The last event went: the next newest takes its place (one index seek)
+        UPDATE field_event_state SET
+            (last_event_id, last_at, last_product, last_amount_kg, last_volume_l) = (
+                SELECT id, timestamp, product, amount_kg, volume_l FROM field_events
+                WHERE sensor_id = OLD.sensor_id AND kind = OLD.kind
+                ORDER BY timestamp DESC, id DESC LIMIT 1)
+        WHERE sensor_id = OLD.sensor_id AND kind = OLD.kind AND last_event_id = OLD.id;
+    END
+    """,
+)
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", [Transactional(database.create_baseline_schema)]),
+    # JSON blobs -> typed columns; explanation texts move to their own table
+    # so scans over recommendations stay narrow
+    Migration(2, "typed recommendation columns", [
+        Transactional("""
+            CREATE TABLE IF NOT EXISTS recommendation_explanations (
+                recommendation_id INTEGER PRIMARY KEY,
+                irrigation TEXT,
+                fertilization TEXT,
+                alerts TEXT  -- one message per line
+            )
+        """),
+        TypedRecommendations(),
+    ]),
+    # Checkpoints of bulk imports (import_readings.py), so they resume after a crash
+    Migration(3, "bulk import progress", [
+        Transactional(
+            """
+            CREATE TABLE IF NOT EXISTS import_progress (
+                source TEXT PRIMARY KEY,  -- absolute path of the imported file
+                fingerprint TEXT NOT NULL,  -- size and mtime: a changed file starts over
+                rows_read INTEGER NOT NULL DEFAULT 0,
+                rows_loaded INTEGER NOT NULL DEFAULT 0,
+                rows_rejected INTEGER NOT NULL DEFAULT 0,
+                rows_duplicate INTEGER NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0,
+                updated_at DATETIME NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS import_deferred_indexes (
+                name TEXT PRIMARY KEY,  -- dropped for the load, recreated when it ends
+                sql TEXT NOT NULL
+            )
+            """,
+        ),
+    ]),
+    # Fertilization / irrigation log with per-sensor last event and totals
+    Migration(4, "field events", [
+        Transactional(
+            """
+            CREATE TABLE IF NOT EXISTS field_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sensor_id TEXT NOT NULL,
+                kind TEXT NOT NULL,  -- fertilization | irrigation
+                timestamp DATETIME NOT NULL,  -- when it was applied (UTC)
+                product TEXT,
+                amount_kg REAL NOT NULL DEFAULT 0,
+                n_kg REAL NOT NULL DEFAULT 0,
+                p_kg REAL NOT NULL DEFAULT 0,
+                k_kg REAL NOT NULL DEFAULT 0,
+                volume_l REAL NOT NULL DEFAULT 0,
+                note TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_field_events_sensor_kind_time
+            ON field_events(sensor_id, kind, timestamp DESC)
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS field_event_state (
+                sensor_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                last_event_id INTEGER,
+                last_at DATETIME,
+                last_product TEXT,
+                last_amount_kg REAL,
+                last_volume_l REAL,
+                event_count INTEGER NOT NULL DEFAULT 0,
+                total_amount_kg REAL NOT NULL DEFAULT 0,
+                total_n_kg REAL NOT NULL DEFAULT 0,
+                total_p_kg REAL NOT NULL DEFAULT 0,
+                total_k_kg REAL NOT NULL DEFAULT 0,
+                total_volume_l REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (sensor_id, kind)
+            ) WITHOUT ROWID
+            """,
+            *_FIELD_EVENT_TRIGGERS,
+        ),
+    ]),
+    # One row per (sensor_id, timestamp): gateway retries must not duplicate data
+    Migration(5, "unique readings", [UniqueReadings()]),
+    # Latest reading per sensor, sensor metadata with zone totals, forecasts
+    Migration(6, "sensor state", [
+        Transactional(database.create_state_schema),
+        Chunked("sensor_readings", _LATEST_BACKFILL),
+    ]),
+    # Optional: readings as scaled integers with interned sensor ids
+    Migration(7, "compact readings", [CompactReadings()],
+              enabled=lambda: get_settings().compact_storage),
+]
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def latest_version(migrations: Sequence[Migration] = None) -> int:
+    """user_version of a current schema: the newest regular migration"""
+    migrations = MIGRATIONS if migrations is None else migrations
+    return max((m.version for m in migrations if not m.optional), default=0)
+
+def recorded_versions(conn: sqlite3.Connection) -> set:
+    """Versions in schema_migrations (empty before the first migration)"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_migrations'").fetchone() is None:
+        return set()
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+class MigrationRunner:
+    def __init__(self, conn: sqlite3.Connection, chunk_rows: int, pause_seconds: float,
+                 optional_versions: Sequence[int] = ()):
+        self.conn = conn  # autocommit mode (isolation_level=None)
+        self.chunk_rows = chunk_rows
+        self.pause_seconds = pause_seconds
+        self.optional_versions = frozenset(optional_versions)
+
+    @contextmanager
+    def transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def pause(self):
+        """Between chunks: let other connections take the write lock"""
+        time.sleep(self.pause_seconds)
+
+    def progress(self, version: int, step: int) -> Tuple[bool, Optional[str], int]:
+        """(done, phase, position) of a step; done when its migration is already applied"""
+        if self.applied(version):
+            return True, None, 0
+        row = self.conn.execute("""
+            SELECT done, phase, position FROM migration_progress
+            WHERE version = ? AND step = ?
+        """, (version, step)).fetchone()
+        if row is None:
+            return False, None, 0
+        return bool(row[0]), row[1], row[2] or 0
+
+    def applied(self, version: int) -> bool:
+        if version in self.optional_versions:
+            return self.conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?",
+                                     (version,)).fetchone() is not None
+        return schema_version(self.conn) >= version
+
+    def save(self, version: int, step: int, phase: Optional[str] = None,
+             position: int = 0, done: bool = False):
+        self.conn.execute("""
+            INSERT INTO migration_progress (version, step, phase, position, done)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(version, step) DO UPDATE SET
+                phase = excluded.phase, position = excluded.position, done = excluded.done
+        """, (version, step, phase, position, int(done)))
+
+    def next_chunk(self, table: str, position: int) -> Optional[int]:
+        """Last rowid of the next chunk after position (None when there is none)"""
+        return self.conn.execute(f"""
+            SELECT MAX(rowid) FROM (
+                SELECT rowid FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?
+            )
+        """, (position, self.chunk_rows)).fetchone()[0]
+
+    def apply(self, migration: Migration) -> bool:
+        """Run the pending steps of one migration; False if another process applied it"""
+        for step, operation in enumerate(migration.steps):
+            operation.run(self, migration.version, step)
+        with self.transaction():
+            if self.applied(migration.version):
+                return False
+            self.conn.execute("""
+                INSERT OR REPLACE INTO schema_migrations (version, name, applied_at)
+                VALUES (?, ?, ?)
+            """, (migration.version, migration.name, datetime.utcnow()))
+            self.conn.execute("DELETE FROM migration_progress WHERE version = ?",
+                              (migration.version,))
+            if not migration.optional:
+                # PRAGMA arguments cannot be bound; version is an int
+                self.conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+        return True
+
+def migrate(db_path: str, target: Optional[int] = None,
+            chunk_rows: Optional[int] = None, pause_seconds: Optional[float] = None,
+            migrations: Sequence[Migration] = None) -> List[int]:
+    """Apply pending migrations up to target (default: all); returns the applied versions"""
+    settings = get_settings()
+    migrations = MIGRATIONS if migrations is None else migrations
+    target = max((m.version for m in migrations), default=0) if target is None else target
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        current = schema_version(conn)
+        pending = [m for m in migrations if not m.optional and current < m.version <= target]
+        optional = [m for m in migrations if m.optional and m.version <= target and m.enabled()]
+        if optional:  # only then is schema_migrations read on startup
+            recorded = recorded_versions(conn)
+            pending += [m for m in optional if m.version not in recorded]
+        if not pending:
+            return []
+
+        # WAL lets worker processes keep reading while one of them writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(settings.migration_busy_timeout_ms)}")
+        runner = MigrationRunner(
+            conn,
+            chunk_rows or settings.migration_chunk_rows,
+            settings.migration_chunk_pause_seconds if pause_seconds is None else pause_seconds,
+            optional_versions=[m.version for m in migrations if m.optional],
+        )
+        with runner.transaction():
+            for statement in _BOOKKEEPING_SQL:
+                conn.execute(statement)
+
+        applied = []
+        for migration in sorted(pending, key=lambda m: m.version):
+            started = time.perf_counter()
+            if runner.apply(migration):
+                applied.append(migration.version)
+                logger.info("Applied migration %d (%s) in %.2fs", migration.version,
+                            migration.name, time.perf_counter() - started)
+        return applied
+    finally:
+        conn.close()
+
+def _is_pending(migration: Migration, current: int, recorded: set) -> bool:
+    if migration.optional:
+        return migration.enabled() and migration.version not in recorded
+    return migration.version > current
+
+def migration_status(db_path: str, migrations: Sequence[Migration] = None) -> dict:
+    """Current version, applied history, pending versions and in-progress steps"""
+    migrations = MIGRATIONS if migrations is None else migrations
+    conn = sqlite3.connect(db_path)
+    try:
+        current = schema_version(conn)
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        applied = conn.execute(
+            "SELECT version, name, applied_at FROM schema_migrations ORDER BY version"
+        ).fetchall() if "schema_migrations" in tables else []
+        recorded = {row[0] for row in applied}
+        in_progress = conn.execute(
+            "SELECT version, step, phase, position, done FROM migration_progress "
+            "ORDER BY version, step"
+        ).fetchall() if "migration_progress" in tables else []
+    finally:
+        conn.close()
+    return {
+        "version": current,
+        "latest": latest_version(migrations),
+        "applied": [{"version": v, "name": n, "applied_at": a} for v, n, a in applied],
+        "pending": [{"version": m.version, "name": m.name} for m in migrations
+                    if _is_pending(m, current, recorded)],
+        "in_progress": [{"version": v, "step": s, "phase": p, "position": pos, "done": bool(d)}
+                        for v, s, p, pos, d in in_progress],
+    }
@@ -0,0 +1,156 @@
+import logging
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, List, Optional
+
+from config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+def fingerprint(sql: str) -> str:
+    """
+    Normalise a statement so that calls differing only in literals or
+    IN-list length aggregate together
+    """
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    return _IN_LIST.sub("IN (...)", sql)
+
+class StatementStats:
+    __slots__ = ("fingerprint", "calls", "total_s", "max_s", "slow_calls", "plan")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.slow_calls = 0
+        self.plan: Optional[List[str]] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "statement": self.fingerprint,
+            "calls": self.calls,
+            "total_ms": round(self.total_s * 1000, 3),
+            "avg_ms": round(self.total_s / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_s * 1000, 3),
+            "slow_calls": self.slow_calls,
+            "plan": self.plan,
+        }
+
+class QueryProfiler:
+    """
+    Per-process statement statistics
+    - every statement is timed and aggregated by fingerprint
+    - statements slower than the threshold are logged with their
+      EXPLAIN QUERY PLAN (captured once per fingerprint to bound the cost)
+    - at most max_fingerprints distinct statements are tracked
+    """
+
+    def __init__(self, slow_threshold_ms: float = 100.0, max_fingerprints: int = 500):
+        self.slow_threshold_s = slow_threshold_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self.dropped = 0
+        self._stats: Dict[str, StatementStats] = {}
+        self._lock = Lock()
+
+    def record(self, conn: sqlite3.Connection, sql: str, params, elapsed_s: float):
+        key = fingerprint(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    self.dropped += 1
+                    return
+                stats = self._stats[key] = StatementStats(key)
+            stats.calls += 1
+            stats.total_s += elapsed_s
+            stats.max_s = max(stats.max_s, elapsed_s)
+            slow = elapsed_s >= self.slow_threshold_s
+            if slow:
+                stats.slow_calls += 1
+            capture_plan = slow and stats.plan is None
+
+        if capture_plan:
+            stats.plan = self._explain(conn, sql, params)
+        if slow:
+            logger.warning("Slow query (%.1f ms): %s | plan: %s",
+                           elapsed_s * 1000, key, "; ".join(stats.plan or []))
+
+    @staticmethod
+    def _explain(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+        if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            # Base-class execute: the plan query itself is not profiled
+            rows = sqlite3.Connection.execute(
+                conn, "EXPLAIN QUERY PLAN " + sql, params or ()
+            ).fetchall()
+        except sqlite3.Error as e:
+            return [f"EXPLAIN failed: {e}"]
+        return [row[-1] for row in rows]
+
+    def report(self, limit: int = 20, sort: str = "total_ms") -> dict:
+        with self._lock:
+            statements = [stats.to_dict() for stats in self._stats.values()]
+        statements.sort(key=lambda s: s.get(sort, 0), reverse=True)
+        return {
+            "slow_threshold_ms": self.slow_threshold_s * 1000,
+            "tracked_statements": len(statements),
+            "dropped_statements": self.dropped,
+            "statements": statements[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.dropped = 0
+
+class ProfilingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            get_query_profiler().record(self.connection, sql, parameters,
+                                        time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Materialised so the first parameter set can bind a slow statement's EXPLAIN
+        seq_of_parameters = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            get_query_profiler().record(self.connection, sql,
+                                        next(iter(seq_of_parameters), None),
+                                        time.perf_counter() - started)
+
+class ProfilingConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose cursors report to the profiler"""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+@lru_cache()
+def get_query_profiler() -> QueryProfiler:
+    """Process-wide profiler"""
+    settings = get_settings()
+    return QueryProfiler(settings.slow_query_threshold_ms,
+                         settings.query_profile_max_fingerprints)
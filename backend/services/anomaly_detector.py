@@ -0,0 +1,195 @@
+from datetime import datetime
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from config.settings import get_settings
+
+METRICS = ("soil_moisture", "temperature", "humidity")
+_LABELS = {"soil_moisture": ("soil moisture", "%"),
+           "temperature": ("temperature", "°C"),
+           "humidity": ("humidity", "%")}
+
+# Flag kinds; bit for (metric m, kind k) is 1 << (m * 3 + k)
+SPIKE, FLATLINE, RATE = 0, 1, 2
+
+class AnomalyDetector:
+    """
+    Streaming anomaly detection fed at ingest time
+    Per sensor and metric it keeps a constant amount of state (EWMA mean and
+    variance, last value/time, flat-run length) in struct-of-arrays NumPy
+    buffers, so a batch of thousands of sensors updates with a few vector ops.
+    Detects:
+    - spikes: |x - ewma| > z_threshold * ewma_std (after warm-up)
+    - flatlines: value unchanged for flatline_readings readings (stuck probe)
+    - rate-of-change violations: |Δx / Δt| above a per-metric limit per hour
+    Flags describe each sensor's latest reading and are read back without DB access.
+    State is per process (each worker sees the readings it ingests).
+    """
+
+    def __init__(self, alpha: float = 0.1, z_threshold: float = 4.0,
+                 warmup: int = 10, flatline_readings: int = 12,
+                 max_rate_per_hour: Sequence[float] = (20.0, 8.0, 30.0),
+                 capacity: int = 1024):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.flatline_readings = flatline_readings
+        self.max_rate = np.asarray(max_rate_per_hour, dtype=np.float64)
+        self._index: Dict[str, int] = {}
+        self._lock = Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        old = getattr(self, "_mean", None)
+        n = 0 if old is None else old.shape[0]
+
+        def grow(name, shape, dtype, fill=0):
+            array = np.full(shape, fill, dtype=dtype)
+            if n:
+                array[:n] = getattr(self, name)
+            setattr(self, name, array)
+
+        width = len(METRICS)
+        grow("_mean", (capacity, width), np.float64)
+        grow("_var", (capacity, width), np.float64)
+        grow("_last", (capacity, width), np.float64)
+        grow("_z", (capacity, width), np.float64)
+        grow("_rate", (capacity, width), np.float64)
+        grow("_flat", (capacity, width), np.int32)
+        grow("_count", (capacity,), np.int64)
+        grow("_last_ts", (capacity,), np.float64, np.nan)
+        grow("_flags", (capacity,), np.int32)
+
+    def _indices(self, sensor_ids: Sequence[str]) -> np.ndarray:
+        for sensor_id in sensor_ids:
+            if sensor_id not in self._index:
+                self._index[sensor_id] = len(self._index)
+        if len(self._index) > self._mean.shape[0]:
+            self._allocate(max(len(self._index), self._mean.shape[0] * 2))
+        return np.fromiter((self._index[s] for s in sensor_ids), dtype=np.int64,
+                           count=len(sensor_ids))
+
+    def update_batch(self, sensor_ids: Sequence[str], values: np.ndarray,
+                     timestamps: np.ndarray) -> np.ndarray:
+        """
+        Feed one reading per row: values (n, 3) in METRICS order,
+        timestamps (n,) in epoch seconds. Rows for the same sensor must be in
+        time order. Returns the flag bitmask of every row.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(METRICS))
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        with self._lock:
+            idx = self._indices(sensor_ids)
+            flags = np.zeros(len(idx), dtype=np.int32)
+            # Vector updates need unique indices: repeated sensors are
+            # processed in successive passes, preserving their order
+            pending = np.arange(len(idx))
+            while pending.size:
+                _, first = np.unique(idx[pending], return_index=True)
+                rows = pending[np.sort(first)]
+                flags[rows] = self._update_unique(idx[rows], values[rows], timestamps[rows])
+                pending = np.setdiff1d(pending, rows, assume_unique=True)
+            return flags
+
+    def _update_unique(self, idx: np.ndarray, x: np.ndarray, ts: np.ndarray) -> np.ndarray:
+        mean, var, last = self._mean[idx], self._var[idx], self._last[idx]
+        count = self._count[idx]
+        seen = (count > 0)[:, None]
+
+        # Spike: z-score against the state *before* this reading
+        std = np.sqrt(var)
+        z = np.where(std > 1e-9, (x - mean) / np.maximum(std, 1e-9), 0.0)
+        spike = (np.abs(z) > self.z_threshold) & (count >= self.warmup)[:, None]
+
+        # Flatline: consecutive identical readings
+        same = seen & (np.abs(x - last) < 1e-6)
+        flat = np.where(same, self._flat[idx] + 1, 0)
+        flatline = flat >= self.flatline_readings
+
+        # Rate of change per hour since the previous reading
+        dt_hours = (ts - self._last_ts[idx]) / 3600.0
+        valid_dt = (np.isfinite(dt_hours) & (dt_hours > 0))[:, None]
+        rate = np.where(valid_dt, (x - last) / np.where(valid_dt, dt_hours[:, None], 1.0), 0.0)
+        rate_violation = valid_dt & (np.abs(rate) > self.max_rate)
+
+        # EWMA mean/variance (first reading initialises the mean)
+        diff = x - mean
+        incr = self.alpha * diff
+        self._mean[idx] = np.where(seen, mean + incr, x)
+        self._var[idx] = np.where(seen, (1 - self.alpha) * (var + diff * incr), 0.0)
+        self._last[idx] = x
+        self._last_ts[idx] = ts
+        self._flat[idx] = flat
+        self._count[idx] = count + 1
+        self._z[idx] = z
+        self._rate[idx] = rate
+
+        bits = (spike.astype(np.int32) << SPIKE) | (flatline.astype(np.int32) << FLATLINE) \
+            | (rate_violation.astype(np.int32) << RATE)
+        shifts = np.arange(len(METRICS), dtype=np.int32) * 3
+        row_flags = np.bitwise_or.reduce(bits << shifts, axis=1)
+        self._flags[idx] = row_flags
+        return row_flags
+
+    def observe_reading(self, reading: dict):
+        """Ingest listener: feed a newly stored reading (late ones are skipped)"""
+        if reading.get("late"):
+            return
+        self.update_batch(
+            [reading["sensor_id"]],
+            np.array([[reading[m] for m in METRICS]]),
+            np.array([epoch_seconds(reading["timestamp"])]),
+        )
+
+    def alerts_for(self, sensor_id: str) -> List[str]:
+        """Human-readable anomaly alerts for the sensor's latest reading"""
+        # Copy one consistent row: updates write (and reallocate) these arrays under the lock
+        with self._lock:
+            index = self._index.get(sensor_id)
+            if index is None or not self._flags[index]:
+                return []
+            flags = int(self._flags[index])
+            last, z = self._last[index].copy(), self._z[index].copy()
+            rate, flat = self._rate[index].copy(), self._flat[index].copy()
+        alerts = []
+        for m, metric in enumerate(METRICS):
+            label, unit = _LABELS[metric]
+            value = last[m]
+            if flags & (1 << (m * 3 + SPIKE)):
+                alerts.append(
+                    f"📈 SENSOR SPIKE: {label} {value:.1f}{unit} deviates "
+                    f"{abs(z[m]):.1f}σ from its recent average. Check the probe or field conditions.")
+            if flags & (1 << (m * 3 + FLATLINE)):
+                alerts.append(
+                    f"🔧 STUCK PROBE: {label} unchanged at {value:.1f}{unit} for "
+                    f"{int(flat[m])} readings. Sensor may be faulty.")
+            if flags & (1 << (m * 3 + RATE)):
+                alerts.append(
+                    f"📉 RAPID CHANGE: {label} changing at {rate[m]:+.1f}{unit}/h, "
+                    f"above the {self.max_rate[m]:.0f}{unit}/h limit.")
+        return alerts
+
+def epoch_seconds(timestamp) -> float:
+    """Seconds since the epoch of a datetime or its ISO text (naive = UTC)"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is None:
+        return (timestamp - datetime(1970, 1, 1)).total_seconds()
+    return timestamp.timestamp()
+
+@lru_cache()
+def get_anomaly_detector() -> AnomalyDetector:
+    """Process-wide detector"""
+    settings = get_settings()
+    return AnomalyDetector(
+        alpha=settings.anomaly_ewma_alpha,
+        z_threshold=settings.anomaly_z_threshold,
+        warmup=settings.anomaly_warmup_readings,
+        flatline_readings=settings.anomaly_flatline_readings,
+        max_rate_per_hour=(settings.anomaly_max_moisture_rate,
+                           settings.anomaly_max_temperature_rate,
+                           settings.anomaly_max_humidity_rate),
+    )
@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.compact_storage import METRICS, RowLayout, readings_layout
+from services.decision_engine import DecisionEngine
+
+# Action codes of the vectorized evaluation (index into ACTIONS)
+ACTIONS = ("water_immediately", "water", "stop_watering", "monitor")
+ALERTS = ("drought", "overwatering", "heat_stress", "cold_stress", "low_humidity")
+
+CHUNK_ROWS = 50_000         # rows per fetchmany() in a worker
+PARTITIONS_PER_WORKER = 4   # id ranges per worker, for load balancing
+
+def evaluate_rules(rules: Dict[str, float], moisture: np.ndarray, temperature: np.ndarray,
+                   humidity: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    DecisionEngine irrigation + threshold alerts over arrays of readings
+    Mirrors _calculate_irrigation / _generate_alerts (the moisture trend only
+    changes the explanation text, so each reading is evaluated on its own).
+    Returns (action code per reading, amount_ml per reading, alert flags (n, len(ALERTS))).
+    """
+    critical = moisture < rules["SOIL_MOISTURE_CRITICAL"]
+    low = ~critical & (moisture < rules["SOIL_MOISTURE_LOW"])
+    high = ~critical & ~low & (moisture > rules["SOIL_MOISTURE_HIGH"])
+    actions = np.select([critical, low, high], [0, 1, 2], default=3).astype(np.int8)
+
+    low_amount = (3000 * (1.0 + np.maximum(0, temperature - 25) * 0.05)).astype(np.int64)
+    amounts = np.where(critical, 5000, np.where(low, low_amount, 0))
+
+    alerts = np.column_stack([
+        critical & (temperature > rules["DROUGHT_TEMP"]),
+        (moisture > rules["SOIL_MOISTURE_HIGH"]) & (humidity > rules["OVERWATER_HUMIDITY"]),
+        temperature > rules["HEAT_STRESS_TEMP"],
+        (temperature <= rules["HEAT_STRESS_TEMP"]) & (temperature < rules["COLD_STRESS_TEMP"]),
+        humidity < rules["HUMIDITY_LOW"],
+    ])
+    return actions, amounts, alerts
+
+def _empty_totals() -> dict:
+    n_actions, n_alerts = len(ACTIONS), len(ALERTS)
+    return {
+        "readings": 0,
+        "actions": np.zeros((2, n_actions), dtype=np.int64),
+        "water_ml": np.zeros(2, dtype=np.int64),
+        "alerts": np.zeros((2, n_alerts), dtype=np.int64),
+        "alerted_readings": np.zeros(2, dtype=np.int64),
+        "transitions": np.zeros(n_actions * n_actions, dtype=np.int64),
+    }
+
+def _accumulate(totals: dict, rule_sets: Sequence[dict], values: np.ndarray):
+    moisture, temperature, humidity = values[:, 0], values[:, 1], values[:, 2]
+    codes = []
+    for i, rules in enumerate(rule_sets):
+        actions, amounts, alerts = evaluate_rules(rules, moisture, temperature, humidity)
+        totals["actions"][i] += np.bincount(actions, minlength=len(ACTIONS))
+        totals["water_ml"][i] += int(amounts.sum())
+        totals["alerts"][i] += alerts.sum(axis=0)
+        totals["alerted_readings"][i] += int(alerts.any(axis=1).sum())
+        codes.append(actions.astype(np.int64))
+    totals["transitions"] += np.bincount(codes[0] * len(ACTIONS) + codes[1],
+                                         minlength=len(ACTIONS) ** 2)
+    totals["readings"] += len(values)
+
+def _merge(totals: dict, other: dict):
+    for key, value in other.items():
+        totals[key] += value
+
+def _where(layout: RowLayout, start: Optional[datetime], end: Optional[datetime],
+           sensor_ids: Optional[List[str]]) -> Tuple[str, list]:
+    clauses, params = [], []
+    if start is not None:
+        clauses.append(f"{layout.timestamp} >= ?")
+        params.append(layout.timestamp_param(start, round_up=True))
+    if end is not None:
+        clauses.append(f"{layout.timestamp} <= ?")
+        params.append(layout.timestamp_param(end))
+    if sensor_ids:
+        clauses.append(f"{layout.sensor} IN ({', '.join('?' * len(sensor_ids))})")
+        params.extend(sensor_ids)
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+def _run_partition(db_path: str, id_range: Tuple[int, int], rule_sets: Sequence[dict],
+                   start: Optional[datetime], end: Optional[datetime],
+                   sensor_ids: Optional[List[str]]) -> dict:
+    """Worker: stream one rowid range with a chunked cursor and evaluate it"""
+    totals = _empty_totals()
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        layout = readings_layout(conn)
+        where, params = _where(layout, start, end, sensor_ids)
+        cursor = conn.execute(f"""
+            SELECT {layout.columns(*METRICS)} FROM {layout.source if sensor_ids else layout.values_source}
+            WHERE r.id >= ? AND r.id < ?{where}
+        """, (*id_range, *params))
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                break
+            _accumulate(totals, rule_sets, np.array(rows, dtype=np.float64))
+    finally:
+        conn.close()
+    return totals
+
+def _partitions(db_path: str, count: int) -> List[Tuple[int, int]]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        table = readings_layout(conn).table
+        low, high = conn.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone()
+    finally:
+        conn.close()
+    if low is None:
+        return []
+    edges = np.linspace(low, high + 1, min(count, high - low + 1) + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+def _summary(totals: dict, i: int) -> dict:
+    readings = totals["readings"]
+    return {
+        "actions": dict(zip(ACTIONS, totals["actions"][i].tolist())),
+        "water_l": round(int(totals["water_ml"][i]) / 1000, 1),
+        "alerts": dict(zip(ALERTS, totals["alerts"][i].tolist())),
+        "alert_rate": round(int(totals["alerted_readings"][i]) / readings, 4) if readings else 0.0,
+    }
+
+def run_backtest(db_path: str, candidate: Dict[str, float],
+                 baseline: Optional[Dict[str, float]] = None,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 sensor_ids: Optional[List[str]] = None,
+                 workers: Optional[int] = None) -> dict:
+    """
+    Replay stored readings through two rule sets and compare the outcomes
+    baseline / candidate: DecisionEngine threshold overrides (baseline
+    defaults to the engine as configured). The readings table is split into
+    rowid ranges evaluated in a process pool; each worker streams its range
+    with a chunked cursor and evaluates whole chunks with NumPy.
+    """
+    rule_sets = [DecisionEngine(baseline).rules, DecisionEngine(candidate).rules]
+    workers = max(1, workers or os.cpu_count() or 1)
+    partitions = _partitions(db_path, workers * PARTITIONS_PER_WORKER)
+    started = time.perf_counter()
+
+    totals = _empty_totals()
+    args = (rule_sets, start, end, sensor_ids)
+    if workers == 1 or len(partitions) <= 1:
+        for id_range in partitions:
+            _merge(totals, _run_partition(db_path, id_range, *args))
+    else:
+        # spawn: forking a threaded server process is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_run_partition, db_path, id_range, *args)
+                       for id_range in partitions]
+            for future in futures:
+                _merge(totals, future.result())
+    elapsed = time.perf_counter() - started
+
+    base, cand = _summary(totals, 0), _summary(totals, 1)
+    transitions = totals["transitions"].reshape(len(ACTIONS), len(ACTIONS))
+    return {
+        "readings": totals["readings"],
+        "rules": {"baseline": rule_sets[0], "candidate": rule_sets[1]},
+        "baseline": base,
+        "candidate": cand,
+        "diff": {
+            "actions": {a: cand["actions"][a] - base["actions"][a] for a in ACTIONS},
+            "water_l": round(cand["water_l"] - base["water_l"], 1),
+            "alerts": {a: cand["alerts"][a] - base["alerts"][a] for a in ALERTS},
+            "alert_rate": round(cand["alert_rate"] - base["alert_rate"], 4),
+        },
+        "changed_readings": int(totals["readings"] - np.trace(transitions)),
+        "transitions": {
+            f"{ACTIONS[i]}->{ACTIONS[j]}": int(transitions[i, j])
+            for i, j in zip(*np.nonzero(transitions)) if i != j
+        },
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(totals["readings"] / elapsed) if elapsed else None,
+    }
@@ -0,0 +1,197 @@
+"""
+Online backups and the read-only analytics snapshot
+
+Copies use SQLite's backup API in steps of pages_per_step pages with a
+pause between steps, so a copy never takes the disk from ingestion for
+long. On a WAL database the copy runs inside one read transaction. It is
+then a consistent image of the moment it started, and writers keep
+committing meanwhile (WAL readers never block them). Without that
+transaction SQLite restarts a stepped backup whenever another connection
+writes, so under steady ingestion it would never finish.
+
+A copy is written to a .partial file that is renamed into place when
+complete, so backups and the snapshot are never torn. The .partial file
+is created exclusively and acts as a claim: when every worker runs the
+same schedule, only one of them copies, and the others find the copy
+fresh afterwards.
+"""
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from config.settings import get_settings
+from utils.metrics import BACKUPS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PATTERN = "agri-*.db"  # agri-YYYYmmdd-HHMMSS.db: names sort by time
+STALE_PARTIAL_SECONDS = 600.0  # untouched this long: left behind by a crashed copy
+
+class BackupInProgress(RuntimeError):
+    """Another process is writing the same copy"""
+
+def _age(path: Path) -> Optional[float]:
+    try:
+        return time.time() - path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+def _claim(partial: Path) -> bool:
+    """Create the partial file exclusively (portable lock); False if another copy is running"""
+    age = _age(partial)
+    if age is not None and age > STALE_PARTIAL_SECONDS:
+        partial.unlink(missing_ok=True)
+    try:
+        os.close(os.open(partial, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+def _copy(source_path: str, partial: Path, pages_per_step: int, pause_seconds: float,
+          verify: bool) -> dict:
+    """Stepped backup of source into the (claimed, empty) partial file"""
+    settings = get_settings()
+    started = time.perf_counter()
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining:
+            time.sleep(pause_seconds)
+
+    source = sqlite3.connect(source_path, isolation_level=None)
+    target = sqlite3.connect(partial, isolation_level=None)
+    try:
+        source.execute(f"PRAGMA busy_timeout = {int(settings.migration_busy_timeout_ms)}")
+        pinned = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+        if pinned:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # starts the read
+        try:
+            source.backup(target, pages=pages_per_step, progress=progress)
+        finally:
+            if pinned:
+                source.execute("COMMIT")
+        # One self-contained file (the source's WAL mode is copied with its header)
+        target.execute("PRAGMA journal_mode=DELETE")
+        pages = target.execute("PRAGMA page_count").fetchone()[0]
+        if verify:
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise sqlite3.DatabaseError(f"Backup failed its integrity check: {check}")
+    finally:
+        target.close()
+        source.close()
+    return {"pages": pages, "steps": steps, "seconds": round(time.perf_counter() - started, 3)}
+
+def _finish(partial: Path, dest: Path, stats: dict, kind: str) -> dict:
+    os.replace(partial, dest)
+    BACKUPS.inc(kind=kind)
+    stats = dict(stats, path=str(dest), bytes=dest.stat().st_size)
+    logger.info("%s written to %s: %d pages in %.1fs", kind.capitalize(), dest,
+                stats["pages"], stats["seconds"])
+    return stats
+
+def _backup(source_path: str, dest: Path, partial: Path, kind: str, verify: bool = False,
+            needed: Callable[[], bool] = lambda: True) -> Optional[dict]:
+    """
+    Claim partial, copy, rename to dest; None if the claim is held elsewhere
+    or the copy is no longer needed once claimed (done by the holder meanwhile)
+    """
+    settings = get_settings()
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if not _claim(partial):
+        return None
+    try:
+        if not needed():
+            partial.unlink(missing_ok=True)
+            return None
+        stats = _copy(source_path, partial, settings.backup_pages_per_step,
+                      settings.backup_step_pause_seconds, verify)
+        return _finish(partial, dest, stats, kind)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+def backup_database(source_path: str, dest_path, verify: bool = False) -> dict:
+    """
+    Online copy of source_path to dest_path (replaced atomically when done)
+    Raises BackupInProgress while another process writes the same file.
+    """
+    dest = Path(dest_path)
+    stats = _backup(source_path, dest, dest.with_name(dest.name + ".partial"), "backup", verify)
+    if stats is None:
+        raise BackupInProgress(f"{dest} is being written by another process")
+    return stats
+
+def list_backups(directory) -> List[Path]:
+    """Scheduled backups in directory, oldest first"""
+    return sorted(Path(directory).glob(BACKUP_PATTERN))
+
+def prune_backups(directory, keep: int) -> List[Path]:
+    """Delete all but the newest `keep` backups; returns the deleted files"""
+    backups = list_backups(directory)
+    removed = backups[:max(0, len(backups) - keep)]
+    for path in removed:
+        path.unlink(missing_ok=True)
+    return removed
+
+def scheduled_backup(source_path: str, directory, interval_seconds: float, keep: int,
+                     now: Optional[datetime] = None) -> Optional[dict]:
+    """
+    Back up when the newest backup is older than interval_seconds, then keep
+    the newest `keep`; None when not due or another worker is on it
+    """
+    directory = Path(directory)
+
+    def due() -> bool:
+        backups = list_backups(directory)
+        return not backups or _age(backups[-1]) >= interval_seconds
+
+    if not due():
+        return None
+    # One partial file per directory, so concurrent schedulers contend for it
+    name = f"agri-{(now or datetime.utcnow()):%Y%m%d-%H%M%S}.db"
+    stats = _backup(source_path, directory / name, directory / "backup.partial",
+                    "backup", needed=due)
+    if stats is not None:
+        stats["pruned"] = [str(path) for path in prune_backups(directory, keep)]
+    return stats
+
+def refresh_snapshot(source_path: str, snapshot_path, max_age_seconds: float = 0.0) -> Optional[dict]:
+    """
+    Replace the read-only snapshot with a fresh copy when it is older than
+    max_age_seconds; None when fresh or another worker is refreshing it
+    Readers keep the copy they opened: the new file is renamed over it.
+    """
+    snapshot = Path(snapshot_path)
+
+    def stale() -> bool:
+        age = _age(snapshot)
+        return age is None or age >= max_age_seconds
+
+    if not stale():
+        return None
+    return _backup(source_path, snapshot, snapshot.with_name(snapshot.name + ".partial"),
+                   "snapshot", needed=stale)
+
+def snapshot_age(snapshot_path) -> Optional[float]:
+    """Seconds since the snapshot was taken, None without one"""
+    return _age(Path(snapshot_path))
+
+def _snapshot_age_seconds() -> float:
+    settings = get_settings()
+    if not settings.snapshot_enabled:
+        return 0.0
+    age = snapshot_age(settings.snapshot_path)
+    return age if age is not None else 0.0
+
+SNAPSHOT_AGE = REGISTRY.gauge(
+    "agri_snapshot_age_seconds",
+    "Age of the read-only analytics snapshot (staleness of analytics reads)",
+    callback=_snapshot_age_seconds)
@@ -0,0 +1,416 @@
+"""
+Bulk import of historical sensor readings (CSV or Parquet)
+
+Files are streamed in chunks of chunk_rows rows. Each chunk is validated
+with a few NumPy array operations (SensorDataRequest's bounds), inserted
+with one executemany and folded into sensor_latest (whose triggers keep
+zone_state current), then committed together with the file's position in
+import_progress: an interrupted import resumes after its last committed
+chunk and never loads a row twice.
+
+Loading into an empty sensor_readings table drops its indexes first and
+rebuilds them once at the end (one sorted build instead of a B-tree insert
+per row); duplicate (sensor_id, timestamp) rows are then removed the way
+migration 5 (unique readings) does it, keeping the first copy. Loading next
+to existing data keeps the indexes and skips duplicates on insert, as
+ingest does. Forecasts are refit when the import finishes.
+"""
+import csv
+import logging
+import sqlite3
+import time
+import warnings
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import database
+from config.settings import get_settings
+from services.data_service import DataService
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("sensor_id", "soil_moisture", "temperature", "humidity", "timestamp")
+# Same bounds as SensorDataRequest (main.py)
+METRIC_RANGES = {"soil_moisture": (0.0, 100.0), "temperature": (-50.0, 60.0),
+                 "humidity": (0.0, 100.0)}
+SENSOR_ID_MAX_LENGTH = 50
+
+Chunk = Dict[str, list]  # column -> values of the chunk's rows
+# (source, 1-based data row, reason, raw values)
+RejectHandler = Callable[[str, int, str, Dict[str, object]], None]
+
+def _source_columns(columns: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Reading column -> column name in the file"""
+    names = {column: column for column in COLUMNS}
+    unknown = set(columns or {}) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown reading column(s): {', '.join(sorted(unknown))}")
+    names.update(columns or {})
+    return names
+
+def read_csv(path: Path, chunk_rows: int, skip_rows: int = 0,
+             columns: Optional[Dict[str, str]] = None) -> Iterator[Chunk]:
+    """Chunks of a CSV file with a header row, after the first skip_rows data rows"""
+    names = _source_columns(columns)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        missing = [source for source in names.values() if source not in header]
+        if missing:
+            raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+        positions = {column: header.index(source) for column, source in names.items()}
+        deque(islice(reader, skip_rows), maxlen=0)
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                return
+            transposed = list(zip(*rows))  # as many columns as the shortest row has
+            if len(transposed) > max(positions.values()):
+                yield {column: list(transposed[i]) for column, i in positions.items()}
+            else:
+                yield {column: [row[i] if i < len(row) else "" for row in rows]
+                       for column, i in positions.items()}
+
+def read_parquet(path: Path, chunk_rows: int, skip_rows: int = 0,
+                 columns: Optional[Dict[str, str]] = None) -> Iterator[Chunk]:
+    """Chunks of a Parquet file (record batches), after the first skip_rows rows"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet import needs pyarrow: pip install pyarrow") from exc
+    names = _source_columns(columns)
+    parquet = pq.ParquetFile(path)
+    missing = [source for source in names.values() if source not in parquet.schema_arrow.names]
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=sorted(set(names.values()))):
+        if skip_rows >= batch.num_rows:
+            skip_rows -= batch.num_rows
+            continue
+        data = batch.slice(skip_rows).to_pydict()
+        skip_rows = 0
+        yield {column: data[source] for column, source in names.items()}
+
+READERS = {".csv": read_csv, ".parquet": read_parquet, ".pq": read_parquet}
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+def _floats(values: list) -> np.ndarray:
+    """float64 array, NaN where a value isn't a number"""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_float(value) for value in values], dtype=np.float64)
+
+def _timestamp(value) -> Optional[datetime]:
+    """Naive UTC datetime of an ISO 8601 string or datetime, None if it isn't one"""
+    if isinstance(value, str):
+        value = value.strip()
+        if len(value) < 10:  # a date at least ("2024" alone parses as a year)
+            return None
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _timestamps(values: list) -> List[Optional[str]]:
+    """Stored text of each timestamp (as DataService._timestamp_key), None where invalid"""
+    parsed = None
+    if all(isinstance(value, str) and len(value) >= 10 for value in values):
+        try:
+            with warnings.catch_warnings():
+                # numpy only warns about UTC offsets: those go through _timestamp
+                warnings.simplefilter("error")
+                parsed = np.asarray(values, dtype="datetime64[us]").tolist()
+        except (ValueError, UserWarning):
+            parsed = None
+    if parsed is None:
+        parsed = [_timestamp(value) for value in values]
+    # NaT comes back as None, years numpy parses but datetime can't hold as ints
+    return [value.isoformat(" ") if isinstance(value, datetime) else None for value in parsed]
+
+def validate_chunk(chunk: Chunk) -> Tuple[List[tuple], List[Tuple[int, str]]]:
+    """
+    Rows passing the API's checks as (sensor_id, soil_moisture, temperature,
+    humidity, timestamp) tuples, and (row index, reason) of the others
+    """
+    sensor_ids = ["" if value is None else str(value).strip() for value in chunk["sensor_id"]]
+    count = len(sensor_ids)
+    lengths = np.fromiter(map(len, sensor_ids), dtype=np.int64, count=count)
+    problems = [((lengths < 1) | (lengths > SENSOR_ID_MAX_LENGTH),
+                 f"sensor_id: empty or longer than {SENSOR_ID_MAX_LENGTH} characters")]
+    values = []
+    for name, (low, high) in METRIC_RANGES.items():
+        column = _floats(chunk[name])
+        values.append(column.tolist())
+        # NaN fails both comparisons
+        problems.append((~((column >= low) & (column <= high)),
+                         f"{name}: not a number within [{low:g}, {high:g}]"))
+    timestamps = _timestamps(chunk["timestamp"])
+    problems.append((np.fromiter((t is None for t in timestamps), dtype=bool, count=count),
+                     "timestamp: not an ISO 8601 date and time"))
+
+    valid = np.ones(count, dtype=bool)
+    rejects = {}
+    for failed, reason in problems:
+        for index in np.flatnonzero(failed & valid).tolist():
+            rejects[index] = reason  # first problem of the row only
+        valid &= ~failed
+    columns = [sensor_ids, *values, timestamps]
+    if rejects:
+        keep = np.flatnonzero(valid).tolist()
+        columns = [[column[i] for i in keep] for column in columns]
+    return list(zip(*columns)), sorted(rejects.items())
+
+def _newest(rows: List[tuple]) -> Dict[str, int]:
+    """Index of each sensor's newest row"""
+    newest = {}
+    for index, row in enumerate(rows):
+        best = newest.get(row[0])
+        if best is None or row[4] > rows[best][4]:
+            newest[row[0]] = index
+    return newest
+
+def connect(db_path: str, cache_mb: Optional[int] = None) -> sqlite3.Connection:
+    """Autocommit connection tuned for bulk loading"""
+    settings = get_settings()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    # No fsync per commit: a power cut can only lose the newest chunks, and
+    # their checkpoints with them, so a rerun loads them again
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{int(cache_mb or settings.import_cache_mb) * 1024}")
+    conn.execute("PRAGMA wal_autocheckpoint=10000")  # pages; checkpointed when the import ends
+    conn.execute(f"PRAGMA busy_timeout={int(settings.migration_busy_timeout_ms)}")
+    return conn
+
+def import_status(conn: sqlite3.Connection) -> dict:
+    return {
+        "files": [dict(row) for row in conn.execute(
+            "SELECT * FROM import_progress ORDER BY updated_at DESC")],
+        "deferred_indexes": [row[0] for row in conn.execute(
+            "SELECT name FROM import_deferred_indexes ORDER BY name")],
+    }
+
+class ReadingImporter:
+    """
+    Loads reading files through `conn` (connect()); call finish() when done
+    defer_indexes: drop and rebuild the sensor_readings indexes; None = only
+    when the table is empty (or an interrupted deferred load is resumed)
+    """
+
+    def __init__(self, conn: sqlite3.Connection, chunk_rows: Optional[int] = None,
+                 defer_indexes: Optional[bool] = None,
+                 forecast_window: Optional[int] = None,
+                 on_reject: Optional[RejectHandler] = None,
+                 clock: Callable[[], float] = time.perf_counter):
+        settings = get_settings()
+        self.conn = conn
+        self.service = DataService(conn)
+        self.chunk_rows = chunk_rows or settings.import_chunk_rows
+        self.defer_indexes = defer_indexes
+        self.forecast_window = forecast_window or settings.forecast_window_readings
+        self.on_reject = on_reject
+        self.clock = clock
+        self.sensor_ids = set()
+        self._deferred: Optional[bool] = None
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _deferring(self) -> bool:
+        """Index mode of this import, decided (and indexes dropped) on the first file"""
+        if self._deferred is None:
+            pending = self.conn.execute(
+                "SELECT COUNT(*) FROM import_deferred_indexes").fetchone()[0]
+            if pending and self.defer_indexes is False:
+                self.rebuild_indexes()
+                pending = 0
+            if pending:
+                self._deferred = True  # resuming: the indexes are still dropped
+            elif self.defer_indexes is None:
+                self._deferred = self.conn.execute(
+                    "SELECT NOT EXISTS (SELECT 1 FROM sensor_readings)").fetchone()[0] == 1
+            else:
+                self._deferred = self.defer_indexes
+            if self._deferred and not pending:
+                self._drop_indexes()
+        return self._deferred
+
+    def _drop_indexes(self):
+        with self._transaction():
+            indexes = self.conn.execute("""
+                SELECT name, sql FROM sqlite_master
+                WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+            """, (self.service.readings.table,)).fetchall()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO import_deferred_indexes (name, sql) VALUES (?, ?)",
+                [tuple(index) for index in indexes])
+            for name, _ in indexes:
+                self.conn.execute(f'DROP INDEX "{name}"')
+        logger.info("Dropped %d %s index(es) for the load", len(indexes), self.service.readings.table)
+
+    def rebuild_indexes(self) -> int:
+        """Recreate the dropped indexes; returns the duplicate readings removed"""
+        deferred = self.conn.execute("SELECT name, sql FROM import_deferred_indexes").fetchall()
+        if not deferred:
+            return 0
+        removed = 0
+        started = self.clock()
+        with self._transaction():
+            # The unique index first: it finds out whether duplicates went in
+            for _, sql in sorted(deferred, key=lambda index: "UNIQUE" not in index[1].upper()):
+                try:
+                    self.conn.execute(sql)
+                except sqlite3.IntegrityError:
+                    layout = self.service.readings
+                    removed = self.conn.execute(f"""
+                        DELETE FROM {layout.table}
+                        WHERE id NOT IN (
+                            SELECT MIN(id) FROM {layout.table}
+                            GROUP BY {layout.key_columns}
+                        )
+                    """).rowcount
+                    self.conn.execute(sql)
+            if removed:
+                # sensor_latest may point at a removed copy
+                database.refresh_latest_state(self.conn)
+            self.conn.execute("DELETE FROM import_deferred_indexes")
+        logger.info("Rebuilt %d index(es) in %.1fs, removed %d duplicate readings",
+                    len(deferred), self.clock() - started, removed)
+        self._deferred = False
+        return removed
+
+    def _load(self, rows: List[tuple], deferred: bool) -> int:
+        """Insert valid rows and fold them into sensor_latest (transaction held); returns rows inserted"""
+        rows = self.service.prepare_readings(rows)
+        if deferred:
+            # No unique index to skip duplicates: repeats within the chunk
+            # are dropped here, others when the index is rebuilt
+            seen = set()
+            rows = [row for row in rows
+                    if (row[0], row[4]) not in seen and not seen.add((row[0], row[4]))]
+            loaded = self.service.insert_readings(rows, ignore_duplicates=False)
+            # AUTOINCREMENT ids of one statement under the write lock are consecutive
+            first_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0] - loaded + 1
+            newest = _newest(rows)
+            latest = [(rows[i][0], first_id + i, *rows[i][1:]) for i in newest.values()]
+        else:
+            loaded = self.service.insert_readings(rows)
+            newest = _newest(rows)
+            # Stored rows: a duplicate keeps the values it was first stored with
+            latest = self.service.get_readings_by_keys(
+                [(rows[i][0], rows[i][4]) for i in newest.values()])
+        self.service.update_latest_states(latest)
+        self.sensor_ids.update(newest)
+        return loaded
+
+    def _progress(self, source: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT * FROM import_progress WHERE source = ?",
+                                (source,)).fetchone()
+        return dict(row) if row else None
+
+    def _save(self, source: str, fingerprint: str, counts: dict, done: bool = False):
+        self.conn.execute("""
+            INSERT INTO import_progress
+                (source, fingerprint, rows_read, rows_loaded, rows_rejected,
+                 rows_duplicate, done, updated_at)
+            VALUES (:source, :fingerprint, :rows_read, :rows_loaded, :rows_rejected,
+                    :rows_duplicate, :done, :updated_at)
+            ON CONFLICT(source) DO UPDATE SET
+                fingerprint = excluded.fingerprint, rows_read = excluded.rows_read,
+                rows_loaded = excluded.rows_loaded, rows_rejected = excluded.rows_rejected,
+                rows_duplicate = excluded.rows_duplicate, done = excluded.done,
+                updated_at = excluded.updated_at
+        """, dict(counts, source=source, fingerprint=fingerprint, done=int(done),
+                  updated_at=datetime.utcnow()))
+
+    def import_file(self, path, columns: Optional[Dict[str, str]] = None,
+                    restart: bool = False) -> dict:
+        """
+        Load one file, resuming after its last committed chunk
+        columns maps reading columns to the file's names for them;
+        restart ignores an earlier checkpoint (a changed file always restarts).
+        """
+        path = Path(path).resolve()
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise ValueError(f"{path}: unsupported file type (expected {', '.join(READERS)})")
+        source = str(path)
+        stat = path.stat()
+        fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+        progress = self._progress(source)
+        if progress and (restart or progress["fingerprint"] != fingerprint):
+            progress = None
+        if progress and progress["done"]:
+            logger.info("%s: already imported", source)
+            return dict(progress, skipped=True)
+
+        counts = {key: progress[key] if progress else 0
+                  for key in ("rows_read", "rows_loaded", "rows_rejected", "rows_duplicate")}
+        if progress:
+            logger.info("%s: resuming after row %d", source, counts["rows_read"])
+        deferred = self._deferring()
+        resumed_at = counts["rows_read"]
+        started = self.clock()
+        for chunk in reader(path, self.chunk_rows, skip_rows=counts["rows_read"], columns=columns):
+            rows, rejects = validate_chunk(chunk)
+            with self._transaction():
+                loaded = self._load(rows, deferred) if rows else 0
+                if self.on_reject:
+                    for index, reason in rejects:
+                        self.on_reject(source, counts["rows_read"] + index + 1, reason,
+                                       {column: chunk[column][index] for column in COLUMNS})
+                counts["rows_read"] += len(chunk["sensor_id"])
+                counts["rows_loaded"] += loaded
+                counts["rows_rejected"] += len(rejects)
+                counts["rows_duplicate"] += len(rows) - loaded
+                self._save(source, fingerprint, counts)
+            elapsed = self.clock() - started
+            logger.info("%s: %d rows read, %d loaded, %d rejected (%.0f rows/s)",
+                        path.name, counts["rows_read"], counts["rows_loaded"],
+                        counts["rows_rejected"],
+                        (counts["rows_read"] - resumed_at) / max(elapsed, 1e-9))
+        with self._transaction():
+            self._save(source, fingerprint, counts, done=True)
+
+        elapsed = self.clock() - started
+        return dict(counts, source=source, skipped=False, seconds=round(elapsed, 3),
+                    rows_per_second=round((counts["rows_read"] - resumed_at) / max(elapsed, 1e-9)))
+
+    def finish(self) -> dict:
+        """Rebuild deferred indexes, refit forecasts and checkpoint the WAL"""
+        started = self.clock()
+        removed = self.rebuild_indexes()
+        with self._transaction():
+            refit = self.service.rebuild_forecasts(self.forecast_window)
+        if self.service.hot is not None:
+            for sensor_id in self.sensor_ids:
+                self.service.hot.discard(sensor_id)  # rings may now miss older history
+        self.conn.execute("PRAGMA optimize")
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"duplicates_removed": removed, "forecasts_refit": refit,
+                "seconds": round(self.clock() - started, 3)}
@@ -0,0 +1,157 @@
+"""
+Compact storage layout for sensor readings (COMPACT_STORAGE=true)
+
+The row layout stores every reading as a sensor_id string, three 8-byte
+REALs and two datetime strings, and repeats sensor_id and timestamp in
+both of its indexes: around 150 bytes per reading. The sensors resolve
+0.1 units, so the compact layout keeps:
+- readings_compact: an integer sensor key, the metrics as integer tenths
+  (2 bytes each) and the timestamp as integer epoch seconds (UTC)
+- sensor_keys: the sensor_id dictionary
+and a single (sensor_key, ts) index, roughly a quarter of the size.
+
+sensor_readings then becomes a view decoding readings_compact, with
+INSTEAD OF triggers, so SQL written against the row layout keeps working.
+DataService addresses the tables directly through CompactLayout instead:
+its filters and ORDER BY stay on the indexed integer columns, and
+inserts report row counts and ids.
+
+Values are rounded to 0.1 and timestamps truncated to whole seconds on
+the way in. Two readings of a sensor within the same second are therefore
+one reading (the second is answered as a duplicate).
+
+The conversion is optional migration 5 (migrations.CompactReadings), run
+online in chunks once the setting is on. It is one-way; restore a backup
+taken before it to go back.
+"""
+import calendar
+import sqlite3
+from datetime import datetime, timezone
+from typing import List
+
+SCALE = 10  # stored units per reading unit: the sensors' 0.1 resolution
+METRICS = ("soil_moisture", "temperature", "humidity")
+READING_COLUMNS = ("id", "sensor_id", *METRICS, "timestamp", "created_at")
+
+def quantize(value: float) -> float:
+    """Value as the compact layout stores it"""
+    return round(value * SCALE) / SCALE
+
+def _naive_utc(timestamp) -> datetime:
+    if not isinstance(timestamp, datetime):
+        timestamp = datetime.fromisoformat(str(timestamp))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def whole_seconds(timestamp) -> datetime:
+    """Naive UTC timestamp truncated to the second, as the compact layout stores it"""
+    return _naive_utc(timestamp).replace(microsecond=0)
+
+def epoch_seconds(timestamp, round_up: bool = False) -> int:
+    """Stored integer form of a timestamp; round_up for lower bounds of ranges"""
+    timestamp = _naive_utc(timestamp)
+    return calendar.timegm(timestamp.timetuple()) + (1 if round_up and timestamp.microsecond else 0)
+
+def encode_sql(sensor_id: str, metrics: List[str], timestamp: str) -> str:
+    """VALUES expressions of one readings_compact row from row-layout values"""
+    return ", ".join([f"(SELECT sensor_key FROM sensor_keys WHERE sensor_id = {sensor_id})",
+                      *(f"round({metric} * {SCALE})" for metric in metrics),
+                      f"CAST(strftime('%s', {timestamp}) AS INTEGER)"])
+
+class RowLayout:
+    """
+    The original layout: sensor_readings rows holding the values as given
+    Queries name the readings `r` (FROM self.source) and use the
+    expressions below, so one SQL text serves both layouts.
+    """
+    compact = False
+    table = "sensor_readings"  # physical table
+    source = "sensor_readings r"  # FROM clause
+    values_source = "sensor_readings r"  # FROM clause without sensor_id (no join)
+    key_columns = "sensor_id, timestamp"  # the unique key, in table columns
+    sensor = "r.sensor_id"  # expressions usable in WHERE / ORDER BY
+    timestamp = "r.timestamp"
+    timestamp_floor = "''"  # sorts before every stored timestamp
+
+    def columns(self, *names: str) -> str:
+        """SELECT list of reading columns (all of them by default)"""
+        return ", ".join(f"r.{name}" for name in names) if names else "r.*"
+
+    def metric(self, name: str) -> str:
+        return f"r.{name}"
+
+    def timestamp_param(self, timestamp, round_up: bool = False):
+        """Parameter compared with self.timestamp"""
+        return timestamp.isoformat(" ") if isinstance(timestamp, datetime) else str(timestamp)
+
+    def timestamp_text(self, expression: str) -> str:
+        """Stored-text form of a self.timestamp expression (e.g. an aggregate)"""
+        return expression
+
+    def prepare(self, rows: List[tuple]) -> List[tuple]:
+        """(sensor_id, soil_moisture, temperature, humidity, timestamp) rows as they will be stored"""
+        return rows
+
+    def add_sensors(self, db: sqlite3.Connection, sensor_ids):
+        pass
+
+    def insert_sql(self, ignore_duplicates: bool) -> str:
+        """INSERT taking (sensor_id, soil_moisture, temperature, humidity, timestamp)"""
+        return f"""
+            INSERT {"OR IGNORE " if ignore_duplicates else ""}INTO sensor_readings
+            (sensor_id, soil_moisture, temperature, humidity, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        """
+
+class CompactLayout(RowLayout):
+    """readings_compact + sensor_keys (see the module docstring)"""
+    compact = True
+    table = "readings_compact"
+    source = "readings_compact r JOIN sensor_keys k ON k.sensor_key = r.sensor_key"
+    values_source = "readings_compact r"
+    key_columns = "sensor_key, ts"
+    sensor = "k.sensor_id"
+    timestamp = "r.ts"
+    timestamp_floor = str(-2 ** 63)
+    EXPRESSIONS = {"id": "r.id", "sensor_id": "k.sensor_id",
+                   **{metric: f"r.{metric} / {SCALE}.0" for metric in METRICS},
+                   "timestamp": "datetime(r.ts, 'unixepoch')", "created_at": "NULL"}
+
+    def columns(self, *names: str) -> str:
+        return ", ".join(f"{self.EXPRESSIONS[name]} AS {name}" for name in names or READING_COLUMNS)
+
+    def metric(self, name: str) -> str:
+        return self.EXPRESSIONS[name]
+
+    def timestamp_param(self, timestamp, round_up: bool = False):
+        return epoch_seconds(timestamp, round_up)
+
+    def timestamp_text(self, expression: str) -> str:
+        return f"datetime({expression}, 'unixepoch')"
+
+    def prepare(self, rows: List[tuple]) -> List[tuple]:
+        return [(sensor_id, quantize(m), quantize(t), quantize(h),
+                 whole_seconds(timestamp).isoformat(" "))
+                for sensor_id, m, t, h, timestamp in rows]
+
+    def add_sensors(self, db: sqlite3.Connection, sensor_ids):
+        """Intern sensor ids not seen before"""
+        db.executemany("INSERT OR IGNORE INTO sensor_keys (sensor_id) VALUES (?)",
+                       [(sensor_id,) for sensor_id in sensor_ids])
+
+    def insert_sql(self, ignore_duplicates: bool) -> str:
+        return f"""
+            INSERT {"OR IGNORE " if ignore_duplicates else ""}INTO readings_compact
+            (sensor_key, soil_moisture, temperature, humidity, ts)
+            VALUES ({encode_sql("?", ["?"] * 3, "?")})
+        """
+
+ROWS = RowLayout()
+COMPACT = CompactLayout()
+
+def readings_layout(conn: sqlite3.Connection) -> RowLayout:
+    """Layout of a database: compact once sensor_readings is a view"""
+    row = conn.execute(
+        "SELECT type FROM sqlite_master WHERE name = 'sensor_readings'").fetchone()
+    return COMPACT if row is not None and row[0] == "view" else ROWS
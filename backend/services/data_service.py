@@ -1,8 +1,37 @@
 # ===== services/data_service.py =====
 import sqlite3
-import json
 from datetime import datetime
-from typing import List, Optional, Dict
+from functools import cached_property
+from typing import List, Optional, Dict, Tuple
+
+import numpy as np
+
+from services.compact_storage import RowLayout, quantize, readings_layout, whole_seconds
+from services.decision_engine import ALERT_BITS, ALERT_TYPES, alert_mask, alert_types
+from services.downsampling import downsample_indices
+from services.hot_readings import HotReadings, get_hot_readings
+from services.ingest_guard import IngestGuard, get_ingest_guard
+from services.moisture_forecast import UPSERT_SQL as FORECAST_UPSERT_SQL, ForecastModel, get_forecast_model
+from utils.metrics import DB_QUERY_SECONDS, timed_method
+
+# (sensor_id, reading_id, soil_moisture, temperature, humidity, timestamp);
+# late readings don't regress the row
+LATEST_UPSERT_SQL = """
+    INSERT INTO sensor_latest
+        (sensor_id, reading_id, soil_moisture, temperature, humidity, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sensor_id) DO UPDATE SET
+        reading_id = excluded.reading_id,
+        soil_moisture = excluded.soil_moisture,
+        temperature = excluded.temperature,
+        humidity = excluded.humidity,
+        timestamp = excluded.timestamp
+    WHERE excluded.timestamp >= sensor_latest.timestamp
+"""
+
+FIELD_EVENT_KINDS = ("fertilization", "irrigation")
+FIELD_EVENT_COLUMNS = ("sensor_id", "kind", "timestamp", "product", "amount_kg",
+                       "n_kg", "p_kg", "k_kg", "volume_l", "note")
 
 class DataService:
     """
@@ -11,117 +40,936 @@ class DataService:
     ⚠️ ISSUE: No transaction management for complex operations
     """
     
-    def __init__(self, db: sqlite3.Connection):
+    METRICS = ("soil_moisture", "temperature", "humidity")
+    STREAM_CHUNK_ROWS = 5000
+    IN_CHUNK_SIZE = 500  # bound parameters per IN (...) list
+    
+    def __init__(self, db: sqlite3.Connection, guard: Optional[IngestGuard] = None,
+                 forecast: Optional[ForecastModel] = None,
+                 hot: Optional[HotReadings] = None):
         self.db = db
+        self.guard = guard or get_ingest_guard()
+        self.forecast = forecast or get_forecast_model()
+        self.hot = hot if hot is not None else get_hot_readings()
     
+    @cached_property
+    def readings(self) -> RowLayout:
+        """How readings are stored here: row or compact layout (services/compact_storage.py)"""
+        return readings_layout(self.db)
+    
+    @timed_method(DB_QUERY_SECONDS)
     def save_sensor_reading(self, sensor_id: str, soil_moisture: float,
                           temperature: float, humidity: float,
                           timestamp: datetime) -> dict:
         """
         Save a new sensor reading
         ✅ Good: Returns created object
-        ⚠️ ISSUE: No duplicate detection
+        Idempotent on (sensor_id, timestamp): a retried reading returns the
+        stored row flagged "duplicate" instead of inserting it again.
+        Readings older than the sensor's latest one are flagged "late".
         """
+        layout = self.readings
+        if layout.compact:
+            # Answer with the values as stored, like any later read would
+            timestamp = whole_seconds(timestamp)
+            soil_moisture, temperature, humidity = map(quantize, (soil_moisture, temperature, humidity))
+        ts = self._timestamp_key(timestamp)
+        
+        # Common retry case: answered from memory, no INSERT attempted
+        known_id = self.guard.lookup(sensor_id, ts)
+        if known_id is not None:
+            existing = self._get_reading_by_key(sensor_id, ts)
+            if existing:
+                return self._duplicate_response(existing)
+        
+        new_sensor = False
+        if self.guard.latest_timestamp(sensor_id) is None:
+            latest = self.get_latest_reading(sensor_id)
+            if latest:
+                self.guard.seed_latest(sensor_id, latest["timestamp"])
+            new_sensor = latest is None
+        
         cursor = self.db.cursor()
-        cursor.execute("""
-            INSERT INTO sensor_readings 
-            (sensor_id, soil_moisture, temperature, humidity, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (sensor_id, soil_moisture, temperature, humidity, timestamp))
+        if layout.compact:
+            created_at = None  # not kept by the compact layout
+            layout.add_sensors(self.db, [sensor_id])
+            cursor.execute(layout.insert_sql(ignore_duplicates=True),
+                           (sensor_id, soil_moisture, temperature, humidity, ts))
+        else:
+            # Set here rather than by the column default so the hot tier holds the stored value
+            created_at = datetime.utcnow().replace(microsecond=0).isoformat(" ")
+            cursor.execute("""
+                INSERT OR IGNORE INTO sensor_readings 
+                (sensor_id, soil_moisture, temperature, humidity, timestamp, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (sensor_id, soil_moisture, temperature, humidity, ts, created_at))
+        
+        if cursor.rowcount == 0:
+            # Evicted from the LRU (or stored by another process)
+            existing = self._get_reading_by_key(sensor_id, ts)
+            if existing is None:
+                raise sqlite3.IntegrityError("Sensor reading was rejected by the database")
+            self.guard.remember(sensor_id, ts, existing["id"])
+            return self._duplicate_response(existing)
         
         reading_id = cursor.lastrowid
+        late = self.guard.remember(sensor_id, ts, reading_id)
+        self._update_latest_state(reading_id, sensor_id, soil_moisture,
+                                  temperature, humidity, ts)
+        if not late:
+            self._update_forecast(sensor_id, soil_moisture, ts)
+        if self.hot is not None:
+            stored = {"id": reading_id, "sensor_id": sensor_id, "soil_moisture": soil_moisture,
+                      "temperature": temperature, "humidity": humidity,
+                      "timestamp": ts, "created_at": created_at}
+            self._after_commit(lambda: self.hot.add(stored, new_sensor=new_sensor))
         
-        return {
+        reading = {
             "id": reading_id,
             "sensor_id": sensor_id,
             "soil_moisture": soil_moisture,
             "temperature": temperature,
             "humidity": humidity,
-            "timestamp": timestamp
+            "timestamp": timestamp,
+            "duplicate": False,
+            "late": late
         }
+        # Listeners (cache invalidation, anomaly detector, sensor health) only
+        # hear of the reading once it is committed
+        self._after_commit(lambda: self.guard.notify(reading))
+        return reading
+    
+    def _after_commit(self, callback):
+        """Defer callback to the commit of the current transaction (see database.Connection)"""
+        register = getattr(self.db, "after_commit", None)
+        if register is None:
+            callback()  # connection opened outside get_db: no commit hook to wait for
+        else:
+            register(callback)
+    
+    def _update_latest_state(self, reading_id: int, sensor_id: str, soil_moisture: float,
+                             temperature: float, humidity: float, timestamp: str):
+        """Keep sensor_latest on the newest reading (late readings don't regress it)"""
+        self.db.execute(LATEST_UPSERT_SQL, (sensor_id, reading_id, soil_moisture,
+                                            temperature, humidity, timestamp))
+    
+    def prepare_readings(self, rows: List[tuple]) -> List[tuple]:
+        """
+        (sensor_id, soil_moisture, temperature, humidity, timestamp) rows with
+        the values they will be stored with (rounded in the compact layout)
+        """
+        return self.readings.prepare(rows)
+    
+    def insert_readings(self, rows: List[tuple], ignore_duplicates: bool = True) -> int:
+        """
+        Bulk insert of prepare_readings() rows in one executemany, outside
+        the ingest pipeline (no guard, forecast or hot tier updates); returns
+        the rows inserted.
+        ignore_duplicates skips keys already stored (needs the unique index).
+        """
+        self.readings.add_sensors(self.db, {row[0] for row in rows})
+        return self.db.executemany(self.readings.insert_sql(ignore_duplicates), rows).rowcount
+    
+    def update_latest_states(self, rows: List[tuple]):
+        """_update_latest_state for many rows (LATEST_UPSERT_SQL parameter tuples)"""
+        self.db.executemany(LATEST_UPSERT_SQL, rows)
+    
+    def get_readings_by_keys(self, keys: List[Tuple[str, str]]) -> List[tuple]:
+        """
+        Stored (sensor_id, id, soil_moisture, temperature, humidity, timestamp)
+        of (sensor_id, timestamp) keys, one unique-index seek each; missing keys are skipped
+        """
+        layout = self.readings
+        sql = f"""
+            SELECT {layout.columns("sensor_id", "id", *self.METRICS, "timestamp")}
+            FROM {layout.source} WHERE {layout.sensor} = ? AND {layout.timestamp} = ?
+        """
+        rows = []
+        for sensor_id, timestamp in keys:
+            row = self.db.execute(sql, (sensor_id, layout.timestamp_param(timestamp))).fetchone()
+            if row is not None:
+                rows.append(tuple(row))
+        return rows
+    
+    def _update_forecast(self, sensor_id: str, soil_moisture: float, timestamp: str):
+        """Fold one in-order reading into the sensor's forecast (late ones wait for the batch refit)"""
+        row = self.db.execute("SELECT * FROM sensor_forecast WHERE sensor_id = ?",
+                              (sensor_id,)).fetchone()
+        current = dict(row) if row else None
+        state = self.forecast.update(current, timestamp, soil_moisture)
+        if state is not current:  # unchanged when older than the fit
+            self.db.execute(FORECAST_UPSERT_SQL, ForecastModel.record(sensor_id, state))
+    
+    @staticmethod
+    def _timestamp_key(timestamp) -> str:
+        """Stored text form of a timestamp (same as sqlite3's datetime adapter)"""
+        if isinstance(timestamp, datetime):
+            return timestamp.isoformat(" ")
+        return str(timestamp)
+    
+    def _get_reading_by_key(self, sensor_id: str, timestamp: str) -> Optional[dict]:
+        layout = self.readings
+        cursor = self.db.cursor()
+        cursor.execute(f"""
+            SELECT {layout.columns()} FROM {layout.source}
+            WHERE {layout.sensor} = ? AND {layout.timestamp} = ?
+        """, (sensor_id, layout.timestamp_param(timestamp)))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    
+    @staticmethod
+    def _duplicate_response(existing: dict) -> dict:
+        reading = dict(existing)
+        reading.pop("created_at", None)
+        reading["duplicate"] = True
+        reading["late"] = False
+        return reading
     
+    @timed_method(DB_QUERY_SECONDS)
     def get_latest_reading(self, sensor_id: str) -> Optional[dict]:
         """
         Get most recent reading for a sensor
         """
+        if self.hot is not None:
+            readings = self.hot.history(sensor_id, 1)
+            if readings is not None:
+                return readings[0] if readings else None
+        
+        layout = self.readings
         cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT * FROM sensor_readings
-            WHERE sensor_id = ?
-            ORDER BY timestamp DESC
+        cursor.execute(f"""
+            SELECT {layout.columns()} FROM {layout.source}
+            WHERE {layout.sensor} = ?
+            ORDER BY {layout.timestamp} DESC
             LIMIT 1
         """, (sensor_id,))
         
         row = cursor.fetchone()
         return dict(row) if row else None
     
+    @timed_method(DB_QUERY_SECONDS)
+    def get_latest_readings(self, sensor_ids: List[str]) -> Dict[str, dict]:
+        """
+        Most recent reading of several sensors, keyed by sensor_id
+        One IN (...) join against sensor_latest per IN_CHUNK_SIZE ids;
+        sensors without data are absent from the result.
+        """
+        readings = {}
+        if self.hot is not None:
+            readings.update((sensor_id, history[0]) for sensor_id, history
+                            in self.hot.histories(sensor_ids, 1).items() if history)
+            sensor_ids = [s for s in sensor_ids if s not in readings]
+        layout = self.readings
+        for chunk in self._id_chunks(sensor_ids):
+            cursor = self.db.execute(f"""
+                SELECT {layout.columns()} FROM sensor_latest l, {layout.source}
+                WHERE r.id = l.reading_id AND l.sensor_id IN ({", ".join("?" * len(chunk))})
+            """, chunk)
+            readings.update((row["sensor_id"], dict(row)) for row in cursor.fetchall())
+        return readings
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_recent_histories(self, sensor_ids: List[str], limit: int = 10) -> Dict[str, List[dict]]:
+        """
+        Newest `limit` readings of several sensors (newest first), keyed by sensor_id
+        Served from the hot tier where it covers the sensor; for the rest,
+        each sensor's cutoff timestamp is one index seek, so only the
+        returned rows are read however long the histories are.
+        """
+        histories = {sensor_id: [] for sensor_id in sensor_ids}
+        if self.hot is not None:
+            found = self.hot.histories(sensor_ids, limit)
+            histories.update(found)
+            sensor_ids = [s for s in sensor_ids if s not in found]
+        histories.update(self._query_recent_histories(sensor_ids, limit))
+        return histories
+    
+    def _query_recent_histories(self, sensor_ids: List[str], limit: int) -> Dict[str, List[dict]]:
+        """get_recent_histories() from SQLite only"""
+        layout = self.readings
+        histories = {sensor_id: [] for sensor_id in sensor_ids}
+        for chunk in self._id_chunks(sensor_ids):
+            cursor = self.db.execute(f"""
+                WITH ids(sensor_id) AS (VALUES {", ".join(["(?)"] * len(chunk))})
+                SELECT {layout.columns()} FROM ids, {layout.source}
+                WHERE {layout.sensor} = ids.sensor_id AND {layout.timestamp} >= COALESCE((
+                    SELECT {layout.timestamp} FROM {layout.source}
+                    WHERE {layout.sensor} = ids.sensor_id
+                    ORDER BY {layout.timestamp} DESC
+                    LIMIT 1 OFFSET ?
+                ), {layout.timestamp_floor})
+                ORDER BY {layout.sensor}, {layout.timestamp} DESC
+            """, (*chunk, limit - 1))
+            for row in cursor.fetchall():
+                histories[row["sensor_id"]].append(dict(row))
+        return histories
+    
+    def _id_chunks(self, sensor_ids: List[str]):
+        for offset in range(0, len(sensor_ids), self.IN_CHUNK_SIZE):
+            yield list(sensor_ids[offset:offset + self.IN_CHUNK_SIZE])
+    
+    @timed_method(DB_QUERY_SECONDS)
     def get_sensor_history(self, sensor_id: str, limit: int = 100) -> List[dict]:
         """
         Get historical readings
         ⚠️ ISSUE: No pagination support for large datasets
         """
+        if self.hot is not None:
+            history = self.hot.history(sensor_id, limit)
+            if history is not None:
+                return history
+        
+        layout = self.readings
         cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT * FROM sensor_readings
-            WHERE sensor_id = ?
-            ORDER BY timestamp DESC
+        cursor.execute(f"""
+            SELECT {layout.columns()} FROM {layout.source}
+            WHERE {layout.sensor} = ?
+            ORDER BY {layout.timestamp} DESC
             LIMIT ?
         """, (sensor_id, limit))
         
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
     
+    @timed_method(DB_QUERY_SECONDS)
+    def get_sensor_history_downsampled(self, sensor_id: str, max_points: int,
+                                       limit: Optional[int] = None,
+                                       start: Optional[datetime] = None,
+                                       end: Optional[datetime] = None,
+                                       method: str = "lttb") -> dict:
+        """
+        Chart-ready history: at most max_points readings chosen by LTTB
+        (or min/max per bucket) from the newest `limit` rows (of [start, end])
+        Rows are streamed from the cursor in chunks into NumPy columns;
+        only the selected points are turned into dicts. One extra row is
+        read to tell whether the window held more than `limit` rows.
+        """
+        where, params = self._window_filter(sensor_id, start, end)
+        layout = self.readings
+        columns = layout.columns("id", "timestamp", *self.METRICS)
+        if limit is not None:
+            sql = f"""
+                SELECT * FROM (
+                    SELECT {columns} FROM {layout.source}
+                    WHERE {where}
+                    ORDER BY {layout.timestamp} DESC
+                    LIMIT ?
+                ) ORDER BY timestamp
+            """
+            params.append(limit + 1)
+        else:
+            sql = f"""
+                SELECT {columns} FROM {layout.source}
+                WHERE {where}
+                ORDER BY {layout.timestamp}
+            """
+        
+        cursor = self.db.cursor()
+        cursor.row_factory = None  # plain tuples: cheaper, and column-friendly
+        cursor.execute(sql, params)
+        id_chunks, ts_chunks, value_chunks = [], [], []
+        while True:
+            rows = cursor.fetchmany(self.STREAM_CHUNK_ROWS)
+            if not rows:
+                break
+            ids, stamps, *metrics = zip(*rows)
+            id_chunks.append(np.array(ids, dtype=np.int64))
+            ts_chunks.append(np.array(stamps, dtype=object))
+            value_chunks.append(np.array(metrics, dtype=np.float64).T)
+        
+        if not id_chunks:
+            return {"sensor_id": sensor_id, "readings": [], "downsampled": False,
+                    "source_points": 0, "method": method, "truncated": False}
+        ids = np.concatenate(id_chunks)
+        stamps = np.concatenate(ts_chunks)
+        values = np.concatenate(value_chunks)
+        truncated = limit is not None and len(ids) > limit
+        if truncated:  # drop the extra (oldest) row
+            ids, stamps, values = ids[1:], stamps[1:], values[1:]
+        
+        n = len(ids)
+        if n > max_points:
+            try:
+                x = stamps.astype("datetime64[us]").astype(np.int64)
+            except (ValueError, TypeError):
+                x = np.arange(n)  # unparseable timestamps: assume even spacing
+            keep = downsample_indices(x, values, max_points, method)
+        else:
+            keep = np.arange(n)
+        
+        readings = [
+            {
+                "id": int(ids[i]),
+                "sensor_id": sensor_id,
+                "soil_moisture": float(values[i, 0]),
+                "temperature": float(values[i, 1]),
+                "humidity": float(values[i, 2]),
+                "timestamp": stamps[i]
+            }
+            for i in keep[::-1]  # newest first, like get_sensor_history
+        ]
+        return {"sensor_id": sensor_id, "readings": readings, "downsampled": n > max_points,
+                "source_points": n, "method": method, "truncated": truncated}
+    
+    def _window_filter(self, sensor_id: str, start: Optional[datetime],
+                       end: Optional[datetime]):
+        """WHERE clause (over FROM self.readings.source) + params for one sensor's readings in [start, end]"""
+        layout = self.readings
+        where = f"{layout.sensor} = ?"
+        params: list = [sensor_id]
+        if start is not None:
+            where += f" AND {layout.timestamp} >= ?"
+            params.append(layout.timestamp_param(start, round_up=True))
+        if end is not None:
+            where += f" AND {layout.timestamp} <= ?"
+            params.append(layout.timestamp_param(end))
+        return where, params
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_sensor_stats(self, sensor_id: str, start: Optional[datetime] = None,
+                         end: Optional[datetime] = None,
+                         percentiles=(0.1, 0.5, 0.9)) -> dict:
+        """
+        Aggregate statistics over a time window, computed in SQL
+        One query for count/mean/min/max/std of every metric (std from the
+        squared deviations against the window mean, which doesn't cancel out
+        like sum_sq / n - mean^2), then one window-function pass ranking every
+        metric for nearest-rank percentiles. The response size does not depend
+        on the window length.
+        """
+        where, params = self._window_filter(sensor_id, start, end)
+        layout = self.readings
+        window = f"""
+            WITH window_readings AS (
+                SELECT {layout.timestamp} AS ts,
+                       {", ".join(f"{layout.metric(m)} AS v{i}" for i, m in enumerate(self.METRICS))}
+                FROM {layout.source}
+                WHERE {where}
+            )"""
+        metrics = range(len(self.METRICS))
+        
+        aggregates = ", ".join(
+            f"AVG(v{i}), MIN(v{i}), MAX(v{i}), SUM((v{i} - m{i}) * (v{i} - m{i}))" for i in metrics
+        )
+        cursor = self.db.cursor()
+        cursor.execute(f"""{window}
+            SELECT COUNT(*), {layout.timestamp_text("MIN(ts)")},
+                   {layout.timestamp_text("MAX(ts)")}, {aggregates}
+            FROM window_readings,
+                 (SELECT {", ".join(f"AVG(v{i}) AS m{i}" for i in metrics)} FROM window_readings)
+        """, params)
+        row = cursor.fetchone()
+        count = row[0]
+        stats = {
+            "sensor_id": sensor_id,
+            "start": row[1],
+            "end": row[2],
+            "count": count,
+            "metrics": {}
+        }
+        if count == 0:
+            stats["metrics"] = {m: None for m in self.METRICS}
+            return stats
+        
+        ranks = sorted({int(p * (count - 1)) for p in percentiles})
+        in_ranks = f"IN ({', '.join('?' * len(ranks))})"
+        cursor.execute(f"""{window}
+            SELECT * FROM (
+                SELECT {", ".join(f"v{i}, ROW_NUMBER() OVER (ORDER BY v{i}) - 1 AS r{i}"
+                                  for i in metrics)}
+                FROM window_readings
+            ) WHERE {" OR ".join(f"r{i} {in_ranks}" for i in metrics)}
+        """, params + ranks * len(self.METRICS))
+        by_rank = {}
+        for ranked in cursor.fetchall():
+            for i in metrics:
+                by_rank[i, ranked[2 * i + 1]] = ranked[2 * i]
+        for i, metric in enumerate(self.METRICS):
+            mean, minimum, maximum, sum_sq_dev = row[3 + i * 4: 7 + i * 4]
+            metric_stats = {
+                "mean": round(mean, 2),
+                "min": minimum,
+                "max": maximum,
+                "std": round((sum_sq_dev / count) ** 0.5, 2),
+            }
+            for p in percentiles:
+                metric_stats[f"p{round(p * 100)}"] = by_rank[i, int(p * (count - 1))]
+            stats["metrics"][metric] = metric_stats
+        
+        return stats
+    
+    @timed_method(DB_QUERY_SECONDS)
     def get_all_sensors(self) -> List[dict]:
         """
         Get list of all sensors with their latest reading
-        ⚠️ ISSUE: Inefficient for many sensors (N+1 query problem)
+        One scan of sensor_latest (one row per sensor)
         """
         cursor = self.db.cursor()
         cursor.execute("""
-            SELECT DISTINCT sensor_id FROM sensor_readings
+            SELECT reading_id AS id, sensor_id, soil_moisture, temperature,
+                   humidity, timestamp
+            FROM sensor_latest
+            ORDER BY sensor_id
         """)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_last_seen(self, sensor_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        """Newest reading timestamp per sensor from sensor_latest (all sensors when ids is None)"""
+        if sensor_ids is None:
+            return dict(self.db.execute("SELECT sensor_id, timestamp FROM sensor_latest").fetchall())
+        last_seen = {}
+        for chunk in self._id_chunks(sensor_ids):
+            last_seen.update(self.db.execute(f"""
+                SELECT sensor_id, timestamp FROM sensor_latest
+                WHERE sensor_id IN ({", ".join("?" * len(chunk))})
+            """, chunk).fetchall())
+        return last_seen
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_overview(self, critical: float, low: float) -> Dict[str, list]:
+        """
+        Latest state of every sensor as columns (one list per field)
+        Columnar output keeps the payload compact for thousands of sensors.
+        status: critical (moisture < critical), warning (moisture < low or
+        alerts on the last recommendation), ok otherwise.
+        """
+        cursor = self.db.cursor()
+        cursor.row_factory = None
+        cursor.execute("""
+            SELECT sensor_id, soil_moisture, temperature, humidity, timestamp,
+                   last_action, alert_count,
+                   CASE WHEN soil_moisture < ? THEN 'critical'
+                        WHEN soil_moisture < ? OR alert_count > 0 THEN 'warning'
+                        ELSE 'ok' END
+            FROM sensor_latest
+            ORDER BY sensor_id
+        """, (critical, low))
+        names = ("sensor_id", "soil_moisture", "temperature", "humidity",
+                 "timestamp", "action", "alert_count", "status")
+        rows = cursor.fetchall()
+        columns = zip(*rows) if rows else [()] * len(names)
+        return {name: list(values) for name, values in zip(names, columns)}
+    
+    def upsert_sensor_metadata(self, sensor_id: str, zone: Optional[str] = None,
+                               field: Optional[str] = None, crop_type: str = "tomato",
+                               plot_area_m2: Optional[float] = None,
+                               root_depth_m: Optional[float] = None) -> dict:
+        """
+        Create or replace a sensor's metadata
+        An upsert (not INSERT OR REPLACE) so the zone triggers see a move
+        between zones as one UPDATE.
+        """
+        self.db.execute("""
+            INSERT INTO sensors
+                (sensor_id, zone, field, crop_type, plot_area_m2, root_depth_m, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(sensor_id) DO UPDATE SET
+                zone = excluded.zone,
+                field = excluded.field,
+                crop_type = excluded.crop_type,
+                plot_area_m2 = excluded.plot_area_m2,
+                root_depth_m = excluded.root_depth_m,
+                updated_at = excluded.updated_at
+        """, (sensor_id, zone, field, crop_type, plot_area_m2, root_depth_m, datetime.utcnow()))
+        return self.get_sensor_metadata(sensor_id)
+    
+    def get_sensor_metadata(self, sensor_id: str) -> Optional[dict]:
+        row = self.db.execute("SELECT * FROM sensors WHERE sensor_id = ?",
+                              (sensor_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def get_sensors_metadata(self, sensor_ids: List[str]) -> Dict[str, dict]:
+        """Metadata rows of several sensors, keyed by sensor_id (absent when unset)"""
+        metadata = {}
+        for chunk in self._id_chunks(sensor_ids):
+            cursor = self.db.execute(f"""
+                SELECT * FROM sensors WHERE sensor_id IN ({", ".join("?" * len(chunk))})
+            """, chunk)
+            metadata.update((row["sensor_id"], dict(row)) for row in cursor.fetchall())
+        return metadata
+    
+    def get_zone_sensor_ids(self, zone: str) -> List[str]:
+        cursor = self.db.execute(
+            "SELECT sensor_id FROM sensors WHERE zone = ? ORDER BY sensor_id", (zone,))
+        return [row[0] for row in cursor.fetchall()]
+    
+    def get_zones(self) -> List[dict]:
+        cursor = self.db.execute("""
+            SELECT zone, sensor_count, reporting_count, alerting_count
+            FROM zone_state
+            WHERE sensor_count > 0
+            ORDER BY zone
+        """)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_zone_summary(self, zone: str, default_plot_area_m2: float,
+                         default_root_depth_m: float) -> Optional[dict]:
+        """
+        Current state of a zone from the trigger-maintained zone_state totals
+        Plot geometry comes from the zone's metadata rows (index on zone);
+        no readings are touched.
+        """
+        row = self.db.execute("""
+            SELECT * FROM zone_state WHERE zone = ? AND sensor_count > 0
+        """, (zone,)).fetchone()
+        if row is None:
+            return None
+        state = dict(row)
+        reporting = state["reporting_count"]
         
-        sensor_ids = [row[0] for row in cursor.fetchall()]
-        
-        sensors = []
-        for sensor_id in sensor_ids:
-            latest = self.get_latest_reading(sensor_id)
-            if latest:
-                sensors.append(latest)
+        def average(total):
+            return round(total / reporting, 2) if reporting else None
         
-        return sensors
+        area, depth = self.db.execute("""
+            SELECT SUM(COALESCE(plot_area_m2, ?)), AVG(COALESCE(root_depth_m, ?))
+            FROM sensors WHERE zone = ?
+        """, (default_plot_area_m2, default_root_depth_m, zone)).fetchone()
+        return {
+            "zone": zone,
+            "sensor_count": state["sensor_count"],
+            "reporting_count": reporting,
+            "alerting_count": state["alerting_count"],
+            "avg_soil_moisture": average(state["moisture_sum"]),
+            "avg_temperature": average(state["temperature_sum"]),
+            "avg_humidity": average(state["humidity_sum"]),
+            "plot_area_m2": area,
+            "avg_root_depth_m": depth,
+            "updated_at": state["updated_at"],
+        }
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def rebuild_forecasts(self, window_readings: int,
+                          sensor_ids: Optional[List[str]] = None) -> int:
+        """
+        Batch refit of every sensor's forecast (or sensor_ids') from its newest readings
+        Picks up late readings and resets any drift of the incremental sums.
+        """
+        if sensor_ids is None:
+            sensor_ids = [row[0] for row in self.db.execute("SELECT sensor_id FROM sensor_latest")]
+        for chunk in self._id_chunks(sensor_ids):
+            histories = self.get_recent_histories(chunk, limit=window_readings)
+            states = self.forecast.fit_histories([histories[s] for s in chunk])
+            self.db.executemany(FORECAST_UPSERT_SQL, [
+                ForecastModel.record(sensor_id, state)
+                for sensor_id, state in zip(chunk, states) if state is not None])
+        return len(sensor_ids)
+    
+    def warm_hot_readings(self) -> int:
+        """
+        Fill the hot tier with the newest readings of the most recently
+        reporting sensors (as many as it holds); returns the sensors loaded
+        """
+        if self.hot is None:
+            return 0
+        sensor_ids = [row[0] for row in self.db.execute(
+            "SELECT sensor_id FROM sensor_latest ORDER BY timestamp DESC LIMIT ?",
+            (self.hot.max_sensors,))]
+        sensor_ids.reverse()  # most recent loaded last = least likely evicted
+        for chunk in self._id_chunks(sensor_ids):
+            # One row past the ring size tells whether the ring holds the whole history
+            histories = self._query_recent_histories(chunk, self.hot.per_sensor + 1)
+            for sensor_id in chunk:
+                history = histories[sensor_id]
+                self.hot.load(sensor_id, history, complete=len(history) <= self.hot.per_sensor)
+        return len(self.hot)
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_sensors_crossing(self, threshold: str, before: datetime,
+                             after: Optional[datetime] = None) -> List[dict]:
+        """
+        Sensors forecast to cross `threshold` ("critical" or "low") before a
+        time, soonest first; one range scan of the crossing-time index
+        """
+        column = {"critical": "critical_at", "low": "low_at"}[threshold]
+        where, params = f"{column} <= ?", [self._timestamp_key(before)]
+        if after is not None:
+            where += f" AND {column} >= ?"
+            params.append(self._timestamp_key(after))
+        cursor = self.db.execute(f"""
+            SELECT sensor_id, last_moisture AS soil_moisture, slope_per_hour,
+                   critical_at, low_at, updated_at
+            FROM sensor_forecast
+            WHERE {where}
+            ORDER BY {column}
+        """, params)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_irrigation_candidates(self, zone: Optional[str] = None) -> List[dict]:
+        """
+        Latest state, plot metadata and forecast of every sensor (or a zone's)
+        in one join: the scheduler's input
+        """
+        where, params = ("WHERE s.zone = ?", (zone,)) if zone else ("", ())
+        cursor = self.db.execute(f"""
+            SELECT l.sensor_id, s.zone, s.crop_type, s.plot_area_m2, s.root_depth_m,
+                   l.soil_moisture, l.temperature, l.last_priority, f.critical_at
+            FROM sensor_latest l
+            LEFT JOIN sensors s ON s.sensor_id = l.sensor_id
+            LEFT JOIN sensor_forecast f ON f.sensor_id = l.sensor_id
+            {where}
+            ORDER BY l.sensor_id
+        """, params)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_forecast(self, sensor_id: str) -> Optional[dict]:
+        row = self.db.execute("""
+            SELECT sensor_id, last_moisture AS soil_moisture, slope_per_hour, n_points,
+                   critical_at, low_at, updated_at
+            FROM sensor_forecast WHERE sensor_id = ?
+        """, (sensor_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def record_field_events(self, events: List[dict]) -> List[dict]:
+        """
+        Log fertilization / irrigation events (dicts with FIELD_EVENT_COLUMNS)
+        Triggers fold each one into field_event_state.
+        """
+        stored = []
+        for event in events:
+            row = self.db.execute(f"""
+                INSERT INTO field_events ({", ".join(FIELD_EVENT_COLUMNS)})
+                VALUES ({", ".join("?" * len(FIELD_EVENT_COLUMNS))})
+                RETURNING *
+            """, [self._timestamp_key(event[column]) if column == "timestamp" else event.get(column)
+                  for column in FIELD_EVENT_COLUMNS]).fetchone()
+            stored.append(dict(row))
+        return stored
+    
+    def get_field_events(self, sensor_id: str, kind: Optional[str] = None,
+                         limit: int = 100) -> List[dict]:
+        """Logged events of a sensor, newest first"""
+        where, params = "sensor_id = ?", [sensor_id]
+        if kind:
+            where += " AND kind = ?"
+            params.append(kind)
+        cursor = self.db.execute(f"""
+            SELECT * FROM field_events WHERE {where}
+            ORDER BY timestamp DESC, id DESC LIMIT ?
+        """, params + [limit])
+        return [dict(row) for row in cursor.fetchall()]
     
+    def delete_field_event(self, event_id: int) -> Optional[dict]:
+        """Remove a logged event (e.g. entered by mistake); the deleted row, None if unknown"""
+        row = self.db.execute("DELETE FROM field_events WHERE id = ? RETURNING *",
+                              (event_id,)).fetchone()
+        return dict(row) if row else None
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_field_states(self, sensor_ids: List[str]) -> Dict[str, Dict[str, dict]]:
+        """
+        Last event and running totals by sensor, then kind (absent when none logged)
+        One primary-key seek per sensor, whatever the length of the log.
+        """
+        states: Dict[str, Dict[str, dict]] = {}
+        for chunk in self._id_chunks(sensor_ids):
+            cursor = self.db.execute(f"""
+                SELECT * FROM field_event_state
+                WHERE sensor_id IN ({", ".join("?" * len(chunk))}) AND event_count > 0
+            """, chunk)
+            for row in cursor.fetchall():
+                states.setdefault(row["sensor_id"], {})[row["kind"]] = dict(row)
+        return states
+    
+    def get_field_state(self, sensor_id: str) -> Dict[str, dict]:
+        return self.get_field_states([sensor_id]).get(sensor_id, {})
+    
+    @timed_method(DB_QUERY_SECONDS)
     def save_recommendation(self, sensor_id: str, recommendation: dict) -> int:
         """
         Save a recommendation to database
         ✅ Good: Audit trail of recommendations
+        Typed columns in recommendations, texts in recommendation_explanations
         """
         cursor = self.db.cursor()
-        cursor.execute("""
-            INSERT INTO recommendations
-            (sensor_id, recommendation_data, timestamp)
-            VALUES (?, ?, ?)
-        """, (sensor_id, json.dumps(recommendation), datetime.utcnow()))
-        
-        return cursor.lastrowid
+        cursor.execute(f"""
+            INSERT INTO recommendations ({self._RECOMMENDATION_COLUMNS})
+            VALUES ({", ".join("?" * self._RECOMMENDATION_WIDTH)})
+        """, self._recommendation_row(sensor_id, recommendation, datetime.utcnow()))
+        recommendation_id = cursor.lastrowid
+        cursor.execute(self._EXPLANATION_SQL,
+                       self._explanation_row(recommendation_id, recommendation))
+        cursor.execute(self._LATEST_RECOMMENDATION_SQL,
+                       self._latest_recommendation_params(sensor_id, recommendation))
+        return recommendation_id
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def save_recommendations(self, recommendations: Dict[str, dict]):
+        """Save several recommendations (keyed by sensor_id), a few statements per chunk"""
+        now = datetime.utcnow()
+        row_sql = f"({', '.join('?' * self._RECOMMENDATION_WIDTH)})"
+        for chunk in self._id_chunks(list(recommendations)):
+            params = [value for sensor_id in chunk
+                      for value in self._recommendation_row(
+                          sensor_id, recommendations[sensor_id], now)]
+            ids = dict(self.db.execute(f"""
+                INSERT INTO recommendations ({self._RECOMMENDATION_COLUMNS})
+                VALUES {", ".join([row_sql] * len(chunk))}
+                RETURNING sensor_id, id
+            """, params).fetchall())
+            self.db.executemany(self._EXPLANATION_SQL, [
+                self._explanation_row(ids[sensor_id], recommendations[sensor_id])
+                for sensor_id in chunk])
+        self.db.executemany(self._LATEST_RECOMMENDATION_SQL, [
+            self._latest_recommendation_params(sensor_id, recommendation)
+            for sensor_id, recommendation in recommendations.items()])
+    
+    _RECOMMENDATION_COLUMNS = """sensor_id, timestamp, action, amount_ml, priority,
+        fertilization_needed, fertilization_type, fertilization_kg, alert_mask"""
+    _RECOMMENDATION_WIDTH = 9
+    
+    _EXPLANATION_SQL = """
+        INSERT INTO recommendation_explanations
+            (recommendation_id, irrigation, fertilization, alerts)
+        VALUES (?, ?, ?, ?)
+    """
     
+    _LATEST_RECOMMENDATION_SQL = """
+        UPDATE sensor_latest
+        SET last_action = ?, last_priority = ?, alert_count = ?, recommended_at = ?
+        WHERE sensor_id = ?
+    """
+    
+    @staticmethod
+    def _recommendation_row(sensor_id: str, recommendation: dict, now: datetime) -> tuple:
+        irrigation = recommendation.get("irrigation") or {}
+        fertilization = recommendation.get("fertilization") or {}
+        return (sensor_id, now, irrigation.get("action"), irrigation.get("amount_ml") or 0,
+                irrigation.get("priority"), bool(fertilization.get("needed")),
+                fertilization.get("type"), fertilization.get("amount_kg") or 0,
+                alert_mask(recommendation.get("alerts") or []))
+    
+    @staticmethod
+    def _explanation_row(recommendation_id: int, recommendation: dict) -> tuple:
+        return (recommendation_id,
+                (recommendation.get("irrigation") or {}).get("explanation"),
+                (recommendation.get("fertilization") or {}).get("explanation"),
+                "\n".join(recommendation.get("alerts") or []) or None)
+    
+    @staticmethod
+    def _latest_recommendation_params(sensor_id: str, recommendation: dict) -> tuple:
+        irrigation = recommendation.get("irrigation") or {}
+        return (irrigation.get("action"), irrigation.get("priority"),
+                len(recommendation.get("alerts") or []), datetime.utcnow(), sensor_id)
+    
+    @staticmethod
+    def _recommendation_dict(row: sqlite3.Row) -> dict:
+        rec = dict(row)
+        rec["fertilization_needed"] = bool(rec["fertilization_needed"])
+        rec["alerts"] = alert_types(rec.pop("alert_mask"))
+        if "alert_messages" in rec:
+            messages = rec.pop("alert_messages")
+            rec["alert_messages"] = messages.split("\n") if messages else []
+        return rec
+    
+    @timed_method(DB_QUERY_SECONDS)
     def get_recommendations_history(self, sensor_id: str, limit: int = 50) -> List[dict]:
         """
         Get historical recommendations
+        Newest first, typed columns plus their explanation texts
         """
-        cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT * FROM recommendations
-            WHERE sensor_id = ?
-            ORDER BY timestamp DESC
+        return self.query_recommendations(sensor_id=sensor_id, limit=limit,
+                                          explanations=True)
+    
+    def _recommendation_filters(self, sensor_id: Optional[str], zone: Optional[str],
+                                action: Optional[str], priority: Optional[str],
+                                alert: Optional[str], start: Optional[datetime],
+                                end: Optional[datetime]):
+        clauses, params = [], []
+        if sensor_id is not None:
+            clauses.append("r.sensor_id = ?")
+            params.append(sensor_id)
+        if zone is not None:
+            clauses.append("s.zone = ?")
+            params.append(zone)
+        if action is not None:
+            clauses.append("r.action = ?")
+            params.append(action)
+        if priority is not None:
+            clauses.append("r.priority = ?")
+            params.append(priority)
+        if alert is not None:
+            clauses.append("r.alert_mask & ? != 0")
+            params.append(ALERT_BITS[alert])
+        if start is not None:
+            clauses.append("r.timestamp >= ?")
+            params.append(self._timestamp_key(start))
+        if end is not None:
+            clauses.append("r.timestamp <= ?")
+            params.append(self._timestamp_key(end))
+        return " AND ".join(clauses) or "1", params
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def query_recommendations(self, sensor_id: Optional[str] = None, zone: Optional[str] = None,
+                              action: Optional[str] = None, priority: Optional[str] = None,
+                              alert: Optional[str] = None, start: Optional[datetime] = None,
+                              end: Optional[datetime] = None, limit: int = 50,
+                              explanations: bool = False) -> List[dict]:
+        """Stored recommendations matching every given filter, newest first"""
+        where, params = self._recommendation_filters(
+            sensor_id, zone, action, priority, alert, start, end)
+        texts = """, e.irrigation AS irrigation_explanation,
+               e.fertilization AS fertilization_explanation, e.alerts AS alert_messages"""
+        cursor = self.db.execute(f"""
+            SELECT r.id, r.sensor_id, r.timestamp, r.action, r.amount_ml, r.priority,
+                   r.fertilization_needed, r.fertilization_type, r.fertilization_kg,
+                   r.alert_mask{texts if explanations else ""}
+            FROM recommendations r
+            {"LEFT JOIN sensors s ON s.sensor_id = r.sensor_id" if zone is not None else ""}
+            {"LEFT JOIN recommendation_explanations e ON e.recommendation_id = r.id"
+             if explanations else ""}
+            WHERE {where}
+            ORDER BY r.timestamp DESC
             LIMIT ?
-        """, (sensor_id, limit))
-        
-        rows = cursor.fetchall()
-        recommendations = []
-        for row in rows:
-            rec = dict(row)
-            rec["recommendation_data"] = json.loads(rec["recommendation_data"])
-            recommendations.append(rec)
+        """, (*params, limit))
+        return [self._recommendation_dict(row) for row in cursor.fetchall()]
+    
+    RECOMMENDATION_GROUPS = {
+        "zone": "s.zone",
+        "sensor": "r.sensor_id",
+        "day": "date(r.timestamp)",
+        "action": "r.action",
+        "priority": "r.priority",
+    }
+    RECOMMENDATION_ACTIONS = ("water_immediately", "water", "stop_watering", "monitor")
+    
+    @timed_method(DB_QUERY_SECONDS)
+    def get_recommendation_analytics(self, group_by: str = "zone", sensor_id: Optional[str] = None,
+                                     zone: Optional[str] = None, action: Optional[str] = None,
+                                     priority: Optional[str] = None, alert: Optional[str] = None,
+                                     start: Optional[datetime] = None,
+                                     end: Optional[datetime] = None) -> List[dict]:
+        """
+        Recommendation counts, water and alert totals per group, aggregated in SQL
+        e.g. water_immediately actions in the last week per zone:
+        group_by="zone", action="water_immediately", start=now - 7 days
+        """
+        where, params = self._recommendation_filters(
+            sensor_id, zone, action, priority, alert, start, end)
+        actions = ", ".join(f"SUM(r.action = '{a}')" for a in self.RECOMMENDATION_ACTIONS)
+        alerts = ", ".join(f"SUM(r.alert_mask & {ALERT_BITS[a]} != 0)" for a in ALERT_TYPES)
+        join = ("LEFT JOIN sensors s ON s.sensor_id = r.sensor_id"
+                if group_by == "zone" or zone is not None else "")
+        cursor = self.db.execute(f"""
+            SELECT {self.RECOMMENDATION_GROUPS[group_by]} AS key, COUNT(*),
+                   SUM(r.amount_ml), SUM(r.fertilization_needed), SUM(r.alert_mask != 0),
+                   {actions}, {alerts}
+            FROM recommendations r
+            {join}
+            WHERE {where}
+            GROUP BY key
+            ORDER BY key
+        """, params)
         
-        return recommendations
\ No newline at end of file
+        n_actions = len(self.RECOMMENDATION_ACTIONS)
+        return [{
+            group_by: row[0],
+            "recommendations": row[1],
+            "water_l": round((row[2] or 0) / 1000, 1),
+            "fertilizations": row[3],
+            "alerted": row[4],
+            "actions": dict(zip(self.RECOMMENDATION_ACTIONS, row[5:5 + n_actions])),
+            "alerts": dict(zip(ALERT_TYPES, row[5 + n_actions:])),
+        } for row in cursor.fetchall()]
\ No newline at end of file
@@ -1,8 +1,40 @@
 # ===== services/decision_engine.py =====
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 import statistics
 
+from utils.metrics import ENGINE_EVALUATION_SECONDS
+
+# Alert categories stored as a bitmask (bit i = ALERT_TYPES[i]), recognised
+# by the marker in the alert message (engine, anomaly detector and sensor
+# health alerts). New categories go at the end so stored masks keep meaning.
+ALERT_MARKERS = {
+    "drought": "DROUGHT RISK",
+    "overwatering": "OVERWATERING RISK",
+    "heat_stress": "HEAT STRESS",
+    "cold_stress": "COLD STRESS",
+    "low_humidity": "LOW HUMIDITY",
+    "sensor_spike": "SENSOR SPIKE",
+    "stuck_probe": "STUCK PROBE",
+    "rapid_change": "RAPID CHANGE",
+    "sensor_offline": "SENSOR OFFLINE",
+    "back_online": "BACK ONLINE",
+}
+ALERT_TYPES = tuple(ALERT_MARKERS)
+ALERT_BITS = {name: 1 << i for i, name in enumerate(ALERT_TYPES)}
+
+def alert_mask(alerts: List[str]) -> int:
+    mask = 0
+    for message in alerts:
+        for name, marker in ALERT_MARKERS.items():
+            if marker in message:
+                mask |= ALERT_BITS[name]
+                break
+    return mask
+
+def alert_types(mask: int) -> List[str]:
+    return [name for name in ALERT_TYPES if mask & ALERT_BITS[name]]
+
 class DecisionEngine:
     """
     Main decision engine for generating agricultural recommendations
@@ -10,7 +42,12 @@ class DecisionEngine:
     ✅ Good: Rule-based and explainable
     """
     
-    def __init__(self):
+    RULE_NAMES = ("SOIL_MOISTURE_LOW", "SOIL_MOISTURE_HIGH", "SOIL_MOISTURE_CRITICAL",
+                  "TEMP_OPTIMAL_MIN", "TEMP_OPTIMAL_MAX", "HUMIDITY_LOW",
+                  "DROUGHT_TEMP", "OVERWATER_HUMIDITY", "HEAT_STRESS_TEMP", "COLD_STRESS_TEMP")
+    
+    def __init__(self, rules: Optional[Dict[str, float]] = None):
+        """rules: threshold overrides by RULE_NAMES name (e.g. for backtesting)"""
         # ⚠️ ISSUE: Hardcoded thresholds should be in configuration
         self.SOIL_MOISTURE_LOW = 30
         self.SOIL_MOISTURE_HIGH = 70
@@ -18,15 +55,37 @@ class DecisionEngine:
         self.TEMP_OPTIMAL_MIN = 15
         self.TEMP_OPTIMAL_MAX = 30
         self.HUMIDITY_LOW = 40
+        self.DROUGHT_TEMP = 30
+        self.OVERWATER_HUMIDITY = 80
+        self.HEAT_STRESS_TEMP = 35
+        self.COLD_STRESS_TEMP = 10
+        # Not a RULE_NAMES threshold: readings alone cannot backtest it
+        self.FERTILIZATION_INTERVAL_DAYS = 14
+        
+        for name, value in (rules or {}).items():
+            if name.upper() not in self.RULE_NAMES:
+                raise ValueError(f"Unknown rule: {name}")
+            setattr(self, name.upper(), value)
+    
+    @property
+    def rules(self) -> Dict[str, float]:
+        """Current thresholds by name"""
+        return {name: getattr(self, name) for name in self.RULE_NAMES}
     
+    @ENGINE_EVALUATION_SECONDS.time()
     def generate_recommendation(self, current_reading: dict, 
-                               history: List[dict]) -> dict:
+                               history: List[dict],
+                               anomaly_alerts: Optional[List[str]] = None,
+                               field_state: Optional[Dict[str, dict]] = None) -> dict:
         """
         Generate complete recommendation based on current and historical data
+        anomaly_alerts: flags from the streaming detector, appended to alerts
+        field_state: last logged field event and totals by kind (fertilization, irrigation)
         """
         irrigation = self._calculate_irrigation(current_reading, history)
-        fertilization = self._calculate_fertilization(current_reading, history)
+        fertilization = self._calculate_fertilization(current_reading, field_state)
         alerts = self._generate_alerts(current_reading, history)
+        alerts.extend(anomaly_alerts or [])
         
         return {
             "sensor_id": current_reading["sensor_id"],
@@ -82,33 +141,54 @@ class DecisionEngine:
                 "explanation": f"Soil moisture at {moisture:.1f}% is optimal. Continue monitoring. {trend}"
             }
     
-    def _calculate_fertilization(self, reading: dict, history: List[dict]) -> dict:
+    def _calculate_fertilization(self, reading: dict, field_state: Optional[dict]) -> dict:
         """
-        Calculate fertilization needs
-        ⚠️ ISSUE: Very simplistic logic, doesn't consider:
+        Calculate fertilization needs from the logged applications
+        field_state: the sensor's field_event_state rows by kind (see DataService.get_field_states)
+        ⚠️ ISSUE: Still simplistic, doesn't consider:
         - Crop type
         - Growth stage
         - Soil nutrients (N, P, K)
-        - Last fertilization date
         """
-        # Simplified heuristic: recommend fertilization every 14 days
-        # In real system, this would be much more sophisticated
+        last = (field_state or {}).get("fertilization")
+        if not last or not last.get("last_at"):
+            return {
+                "needed": False,
+                "type": None,
+                "amount_kg": 0,
+                "days_since_application": None,
+                "explanation": "No fertilization logged for this sensor. Record applications to get interval-based advice."
+            }
         
-        days_since_reading = len(history)  # Rough proxy
+        last_at = last["last_at"]
+        if not isinstance(last_at, datetime):
+            last_at = datetime.fromisoformat(str(last_at))
+        days = (datetime.utcnow() - last_at).total_seconds() / 86400
+        totals = {"N": last["total_n_kg"], "P": last["total_p_kg"], "K": last["total_k_kg"]}
+        applied = (f"{last['event_count']} application(s) logged, {last['total_amount_kg']:.1f} kg in total "
+                   f"(N {totals['N']:.1f} / P {totals['P']:.1f} / K {totals['K']:.1f} kg).")
+        common = {
+            "days_since_application": round(days, 1),
+            "applications": last["event_count"],
+            "total_applied_kg": round(last["total_amount_kg"], 2),
+            "nutrients_applied_kg": {name: round(value, 2) for name, value in totals.items()},
+        }
         
-        if days_since_reading > 14:
+        if days > self.FERTILIZATION_INTERVAL_DAYS:
             return {
                 "needed": True,
                 "type": "balanced_NPK",
                 "amount_kg": 2.5,
-                "explanation": "Based on time elapsed, balanced fertilization recommended. Actual needs depend on soil analysis and crop type."
+                **common,
+                "explanation": f"Last fertilization was {days:.0f} days ago (every {self.FERTILIZATION_INTERVAL_DAYS} days recommended); balanced fertilization recommended. {applied} Actual needs depend on soil analysis and crop type."
             }
         else:
             return {
                 "needed": False,
                 "type": None,
                 "amount_kg": 0,
-                "explanation": "No fertilization needed at this time. Monitor plant health and soil conditions."
+                **common,
+                "explanation": f"Last fertilization was {days:.1f} days ago; next one due in {self.FERTILIZATION_INTERVAL_DAYS - days:.0f} days. {applied}"
             }
     
     def _generate_alerts(self, reading: dict, history: List[dict]) -> List[str]:
@@ -123,17 +203,17 @@ class DecisionEngine:
         humidity = reading["humidity"]
         
         # Drought risk
-        if moisture < self.SOIL_MOISTURE_CRITICAL and temp > 30:
+        if moisture < self.SOIL_MOISTURE_CRITICAL and temp > self.DROUGHT_TEMP:
             alerts.append(f"⚠️ DROUGHT RISK: Critical soil moisture ({moisture:.1f}%) combined with high temperature ({temp:.1f}°C)")
         
         # Overwatering risk
-        if moisture > self.SOIL_MOISTURE_HIGH and humidity > 80:
+        if moisture > self.SOIL_MOISTURE_HIGH and humidity > self.OVERWATER_HUMIDITY:
             alerts.append(f"⚠️ OVERWATERING RISK: High soil moisture ({moisture:.1f}%) and humidity ({humidity:.1f}%) may cause root rot")
         
         # Temperature stress
-        if temp > 35:
+        if temp > self.HEAT_STRESS_TEMP:
             alerts.append(f"🌡️ HEAT STRESS: Temperature {temp:.1f}°C exceeds optimal range. Consider shade or increased irrigation.")
-        elif temp < 10:
+        elif temp < self.COLD_STRESS_TEMP:
             alerts.append(f"❄️ COLD STRESS: Temperature {temp:.1f}°C below optimal. Risk of frost damage.")
         
         # Low humidity alert
@@ -0,0 +1,69 @@
+import numpy as np
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets point selection
+    x: (n,) increasing; y: (n,) or (n, k) for k series sharing one x axis.
+    With several series the triangle areas are summed after scaling each
+    series to its own range, so one index set preserves the shape of all
+    of them. Returns sorted indices of n_out points (first and last kept).
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1], dtype=np.int64)[:max(n_out, 0)]
+
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64).reshape(n, -1)
+    span = np.ptp(y, axis=0)
+    y = (y - y.min(axis=0)) / np.where(span > 0, span, 1.0)
+
+    # Bucket boundaries over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for b in range(n_out - 2):
+        start, end = edges[b], edges[b + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_end = edges[b + 2] if b + 2 < len(edges) else n
+        next_start = end if b + 2 < len(edges) else n - 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean(axis=0)
+
+        px, py = x[previous], y[previous]
+        bx, by = x[start:end], y[start:end]
+        # Twice the triangle area, per series, summed across series
+        area = np.abs((px - avg_x) * (by - py) - (px - bx)[:, None] * (avg_y - py)).sum(axis=1)
+        previous = start + int(np.argmax(area))
+        selected[b + 1] = previous
+    return selected
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min/max-per-bucket selection (fully vectorised, keeps every extreme)
+    Uses the first series for multi-series input. Returns sorted indices of
+    at most n_out points.
+    """
+    y = np.asarray(y, dtype=np.float64).reshape(len(y), -1)[:, 0]
+    n = len(y)
+    buckets = n_out // 2
+    if buckets < 1 or n <= n_out:
+        return np.arange(n)
+    size = n // buckets
+    trimmed = y[:size * buckets].reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    picks = np.concatenate([offsets + trimmed.argmin(axis=1),
+                            offsets + trimmed.argmax(axis=1),
+                            [n - 1]])
+    return np.unique(picks)[:n_out]
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, n_out: int,
+                       method: str = "lttb") -> np.ndarray:
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    if method == "lttb":
+        return lttb_indices(x, y, n_out)
+    raise ValueError(f"Unknown downsampling method: {method}")
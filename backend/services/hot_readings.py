@@ -0,0 +1,260 @@
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config.settings import get_settings
+from utils.metrics import HOT_READINGS_REQUESTS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_BYTES = 32  # "YYYY-MM-DD HH:MM:SS.ffffff+HH:MM"
+CREATED_AT_BYTES = 19  # CURRENT_TIMESTAMP: "YYYY-MM-DD HH:MM:SS"
+# id (int64) + timestamp, created_at (fixed-width text) + 3 metrics (float32)
+READING_BYTES = 8 + TIMESTAMP_BYTES + CREATED_AT_BYTES + 3 * 4
+
+def _encode(text, width: int) -> Optional[bytes]:
+    """Stored text as fixed-width ASCII, None if it doesn't fit the column"""
+    if not isinstance(text, str) or len(text) > width or not text.isascii():
+        return None
+    return text.encode()
+
+class HotReadings:
+    """
+    Newest readings of the most recently used sensors, in memory
+    Each sensor owns one row (slot) of preallocated parallel arrays used as
+    a ring buffer of `per_sensor` readings: int64 ids, float32 metrics and
+    the stored timestamp / created_at text as fixed-width bytes (ordered
+    like SQLite orders it, and returned without formatting), so the whole
+    tier is one block of max_sensors * per_sensor * READING_BYTES. When
+    every slot is taken, the least recently used sensor is evicted.
+    A ring holds a sensor's newest `count` readings (late readings are
+    slotted in by timestamp); it holds all of them when `complete` (new
+    sensor, or fewer rows in the database than the ring size). Lookups it
+    cannot answer exactly return None and the caller queries SQLite.
+    Metrics are served rounded to VALUE_DECIMALS (float32 keeps ~7 digits).
+    """
+
+    VALUE_DECIMALS = 4
+
+    def __init__(self, per_sensor: int = 256, max_sensors: int = 1000):
+        self.per_sensor = per_sensor
+        self.max_sensors = max_sensors
+        shape = (max_sensors, per_sensor)
+        self._ids = np.zeros(shape, dtype=np.int64)
+        self._timestamps = np.zeros(shape, dtype=f"S{TIMESTAMP_BYTES}")
+        self._created = np.zeros(shape, dtype=f"S{CREATED_AT_BYTES}")
+        self._moisture = np.zeros(shape, dtype=np.float32)
+        self._temperature = np.zeros(shape, dtype=np.float32)
+        self._humidity = np.zeros(shape, dtype=np.float32)
+        self._columns = (self._ids, self._timestamps, self._created,
+                         self._moisture, self._temperature, self._humidity)
+        # Per-slot bookkeeping (plain lists: scalar access is the hot path)
+        self._head = [0] * max_sensors  # next write position
+        self._count = [0] * max_sensors
+        self._complete = [False] * max_sensors
+        self._slots: "OrderedDict[str, int]" = OrderedDict()  # LRU order
+        self._free = list(range(max_sensors - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @classmethod
+    def for_budget(cls, per_sensor: int, budget_bytes: int) -> "HotReadings":
+        """As many sensor slots as fit in the memory budget"""
+        return cls(per_sensor, max(1, budget_bytes // (per_sensor * READING_BYTES)))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self._columns)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, sensor_id: str) -> bool:
+        return sensor_id in self._slots
+
+    @staticmethod
+    def _row(reading: dict) -> Optional[tuple]:
+        timestamp = _encode(reading["timestamp"], TIMESTAMP_BYTES)
+        created = _encode(reading.get("created_at") or "", CREATED_AT_BYTES)  # "": not stored
+        if timestamp is None or created is None:
+            return None
+        return (reading["id"], timestamp, created,
+                reading["soil_moisture"], reading["temperature"], reading["humidity"])
+
+    def _allocate(self, sensor_id: str, complete: bool) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, slot = self._slots.popitem(last=False)
+            self.evictions += 1
+        self._slots[sensor_id] = slot
+        self._head[slot] = 0
+        self._count[slot] = 0
+        self._complete[slot] = complete
+        return slot
+
+    def _write(self, slot: int, row: tuple):
+        head = self._head[slot]
+        for column, value in zip(self._columns, row):
+            column[slot, head] = value
+        self._head[slot] = (head + 1) % self.per_sensor
+        if self._count[slot] == self.per_sensor:
+            self._complete[slot] = False  # overwrote the oldest
+        else:
+            self._count[slot] += 1
+
+    def _order(self, slot: int) -> np.ndarray:
+        """Positions of the slot's readings, oldest first"""
+        count = self._count[slot]
+        return (self._head[slot] - count + np.arange(count)) % self.per_sensor
+
+    def add(self, reading: dict, new_sensor: bool = False):
+        """
+        Fold in a newly stored reading (dict with the sensor_readings columns)
+        new_sensor: the database had no earlier reading of this sensor
+        """
+        sensor_id = reading["sensor_id"]
+        row = self._row(reading)
+        with self._lock:
+            if row is None:
+                self._discard(sensor_id)  # not representable: leave it to SQLite
+                return
+            slot = self._slots.get(sensor_id)
+            if slot is None:
+                slot = self._allocate(sensor_id, new_sensor)
+            else:
+                self._slots.move_to_end(sensor_id)
+
+            count = self._count[slot]
+            newest = self._timestamps[slot, (self._head[slot] - 1) % self.per_sensor]
+            if count == 0 or row[1] > newest:
+                self._write(slot, row)
+                return
+
+            # Late reading: insert by timestamp, keep the newest per_sensor
+            order = self._order(slot)
+            position = int(np.searchsorted(self._timestamps[slot, order], row[1]))
+            if position == 0 and (count == self.per_sensor or not self._complete[slot]):
+                return  # older than everything held: not among the newest
+            if count == self.per_sensor:
+                self._complete[slot] = False  # the oldest drops out
+            for column, value in zip(self._columns, row):
+                merged = np.insert(column[slot, order], position, value)[-self.per_sensor:]
+                column[slot, :len(merged)] = merged
+            self._count[slot] = len(merged)
+            self._head[slot] = len(merged) % self.per_sensor
+
+    def load(self, sensor_id: str, readings: List[dict], complete: bool):
+        """Replace a sensor's ring with its newest readings from the database (newest first)"""
+        rows = [self._row(reading) for reading in readings[:self.per_sensor]]
+        with self._lock:
+            self._discard(sensor_id)
+            if not rows or any(row is None for row in rows):
+                return
+            slot = self._allocate(sensor_id, complete and len(readings) <= self.per_sensor)
+            for row in reversed(rows):
+                self._write(slot, row)
+
+    def discard(self, sensor_id: str):
+        with self._lock:
+            self._discard(sensor_id)
+
+    def _discard(self, sensor_id: str):
+        slot = self._slots.pop(sensor_id, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def history(self, sensor_id: str, limit: int) -> Optional[List[dict]]:
+        """
+        Newest `limit` readings (newest first) shaped like sensor_readings
+        rows, or None when memory can't answer exactly
+        """
+        with self._lock:
+            columns = self._take(sensor_id, limit)
+        HOT_READINGS_REQUESTS.inc(result="miss" if columns is None else "hit")
+        return None if columns is None else self._readings(sensor_id, columns)
+
+    def histories(self, sensor_ids: Iterable[str], limit: int) -> Dict[str, List[dict]]:
+        """history() of several sensors; the ones memory can't answer are absent"""
+        with self._lock:
+            taken = {sensor_id: self._take(sensor_id, limit) for sensor_id in sensor_ids}
+        found = {sensor_id: self._readings(sensor_id, columns)
+                 for sensor_id, columns in taken.items() if columns is not None}
+        HOT_READINGS_REQUESTS.inc(len(found), result="hit")
+        HOT_READINGS_REQUESTS.inc(len(taken) - len(found), result="miss")
+        return found
+
+    def _take(self, sensor_id: str, limit: int) -> Optional[list]:
+        """
+        Copies of the newest `limit` entries of each column, newest first
+        (a tuple of scalars for a single reading); lock held
+        """
+        slot = self._slots.get(sensor_id)
+        if slot is None:
+            return None
+        count = self._count[slot]
+        if limit > count and not self._complete[slot]:
+            return None
+        self._slots.move_to_end(sensor_id)
+        head = self._head[slot]
+        if min(limit, count) == 1:  # latest reading: scalar reads beat slicing six columns
+            position = (head - 1) % self.per_sensor
+            return tuple(column[slot, position].item() for column in self._columns)
+        start = head - min(limit, count)
+        if start >= 0:
+            return [column[slot, start:head][::-1].copy() for column in self._columns]
+        # Wrapped: newest part at the front of the row, older part at its end
+        return [np.concatenate((column[slot, :head][::-1], column[slot, start:][::-1]))
+                for column in self._columns]
+
+    def _readings(self, sensor_id: str, columns: list) -> List[dict]:
+        digits = self.VALUE_DECIMALS
+        if isinstance(columns, tuple):
+            reading_id, ts, c, m, t, h = columns
+            return [{"id": reading_id, "sensor_id": sensor_id, "soil_moisture": round(m, digits),
+                     "temperature": round(t, digits), "humidity": round(h, digits),
+                     "timestamp": ts.decode(), "created_at": c.decode() or None}]
+        ids, timestamps, created, *values = columns
+        moisture, temperature, humidity = np.round(
+            np.stack(values).astype(np.float64), digits).tolist()
+        return [
+            {"id": reading_id, "sensor_id": sensor_id, "soil_moisture": m,
+             "temperature": t, "humidity": h, "timestamp": ts.decode(),
+             "created_at": c.decode() or None}
+            for reading_id, ts, c, m, t, h in zip(
+                ids.tolist(), timestamps.tolist(), created.tolist(),
+                moisture, temperature, humidity)
+        ]
+
+@lru_cache()
+def get_hot_readings() -> Optional[HotReadings]:
+    """
+    Process-wide hot tier, None unless single-process mode is confirmed
+    Rings are fed by this process's ingest only, so with several processes
+    each would miss the others' writes. The number of processes a server
+    forks is not visible from here, hence the opt-in
+    (settings.hot_readings_enabled).
+    """
+    settings = get_settings()
+    if not settings.hot_readings_enabled:
+        return None
+    if settings.workers > 1:
+        logger.info("Hot readings tier disabled: %d worker processes", settings.workers)
+        return None
+    return HotReadings.for_budget(settings.hot_readings_per_sensor,
+                                  settings.hot_readings_memory_mb * 1024 * 1024)
+
+def _hot_sensor_count() -> float:
+    if get_hot_readings.cache_info().currsize == 0:
+        return 0.0  # not created yet; don't allocate it from a scrape
+    hot = get_hot_readings()
+    return float(len(hot)) if hot is not None else 0.0
+
+HOT_READINGS_SENSORS = REGISTRY.gauge(
+    "agri_hot_readings_sensors",
+    "Sensors whose recent readings are held in memory",
+    callback=_hot_sensor_count)
@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from config.settings import get_settings
+
+IngestListener = Callable[[dict], None]
+
+class IngestGuard:
+    """
+    In-memory front for idempotent ingest
+    - LRU of recently stored (sensor_id, timestamp) keys, so gateway retries
+      are answered without touching the database
+    - Per-sensor high-water mark, so late (out-of-order) readings get flagged
+    - Listeners notified of every stored reading (caches, rollups, ...)
+    The UNIQUE index on sensor_readings stays the source of truth: a key
+    missing from the LRU is still rejected by the database.
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._recent: "OrderedDict[tuple, int]" = OrderedDict()  # (sensor_id, timestamp) -> id
+        self._latest: Dict[str, str] = {}
+        self._listeners: List[IngestListener] = []
+        self._lock = Lock()
+
+    def lookup(self, sensor_id: str, timestamp: str) -> Optional[int]:
+        """Return the stored reading id if this key was ingested recently"""
+        key = (sensor_id, timestamp)
+        with self._lock:
+            reading_id = self._recent.get(key)
+            if reading_id is not None:
+                self._recent.move_to_end(key)
+            return reading_id
+
+    def latest_timestamp(self, sensor_id: str) -> Optional[str]:
+        """High-water mark for a sensor, None if not seen by this process"""
+        return self._latest.get(sensor_id)
+
+    def remember(self, sensor_id: str, timestamp: str, reading_id: int) -> bool:
+        """
+        Record a stored reading
+        Returns True when the reading is older than one already seen (late)
+        """
+        key = (sensor_id, timestamp)
+        with self._lock:
+            self._recent[key] = reading_id
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.capacity:
+                self._recent.popitem(last=False)
+
+            latest = self._latest.get(sensor_id)
+            if latest is not None and timestamp < latest:
+                return True
+            self._latest[sensor_id] = timestamp
+            return False
+
+    def seed_latest(self, sensor_id: str, timestamp: str):
+        """Initialise the high-water mark from the database (first sight)"""
+        with self._lock:
+            current = self._latest.get(sensor_id)
+            if current is None or timestamp > current:
+                self._latest[sensor_id] = timestamp
+
+    def subscribe(self, listener: IngestListener):
+        """Register a callback invoked with every newly stored reading"""
+        self._listeners.append(listener)
+
+    def notify(self, reading: dict):
+        for listener in self._listeners:
+            listener(reading)
+
+@lru_cache()
+def get_ingest_guard() -> IngestGuard:
+    """Process-wide ingest guard"""
+    return IngestGuard(capacity=get_settings().ingest_dedup_cache_size)
@@ -0,0 +1,73 @@
+import heapq
+import math
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from services.moisture_forecast import epoch_hours
+
+PRIORITY_RANK = {"critical": 3, "high": 3, "medium": 2, "low": 1}
+_EPSILON = 1e-6
+
+def schedule_irrigation(deficit_l: Sequence[float], priority: Sequence[int],
+                        hours_to_critical: Sequence[float], budget_l: float,
+                        pump_l_per_hour: float, horizon_hours: int) -> Dict[str, np.ndarray]:
+    """
+    Greedy water allocation under a budget and a shared pump capacity
+    Units (sensor plots or zones) are served from a priority queue ordered by
+    priority (higher first), then forecast hours to critical (earliest
+    deadline first), then deficit (largest first). Each unit takes
+    min(deficit, remaining budget) from the earliest hours that still have
+    pump capacity, possibly spanning several hours. O(n log n + horizon).
+
+    Returns per-unit arrays (allocated_l, start_hour, end_hour; hours are -1
+    when nothing was allocated) and hourly_l, the pumped volume per hour.
+    """
+    deficit = np.asarray(deficit_l, dtype=np.float64)
+    n = len(deficit)
+    allocated = np.zeros(n)
+    start = np.full(n, -1, dtype=np.int64)
+    end = np.full(n, -1, dtype=np.int64)
+    capacity = [float(pump_l_per_hour)] * horizon_hours
+
+    queue = [(-int(priority[i]), float(hours_to_critical[i]), -deficit[i], i)
+             for i in range(n) if deficit[i] > _EPSILON]
+    heapq.heapify(queue)
+
+    remaining, hour = float(budget_l), 0
+    while queue and remaining > _EPSILON and hour < horizon_hours:
+        i = heapq.heappop(queue)[3]
+        want = min(deficit[i], remaining)
+        start[i] = hour
+        while want > _EPSILON and hour < horizon_hours:
+            take = min(want, capacity[hour])
+            capacity[hour] -= take
+            want -= take
+            allocated[i] += take
+            end[i] = hour
+            if capacity[hour] <= _EPSILON:
+                hour += 1
+        remaining -= allocated[i]
+
+    return {
+        "allocated_l": allocated,
+        "start_hour": start,
+        "end_hour": end,
+        "hourly_l": pump_l_per_hour - np.array(capacity),
+    }
+
+def priority_rank(last_priority, moisture: float, critical: float, low: float) -> int:
+    """Engine priority of the last recommendation, else derived from moisture"""
+    if last_priority in PRIORITY_RANK:
+        return PRIORITY_RANK[last_priority]
+    if moisture < critical:
+        return 3
+    return 2 if moisture < low else 1
+
+def hours_until(crossings: Sequence[Optional[str]], now: datetime) -> np.ndarray:
+    """Hours from now to each forecast crossing time (inf when none is forecast)"""
+    now_hours = epoch_hours(now)
+    values = np.array([math.inf if c is None else epoch_hours(c) for c in crossings],
+                      dtype=np.float64)
+    return np.maximum(values - now_hours, 0.0)
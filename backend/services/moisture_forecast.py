@@ -0,0 +1,155 @@
+import math
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import get_settings
+
+_EPOCH = datetime(1970, 1, 1)
+
+def epoch_hours(timestamp) -> float:
+    """Hours since 1970-01-01 of a naive UTC datetime or its ISO text"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return (timestamp - _EPOCH).total_seconds() / 3600.0
+
+def _timestamp(hours: float) -> str:
+    return (_EPOCH + timedelta(hours=hours)).isoformat(" ", timespec="seconds")
+
+class ForecastModel:
+    """
+    Time-to-threshold forecast from an exponentially weighted linear trend
+    Per sensor the regression is kept as weighted sums (w, t, m, tt, tm)
+    with time measured in hours relative to the latest reading, so one
+    reading updates it in O(1): decay, shift the origin, add the point.
+    A rise of more than reset_rise points (irrigation, rain) restarts the
+    fit. Crossing times extrapolate the latest moisture along the slope.
+    """
+
+    def __init__(self, critical: float, low: float, tau_hours: float = 12.0,
+                 reset_rise: float = 5.0, min_points: int = 4, max_hours: float = 720.0):
+        self.critical = critical
+        self.low = low
+        self.tau_hours = tau_hours
+        self.reset_rise = reset_rise
+        self.min_points = min_points
+        self.max_hours = max_hours
+
+    def update(self, state: Optional[dict], timestamp, moisture: float) -> dict:
+        """
+        New regression state after one reading (state: a sensor_forecast row or None)
+        A reading older than the fit returns state itself, unchanged.
+        """
+        hours = epoch_hours(timestamp)
+        dt = hours - state["last_hours"] if state else 0.0
+        if dt < 0:
+            # Older than the fit (e.g. late on another worker): left to the batch refit
+            return state
+        if state is None or moisture - state["last_moisture"] > self.reset_rise:
+            sw, st, sm, stt, stm, n = 0.0, 0.0, 0.0, 0.0, 0.0, 0
+        else:
+            decay = math.exp(-dt / self.tau_hours)
+            sw, st, sm = state["sw"] * decay, state["st"] * decay, state["sm"] * decay
+            stt, stm = state["stt"] * decay, state["stm"] * decay
+            # Shift the origin to the new reading (old points move to t - dt)
+            stt, stm = stt - 2 * dt * st + dt * dt * sw, stm - dt * sm
+            st = st - dt * sw
+            n = state["n_points"]
+        return self._with_forecast(
+            sw + 1, st, sm + moisture, stt, stm, n + 1, hours, moisture)
+
+    def _with_forecast(self, sw, st, sm, stt, stm, n, hours, moisture) -> dict:
+        denominator = sw * stt - st * st
+        slope = (sw * stm - st * sm) / denominator if n >= self.min_points and denominator > 1e-9 else None
+        return {
+            "sw": sw, "st": st, "sm": sm, "stt": stt, "stm": stm, "n_points": n,
+            "last_hours": hours, "last_moisture": moisture, "slope_per_hour": slope,
+            "critical_at": self._crossing(hours, moisture, slope, self.critical),
+            "low_at": self._crossing(hours, moisture, slope, self.low),
+        }
+
+    def _crossing(self, hours: float, moisture: float, slope: Optional[float],
+                  threshold: float) -> Optional[str]:
+        if moisture < threshold:
+            return _timestamp(hours)  # already below
+        if slope is None or slope >= 0:
+            return None
+        ahead = (moisture - threshold) / -slope
+        return _timestamp(hours + ahead) if ahead <= self.max_hours else None
+
+    def fit_batch(self, hours: np.ndarray, moisture: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Regression sums for many sensors at once; the same as replaying
+        update() over the same readings.
+        hours/moisture: (S, L) oldest first, NaN-padded on the left.
+        Returns (sw, st, sm, stt, stm, n_points) arrays of shape (S,).
+        """
+        valid = ~np.isnan(moisture)
+        # Points before the last reset (a rise > reset_rise) do not count
+        rise = np.diff(moisture, axis=1, prepend=np.nan) > self.reset_rise
+        last_reset = np.where(rise, np.arange(moisture.shape[1]), 0).max(axis=1)
+        valid &= np.arange(moisture.shape[1])[None, :] >= last_reset[:, None]
+
+        t = np.where(valid, hours - hours[:, -1:], 0.0)
+        w = np.where(valid, np.exp(t / self.tau_hours), 0.0)
+        m = np.where(valid, moisture, 0.0)
+        return (w.sum(axis=1), (w * t).sum(axis=1), (w * m).sum(axis=1),
+                (w * t * t).sum(axis=1), (w * t * m).sum(axis=1), valid.sum(axis=1))
+
+    def fit_histories(self, histories: List[List[dict]]) -> List[dict]:
+        """
+        Batch refit: regression state of each sensor from its recent readings
+        histories: readings per sensor, newest first (get_recent_histories order).
+        """
+        width = max((len(h) for h in histories), default=0)
+        hours = np.full((len(histories), max(width, 1)), np.nan)
+        moisture = np.full_like(hours, np.nan)
+        for i, rows in enumerate(histories):
+            # Right-aligned, oldest first
+            for j, row in enumerate(rows):
+                hours[i, width - 1 - j] = epoch_hours(row["timestamp"])
+                moisture[i, width - 1 - j] = row["soil_moisture"]
+
+        sw, st, sm, stt, stm, n = self.fit_batch(hours, moisture)
+        return [
+            self._with_forecast(float(sw[i]), float(st[i]), float(sm[i]), float(stt[i]),
+                                float(stm[i]), int(n[i]), float(hours[i, -1]),
+                                float(moisture[i, -1]))
+            if rows else None
+            for i, rows in enumerate(histories)
+        ]
+
+    @staticmethod
+    def record(sensor_id: str, state: dict) -> tuple:
+        return (sensor_id, state["sw"], state["st"], state["sm"], state["stt"], state["stm"],
+                state["n_points"], state["last_hours"], state["last_moisture"],
+                state["slope_per_hour"], state["critical_at"], state["low_at"],
+                datetime.utcnow())
+
+UPSERT_SQL = """
+    INSERT INTO sensor_forecast
+        (sensor_id, sw, st, sm, stt, stm, n_points, last_hours, last_moisture,
+         slope_per_hour, critical_at, low_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sensor_id) DO UPDATE SET
+        sw = excluded.sw, st = excluded.st, sm = excluded.sm,
+        stt = excluded.stt, stm = excluded.stm, n_points = excluded.n_points,
+        last_hours = excluded.last_hours, last_moisture = excluded.last_moisture,
+        slope_per_hour = excluded.slope_per_hour, critical_at = excluded.critical_at,
+        low_at = excluded.low_at, updated_at = excluded.updated_at
+    WHERE excluded.last_hours >= sensor_forecast.last_hours
+"""
+
+@lru_cache()
+def get_forecast_model() -> ForecastModel:
+    settings = get_settings()
+    return ForecastModel(
+        critical=settings.soil_moisture_critical,
+        low=settings.soil_moisture_low,
+        tau_hours=settings.forecast_tau_hours,
+        reset_rise=settings.forecast_reset_rise,
+        min_points=settings.forecast_min_points,
+        max_hours=settings.forecast_max_hours,
+    )
@@ -0,0 +1,98 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+MAX_GAP_HOURS = 6.0  # longer gaps between readings are not used for fitting
+
+def evaporation_factor(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+    """
+    Relative drying speed vs. 25°C / 60% humidity (1.0)
+    Simple empirical scaling: +4% per °C above 25, +1% per point of humidity below 60.
+    """
+    return (np.clip(1 + 0.04 * (temperature - 25), 0.2, None)
+            * np.clip(1 + 0.01 * (60 - humidity), 0.2, None))
+
+def _epoch_hours(timestamp) -> float:
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return (timestamp - datetime(1970, 1, 1)).total_seconds() / 3600.0
+
+def fit_drying_rates(histories: Sequence[List[dict]], default_rate: float) -> np.ndarray:
+    """
+    Base drying rate (% moisture per hour at evaporation factor 1) per sensor
+    histories: readings per sensor, newest first (get_recent_histories order).
+    Only falling steps count, so irrigation jumps don't mask the drying rate;
+    sensors with too little history get default_rate.
+    """
+    n, width = len(histories), max((len(h) for h in histories), default=0)
+    columns = np.full((4, n, width), np.nan)  # hours, moisture, temperature, humidity
+    for i, rows in enumerate(histories):
+        for j, row in enumerate(reversed(rows)):
+            columns[:, i, j] = (_epoch_hours(row["timestamp"]), row["soil_moisture"],
+                                row["temperature"], row["humidity"])
+    if width < 2:
+        return np.full(n, default_rate)
+
+    hours, moisture, temperature, humidity = columns
+    dt = np.diff(hours, axis=1)
+    drop = -np.diff(moisture, axis=1)
+    factor = evaporation_factor((temperature[:, 1:] + temperature[:, :-1]) / 2,
+                                (humidity[:, 1:] + humidity[:, :-1]) / 2)
+    drying = (drop >= 0) & (dt > 0) & (dt <= MAX_GAP_HOURS)
+
+    lost = np.where(drying, drop, 0.0).sum(axis=1)
+    exposure = np.where(drying, factor * dt, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = np.where(exposure > 1e-9, lost / exposure, default_rate)
+    return rates
+
+def simulate(moisture: np.ndarray, temperature: np.ndarray, humidity: np.ndarray,
+             rates: np.ndarray, litres_per_point: np.ndarray, irrigation_l: np.ndarray,
+             temperature_offset: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Hourly soil-moisture trajectories for every (plan, sensor) pair
+    moisture/temperature/humidity/rates/litres_per_point: (S,) per sensor
+    (litres_per_point: water raising the root zone by one moisture point).
+    irrigation_l: (P, N) litres per plot at each hour, or (P, S, N) per sensor.
+    temperature_offset: (P,) °C added to each sensor's temperature per plan.
+    Returns (P, S, N + 1) including the starting moisture. Each hour dries
+    the soil, then adds that hour's water, clipped to 0-100%.
+    """
+    irrigation_l = np.asarray(irrigation_l, dtype=np.float64)
+    if irrigation_l.ndim == 2:
+        irrigation_l = irrigation_l[:, None, :]
+    plans, hours = irrigation_l.shape[0], irrigation_l.shape[-1]
+    offset = np.zeros(plans) if temperature_offset is None else np.asarray(temperature_offset)
+
+    hourly_loss = rates[None, :] * evaporation_factor(
+        temperature[None, :] + offset[:, None], humidity[None, :])  # (P, S)
+    # Time-major buffers so each hourly step works on contiguous (P, S) slices
+    added = np.ascontiguousarray(
+        np.moveaxis(irrigation_l / litres_per_point[None, :, None], -1, 0))  # (N, P, S|1)
+
+    trajectory = np.empty((hours + 1, plans, len(moisture)))
+    trajectory[0] = moisture[None, :]
+    for h in range(hours):
+        step = trajectory[h + 1]
+        np.subtract(trajectory[h], hourly_loss, out=step)
+        step += added[h]
+        np.clip(step, 0.0, 100.0, out=step)
+    return np.moveaxis(trajectory, 0, -1)
+
+def summarize(trajectory: np.ndarray, irrigation_l: np.ndarray,
+              critical: float, excess: float) -> Dict[str, np.ndarray]:
+    """Per (plan, sensor) outcome arrays of a simulate() result"""
+    below = trajectory[:, :, 1:] < critical
+    first_critical = np.where(below.any(axis=2), below.argmax(axis=2) + 1, -1)
+    irrigation_l = np.asarray(irrigation_l, dtype=np.float64)
+    water = irrigation_l.sum(axis=-1)
+    return {
+        "final_moisture": trajectory[:, :, -1],
+        "min_moisture": trajectory.min(axis=2),
+        "hours_below_critical": below.sum(axis=2),
+        "hours_above_excess": (trajectory[:, :, 1:] > excess).sum(axis=2),
+        "hours_to_critical": first_critical,
+        "water_l": np.broadcast_to(water if water.ndim == 2 else water[:, None],
+                                   trajectory.shape[:2]),
+    }
@@ -0,0 +1,240 @@
+import heapq
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import get_settings
+from services.anomaly_detector import epoch_seconds
+from utils.metrics import REGISTRY, SENSOR_HEALTH_EVENTS
+
+OFFLINE, BACK_ONLINE = "offline", "back_online"
+
+# sensor ids -> newest stored timestamp of each (ids without data absent)
+LastSeenLookup = Callable[[List[str]], Dict[str, object]]
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _text(seconds: float) -> str:
+    return (_EPOCH + timedelta(seconds=seconds)).isoformat(" ", timespec="seconds")
+
+def _duration(seconds: float) -> str:
+    if seconds >= 5400:
+        return f"{seconds / 3600:.1f}h"
+    return f"{max(seconds, 60) / 60:.0f} min"
+
+class _Sensor:
+    __slots__ = ("last_seen", "interval", "deadline", "offline", "recovered_after")
+
+    def __init__(self, last_seen: float, interval: float):
+        self.last_seen = last_seen
+        self.interval = interval  # learned reporting cadence (EWMA of gaps)
+        self.deadline = 0.0  # offline if nothing is heard by then
+        self.offline = False
+        self.recovered_after: Optional[float] = None  # silence ended by the last reading
+
+class SensorHealthTracker:
+    """
+    Last-seen tracker that finds sensors which stopped reporting
+    Every reading pushes the sensor's deadline (last seen + missed_reports
+    expected intervals, at least min_silence) onto a min-heap, so a check
+    only pops the deadlines that have passed: O(log n) per reading and per
+    expiry, nothing proportional to the number of sensors or readings.
+    Outdated heap entries are skipped when popped (lazy deletion) and the
+    heap is rebuilt when they outnumber the live ones.
+    Expired sensors are confirmed against the database (lookup) before
+    going offline, as readings may have been ingested by another worker.
+    Status changes are kept in a bounded event log and surface as alerts
+    in the sensor's recommendations.
+    """
+
+    def __init__(self, expected_interval: float = 300.0, missed_reports: float = 3.0,
+                 min_silence: float = 900.0, event_log_size: int = 1000,
+                 alpha: float = 0.2, clock: Callable[[], float] = time.time):
+        self.expected_interval = expected_interval
+        self.missed_reports = missed_reports
+        self.min_silence = min_silence
+        self.alpha = alpha
+        self.clock = clock
+        self.checked_at: Optional[float] = None
+        self._sensors: Dict[str, _Sensor] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._offline = set()
+        self._events = deque(maxlen=event_log_size)
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._sensors)
+
+    @property
+    def offline_count(self) -> int:
+        return len(self._offline)
+
+    def _schedule(self, sensor_id: str, state: _Sensor):
+        state.deadline = state.last_seen + max(self.min_silence,
+                                               self.missed_reports * state.interval)
+        heapq.heappush(self._heap, (state.deadline, sensor_id))
+        if len(self._heap) > 2 * len(self._sensors) + 1024:
+            self._heap = [(s.deadline, i) for i, s in self._sensors.items() if not s.offline]
+            heapq.heapify(self._heap)
+
+    def _heard(self, sensor_id: str, seen: float, now: float) -> Optional[dict]:
+        """Record a report at `seen` (lock held); returns a back-online event"""
+        seen = min(seen, now)  # a skewed device clock can't postpone detection
+        state = self._sensors.get(sensor_id)
+        if state is None:
+            state = self._sensors[sensor_id] = _Sensor(seen, self.expected_interval)
+            self._schedule(sensor_id, state)
+            return None
+        if seen <= state.last_seen:
+            return None  # late or replayed reading
+
+        gap = seen - state.last_seen
+        event = None
+        if state.offline:
+            state.offline = False
+            self._offline.discard(sensor_id)
+            state.recovered_after = gap
+            state.last_seen = seen
+            event = self._event(sensor_id, BACK_ONLINE, state, now, silent=gap)
+        else:
+            state.interval += self.alpha * (gap - state.interval)
+            state.recovered_after = None
+            state.last_seen = seen
+        self._schedule(sensor_id, state)
+        return event
+
+    def _event(self, sensor_id: str, kind: str, state: _Sensor, now: float,
+               silent: float) -> dict:
+        event = {"sensor_id": sensor_id, "event": kind, "at": _text(now),
+                 "last_seen": _text(state.last_seen), "silent_seconds": round(silent),
+                 "expected_interval_seconds": round(state.interval)}
+        self._events.append(event)
+        SENSOR_HEALTH_EVENTS.inc(event=kind)
+        return event
+
+    def observe_reading(self, reading: dict):
+        """Ingest listener: the sensor just reported"""
+        seen = epoch_seconds(reading["timestamp"])
+        with self._lock:
+            self._heard(reading["sensor_id"], seen, self.clock())
+
+    def seed(self, last_seen: Iterable[Tuple[str, object]]):
+        """
+        Start tracking sensors from their stored newest timestamps (startup)
+        Sensors already past their deadline start offline, without an event.
+        """
+        now = self.clock()
+        with self._lock:
+            for sensor_id, timestamp in last_seen:
+                self._heard(sensor_id, epoch_seconds(timestamp), now)
+                state = self._sensors[sensor_id]
+                if not state.offline and state.deadline <= now:
+                    state.offline = True
+                    self._offline.add(sensor_id)
+
+    def check(self, lookup: Optional[LastSeenLookup] = None) -> List[dict]:
+        """
+        Take sensors whose deadline passed offline; returns the new events
+        Offline sensors are looked up too: their next reading may have been
+        ingested by another worker, which this one would otherwise never hear.
+        """
+        now = self.clock()
+        with self._lock:
+            self.checked_at = now
+            expired = []
+            while self._heap and self._heap[0][0] <= now:
+                deadline, sensor_id = heapq.heappop(self._heap)
+                state = self._sensors[sensor_id]
+                if state.deadline == deadline and not state.offline:
+                    expired.append(sensor_id)
+            offline = list(self._offline) if lookup else []
+        if not expired and not offline:
+            return []
+
+        stored = lookup(expired + offline) if lookup else {}
+        events = []
+        with self._lock:
+            for sensor_id in offline:
+                if sensor_id in stored:
+                    event = self._heard(sensor_id, epoch_seconds(stored[sensor_id]), now)
+                    if event:
+                        events.append(event)
+            for sensor_id in expired:
+                state = self._sensors[sensor_id]
+                if sensor_id in stored:
+                    self._heard(sensor_id, epoch_seconds(stored[sensor_id]), now)
+                if state.offline or state.deadline > now:
+                    continue  # heard from meanwhile (here or in another worker)
+                state.offline = True
+                self._offline.add(sensor_id)
+                events.append(self._event(sensor_id, OFFLINE, state, now,
+                                          silent=now - state.last_seen))
+        return events
+
+    def _describe(self, sensor_id: str, state: _Sensor, now: float) -> dict:
+        return {"sensor_id": sensor_id,
+                "status": OFFLINE if state.offline else "online",
+                "last_seen": _text(state.last_seen),
+                "silent_seconds": round(max(0.0, now - state.last_seen)),
+                "expected_interval_seconds": round(state.interval),
+                "offline_after": _text(state.deadline)}
+
+    def status(self, sensor_id: str) -> Optional[dict]:
+        with self._lock:
+            state = self._sensors.get(sensor_id)
+            return self._describe(sensor_id, state, self.clock()) if state else None
+
+    def summary(self, limit: int = 100, events: int = 50) -> dict:
+        """Counts, the longest-silent offline sensors and the newest events"""
+        now = self.clock()
+        with self._lock:
+            offline = heapq.nsmallest(limit, self._offline,
+                                      key=lambda s: self._sensors[s].last_seen)
+            return {
+                "checked_at": _text(self.checked_at) if self.checked_at else None,
+                "sensors": len(self._sensors),
+                "online": len(self._sensors) - len(self._offline),
+                "offline": len(self._offline),
+                "offline_sensors": [self._describe(s, self._sensors[s], now) for s in offline],
+                "events": list(self._events)[::-1][:events],
+            }
+
+    def alerts_for(self, sensor_id: str) -> List[str]:
+        """Alerts for the sensor's recommendations (offline now / just back)"""
+        with self._lock:
+            state = self._sensors.get(sensor_id)
+            if state is None:
+                return []
+            if state.offline:
+                silent = self.clock() - state.last_seen
+                return [f"📡 SENSOR OFFLINE: no reading for {_duration(silent)} "
+                        f"(expected every {_duration(state.interval)}). "
+                        f"Recommendation is based on stale data."]
+            if state.recovered_after is not None:
+                return [f"📶 BACK ONLINE: first reading after {_duration(state.recovered_after)} "
+                        f"of silence. Check whether irrigation was missed."]
+            return []
+
+@lru_cache()
+def get_sensor_health() -> SensorHealthTracker:
+    """Process-wide tracker"""
+    settings = get_settings()
+    return SensorHealthTracker(
+        expected_interval=settings.health_expected_interval_seconds,
+        missed_reports=settings.health_missed_reports,
+        min_silence=settings.health_min_offline_seconds,
+        event_log_size=settings.health_event_log_size,
+    )
+
+def _offline_count() -> float:
+    if get_sensor_health.cache_info().currsize == 0:
+        return 0.0
+    return float(get_sensor_health().offline_count)
+
+SENSORS_OFFLINE = REGISTRY.gauge(
+    "agri_sensors_offline",
+    "Tracked sensors currently considered offline",
+    callback=_offline_count)
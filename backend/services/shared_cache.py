@@ -0,0 +1,134 @@
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+from config.settings import get_settings
+from utils.metrics import CACHE_REQUESTS
+
+class SharedCache:
+    """
+    Response cache shared by every worker process
+    Backed by a small SQLite file in WAL mode: all workers read and write the
+    same entries, so invalidating a sensor in one worker is immediately
+    visible to the others (no stale per-process copies).
+    Entries are tagged with their sensor_id for targeted invalidation.
+    Each sensor also has a generation, bumped on invalidation: a value
+    computed before an invalidation (in any worker) is refused by set().
+    """
+
+    PURGE_EVERY = 1000  # sets between sweeps of expired entries
+
+    def __init__(self, path: str, ttl_seconds: float = 300.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._sets = 0
+        self._local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                sensor_id TEXT,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cache_sensor
+            ON cache_entries(sensor_id)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_generations (
+                sensor_id TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit, each statement is atomic
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            self.misses += 1
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        self.hits += 1
+        CACHE_REQUESTS.inc(result="hit")
+        return json.loads(row[0])
+
+    def generation(self, sensor_id: str) -> int:
+        """Current generation of a sensor; read it before computing a value"""
+        row = self._conn().execute(
+            "SELECT generation FROM cache_generations WHERE sensor_id = ?", (sensor_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set(self, key: str, value: Any, sensor_id: Optional[str] = None,
+            ttl_seconds: Optional[float] = None, generation: Optional[int] = None) -> bool:
+        """
+        Store a value; with a generation, only if the sensor has not been
+        invalidated since (returns False when the value was refused)
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        params = (key, sensor_id, json.dumps(value, default=str), time.time() + ttl)
+        if generation is None:
+            cursor = self._conn().execute("""
+                INSERT OR REPLACE INTO cache_entries (key, sensor_id, value, expires_at)
+                VALUES (?, ?, ?, ?)
+            """, params)
+        else:
+            # Check and write in one statement so an invalidation can't slip between
+            cursor = self._conn().execute("""
+                INSERT OR REPLACE INTO cache_entries (key, sensor_id, value, expires_at)
+                SELECT ?, ?, ?, ?
+                WHERE COALESCE((SELECT generation FROM cache_generations
+                                WHERE sensor_id = ?), 0) = ?
+            """, params + (sensor_id, generation))
+        self._sets += 1
+        if self._sets % self.PURGE_EVERY == 0:
+            self.purge_expired()
+        return cursor.rowcount > 0
+
+    def invalidate_sensor(self, sensor_id: str) -> int:
+        """Drop every entry derived from a sensor's data (all workers)"""
+        conn = self._conn()
+        # Bump first: sets still in flight with the old generation are refused
+        conn.execute("""
+            INSERT INTO cache_generations (sensor_id, generation) VALUES (?, 1)
+            ON CONFLICT(sensor_id) DO UPDATE SET generation = generation + 1
+        """, (sensor_id,))
+        cursor = conn.execute(
+            "DELETE FROM cache_entries WHERE sensor_id = ?", (sensor_id,)
+        )
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        cursor = self._conn().execute(
+            "DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache_entries")
+
+@lru_cache()
+def get_shared_cache() -> SharedCache:
+    """Process-wide handle on the shared cache"""
+    settings = get_settings()
+    return SharedCache(settings.cache_path, settings.cache_ttl_seconds)
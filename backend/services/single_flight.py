@@ -0,0 +1,68 @@
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.metrics import SINGLE_FLIGHT_REQUESTS
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution
+    The first caller (leader) runs the function; callers arriving while it
+    is in flight wait and receive the same result, or the same exception.
+    Nothing is kept once the call finishes, so this is not a cache: a call
+    starting afterwards runs again. Results are shared objects and must not
+    be mutated by callers. Per process (endpoints run in the threadpool).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], label: str = "") -> Any:
+        """fn()'s result, computed once for every concurrent caller with this key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.followers += 1
+                self.coalesced += 1
+        SINGLE_FLIGHT_REQUESTS.inc(route=label, result="executed" if leader else "coalesced")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    """Process-wide single-flight table shared by all routes"""
+    return SingleFlight()
@@ -1,21 +1,46 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from typing import Dict, List, Optional
 from config.settings import get_settings
 from datetime import datetime
 
 class IrrigationStrategy(ABC):
-    """Abstract base class for irrigation strategies"""
+    """
+    Abstract base class for irrigation strategies
+    Subclasses set settings, plot_area_m2 and root_depth_m.
+    """
     
     @abstractmethod
     def calculate(self, reading: dict, history: List[dict]) -> dict:
         """Calculate irrigation recommendation"""
         pass
+    
+    @property
+    def target_moisture(self) -> float:
+        """Moisture the crop is watered up to"""
+        return self.settings.soil_moisture_optimal_min
+    
+    def required_volume_l(self, current: float, temp: float) -> float:
+        """Litres to bring the plot up to the target moisture (0 when already there)"""
+        return max(0.0, self._calculate_amount(self.target_moisture, current, temp))
+    
+    def _calculate_amount(self, target: float, current: float, temp: float) -> float:
+        deficit = (target - current) / 100
+        base_amount = self.plot_area_m2 * self.root_depth_m * deficit * 1000
+        temp_factor = 1.0 + max(0, (temp - 25) * 0.02)
+        return round(base_amount * temp_factor, 1)
 
 class TomatoIrrigationStrategy(IrrigationStrategy):
-    """Irrigation strategy specific to tomato crops"""
+    """
+    Irrigation strategy specific to tomato crops
+    Plot geometry comes from the sensor's metadata; the settings defaults
+    apply to sensors that have none.
+    """
     
-    def __init__(self):
+    def __init__(self, plot_area_m2: Optional[float] = None,
+                 root_depth_m: Optional[float] = None):
         self.settings = get_settings()
+        self.plot_area_m2 = plot_area_m2 or self.settings.default_plot_area_m2
+        self.root_depth_m = root_depth_m or self.settings.root_depth_m
     
     def calculate(self, reading: dict, history: List[dict]) -> dict:
         moisture = reading['soil_moisture']
@@ -42,20 +67,21 @@ class TomatoIrrigationStrategy(IrrigationStrategy):
             'timing': 'NOW',
             'next_check_hours': 4
         }
-    
-    def _calculate_amount(self, target: float, current: float, temp: float) -> float:
-        deficit = (target - current) / 100
-        base_amount = self.settings.default_plot_area_m2 * self.settings.root_depth_m * deficit * 1000
-        temp_factor = 1.0 + max(0, (temp - 25) * 0.02)
-        return round(base_amount * temp_factor, 1)
 
 class LettuceIrrigationStrategy(IrrigationStrategy):
     """Different thresholds for lettuce"""
     
-    def __init__(self):
+    def __init__(self, plot_area_m2: Optional[float] = None,
+                 root_depth_m: Optional[float] = None):
         self.settings = get_settings()
+        self.plot_area_m2 = plot_area_m2 or self.settings.default_plot_area_m2
+        self.root_depth_m = root_depth_m or self.settings.root_depth_m
         self.moisture_low = 50.0
         self.moisture_optimal_min = 70.0
     
+    @property
+    def target_moisture(self) -> float:
+        return self.moisture_optimal_min
+    
     def calculate(self, reading: dict, history: List[dict]) -> dict:
         pass  # Lettuce-specific logic
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from services.strategies.irrigation_strategy import (
     TomatoIrrigationStrategy,
     LettuceIrrigationStrategy,
@@ -13,9 +15,20 @@ class StrategyFactory:
     }
     
     @classmethod
-    def get_irrigation_strategy(cls, crop_type: str) -> IrrigationStrategy:
+    def get_irrigation_strategy(cls, crop_type: str, **plot) -> IrrigationStrategy:
+        """plot: plot_area_m2 / root_depth_m for strategies that size water volumes"""
         strategy_class = cls._irrigation_strategies.get(
             crop_type.lower(),
             TomatoIrrigationStrategy
         )
-        return strategy_class()
+        return strategy_class(**plot)
+    
+    @classmethod
+    def for_sensor(cls, metadata: Optional[dict]) -> IrrigationStrategy:
+        """Strategy for a sensor's metadata row (settings defaults when it has none)"""
+        metadata = metadata or {}
+        return cls.get_irrigation_strategy(
+            metadata.get("crop_type") or "tomato",
+            plot_area_m2=metadata.get("plot_area_m2"),
+            root_depth_m=metadata.get("root_depth_m"),
+        )
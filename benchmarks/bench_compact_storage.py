@@ -0,0 +1,137 @@
+"""
+Row vs compact storage layout: database size and scan speed
+
+Generates --sensors x --readings readings (datagen.py) in the row layout,
+copies the file and converts the copy with the compact-readings migration
+(chunked, no pauses), VACUUMs both and compares:
+- file size and bytes per reading, projected to --project rows
+- full scans: an aggregate over every reading in SQL, and the backtest's
+  id-ordered stream of metrics into NumPy
+- per-sensor reads through DataService: history, window stats, chart
+
+Both databases are read with a warm page cache (best of --repeat runs),
+which shows the decoding cost. Cold reads are I/O bound and scale with
+the file size. That is not measured here, since the OS cache can't be
+dropped portably.
+
+Usage:
+    python benchmarks/bench_compact_storage.py --sensors 1000 --readings 2000
+    python benchmarks/bench_compact_storage.py --sensors 20000 --readings 5000   # 100M rows
+"""
+import argparse
+import json
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from common import Stopwatch, add_project_paths, write_results
+from datagen import generate
+
+add_project_paths()
+
+import database  # noqa: E402
+from config.settings import get_settings  # noqa: E402
+from migrations import migrate  # noqa: E402
+from services.backtesting import run_backtest  # noqa: E402
+from services.compact_storage import readings_layout  # noqa: E402
+from services.data_service import DataService  # noqa: E402
+
+END = datetime(2026, 1, 1)
+
+def best_seconds(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        with Stopwatch() as watch:
+            fn()
+        timings.append(watch.elapsed)
+    return min(timings)
+
+def full_scan(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        layout = readings_layout(conn)
+        metrics = ", ".join(f"AVG({layout.metric(m)})" for m in DataService.METRICS)
+        return conn.execute(f"SELECT COUNT(*), {metrics} FROM {layout.values_source}").fetchone()
+    finally:
+        conn.close()
+
+def measure(path: str, rows: int, project: int, repeat: int) -> dict:
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    size = Path(path).stat().st_size
+    result = {"bytes": size, "bytes_per_reading": round(size / rows, 1),
+              "projected_gb": round(size / rows * project / 1e9, 2), "page_size": page_size}
+
+    scan_s = best_seconds(lambda: full_scan(path), repeat)
+    stream_s = best_seconds(lambda: run_backtest(path, {}, workers=1), repeat)
+    result.update({
+        "scan_aggregate_s": round(scan_s, 3),
+        "scan_rows_per_second": round(rows / scan_s),
+        "scan_projected_s": round(scan_s * project / rows, 1),
+        "backtest_stream_s": round(stream_s, 3),
+        "backtest_rows_per_second": round(rows / stream_s),
+    })
+
+    database.DATABASE_URL = path
+    with database.get_db() as conn:
+        service = DataService(conn, hot=None)
+        service.hot = None
+        sensor = "FIELD_000_07"
+        day, month = END - timedelta(days=1), END - timedelta(days=30)
+        cases = {
+            "history_100_ms": lambda: service.get_sensor_history(sensor, 100),
+            "stats_all_ms": lambda: service.get_sensor_stats(sensor),
+            "stats_day_ms": lambda: service.get_sensor_stats(sensor, start=day, end=END),
+            "chart_500_ms": lambda: service.get_sensor_history_downsampled(sensor, 500,
+                                                                           start=month),
+        }
+        for name, case in cases.items():
+            result[name] = round(best_seconds(case, repeat) * 1000, 3)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--readings", type=int, default=2000, help="per sensor")
+    parser.add_argument("--interval", type=int, default=15, help="minutes between readings")
+    parser.add_argument("--project", type=int, default=100_000_000,
+                        help="readings to project size and scan time to")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="conversion chunk size")
+    parser.add_argument("--dir", help="scratch directory (default: a temporary one)")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as scratch:
+        rows_path, compact_path = str(Path(scratch) / "rows.db"), str(Path(scratch) / "compact.db")
+        generated = generate(rows_path, args.sensors, args.readings, args.interval, end=END)
+        shutil.copyfile(rows_path, compact_path)
+        get_settings().compact_storage = True
+        with Stopwatch() as watch:
+            migrate(compact_path, chunk_rows=args.chunk_rows, pause_seconds=0)
+
+        rows = generated["rows"]
+        results = {"rows": {"count": rows},
+                   "convert": {"seconds": round(watch.elapsed, 3),
+                               "rows_per_second": round(rows / watch.elapsed)}}
+        results["row_layout"] = measure(rows_path, rows, args.project, args.repeat)
+        results["compact_layout"] = measure(compact_path, rows, args.project, args.repeat)
+        if full_scan(rows_path)[0] != full_scan(compact_path)[0]:
+            raise SystemExit("Layouts hold different reading counts")
+
+    row, compact = results["row_layout"], results["compact_layout"]
+    results["ratio"] = {name: round(row[name] / compact[name], 2)
+                        for name in ("bytes", "scan_aggregate_s", "backtest_stream_s",
+                                     "history_100_ms", "stats_all_ms", "stats_day_ms",
+                                     "chart_500_ms")}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        write_results(args.output, "compact_storage", results, vars(args))
+
+if __name__ == "__main__":
+    main()
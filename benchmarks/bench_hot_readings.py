@@ -0,0 +1,99 @@
+"""
+Hot readings tier vs SQLite
+
+Fills a scratch database with --sensors sensors of --readings readings,
+warms the in-memory tier from it and times the recent-history reads both
+ways: get_latest_reading, get_sensor_history at several limits, and a
+batched get_recent_histories. Answers are checked to be identical. Exits
+non-zero if memory is slower than SQLite for histories of 10+ readings,
+so it can gate CI.
+
+Usage:
+    python benchmarks/bench_hot_readings.py --sensors 1000 --readings 300
+"""
+import argparse
+import json
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from common import add_project_paths, write_results
+
+add_project_paths()
+
+import database  # noqa: E402
+from services.data_service import DataService  # noqa: E402
+from services.hot_readings import HotReadings  # noqa: E402
+
+LIMITS = (1, 10, 50, 200)
+
+def fill(conn, sensors: int, readings: int):
+    start = datetime(2026, 1, 1)
+    conn.executemany("""
+        INSERT INTO sensor_readings
+            (sensor_id, soil_moisture, temperature, humidity, timestamp, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, ((f"S{s:05d}", round(30 + (s + i) % 50 * 0.7, 1), 18 + i % 12 * 0.5, 55.5,
+           (start + timedelta(minutes=5 * i)).isoformat(" "), "2026-01-01 00:00:00")
+          for s in range(sensors) for i in range(readings)))
+    conn.execute("""
+        INSERT INTO sensor_latest
+            (sensor_id, reading_id, soil_moisture, temperature, humidity, timestamp)
+        SELECT sensor_id, id, soil_moisture, temperature, humidity, MAX(timestamp)
+        FROM sensor_readings GROUP BY sensor_id
+    """)
+
+def per_call_us(fn, number: int) -> float:
+    # Best of five to keep scheduler noise out of the comparison
+    return round(min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--readings", type=int, default=300, help="per sensor")
+    parser.add_argument("--per-sensor", type=int, default=256, help="ring size")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        database.DATABASE_URL = str(Path(scratch) / "agri.db")
+        database.init_db()
+        with database.get_db() as conn:
+            fill(conn, args.sensors, args.readings)
+        with database.get_db() as conn:
+            hot = HotReadings(args.per_sensor, args.sensors)
+            memory = DataService(conn, hot=hot)
+            sqlite = DataService(conn, hot=HotReadings(1, 1))
+            warm_s = per_call_us(memory.warm_hot_readings, 1) / 1e6
+            sensor_id, batch = "S00007", [f"S{s:05d}" for s in range(min(100, args.sensors))]
+
+            results = {"warm": {"seconds": round(warm_s, 3), "sensors": len(hot),
+                                "tier_mb": round(hot.nbytes / 1e6, 2)}}
+            cases = {"latest": lambda s: s.get_latest_reading(sensor_id),
+                     "batch100_limit10": lambda s: s.get_recent_histories(batch, 10)}
+            cases.update({f"history_limit{limit}": (lambda s, limit=limit:
+                                                    s.get_sensor_history(sensor_id, limit))
+                          for limit in LIMITS})
+            slower = []
+            for name, case in cases.items():
+                if case(memory) != case(sqlite):
+                    sys.exit(f"{name}: memory and SQLite answers differ")
+                hot_us = per_call_us(lambda: case(memory), args.calls)
+                sqlite_us = per_call_us(lambda: case(sqlite), args.calls)
+                results[name] = {"hot_us": hot_us, "sqlite_us": sqlite_us,
+                                 "speedup": round(sqlite_us / hot_us, 2)}
+                if name not in ("latest", "history_limit1") and hot_us > sqlite_us:
+                    slower.append(name)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        write_results(args.output, "hot_readings", results, vars(args))
+    if slower:
+        sys.exit(f"Hot tier slower than SQLite for: {', '.join(slower)}")
+
+if __name__ == "__main__":
+    main()
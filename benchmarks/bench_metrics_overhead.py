@@ -0,0 +1,84 @@
+"""
+Instrumentation overhead
+
+Measures (1) the raw cost of recording a histogram observation and
+(2) the per-request cost of MetricsMiddleware, by calling a minimal ASGI
+app directly with and without the middleware (no sockets, no event-loop
+scheduling noise). Exits non-zero if the middleware costs more than
+--max-overhead-us per request, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_metrics_overhead.py --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from common import add_project_paths, write_results
+
+add_project_paths()
+
+from middleware.metrics import MetricsMiddleware  # noqa: E402
+from utils.metrics import Histogram  # noqa: E402
+
+class _Route:
+    path = "/api/sensors/current/{sensor_id}"
+
+async def _plain_app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+async def _send(message):
+    pass
+
+def _scope():
+    return {"type": "http", "method": "GET", "path": "/api/sensors/current/S1"}
+
+async def _time_app(app, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(_scope(), _receive, _send)
+    return (time.perf_counter() - started) / requests
+
+def bench_observe(samples: int) -> float:
+    histogram = Histogram("bench_seconds", "bench", ["route"])
+    started = time.perf_counter()
+    for i in range(samples):
+        histogram.observe(0.003, route="/api/x")
+    return (time.perf_counter() - started) / samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--max-overhead-us", type=float, default=50.0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    observe_s = bench_observe(args.requests * 5)
+    # Best of three to keep scheduler noise out of the comparison
+    bare = min(asyncio.run(_time_app(_plain_app, args.requests)) for _ in range(3))
+    instrumented = min(asyncio.run(_time_app(MetricsMiddleware(_plain_app), args.requests))
+                       for _ in range(3))
+    overhead_us = (instrumented - bare) * 1e6
+
+    results = {"metrics_overhead": {
+        "histogram_observe_us": round(observe_s * 1e6, 3),
+        "request_bare_us": round(bare * 1e6, 3),
+        "request_instrumented_us": round(instrumented * 1e6, 3),
+        "middleware_overhead_us": round(overhead_us, 3),
+    }}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        write_results(args.output, "metrics_overhead", results, vars(args))
+    if overhead_us > args.max_overhead_us:
+        sys.exit(f"Middleware overhead {overhead_us:.1f}us exceeds {args.max_overhead_us}us")
+
+if __name__ == "__main__":
+    main()
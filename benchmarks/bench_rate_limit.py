@@ -0,0 +1,100 @@
+"""
+Rate limiting overhead
+
+Measures (1) one token-bucket check against a table of --keys active
+clients, (2) a client check including API key validation, and (3) the
+per-request cost of RateLimitMiddleware, by calling a minimal ASGI app
+directly with and without it. Exits non-zero if the middleware costs more
+than --max-overhead-us per request, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_rate_limit.py --requests 20000 --keys 100000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from common import add_project_paths, write_results
+
+add_project_paths()
+
+from middleware import rate_limit  # noqa: E402
+from middleware.rate_limit import RateLimitMiddleware, RateLimiter, TokenBuckets  # noqa: E402
+
+async def _plain_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+async def _send(message):
+    pass
+
+def _scope(i: int):
+    return {"type": "http", "method": "GET", "path": "/api/sensors/current/S1",
+            "headers": [(b"host", b"localhost"), (b"x-api-key", b"gateway-%d" % (i % 100))],
+            "client": ("10.0.0.1", 5000)}
+
+async def _time_app(app, requests: int) -> float:
+    scopes = [_scope(i) for i in range(requests)]
+    started = time.perf_counter()
+    for scope in scopes:
+        await app(scope, _receive, _send)
+    return (time.perf_counter() - started) / requests
+
+def bench_buckets(requests: int, keys: int) -> float:
+    buckets = TokenBuckets(rate=1e9, burst=1e9)
+    for i in range(keys):
+        buckets.acquire(i)
+    started = time.perf_counter()
+    for i in range(requests):
+        buckets.acquire(i % keys)
+    return (time.perf_counter() - started) / requests
+
+def bench_client_check(limiter: RateLimiter, requests: int) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        limiter.check_client(f"gateway-{i % 100}", "10.0.0.1")
+    return (time.perf_counter() - started) / requests
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=100000, help="active buckets in the table")
+    parser.add_argument("--max-overhead-us", type=float, default=50.0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    # Limits high enough that every request is allowed (the common path)
+    limiter = RateLimiter([f"gateway-{i}" for i in range(100)], client_rate=1e9,
+                          client_burst=1e9, sensor_rate=1e9, sensor_burst=1e9)
+    rate_limit.get_rate_limiter = lambda: limiter
+
+    bucket_s = bench_buckets(args.requests, args.keys)
+    client_s = bench_client_check(limiter, args.requests)
+    # Best of three to keep scheduler noise out of the comparison
+    bare = min(asyncio.run(_time_app(_plain_app, args.requests)) for _ in range(3))
+    limited = min(asyncio.run(_time_app(RateLimitMiddleware(_plain_app), args.requests))
+                  for _ in range(3))
+    overhead_us = (limited - bare) * 1e6
+
+    results = {"rate_limit_overhead": {
+        "bucket_check_us": round(bucket_s * 1e6, 3),
+        "client_check_us": round(client_s * 1e6, 3),
+        "request_bare_us": round(bare * 1e6, 3),
+        "request_limited_us": round(limited * 1e6, 3),
+        "middleware_overhead_us": round(overhead_us, 3),
+        "buckets": args.keys,
+    }}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        write_results(args.output, "rate_limit_overhead", results, vars(args))
+    if overhead_us > args.max_overhead_us:
+        sys.exit(f"Middleware overhead {overhead_us:.1f}us exceeds {args.max_overhead_us}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Irrigation scheduler scaling
+
+Times schedule_irrigation on synthetic farms (random deficits, priorities
+and forecast deadlines) of increasing size. Exits non-zero if the largest
+farm takes longer than --max-seconds, so it can gate CI.
+
+Usage:
+    python benchmarks/bench_scheduler.py --units 1000 10000 100000
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from common import add_project_paths, write_results
+
+add_project_paths()
+
+from services.irrigation_scheduler import schedule_irrigation  # noqa: E402
+
+def synthetic_farm(units: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    deficit = np.where(rng.random(units) < 0.6, rng.uniform(100, 5000, units), 0.0)
+    priority = rng.integers(1, 4, units)
+    deadline = np.where(rng.random(units) < 0.5, rng.uniform(0, 48, units), np.inf)
+    return deficit, priority, deadline
+
+def bench(units: int, rounds: int, budget_fraction: float) -> dict:
+    deficit, priority, deadline = synthetic_farm(units)
+    budget = float(deficit.sum()) * budget_fraction
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        plan = schedule_irrigation(deficit, priority, deadline, budget, budget / 20, 24)
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_ms": round(float(np.median(timings)) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+        "served_units": int((plan["allocated_l"] > 0).sum()),
+        "allocated_fraction": round(float(plan["allocated_l"].sum() / deficit.sum()), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--units", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budget-fraction", type=float, default=0.7,
+                        help="water budget as a share of the total deficit")
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = {f"scheduler_{units}": bench(units, args.rounds, args.budget_fraction)
+               for units in args.units}
+    print(json.dumps(results, indent=2))
+    if args.output:
+        write_results(args.output, "scheduler", results, vars(args))
+    worst = results[f"scheduler_{max(args.units)}"]["max_ms"] / 1000
+    if worst > args.max_seconds:
+        sys.exit(f"Scheduling {max(args.units)} units took {worst:.2f}s (> {args.max_seconds}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Throughput scaling by worker count
+
+Starts the API with 1, 2, 4... worker processes on a scratch database,
+seeds every sensor, then drives a workload from load_test.py (default:
+the read-heavy dashboard mix) and reports requests/second per worker count.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import tempfile
+
+from common import free_port, start_server, write_results
+from load_test import run_workload, wait_ready
+
+def run(worker_counts, duration, concurrency, sensors, workload) -> dict:
+    sensor_ids = [f"BENCH_{i:04d}" for i in range(sensors)]
+    results = {}
+    for workers in worker_counts:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        with tempfile.TemporaryDirectory() as data_dir:
+            server = start_server(port, data_dir, workers=workers)
+            try:
+                asyncio.run(wait_ready(base_url))
+                # Populate every sensor before measuring reads
+                asyncio.run(run_workload(base_url, "ingest", sensor_ids, 2.0, concurrency))
+                stats = asyncio.run(run_workload(base_url, workload, sensor_ids,
+                                                 duration, concurrency))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        total = stats[f"{workload}.total"]
+        results[f"workers_{workers}"] = dict(total, workers=workers)
+        print(f"workers={workers:<3} rps={total['rps']:<10} errors={total['errors']}")
+
+    baseline = next(iter(results.values()))["rps"] or 1.0
+    for stats in results.values():
+        stats["speedup"] = round(stats["rps"] / baseline, 2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--sensors", type=int, default=50)
+    parser.add_argument("--workload", default="dashboard")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.workers, args.duration, args.concurrency,
+                  args.sensors, args.workload)
+    if args.output:
+        write_results(args.output, "workers", results, vars(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Shared helpers for the benchmark scripts: paths, server process, result files"""
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / "backend"
+
+def add_project_paths():
+    """Make backend modules importable the same way main.py imports them"""
+    for path in (str(ROOT), str(BACKEND)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(port: int, data_dir: str, workers: int = 1,
+                 database: str = None, extra_env: dict = None) -> subprocess.Popen:
+    """Run backend/main.py against a scratch database (or an existing one)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(ROOT), str(BACKEND)])
+    env["DATABASE_URL"] = f"sqlite:///{database or Path(data_dir) / 'agri.db'}"
+    env["CACHE_PATH"] = str(Path(data_dir) / "cache.db")
+    # Load tests measure the API, not the per-client limit on one load generator
+    env.setdefault("RATE_LIMIT_ENABLED", "false")
+    env.update(extra_env or {})
+    return subprocess.Popen(
+        [sys.executable, "main.py", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers)],
+        cwd=BACKEND, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+def percentile_ms(sorted_seconds: list, q: float):
+    if not sorted_seconds:
+        return None
+    index = min(len(sorted_seconds) - 1, int(len(sorted_seconds) * q))
+    return round(sorted_seconds[index] * 1000, 3)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def write_results(path: str, suite: str, results: dict, params: dict = None):
+    """
+    Machine-readable result file, comparable across commits with compare.py
+    results: {benchmark name: {metric: value}}
+    """
+    document = {
+        "suite": suite,
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params or {},
+        "results": results,
+    }
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(document, indent=2))
+    return document
+
+class Stopwatch:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
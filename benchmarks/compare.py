@@ -0,0 +1,69 @@
+"""
+Compare two benchmark result files (e.g. main vs. a feature branch)
+
+Prints the relative change of every shared metric and exits with status 1
+if any metric regressed by more than --threshold percent. Latency/time
+metrics (*_ms, *_us, *seconds) are better when lower; throughput metrics
+(rps, ops_per_s, *_per_second) are better when higher. Other metrics are
+reported but never fail the comparison.
+
+Usage:
+    python benchmarks/compare.py results/base.json results/head.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+LOWER_IS_BETTER = ("_ms", "_us", "seconds")
+HIGHER_IS_BETTER = ("rps", "ops_per_s", "_per_second")
+
+def direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if informational"""
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+def compare(base: dict, head: dict, threshold: float) -> list:
+    rows = []
+    for name, base_metrics in base["results"].items():
+        head_metrics = head["results"].get(name)
+        if head_metrics is None:
+            continue
+        for metric, old in base_metrics.items():
+            new = head_metrics.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+                continue
+            change = (new - old) / old * 100
+            sign = direction(metric)
+            regressed = sign != 0 and -sign * change > threshold
+            rows.append((name, metric, old, new, change, regressed))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"{base.get('commit')} -> {head.get('commit')} ({base.get('suite')})")
+    rows = compare(base, head, args.threshold)
+    for name, metric, old, new, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{name:<45} {metric:<12} {old:>12} -> {new:<12} {change:+7.1f}% {flag}")
+
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        sys.exit(f"{len(regressions)} metric(s) regressed by more than {args.threshold}%")
+
+if __name__ == "__main__":
+    main()
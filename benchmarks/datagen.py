@@ -0,0 +1,111 @@
+"""
+Synthetic sensor data generator
+
+Writes realistic readings (drying curves with irrigation refills, daily
+temperature/humidity cycles, sensor noise) straight into a SQLite database
+using the application schema. Deterministic for a given --seed, so runs on
+different commits benchmark identical data.
+
+Usage:
+    python benchmarks/datagen.py --db /tmp/bench.db --sensors 2000 --readings 1000
+    (2000 sensors x 1000 readings = 2M rows, one reading every --interval minutes)
+"""
+import argparse
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from common import add_project_paths
+
+add_project_paths()
+
+def sensor_ids(count: int) -> list:
+    return [f"FIELD_{i // 100:03d}_{i % 100:02d}" for i in range(count)]
+
+def generate_sensor_block(rng: np.random.Generator, sensors: int, readings: int,
+                          end: datetime, interval_minutes: int):
+    """
+    Readings for a block of sensors as column arrays, oldest first per sensor
+    Returns (sensor_index, timestamps[str], moisture, temperature, humidity)
+    """
+    steps = np.arange(readings)
+    hours = (steps * interval_minutes / 60.0)[None, :]
+
+    dry_rate = rng.uniform(0.05, 0.4, size=(sensors, 1))      # % per hour
+    refill_every = rng.uniform(24, 96, size=(sensors, 1))     # hours between irrigations
+    top = rng.uniform(65, 85, size=(sensors, 1))
+    phase = rng.uniform(0, 1, size=(sensors, 1)) * refill_every
+    moisture = top - dry_rate * np.mod(hours + phase, refill_every)
+    moisture += rng.normal(0, 0.5, size=moisture.shape)
+
+    daily = np.sin(2 * np.pi * (hours % 24) / 24 - np.pi / 2)
+    temperature = rng.uniform(18, 26, size=(sensors, 1)) + 6 * daily
+    temperature += rng.normal(0, 0.3, size=temperature.shape)
+    humidity = rng.uniform(50, 70, size=(sensors, 1)) - 12 * daily
+    humidity += rng.normal(0, 1.0, size=humidity.shape)
+
+    start = np.datetime64(end - timedelta(minutes=interval_minutes * (readings - 1)), "s")
+    ts = start + (steps * interval_minutes * 60).astype("timedelta64[s]")
+    ts_text = np.char.replace(np.datetime_as_string(ts, unit="s"), "T", " ")
+
+    def clip(values, low, high):
+        return np.round(np.clip(values, low, high), 1)
+
+    return (clip(moisture, 0, 100), clip(temperature, -50, 60), clip(humidity, 0, 100),
+            ts_text)
+
+def generate(db_path: str, sensors: int, readings: int, interval_minutes: int = 15,
+             seed: int = 42, block: int = 100, end: datetime = None) -> dict:
+    import database
+    database.DATABASE_URL = db_path
+    database.init_db()
+
+    rng = np.random.default_rng(seed)
+    end = (end or datetime.utcnow()).replace(microsecond=0)
+    ids = sensor_ids(sensors)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-200000")
+    started = time.perf_counter()
+    rows = 0
+    for offset in range(0, sensors, block):
+        block_ids = ids[offset:offset + block]
+        moisture, temperature, humidity, ts = generate_sensor_block(
+            rng, len(block_ids), readings, end, interval_minutes)
+        batch = [
+            (sensor_id, float(m), float(t), float(h), str(stamp))
+            for i, sensor_id in enumerate(block_ids)
+            for m, t, h, stamp in zip(moisture[i], temperature[i], humidity[i], ts)
+        ]
+        conn.executemany("""
+            INSERT OR IGNORE INTO sensor_readings
+            (sensor_id, soil_moisture, temperature, humidity, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        """, batch)
+        conn.commit()
+        rows += len(batch)
+    database.refresh_latest_state(conn)
+    conn.commit()
+    conn.close()
+    elapsed = time.perf_counter() - started
+    return {"rows": rows, "sensors": sensors, "seconds": round(elapsed, 2),
+            "rows_per_second": round(rows / elapsed) if elapsed else None}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="SQLite file to create or extend")
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--readings", type=int, default=1000, help="readings per sensor")
+    parser.add_argument("--interval", type=int, default=15, help="minutes between readings")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    stats = generate(args.db, args.sensors, args.readings, args.interval, args.seed)
+    print(f"{stats['rows']:,} readings for {stats['sensors']:,} sensors "
+          f"in {stats['seconds']}s ({stats['rows_per_second']:,} rows/s)")
+
+if __name__ == "__main__":
+    main()
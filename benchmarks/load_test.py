@@ -0,0 +1,169 @@
+"""
+Scripted API load tests driven by an async client
+
+Workloads (weights of each request type):
+  ingest   - gateways pushing readings (90% POST /api/sensors/data)
+  dashboard - dashboard users (current, history, recommendations, list)
+  mixed    - both at once
+
+Either targets a running server (--url) or starts one on a scratch copy of
+the database (--db, e.g. produced by datagen.py). Results are written as
+JSON (see compare.py).
+
+Usage:
+    python benchmarks/datagen.py --db /tmp/bench.db --sensors 1000 --readings 500
+    python benchmarks/load_test.py --db /tmp/bench.db --workload mixed --duration 30 \\
+        --output results/load.json
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from common import free_port, percentile_ms, start_server, write_results
+
+WORKLOADS = {
+    "ingest": {"ingest": 0.90, "current": 0.05, "recommendations": 0.05},
+    "dashboard": {"current": 0.35, "history": 0.30, "recommendations": 0.30, "list": 0.05},
+    "mixed": {"ingest": 0.40, "current": 0.20, "history": 0.20, "recommendations": 0.18,
+              "list": 0.02},
+}
+
+def _request(kind: str, sensor_id: str, rng: random.Random):
+    """(method, path, json body) for one request of a given kind"""
+    if kind == "ingest":
+        return "POST", "/api/sensors/data", {
+            "sensor_id": sensor_id,
+            "soil_moisture": round(rng.uniform(15, 90), 1),
+            "temperature": round(rng.uniform(10, 38), 1),
+            "humidity": round(rng.uniform(30, 90), 1),
+        }
+    if kind == "current":
+        return "GET", f"/api/sensors/current/{sensor_id}", None
+    if kind == "history":
+        return "GET", f"/api/sensors/history/{sensor_id}?limit=100", None
+    if kind == "recommendations":
+        return "GET", f"/api/recommendations/{sensor_id}", None
+    return "GET", "/api/sensors/list", None
+
+async def wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+async def run_workload(base_url: str, workload: str, sensors: list, duration: float,
+                       concurrency: int, seed: int = 7) -> dict:
+    mix = WORKLOADS[workload]
+    kinds, weights = zip(*mix.items())
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    async def user(client: httpx.AsyncClient, rng: random.Random, stop_at: float):
+        while time.monotonic() < stop_at:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, body = _request(kind, rng.choice(sensors), rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                failed = response.status_code >= 400
+            except httpx.TransportError:
+                failed = True
+            latencies[kind].append(time.perf_counter() - started)
+            if failed:
+                errors[kind] += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.monotonic()
+        stop_at = started + duration
+        await asyncio.gather(*(user(client, random.Random(seed + i), stop_at)
+                               for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    results = {}
+    for kind, values in latencies.items():
+        values.sort()
+        results[f"{workload}.{kind}"] = {
+            "requests": len(values),
+            "errors": errors[kind],
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": percentile_ms(values, 0.50),
+            "p95_ms": percentile_ms(values, 0.95),
+            "p99_ms": percentile_ms(values, 0.99),
+        }
+    total = sum(len(v) for v in latencies.values())
+    results[f"{workload}.total"] = {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "rps": round(total / elapsed, 1),
+    }
+    return results
+
+def _sensor_ids_from_db(db_path: str, limit: int) -> list:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT DISTINCT sensor_id FROM sensor_readings LIMIT ?",
+                            (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--db", help="database to copy and serve (from datagen.py)")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS) + ["all"], default="mixed")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per workload")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--sensors", type=int, default=500, help="sensor ids to target")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    workloads = sorted(WORKLOADS) if args.workload == "all" else [args.workload]
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = None
+        base_url = args.url
+        sensors = [f"LOAD_{i:05d}" for i in range(args.sensors)]
+        if base_url is None:
+            database = Path(data_dir) / "agri.db"
+            if args.db:
+                shutil.copyfile(args.db, database)
+                sensors = _sensor_ids_from_db(str(database), args.sensors) or sensors
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(port, data_dir, workers=args.workers, database=str(database))
+        try:
+            asyncio.run(wait_ready(base_url))
+            results = {}
+            for workload in workloads:
+                results.update(asyncio.run(run_workload(
+                    base_url, workload, sensors, args.duration, args.concurrency, args.seed)))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    for name, stats in results.items():
+        print(f"{name:<28} {stats}")
+    if args.output:
+        write_results(args.output, "load_test", results, vars(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Micro-benchmarks for DecisionEngine and DataService
+
+Runs each operation in-process (no HTTP) against a generated database and
+reports the median time per call over several rounds.
+
+Usage:
+    python benchmarks/micro.py --output results/micro.json
+    python benchmarks/micro.py --db /tmp/bench.db   # reuse a datagen.py database
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from common import add_project_paths, write_results
+
+add_project_paths()
+
+import database  # noqa: E402
+from services.anomaly_detector import AnomalyDetector  # noqa: E402
+from services.data_service import DataService  # noqa: E402
+from services.decision_engine import DecisionEngine  # noqa: E402
+from services.ingest_guard import IngestGuard  # noqa: E402
+
+def measure(func, calls: int, rounds: int) -> dict:
+    per_call = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        per_call.append((time.perf_counter() - started) / calls)
+    median = statistics.median(per_call)
+    return {
+        "median_us": round(median * 1e6, 3),
+        "min_us": round(min(per_call) * 1e6, 3),
+        "ops_per_s": round(1 / median) if median else None,
+    }
+
+def engine_benchmarks(calls: int, rounds: int) -> dict:
+    engine = DecisionEngine()
+    reading = {"sensor_id": "S1", "soil_moisture": 35.0, "temperature": 29.0, "humidity": 55.0}
+    history = [dict(reading, soil_moisture=35.0 + i) for i in range(10)]
+    return {
+        "engine.generate_recommendation": measure(
+            lambda: engine.generate_recommendation(reading, history), calls, rounds),
+        "engine.generate_recommendation_no_history": measure(
+            lambda: engine.generate_recommendation(reading, []), calls, rounds),
+    }
+
+def anomaly_benchmarks(rounds: int, sensors: int = 5000) -> dict:
+    detector = AnomalyDetector()
+    ids = [f"S{i}" for i in range(sensors)]
+    rng = np.random.default_rng(0)
+    clock = [0.0]
+
+    def batch():
+        clock[0] += 900
+        values = rng.normal((50, 25, 60), (5, 2, 5), size=(sensors, 3))
+        detector.update_batch(ids, values, np.full(sensors, clock[0]))
+
+    batch()  # allocate state outside the timed rounds
+    return {f"anomaly.update_batch_{sensors}": measure(batch, 10, rounds)}
+
+def data_service_benchmarks(db_path: str, calls: int, rounds: int) -> dict:
+    database.DATABASE_URL = db_path
+    results = {}
+    with database.get_db() as conn:
+        service = DataService(conn, IngestGuard())
+        sensor_id = conn.execute("SELECT sensor_id FROM sensor_readings LIMIT 1").fetchone()[0]
+        recommendation = DecisionEngine().generate_recommendation(
+            service.get_latest_reading(sensor_id), [])
+        clock = [datetime.utcnow() + timedelta(days=1)]
+
+        def save_reading():
+            clock[0] += timedelta(seconds=1)
+            service.save_sensor_reading("MICRO_BENCH", 50.0, 25.0, 60.0, clock[0])
+
+        results["data.get_latest_reading"] = measure(
+            lambda: service.get_latest_reading(sensor_id), calls, rounds)
+        results["data.get_sensor_history_10"] = measure(
+            lambda: service.get_sensor_history(sensor_id, 10), calls, rounds)
+        results["data.get_sensor_history_200"] = measure(
+            lambda: service.get_sensor_history(sensor_id, 200), max(1, calls // 10), rounds)
+        results["data.save_sensor_reading"] = measure(save_reading, calls, rounds)
+        results["data.save_recommendation"] = measure(
+            lambda: service.save_recommendation(sensor_id, recommendation), calls, rounds)
+        results["data.get_recommendations_history"] = measure(
+            lambda: service.get_recommendations_history(sensor_id, 50),
+            max(1, calls // 10), rounds)
+        results["data.get_all_sensors"] = measure(
+            service.get_all_sensors, 1, rounds)
+        results["data.get_overview"] = measure(
+            lambda: service.get_overview(20.0, 40.0), 1, rounds)
+        conn.rollback()  # leave the benchmark database unchanged
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="existing database (default: generate one)")
+    parser.add_argument("--sensors", type=int, default=200)
+    parser.add_argument("--readings", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            from datagen import generate
+            db_path = str(Path(tmp) / "micro.db")
+            generate(db_path, args.sensors, args.readings)
+        results = engine_benchmarks(args.calls, args.rounds)
+        results.update(anomaly_benchmarks(args.rounds))
+        results.update(data_service_benchmarks(db_path, args.calls, args.rounds))
+
+    for name, stats in results.items():
+        print(f"{name:<45} {stats['median_us']:>12.1f} us  ({stats['ops_per_s']:,} ops/s)")
+    if args.output:
+        write_results(args.output, "micro", results, vars(args))
+
+if __name__ == "__main__":
+    main()
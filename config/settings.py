@@ -1,5 +1,5 @@
 from pydantic import BaseSettings, Field
-from typing import List
+from typing import List, Optional
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -7,16 +7,51 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = Field(default="sqlite:///data/agri.db", env="DATABASE_URL")
+    # Readings as scaled integers with interned sensor ids (services/compact_storage.py);
+    # an optional migration converts the database online, once; there is no way back
+    compact_storage: bool = False
     
     # API Configuration
     api_title: str = "Smart Agriculture API"
     api_version: str = "1.0.0"
     allowed_origins: List[str] = Field(default=["http://localhost:8501"], env="ALLOWED_ORIGINS")
+    api_host: str = "0.0.0.0"
+    api_port: int = 8000
+    workers: int = Field(default=1, env="WORKERS")  # >1 runs one process per core
+    
+    history_max_limit: int = 100_000  # cap on raw rows scanned by one history request
+    batch_max_ids: int = 1000  # distinct sensor ids accepted by one batch read
+    
+    # Shared cache (SQLite file shared by all workers)
+    cache_enabled: bool = True
+    cache_path: str = "data/cache.db"
+    cache_ttl_seconds: float = 300.0
+    
+    # Concurrent identical reads share one computation (per process)
+    single_flight_enabled: bool = True
+    
+    # Hot tier: newest readings per sensor in memory. Rings only see this process's
+    # ingest, so the tier must stay off when several processes serve the API
+    # (uvicorn/gunicorn --workers N, several containers). Unset = off, except
+    # `python main.py` without --workers; true = the API runs as one process.
+    hot_readings_enabled: Optional[bool] = None
+    hot_readings_per_sensor: int = 256  # covers dashboard charts of 50-200 points
+    hot_readings_memory_mb: int = 64  # fixed block; least recently used sensors evicted
     
     # Security
     api_key_header: str = "X-API-Key"
     api_keys: List[str] = Field(default=[], env="API_KEYS")  # Load from env
     
+    # Rate limiting (token buckets; rate 0 = off). Limits are for the whole API:
+    # each worker process keeps its own buckets with rate and burst divided by
+    # WORKERS, so set WORKERS when a server other than main.py forks workers
+    rate_limit_enabled: bool = True
+    rate_limit_client_per_second: float = 50.0  # per API key (or address without one)
+    rate_limit_client_burst: float = 200.0
+    rate_limit_sensor_per_second: float = 0.2  # readings per sensor
+    rate_limit_sensor_burst: float = 20.0  # absorbs gateway catch-up after an outage
+    rate_limit_sweep_seconds: float = 60.0  # eviction of idle buckets
+    
     # Agricultural Thresholds
     soil_moisture_critical: float = 20.0
     soil_moisture_low: float = 40.0
@@ -31,10 +66,79 @@ class Settings(BaseSettings):
     
     humidity_low: float = 40.0
     
+    # Streaming anomaly detection (per-sensor EWMA state, fed on ingest)
+    anomaly_ewma_alpha: float = 0.1
+    anomaly_z_threshold: float = 4.0
+    anomaly_warmup_readings: int = 10
+    anomaly_flatline_readings: int = 12
+    anomaly_max_moisture_rate: float = 20.0    # % per hour
+    anomaly_max_temperature_rate: float = 8.0  # °C per hour
+    anomaly_max_humidity_rate: float = 30.0    # % per hour
+    
+    # Sensor health (last-seen tracking, offline detection)
+    health_expected_interval_seconds: float = 300.0  # until a sensor's own cadence is learned
+    health_missed_reports: float = 3.0  # offline once this many expected reports are missed
+    health_min_offline_seconds: float = 900.0
+    health_check_interval_seconds: float = 60.0  # background sweep, 0 = on /api/sensors/health only
+    health_event_log_size: int = 1000
+    
+    # What-if moisture simulation
+    simulation_max_hours: int = 168
+    simulation_max_plans: int = 5000
+    simulation_history_readings: int = 96  # recent readings used to fit drying rates
+    simulation_default_drying_rate: float = 0.2  # % per hour when history is too short
+    
+    # Time-to-critical forecast (regression updated on ingest, refit by a batch job)
+    forecast_tau_hours: float = 12.0  # weight of a reading halves every ~8h
+    forecast_reset_rise: float = 5.0  # moisture rise (points) treated as irrigation
+    forecast_min_points: int = 4
+    forecast_max_hours: float = 720.0  # crossings further out are stored as NULL
+    forecast_window_readings: int = 192  # readings per sensor used by the batch refit
+    forecast_refresh_interval_seconds: float = 3600.0  # in-process batch refit, 0 = off
+    
+    # Irrigation scheduling (shared water supply)
+    irrigation_daily_budget_l: float = 200_000.0
+    pump_capacity_l_per_hour: float = 20_000.0
+    schedule_horizon_hours: int = 24
+    
     # Plot Configuration
     default_plot_area_m2: float = 100.0
     root_depth_m: float = 0.3
     
+    # POST /api/backtest runs in the request; longer replays belong to backtest.py
+    backtest_max_days: int = 31  # span of one request, also the default span
+    backtest_max_sensors: int = 100
+    
+    # Schema migrations (migrations.py)
+    migration_chunk_rows: int = 10_000  # rows per backfill / copy transaction
+    migration_chunk_pause_seconds: float = 0.05  # lets ingestion write between chunks
+    migration_busy_timeout_ms: int = 30_000
+    
+    # Online backups (services/backup.py): stepped copies that don't stall ingestion
+    backup_pages_per_step: int = 1000  # ~4 MB per step at the default page size
+    backup_step_pause_seconds: float = 0.01  # between steps
+    backup_dir: str = "data/backups"
+    backup_interval_seconds: float = 0.0  # scheduled backups run by the API, 0 = off
+    backup_keep: int = 7  # newest scheduled backups kept
+    
+    # Read-only snapshot serving analytics / export reads (stale by up to the refresh interval)
+    snapshot_enabled: bool = False
+    snapshot_path: str = "data/snapshot.db"
+    snapshot_refresh_seconds: float = 900.0
+    
+    # Bulk import of historical readings (import_readings.py)
+    import_chunk_rows: int = 50_000  # rows per transaction and checkpoint
+    import_cache_mb: int = 256  # page cache of the import connection
+    
+    # Ingest
+    ingest_dedup_cache_size: int = 100_000  # recent (sensor_id, timestamp) keys kept in memory
+    
+    # Observability
+    metrics_enabled: bool = True  # /metrics endpoint + per-request latency middleware
+    query_profiling_enabled: bool = False  # time every SQL statement
+    slow_query_threshold_ms: float = 100.0  # log + EXPLAIN QUERY PLAN above this
+    query_profile_max_fingerprints: int = 500
+    
     # Logging
     log_level: str = "INFO"
     log_file: str = "logs/agri_system.log"
@@ -1,6 +1,7 @@
 # frontend/app.py
 import streamlit as st
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
@@ -9,6 +10,10 @@ from typing import Dict, List
 
 # Configuration
 API_BASE_URL = "http://localhost:8000/api"
+CHART_MAX_POINTS = 1000   # roughly one point per horizontal pixel of the chart
+WEBGL_MIN_POINTS = 500    # switch to Scattergl above this many points
+STATS_PERIODS = {"Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30,
+                 "Last year": 365, "All time": None}
 
 # Page configuration
 st.set_page_config(
@@ -90,12 +95,16 @@ def get_recommendations(sensor_id: str) -> Dict:
         st.error(f"Error fetching recommendations: {e}")
         return None
 
-def get_sensor_history(sensor_id: str, limit: int = 50) -> List[Dict]:
-    """Fetch historical data"""
+def get_sensor_history(sensor_id: str, limit: int = 50,
+                       max_points: int = None) -> List[Dict]:
+    """Fetch historical data (downsampled server-side when max_points is set)"""
+    params = {"limit": limit}
+    if max_points:
+        params["max_points"] = max_points
     try:
         response = requests.get(
             f"{API_BASE_URL}/sensors/history/{sensor_id}",
-            params={"limit": limit},
+            params=params,
             timeout=5
         )
         response.raise_for_status()
@@ -104,6 +113,51 @@ def get_sensor_history(sensor_id: str, limit: int = 50) -> List[Dict]:
         st.error(f"Error fetching history: {e}")
         return []
 
+def get_sensor_stats(sensor_id: str, start: datetime = None,
+                     end: datetime = None) -> Dict:
+    """Fetch server-side aggregate statistics for a time window"""
+    params = {}
+    if start:
+        params["start"] = start.isoformat()
+    if end:
+        params["end"] = end.isoformat()
+    try:
+        response = requests.get(
+            f"{API_BASE_URL}/sensors/stats/{sensor_id}",
+            params=params,
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"Error fetching statistics: {e}")
+        return None
+
+def get_overview() -> Dict:
+    """Fetch the latest state of every sensor (columnar: one list per field)"""
+    try:
+        response = requests.get(f"{API_BASE_URL}/overview", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"Error fetching overview: {e}")
+        return None
+
+def simulate_plans(sensor_id: str, hours: int, plans: List[Dict]) -> Dict:
+    """Project soil moisture under what-if irrigation plans (server-side simulation)"""
+    try:
+        response = requests.post(
+            f"{API_BASE_URL}/simulate",
+            json={"sensor_ids": [sensor_id], "hours": hours, "plans": plans,
+                  "include_trajectories": True},
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"Error running simulation: {e}")
+        return None
+
 def post_sensor_data(sensor_id: str, soil_moisture: float, 
                     temperature: float, humidity: float) -> bool:
     """Post new sensor data"""
@@ -171,31 +225,36 @@ def create_history_chart(history: List[Dict]) -> go.Figure:
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     df = df.sort_values('timestamp')
     
+    # Dense series: WebGL traces, no per-point markers
+    dense = len(df) > WEBGL_MIN_POINTS
+    trace = go.Scattergl if dense else go.Scatter
+    mode = 'lines' if dense else 'lines+markers'
+    
     fig = go.Figure()
     
     # Soil Moisture
-    fig.add_trace(go.Scatter(
+    fig.add_trace(trace(
         x=df['timestamp'], y=df['soil_moisture'],
         name='Soil Moisture (%)',
         line=dict(color='#8b4513', width=2),
-        mode='lines+markers'
+        mode=mode
     ))
     
     # Temperature (scaled)
-    fig.add_trace(go.Scatter(
+    fig.add_trace(trace(
         x=df['timestamp'], y=df['temperature'],
         name='Temperature (°C)',
         line=dict(color='#ff6b6b', width=2),
-        mode='lines+markers',
+        mode=mode,
         yaxis='y2'
     ))
     
     # Humidity
-    fig.add_trace(go.Scatter(
+    fig.add_trace(trace(
         x=df['timestamp'], y=df['humidity'],
         name='Humidity (%)',
         line=dict(color='#4ecdc4', width=2),
-        mode='lines+markers'
+        mode=mode
     ))
     
     fig.update_layout(
@@ -230,7 +289,8 @@ def main():
         
         page = st.radio(
             "Select Page:",
-            ["📊 Dashboard", "📈 Historical Data", "➕ Add Sensor Data", "ℹ️ About"]
+            ["📊 Dashboard", "🗺️ Farm Overview", "📈 Historical Data",
+             "💧 Irrigation What-If", "➕ Add Sensor Data", "ℹ️ About"]
         )
         
         st.divider()
@@ -255,8 +315,12 @@ def main():
     # Page Routing
     if page == "📊 Dashboard":
         show_dashboard(selected_sensor)
+    elif page == "🗺️ Farm Overview":
+        show_farm_overview()
     elif page == "📈 Historical Data":
         show_historical_data(selected_sensor)
+    elif page == "💧 Irrigation What-If":
+        show_what_if_page(selected_sensor)
     elif page == "➕ Add Sensor Data":
         show_add_data_page()
     else:
@@ -375,6 +439,66 @@ def show_dashboard(sensor_id: str):
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+def create_overview_heatmap(df: pd.DataFrame, metric: str, label: str) -> go.Figure:
+    """One cell per sensor, laid out in a near-square grid"""
+    n = len(df)
+    width = max(1, int(np.ceil(np.sqrt(n))))
+    height = int(np.ceil(n / width))
+    
+    values = np.full(width * height, np.nan)
+    values[:n] = df[metric].to_numpy(dtype=float)
+    hover = np.full(width * height, "", dtype=object)
+    hover[:n] = (df["sensor_id"] + "<br>" + label + ": " + df[metric].round(1).astype(str)
+                 + "<br>Status: " + df["status"]).to_numpy()
+    
+    fig = go.Figure(go.Heatmap(
+        z=values.reshape(height, width),
+        text=hover.reshape(height, width),
+        hoverinfo="text",
+        colorscale="RdYlGn" if metric == "soil_moisture" else "RdYlBu_r",
+        colorbar=dict(title=label),
+    ))
+    fig.update_layout(height=600, margin=dict(l=10, r=10, t=30, b=10),
+                      xaxis=dict(visible=False), yaxis=dict(visible=False, autorange="reversed"))
+    return fig
+
+def show_farm_overview():
+    """Every sensor's latest state from a single API call"""
+    st.header("Farm Overview")
+    
+    overview = get_overview()
+    if not overview or not overview["count"]:
+        st.warning("No sensors found. Add sensor data first.")
+        return
+    
+    df = pd.DataFrame(overview["columns"])
+    status_counts = df["status"].value_counts()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Sensors", f"{overview['count']:,}")
+    col2.metric("Critical", int(status_counts.get("critical", 0)))
+    col3.metric("Warning", int(status_counts.get("warning", 0)))
+    col4.metric("Avg Soil Moisture", f"{df['soil_moisture'].mean():.1f}%")
+    
+    metric_labels = {"Soil Moisture (%)": "soil_moisture",
+                     "Temperature (°C)": "temperature",
+                     "Humidity (%)": "humidity"}
+    label = st.selectbox("Metric:", list(metric_labels))
+    st.plotly_chart(create_overview_heatmap(df, metric_labels[label], label),
+                    use_container_width=True)
+    
+    st.subheader("Sensors Needing Attention")
+    attention = df[df["status"] != "ok"].sort_values("soil_moisture")
+    if attention.empty:
+        st.success("All sensors are within normal ranges")
+        return
+    st.dataframe(
+        attention[["sensor_id", "status", "soil_moisture", "temperature",
+                   "humidity", "alert_count", "action", "timestamp"]],
+        use_container_width=True,
+        hide_index=True
+    )
+
 def show_historical_data(sensor_id: str):
     """Historical data view with charts"""
     st.header(f"Historical Data: {sensor_id}")
@@ -382,12 +506,13 @@ def show_historical_data(sensor_id: str):
     # Time range selector
     col1, col2 = st.columns(2)
     with col1:
-        limit = st.slider("Number of readings:", 10, 200, 50)
+        limit = st.select_slider("Number of readings:",
+                                 [50, 200, 1000, 5000, 20000, 100000], 200)
     with col2:
         chart_type = st.selectbox("Chart Type:", ["Line Chart", "Area Chart", "Bar Chart"])
     
-    # Fetch history
-    history = get_sensor_history(sensor_id, limit)
+    # Fetch history (the API downsamples long ranges to what the chart can show)
+    history = get_sensor_history(sensor_id, limit, max_points=CHART_MAX_POINTS)
     
     if not history:
         st.warning("No historical data available")
@@ -397,7 +522,7 @@ def show_historical_data(sensor_id: str):
     st.plotly_chart(create_history_chart(history), use_container_width=True)
     
     # Data table
-    st.subheader("Raw Data")
+    st.subheader("Chart Data")
     df = pd.DataFrame(history)
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     df = df.sort_values('timestamp', ascending=False)
@@ -408,24 +533,79 @@ def show_historical_data(sensor_id: str):
         hide_index=True
     )
     
-    # Statistics
+    # Statistics (aggregated by the API over the whole period, not the rows above)
     st.subheader("Statistics")
+    period = st.selectbox("Period:", list(STATS_PERIODS), index=1)
+    days = STATS_PERIODS[period]
+    start = datetime.utcnow() - timedelta(days=days) if days else None
+    stats = get_sensor_stats(sensor_id, start=start)
+    
+    if not stats or not stats["count"]:
+        st.info("No readings in this period")
+        return
+    
+    st.caption(f"{stats['count']:,} readings from {stats['start']} to {stats['end']}")
     col1, col2, col3 = st.columns(3)
+    for col, metric, label, unit in [
+        (col1, "soil_moisture", "Soil Moisture", "%"),
+        (col2, "temperature", "Temperature", "°C"),
+        (col3, "humidity", "Humidity", "%"),
+    ]:
+        values = stats["metrics"][metric]
+        with col:
+            st.metric(f"Avg {label}", f"{values['mean']:.1f}{unit}")
+            st.metric("Min", f"{values['min']:.1f}{unit}")
+            st.metric("Max", f"{values['max']:.1f}{unit}")
+            st.caption(f"Median {values['p50']:.1f}{unit} · P10–P90 "
+                       f"{values['p10']:.1f}–{values['p90']:.1f}{unit} · σ {values['std']:.1f}")
+
+def show_what_if_page(sensor_id: str):
+    """Compare projected soil moisture under alternative irrigation plans"""
+    st.header(f"Irrigation What-If: {sensor_id}")
     
+    col1, col2 = st.columns(2)
     with col1:
-        st.metric("Avg Soil Moisture", f"{df['soil_moisture'].mean():.1f}%")
-        st.metric("Min", f"{df['soil_moisture'].min():.1f}%")
-        st.metric("Max", f"{df['soil_moisture'].max():.1f}%")
-    
+        hours = st.slider("Horizon (hours):", 6, 168, 48, step=6)
     with col2:
-        st.metric("Avg Temperature", f"{df['temperature'].mean():.1f}°C")
-        st.metric("Min", f"{df['temperature'].min():.1f}°C")
-        st.metric("Max", f"{df['temperature'].max():.1f}°C")
+        temperature_offset = st.slider("Temperature change (°C):", -10.0, 10.0, 0.0, step=0.5)
+    
+    st.subheader("Plans")
+    plans = [{"name": "No irrigation", "temperature_offset": temperature_offset}]
+    for i, col in enumerate(st.columns(3), start=1):
+        with col:
+            volume = st.number_input(f"Plan {i} volume (L)", 0.0, 20000.0,
+                                     float(500 * i), step=100.0, key=f"volume_{i}")
+            hour = st.number_input(f"Plan {i} at hour", 0, hours - 1,
+                                   min(6 * (i - 1), hours - 1), key=f"hour_{i}")
+            plans.append({"name": f"{volume:.0f} L at +{hour}h",
+                          "irrigation": [{"hour": int(hour), "volume_l": volume}],
+                          "temperature_offset": temperature_offset})
+    
+    result = simulate_plans(sensor_id, hours, plans)
+    if not result or not result["sensor_ids"]:
+        st.warning("No data available for this sensor")
+        return
     
-    with col3:
-        st.metric("Avg Humidity", f"{df['humidity'].mean():.1f}%")
-        st.metric("Min", f"{df['humidity'].min():.1f}%")
-        st.metric("Max", f"{df['humidity'].max():.1f}%")
+    fig = go.Figure()
+    for plan in result["plans"]:
+        fig.add_trace(go.Scatter(x=list(range(hours + 1)), y=plan["trajectory"][0],
+                                 name=plan["name"], mode="lines"))
+    fig.add_hline(y=20, line_dash="dash", line_color="red", annotation_text="Critical")
+    fig.update_layout(xaxis_title="Hours from now", yaxis_title="Soil Moisture (%)",
+                      height=450, hovermode="x unified")
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.caption(f"Fitted drying rate: {result['drying_rate_per_hour'][0]:.2f}%/h · "
+               f"{result['litres_per_point'][0]:.0f} L per moisture point")
+    st.dataframe(pd.DataFrame([{
+        "Plan": plan["name"],
+        "Water (L)": plan["water_l"][0],
+        "Final moisture (%)": plan["final_moisture"][0],
+        "Min moisture (%)": plan["min_moisture"][0],
+        "Hours to critical": plan["hours_to_critical"][0],
+        "Hours below critical": plan["hours_below_critical"][0],
+        "Hours above excess": plan["hours_above_excess"][0],
+    } for plan in result["plans"]]), use_container_width=True, hide_index=True)
 
 def show_add_data_page():
     """Form to manually add sensor data"""
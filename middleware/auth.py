@@ -1,10 +1,17 @@
+from functools import lru_cache
 from fastapi import Security, HTTPException, status
 from fastapi.security import APIKeyHeader
 from config.settings import get_settings
+from middleware.rate_limit import ApiKeySet
 
 settings = get_settings()
 api_key_header = APIKeyHeader(name=settings.api_key_header, auto_error=False)
 
+@lru_cache()
+def get_api_keys() -> ApiKeySet:
+    """Configured API keys (built once per process)"""
+    return ApiKeySet(get_settings().api_keys)
+
 async def verify_api_key(api_key: str = Security(api_key_header)):
     """Verify API key from header"""
     if api_key is None:
@@ -13,7 +20,7 @@ async def verify_api_key(api_key: str = Security(api_key_header)):
             detail="API key missing"
         )
     
-    if api_key not in settings.api_keys:
+    if api_key not in get_api_keys():
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid API key"
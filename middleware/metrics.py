@@ -0,0 +1,39 @@
+import time
+
+from utils.metrics import HTTP_REQUEST_SECONDS
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template
+    (no BaseHTTPMiddleware: avoids an extra task and body buffering per request)
+    Routes are labelled by their template, e.g. /api/sensors/current/{sensor_id},
+    so label cardinality is bounded by the number of routes.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
@@ -0,0 +1,193 @@
+import hashlib
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+from config.settings import get_settings
+from utils.metrics import RATE_LIMIT_REQUESTS, REGISTRY
+
+class ApiKeySet:
+    """
+    Configured API keys held as SHA-256 digests
+    Membership is one hash-set lookup on the digest of the presented key,
+    so the time taken does not depend on how much of a real key it shares.
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self._digests = frozenset(self._digest(key) for key in keys)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.sha256(key.encode()).digest()
+
+    def __contains__(self, key: Optional[str]) -> bool:
+        return key is not None and self._digest(key) in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+class TokenBuckets:
+    """
+    Token buckets keyed by any hashable (rate tokens/s, up to burst)
+    Each bucket is [tokens, last update], refilled lazily on access: O(1)
+    per check. A bucket idle for burst / rate seconds is full again, which
+    is the same as having no bucket, so a sweep every sweep_interval seconds
+    drops those and the table only holds recently active clients.
+    """
+
+    def __init__(self, rate: float, burst: float, sweep_interval: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._buckets: Dict[Hashable, List[float]] = {}
+        self._lock = threading.Lock()
+        self._full_after = burst / rate
+        self._next_sweep = clock() + sweep_interval
+
+    def acquire(self, key: Hashable, cost: float = 1.0) -> float:
+        """0.0 when a token was taken, else seconds until one is available"""
+        now = self._clock()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / self.rate
+
+    def refund(self, key: Hashable, cost: float = 1.0):
+        """Give back a token taken for work that turned out not to count"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+
+    def _sweep(self, now: float):
+        cutoff = now - self._full_after
+        for key in [k for k, bucket in self._buckets.items() if bucket[1] <= cutoff]:
+            del self._buckets[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class RateLimiter:
+    """
+    Request budget per client and reading budget per sensor
+    Clients are identified by a valid API key, otherwise by address (so
+    made-up keys share their address's bucket). Buckets are per worker process
+    (see get_rate_limiter). A rate of 0 disables that limit.
+    """
+
+    def __init__(self, api_keys: Iterable[str], client_rate: float, client_burst: float,
+                 sensor_rate: float, sensor_burst: float, sweep_interval: float = 60.0):
+        self.api_keys = ApiKeySet(api_keys)
+        self.clients = (TokenBuckets(client_rate, client_burst, sweep_interval)
+                        if client_rate > 0 else None)
+        self.sensors = (TokenBuckets(sensor_rate, sensor_burst, sweep_interval)
+                        if sensor_rate > 0 else None)
+
+    def check_client(self, api_key: Optional[str], address: Optional[str]) -> float:
+        """0.0 if the request may proceed, else seconds to wait"""
+        if self.clients is None:
+            return 0.0
+        identity = ("key", api_key) if api_key in self.api_keys else ("address", address)
+        return self._record("client", self.clients.acquire(identity))
+
+    def check_sensor(self, sensor_id: str) -> float:
+        """0.0 if the sensor may submit a reading, else seconds to wait"""
+        if self.sensors is None:
+            return 0.0
+        return self._record("sensor", self.sensors.acquire(sensor_id))
+
+    def refund_sensor(self, sensor_id: str):
+        """The reading was a duplicate (gateway retry): it costs no token"""
+        if self.sensors is not None:
+            self.sensors.refund(sensor_id)
+
+    @staticmethod
+    def _record(scope: str, wait: float) -> float:
+        RATE_LIMIT_REQUESTS.inc(scope=scope, result="limited" if wait else "allowed")
+        return wait
+
+def retry_after(wait: float) -> str:
+    """Retry-After header value: whole seconds, rounded up"""
+    return str(max(1, math.ceil(wait)))
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    """
+    Process-wide limiter holding this worker's share of the configured limits
+    Connections are spread over the workers, so each enforces rate / WORKERS
+    (burst / WORKERS, at least one token) and the API as a whole stays close
+    to the configured limit without shared state on the request path.
+    """
+    settings = get_settings()
+    workers = max(1, settings.workers)
+    return RateLimiter(
+        settings.api_keys,
+        client_rate=settings.rate_limit_client_per_second / workers,
+        client_burst=max(1.0, settings.rate_limit_client_burst / workers),
+        sensor_rate=settings.rate_limit_sensor_per_second / workers,
+        sensor_burst=max(1.0, settings.rate_limit_sensor_burst / workers),
+        sweep_interval=settings.rate_limit_sweep_seconds,
+    )
+
+def _bucket_count() -> float:
+    if get_rate_limiter.cache_info().currsize == 0:
+        return 0.0  # not created yet; don't build it from a scrape
+    limiter = get_rate_limiter()
+    return sum(len(table) for table in (limiter.clients, limiter.sensors) if table is not None)
+
+RATE_LIMIT_BUCKETS = REGISTRY.gauge(
+    "agri_rate_limit_buckets",
+    "Token buckets currently held (clients + sensors)",
+    callback=_bucket_count)
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware: per-client token bucket on /api/ requests
+    Over the limit the request is answered with 429 and Retry-After without
+    reaching the route. Per-sensor limits are checked by the ingest route,
+    which has the parsed sensor_id.
+    """
+
+    def __init__(self, app, prefix: str = "/api/"):
+        self.app = app
+        self.prefix = prefix
+        self.header = get_settings().api_key_header.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        api_key = None
+        for name, value in scope["headers"]:
+            if name == self.header:
+                api_key = value.decode("latin-1")
+                break
+        client = scope.get("client")
+        wait = get_rate_limiter().check_client(api_key, client[0] if client else None)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"retry-after", retry_after(wait).encode())],
+        })
+        await send({"type": "http.response.body",
+                    "body": b'{"detail":"Rate limit exceeded"}'})
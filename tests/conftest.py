@@ -0,0 +1,57 @@
+import pytest
+
+import database
+from middleware.auth import get_api_keys
+from config.settings import get_settings
+from middleware.rate_limit import get_rate_limiter
+from services.anomaly_detector import get_anomaly_detector
+from services.hot_readings import get_hot_readings
+from services.ingest_guard import get_ingest_guard
+from services.sensor_health import get_sensor_health
+from services.shared_cache import get_shared_cache
+from services.single_flight import get_single_flight
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Fresh SQLite database per test"""
+    path = tmp_path / "agri.db"
+    monkeypatch.setattr(database, "DATABASE_URL", str(path))
+    monkeypatch.setattr(get_settings(), "cache_path", str(tmp_path / "cache.db"))
+    get_ingest_guard.cache_clear()
+    get_shared_cache.cache_clear()
+    get_anomaly_detector.cache_clear()
+    get_rate_limiter.cache_clear()
+    get_single_flight.cache_clear()
+    get_hot_readings.cache_clear()
+    get_sensor_health.cache_clear()
+    get_api_keys.cache_clear()
+    database.init_db()
+    return path
+
+@pytest.fixture
+def db(db_path):
+    with database.get_db() as conn:
+        yield conn
+
+@pytest.fixture
+def hot_readings(db_path, monkeypatch):
+    """Hot tier enabled, as in a confirmed single-process deployment"""
+    monkeypatch.setattr(get_settings(), "hot_readings_enabled", True)
+    get_hot_readings.cache_clear()
+    return get_hot_readings()
+
+@pytest.fixture
+def api_key(db_path, monkeypatch):
+    """Headers carrying a configured API key"""
+    monkeypatch.setattr(get_settings(), "api_keys", ["test-admin-key"])
+    get_api_keys.cache_clear()
+    get_rate_limiter.cache_clear()
+    return {get_settings().api_key_header: "test-admin-key"}
+
+@pytest.fixture
+def api_client(db_path):
+    """TestClient bound to the per-test database"""
+    from fastapi.testclient import TestClient
+    from main import app
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+
+from services.anomaly_detector import AnomalyDetector
+
+HOUR = 3600.0
+
+def _feed(detector, values, sensor_id="S1", start=0.0, step=HOUR / 4):
+    flags = []
+    for i, row in enumerate(values):
+        flags.append(int(detector.update_batch([sensor_id], np.array([row]),
+                                               np.array([start + i * step]))[0]))
+    return flags
+
+def _noisy(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(50 + rng.normal(0, 0.5), 25 + rng.normal(0, 0.2), 60 + rng.normal(0, 0.5))
+            for _ in range(n)]
+
+class TestAnomalyDetector:
+    def test_spike_after_warmup_is_flagged(self):
+        detector = AnomalyDetector(warmup=10)
+        _feed(detector, _noisy(30))
+        _feed(detector, [(58.0, 25.0, 60.0)], start=100 * HOUR)
+        assert any("SPIKE" in a and "soil moisture" in a for a in detector.alerts_for("S1"))
+    
+    def test_stuck_probe_is_flagged(self):
+        detector = AnomalyDetector(flatline_readings=5)
+        flags = _feed(detector, [(42.0, 25.0 + i * 0.1, 60.0 + i * 0.1) for i in range(6)])
+        assert flags[-1] and not flags[3]
+        assert any("STUCK PROBE" in a for a in detector.alerts_for("S1"))
+    
+    def test_sudden_drop_violates_rate_limit(self):
+        detector = AnomalyDetector(max_rate_per_hour=(20.0, 8.0, 30.0))
+        _feed(detector, [(60.0, 25.0, 60.0), (45.0, 25.1, 60.5)])  # -60 %/h
+        assert any("RAPID CHANGE" in a for a in detector.alerts_for("S1"))
+    
+    def test_alerts_wait_for_an_update_in_progress(self):
+        detector = AnomalyDetector()
+        _feed(detector, [(60.0, 25.0, 60.0), (45.0, 25.1, 60.5)])
+        alerts = []
+        with detector._lock:  # an update holding the state
+            reader = threading.Thread(target=lambda: alerts.extend(detector.alerts_for("S1")))
+            reader.start()
+            reader.join(0.05)
+            assert reader.is_alive() and alerts == []
+        reader.join()
+        assert any("RAPID CHANGE" in a for a in alerts)
+    
+    def test_batch_with_repeated_sensors_matches_sequential_updates(self):
+        rows = np.array(_noisy(12, seed=3))
+        ids = ["A", "B"] * 6
+        ts = np.repeat(np.arange(6) * 900.0, 2)
+        batched = AnomalyDetector(warmup=2)
+        batched.update_batch(ids, rows, ts)
+        sequential = AnomalyDetector(warmup=2)
+        for i in range(12):
+            sequential.update_batch([ids[i]], rows[i:i + 1], ts[i:i + 1])
+        assert np.allclose(batched._mean[:2], sequential._mean[:2])
+        assert np.allclose(batched._var[:2], sequential._var[:2])
+    
+    def test_recommendation_alerts_include_anomalies(self, api_client):
+        for i, moisture in enumerate([60.0, 30.0]):
+            api_client.post("/api/sensors/data", json={
+                "sensor_id": "DROP", "soil_moisture": moisture, "temperature": 25.0,
+                "humidity": 60.0, "timestamp": f"2026-01-01T12:{i * 15:02d}:00"})
+        alerts = api_client.get("/api/recommendations/DROP").json()["alerts"]
+        assert any("RAPID CHANGE" in a for a in alerts)
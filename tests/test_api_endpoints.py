@@ -1,3 +1,7 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
 from fastapi.testclient import TestClient
 from main import app
 
@@ -39,3 +43,219 @@ class TestSensorEndpoints:
             headers={"X-API-Key": "test-key-123"}
         )
         assert response.status_code == 422
+
+class TestIdempotentIngest:
+    def test_retried_reading_returns_200_and_same_id(self, api_client):
+        payload = {
+            "sensor_id": "RETRY_SENSOR",
+            "soil_moisture": 50.0,
+            "temperature": 25.0,
+            "humidity": 60.0,
+            "timestamp": "2026-01-01T12:00:00"
+        }
+        first = api_client.post("/api/sensors/data", json=payload)
+        retry = api_client.post("/api/sensors/data", json=payload)
+        assert first.status_code == 201
+        assert retry.status_code == 200
+        assert retry.json()["duplicate"] is True
+        assert retry.json()["id"] == first.json()["id"]
+
+class TestRecommendationCache:
+    def test_new_reading_invalidates_cached_recommendation(self, api_client):
+        reading = {"sensor_id": "CACHED", "temperature": 25.0, "humidity": 60.0}
+        api_client.post("/api/sensors/data", json={**reading, "soil_moisture": 50.0})
+        first = api_client.get("/api/recommendations/CACHED").json()
+        assert api_client.get("/api/recommendations/CACHED").json() == first
+        
+        api_client.post("/api/sensors/data", json={**reading, "soil_moisture": 10.0})
+        refreshed = api_client.get("/api/recommendations/CACHED").json()
+        assert refreshed["irrigation"]["action"] == "water_immediately"
+    
+    def test_rolled_back_reading_has_no_side_effects(self, hot_readings, api_client):
+        import database
+        from services.anomaly_detector import get_anomaly_detector
+        from services.data_service import DataService
+        from services.shared_cache import get_shared_cache
+        drop = {"sensor_id": "RB", "soil_moisture": 45.0, "temperature": 25.0,
+                "humidity": 60.0, "timestamp": "2026-01-01T12:15:00"}  # -60 %/h
+        api_client.post("/api/sensors/data", json=dict(drop, soil_moisture=60.0,
+                                                       timestamp="2026-01-01T12:00:00"))
+        api_client.get("/api/recommendations/RB")
+        
+        with pytest.raises(sqlite3.OperationalError):
+            with database.get_db() as conn:
+                DataService(conn).save_sensor_reading("RB", 45.0, 25.0, 60.0,
+                                                      datetime(2026, 1, 1, 12, 15))
+                raise sqlite3.OperationalError("database is locked")  # failed commit
+        assert get_shared_cache().get("recommendation:RB") is not None
+        assert hot_readings.history("RB", 1)[0]["soil_moisture"] == 60.0
+        assert get_anomaly_detector().alerts_for("RB") == []
+        
+        assert api_client.post("/api/sensors/data", json=drop).status_code == 201
+        assert get_shared_cache().get("recommendation:RB") is None
+        assert hot_readings.history("RB", 1)[0]["soil_moisture"] == 45.0
+        assert any("RAPID CHANGE" in a for a in get_anomaly_detector().alerts_for("RB"))
+
+class TestFarmOverview:
+    def test_overview_returns_one_column_per_field(self, api_client):
+        for sensor_id, moisture in [("OV_1", 12.0), ("OV_2", 70.0)]:
+            api_client.post("/api/sensors/data", json={
+                "sensor_id": sensor_id, "soil_moisture": moisture,
+                "temperature": 25.0, "humidity": 60.0})
+        body = api_client.get("/api/overview").json()
+        assert body["count"] == 2
+        assert body["columns"]["sensor_id"] == ["OV_1", "OV_2"]
+        assert body["columns"]["status"] == ["critical", "ok"]
+
+class TestBatchReads:
+    def test_current_batch_coalesces_duplicates(self, api_client):
+        for sensor_id in ("BATCH_1", "BATCH_2"):
+            api_client.post("/api/sensors/data", json={
+                "sensor_id": sensor_id, "soil_moisture": 50.0,
+                "temperature": 25.0, "humidity": 60.0})
+        body = api_client.get("/api/sensors/current",
+                              params={"ids": ["BATCH_1,BATCH_2", "BATCH_1", "NOPE"]}).json()
+        assert list(body["readings"]) == ["BATCH_1", "BATCH_2"]
+        assert body["missing"] == ["NOPE"]
+    
+    def test_recommendations_batch_via_post(self, api_client):
+        api_client.post("/api/sensors/data", json={
+            "sensor_id": "BATCH_DRY", "soil_moisture": 10.0,
+            "temperature": 25.0, "humidity": 60.0})
+        body = api_client.post("/api/recommendations",
+                               json={"sensor_ids": ["BATCH_DRY", "BATCH_DRY"]}).json()
+        assert list(body["recommendations"]) == ["BATCH_DRY"]
+        assert body["recommendations"]["BATCH_DRY"]["irrigation"]["action"] == "water_immediately"
+        single = api_client.get("/api/recommendations/BATCH_DRY").json()
+        assert single == body["recommendations"]["BATCH_DRY"]
+    
+    def test_empty_batch_rejected(self, api_client):
+        assert api_client.get("/api/sensors/current", params={"ids": ","}).status_code == 422
+
+class TestZones:
+    def test_zone_summary_and_recommendation(self, api_key, api_client):
+        for sensor_id, moisture in [("Z_1", 10.0), ("Z_2", 30.0)]:
+            api_client.put(f"/api/sensors/{sensor_id}/metadata",
+                           json={"zone": "east", "plot_area_m2": 50.0}, headers=api_key)
+            api_client.post("/api/sensors/data", json={
+                "sensor_id": sensor_id, "soil_moisture": moisture,
+                "temperature": 25.0, "humidity": 60.0})
+        summary = api_client.get("/api/zones/east/summary").json()
+        assert summary["reporting_count"] == 2
+        assert summary["avg_soil_moisture"] == 20.0
+        assert summary["plot_area_m2"] == 100.0
+        
+        recommendation = api_client.get("/api/zones/east/recommendations").json()
+        assert recommendation["zone"] == "east"
+        assert recommendation["irrigation"]["volume_l"] > 0
+        assert api_client.get("/api/zones/west/summary").status_code == 404
+    
+    def test_zone_volume_follows_each_sensors_crop(self, api_key, api_client):
+        from services.strategies.strategy_factory import StrategyFactory
+        for sensor_id, crop in [("M_1", "tomato"), ("M_2", "lettuce")]:
+            assert api_client.put(f"/api/sensors/{sensor_id}/metadata", json={
+                "zone": "mixed", "crop_type": crop, "plot_area_m2": 40.0}).status_code == 401
+            api_client.put(f"/api/sensors/{sensor_id}/metadata", headers=api_key, json={
+                "zone": "mixed", "crop_type": crop, "plot_area_m2": 40.0})
+            api_client.post("/api/sensors/data", json={
+                "sensor_id": sensor_id, "soil_moisture": 55.0,
+                "temperature": 25.0, "humidity": 60.0})
+        expected = sum(StrategyFactory.get_irrigation_strategy(crop, plot_area_m2=40.0)
+                       .required_volume_l(55.0, 25.0) for crop in ("tomato", "lettuce"))
+        volume = api_client.get("/api/zones/mixed/recommendations").json()["irrigation"]["volume_l"]
+        assert volume == pytest.approx(expected)
+        assert volume > 2 * StrategyFactory.get_irrigation_strategy(
+            "tomato", plot_area_m2=40.0).required_volume_l(55.0, 25.0)
+
+class TestBacktest:
+    def test_backtest_endpoint(self, api_key, api_client):
+        api_client.post("/api/sensors/data", json={
+            "sensor_id": "BT", "soil_moisture": 35.0, "temperature": 25.0, "humidity": 60.0})
+        request = {"candidate": {"SOIL_MOISTURE_LOW": 40}, "sensor_ids": ["BT"], "workers": 1}
+        assert api_client.post("/api/backtest", json=request).status_code == 401
+        report = api_client.post("/api/backtest", json=request, headers=api_key).json()
+        assert report["transitions"] == {"monitor->water": 1}
+        assert api_client.post("/api/backtest", json=dict(request, candidate={"BOGUS": 1}),
+                               headers=api_key).status_code == 422
+    
+    def test_backtest_request_is_capped(self, api_key, api_client):
+        request = {"candidate": {"SOIL_MOISTURE_LOW": 40}, "sensor_ids": ["BT"]}
+        too_long = dict(request, start="2026-01-01T00:00:00", end="2026-03-01T00:00:00")
+        assert api_client.post("/api/backtest", json=too_long,
+                               headers=api_key).status_code == 422
+        too_many = dict(request, sensor_ids=[f"S{i}" for i in range(101)])
+        assert api_client.post("/api/backtest", json=too_many,
+                               headers=api_key).status_code == 422
+        assert api_client.post("/api/backtest", json=dict(request, sensor_ids=[]),
+                               headers=api_key).status_code == 422
+
+class TestSimulation:
+    def test_what_if_plans(self, api_client):
+        api_client.post("/api/sensors/data", json={
+            "sensor_id": "SIM", "soil_moisture": 30.0, "temperature": 25.0, "humidity": 60.0})
+        body = api_client.post("/api/simulate", json={
+            "sensor_ids": ["SIM", "GHOST"], "hours": 12, "include_trajectories": True,
+            "plans": [{"name": "dry"},
+                      {"name": "water", "irrigation": [{"hour": 0, "volume_l": 300}]}],
+        }).json()
+        assert body["sensor_ids"] == ["SIM"] and body["missing"] == ["GHOST"]
+        dry, water = body["plans"]
+        assert len(dry["trajectory"][0]) == 13
+        assert water["final_moisture"][0] > dry["final_moisture"][0]
+        assert api_client.post("/api/simulate", json={
+            "sensor_ids": ["SIM"], "hours": 2,
+            "plans": [{"name": "late", "irrigation": [{"hour": 5, "volume_l": 1}]}],
+        }).status_code == 422
+
+class TestForecasts:
+    def test_sensors_going_critical(self, api_key, api_client):
+        from datetime import datetime, timedelta
+        now = datetime.utcnow().replace(microsecond=0)
+        for h in range(5):
+            api_client.post("/api/sensors/data", json={
+                "sensor_id": "DRYING", "soil_moisture": 30.0 - 2.0 * h, "temperature": 25.0,
+                "humidity": 60.0, "timestamp": (now - timedelta(hours=4 - h)).isoformat()})
+        body = api_client.get("/api/forecasts/crossing", params={"hours": 6}).json()
+        assert [s["sensor_id"] for s in body["sensors"]] == ["DRYING"]
+        assert api_client.post("/api/admin/forecasts/rebuild").status_code == 401
+        assert api_client.post("/api/admin/forecasts/rebuild",
+                               headers=api_key).json() == {"sensors": 1}
+        assert api_client.get("/api/sensors/DRYING/forecast").json()["n_points"] == 5
+
+class TestIrrigationSchedule:
+    def test_schedule_under_budget(self, api_client):
+        for sensor_id, moisture in [("SCH_DRY", 15.0), ("SCH_LOW", 35.0), ("SCH_WET", 75.0)]:
+            api_client.post("/api/sensors/data", json={
+                "sensor_id": sensor_id, "soil_moisture": moisture,
+                "temperature": 25.0, "humidity": 60.0})
+        body = api_client.get("/api/irrigation/schedule",
+                              params={"budget_l": 15_000, "pump_l_per_hour": 10_000}).json()
+        assert body["units"] == 3
+        assert [s["sensor_id"] for s in body["scheduled"]] == ["SCH_DRY", "SCH_LOW"]
+        assert body["scheduled"][0]["start_hour"] == 0
+        # 100 m² x 0.3 m plots: 13,500 L and 7,500 L to reach 60%
+        assert body["requested_l"] == 21_000
+        assert body["allocated_l"] == 15_000
+        assert body["deferred"] == ["SCH_LOW"]
+
+class TestRecommendationAnalytics:
+    def test_history_and_analytics_endpoints(self, api_key, api_client):
+        api_client.put("/api/sensors/RA_DRY/metadata", json={"zone": "east"}, headers=api_key)
+        api_client.post("/api/sensors/data", json={
+            "sensor_id": "RA_DRY", "soil_moisture": 15.0, "temperature": 25.0, "humidity": 60.0})
+        api_client.get("/api/recommendations/RA_DRY")
+        
+        history = api_client.get("/api/recommendations/history",
+                                 params={"zone": "east", "explanations": True}).json()
+        assert history["count"] == 1
+        assert history["recommendations"][0]["action"] == "water_immediately"
+        assert "Critical" in history["recommendations"][0]["irrigation_explanation"]
+        
+        body = api_client.get("/api/recommendations/analytics",
+                              params={"action": "water_immediately"}).json()
+        assert body["groups"][0]["zone"] == "east"
+        assert body["groups"][0]["actions"]["water_immediately"] == 1
+        assert api_client.get("/api/recommendations/analytics",
+                              params={"group_by": "bogus"}).status_code == 422
+        assert api_client.get("/api/recommendations/history",
+                              params={"alert": "bogus"}).status_code == 422
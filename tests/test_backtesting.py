@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import database
+from services.backtesting import ACTIONS, ALERTS, evaluate_rules, run_backtest
+from services.data_service import DataService
+from services.decision_engine import DecisionEngine
+from services.ingest_guard import IngestGuard
+
+_ALERT_PREFIX = dict(zip(ALERTS, ("⚠️ DROUGHT", "⚠️ OVERWATERING", "🌡️ HEAT",
+                                  "❄️ COLD", "💨 LOW HUMIDITY")))
+
+@pytest.fixture
+def readings(db):
+    rng = np.random.default_rng(7)
+    service = DataService(db, IngestGuard())
+    t0 = datetime(2026, 1, 1)
+    for i in range(400):
+        service.save_sensor_reading(f"S{i % 8}", float(rng.uniform(0, 100)),
+                                    float(rng.uniform(0, 40)), float(rng.uniform(20, 95)),
+                                    t0 + timedelta(minutes=15 * i))
+    db.commit()
+    return db
+
+class TestVectorizedRules:
+    @pytest.mark.parametrize("rules", [{}, {"SOIL_MOISTURE_LOW": 45, "HEAT_STRESS_TEMP": 32}])
+    def test_matches_decision_engine(self, rules):
+        engine = DecisionEngine(rules)
+        rng = np.random.default_rng(1)
+        values = np.round(rng.uniform((0, -10, 10), (100, 45, 100), size=(500, 3)), 1)
+        actions, amounts, alerts = evaluate_rules(engine.rules, *values.T)
+        for row, action, amount, flags in zip(values, actions, amounts, alerts):
+            reading = dict(sensor_id="S", soil_moisture=row[0], temperature=row[1], humidity=row[2])
+            expected = engine.generate_recommendation(reading, [])
+            assert ACTIONS[action] == expected["irrigation"]["action"]
+            assert amount == expected["irrigation"]["amount_ml"]
+            fired = [a for a, flag in zip(ALERTS, flags) if flag]
+            assert [a for a in ALERTS if any(t.startswith(_ALERT_PREFIX[a])
+                                             for t in expected["alerts"])] == fired
+    
+    def test_unknown_rule_rejected(self):
+        with pytest.raises(ValueError):
+            DecisionEngine({"NOT_A_RULE": 1})
+
+class TestRunBacktest:
+    def test_identical_rule_sets_change_nothing(self, readings):
+        report = run_backtest(str(database.DATABASE_URL), {}, workers=1)
+        assert report["readings"] == 400
+        assert report["changed_readings"] == 0
+        assert all(v == 0 for v in report["diff"]["actions"].values())
+    
+    def test_pool_matches_single_process(self, readings):
+        candidate = {"SOIL_MOISTURE_LOW": 50, "SOIL_MOISTURE_CRITICAL": 25}
+        single = run_backtest(str(database.DATABASE_URL), candidate, workers=1)
+        pooled = run_backtest(str(database.DATABASE_URL), candidate, workers=2)
+        for key in ("readings", "baseline", "candidate", "diff", "transitions"):
+            assert single[key] == pooled[key]
+        assert single["diff"]["water_l"] > 0
+        assert single["transitions"]["monitor->water"] > 0
+    
+    def test_window_and_sensor_filter(self, readings):
+        report = run_backtest(str(database.DATABASE_URL), {}, workers=1,
+                              start=datetime(2026, 1, 1), end=datetime(2026, 1, 1, 23, 59),
+                              sensor_ids=["S0", "S1"])
+        assert report["readings"] == 24
@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from config.settings import get_settings
+from services.backup import (BackupInProgress, backup_database, list_backups,
+                             refresh_snapshot, scheduled_backup)
+
+T0 = datetime(2026, 2, 1)
+
+def _fill(path, count, start=0):
+    conn = sqlite3.connect(path)
+    conn.executemany("""
+        INSERT INTO sensor_readings (sensor_id, soil_moisture, temperature, humidity, timestamp)
+        VALUES (?, 50, 20, 60, ?)
+    """, [(f"S{i % 50}", (T0 + timedelta(seconds=i)).isoformat(" "))
+          for i in range(start, start + count)])
+    conn.commit()
+    conn.close()
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0]
+    finally:
+        conn.close()
+
+class TestOnlineBackup:
+    def test_stepped_copy_is_consistent_while_ingestion_continues(self, db_path, tmp_path,
+                                                                  monkeypatch):
+        monkeypatch.setattr(get_settings(), "backup_pages_per_step", 8)
+        monkeypatch.setattr(get_settings(), "backup_step_pause_seconds", 0.002)
+        _fill(db_path, 20_000)
+        written, stop = [], threading.Event()
+
+        def ingest():
+            while not stop.is_set():
+                _fill(db_path, 1, start=100_000 + len(written))
+                written.append(1)
+
+        writer = threading.Thread(target=ingest)
+        writer.start()
+        try:
+            time.sleep(0.05)
+            before = len(written)
+            result = backup_database(str(db_path), tmp_path / "copy.db", verify=True)
+            during = len(written) - before
+        finally:
+            stop.set()
+            writer.join()
+
+        assert result["steps"] > 10 and during > 0  # writers were never blocked
+        copied = _count(tmp_path / "copy.db")
+        assert 20_000 + before <= copied <= 20_000 + before + during
+        conn = sqlite3.connect(tmp_path / "copy.db")
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        conn.close()
+        assert not (tmp_path / "copy.db.partial").exists()
+
+    def test_scheduled_backups_are_pruned_and_claimed(self, db_path, tmp_path):
+        directory = tmp_path / "backups"
+        for hour in range(4):
+            assert scheduled_backup(str(db_path), directory, 0, keep=2,
+                                    now=T0 + timedelta(hours=hour)) is not None
+        assert [p.name for p in list_backups(directory)] == [
+            "agri-20260201-020000.db", "agri-20260201-030000.db"]
+        assert scheduled_backup(str(db_path), directory, 3600, keep=2) is None  # not due
+
+        partial = directory / "backup.partial"
+        partial.touch()  # another worker is copying
+        assert scheduled_backup(str(db_path), directory, 0, keep=2) is None
+        (tmp_path / "x.db.partial").touch()
+        with pytest.raises(BackupInProgress):
+            backup_database(str(db_path), tmp_path / "x.db")
+        os.utime(partial, (0, 0))  # left behind by a crashed copy
+        assert scheduled_backup(str(db_path), directory, 0, keep=2) is not None
+
+    def test_snapshot_refresh_respects_age(self, db_path, tmp_path):
+        snapshot = tmp_path / "snapshot.db"
+        assert refresh_snapshot(str(db_path), snapshot, 3600) is not None
+        assert refresh_snapshot(str(db_path), snapshot, 3600) is None
+        _fill(db_path, 5)
+        assert _count(snapshot) == 0
+        refresh_snapshot(str(db_path), snapshot, 0)
+        assert _count(snapshot) == 5
+
+class TestSnapshotApi:
+    def _post(self, api_client, minute):
+        return api_client.post("/api/sensors/data", json={
+            "sensor_id": "SNAP", "soil_moisture": 40.0, "temperature": 20.0, "humidity": 60.0,
+            "timestamp": (T0 + timedelta(minutes=minute)).isoformat()})
+
+    def test_analytics_reads_come_from_the_snapshot(self, api_key, api_client, tmp_path,
+                                                    monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "backup_dir", str(tmp_path / "backups"))
+        monkeypatch.setattr(settings, "snapshot_path", str(tmp_path / "snapshot.db"))
+        assert api_client.post("/api/admin/snapshot/refresh", headers=api_key).status_code == 404
+        monkeypatch.setattr(settings, "snapshot_enabled", True)
+
+        assert self._post(api_client, 0).status_code == 201
+        assert api_client.get("/api/sensors/stats/SNAP").json()["count"] == 1  # no snapshot yet: live
+        assert api_client.post("/api/admin/snapshot/refresh", headers=api_key).status_code == 200
+        assert self._post(api_client, 1).status_code == 201
+        assert api_client.get("/api/sensors/stats/SNAP").json()["count"] == 1
+        assert len(api_client.get("/api/sensors/history/SNAP").json()["readings"]) == 2
+
+        backup = api_client.post("/api/admin/backup", headers=api_key).json()
+        listing = api_client.get("/api/admin/backups", headers=api_key).json()
+        assert [b["path"] for b in listing["backups"]] == [backup["path"]]
+        assert listing["snapshot"]["age_seconds"] is not None
+
+    def test_admin_routes_require_an_api_key(self, api_key, api_client, tmp_path, monkeypatch):
+        monkeypatch.setattr(get_settings(), "backup_dir", str(tmp_path / "backups"))
+        for method, path in (("post", "/api/admin/backup"), ("get", "/api/admin/backups"),
+                             ("post", "/api/admin/snapshot/refresh")):
+            assert api_client.request(method, path).status_code == 401
+            assert api_client.request(method, path,
+                                      headers={"X-API-Key": "made-up"}).status_code == 403
+        assert not (tmp_path / "backups").exists()
@@ -0,0 +1,171 @@
+import csv
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import import_readings
+from services import bulk_import
+from services.bulk_import import ReadingImporter, connect, validate_chunk
+from services.data_service import DataService
+
+T0 = datetime(2025, 6, 1, 0, 0)
+HEADER = ["sensor_id", "soil_moisture", "temperature", "humidity", "timestamp"]
+
+def _rows(sensors=3, per_sensor=10):
+    return [[f"S{s}", f"{30 + i:.1f}", "21.5", "60", (T0 + timedelta(minutes=15 * i)).isoformat(" ")]
+            for i in range(per_sensor) for s in range(sensors)]
+
+def _write(path, rows, header=HEADER):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+def _count(conn, table="sensor_readings"):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def _latest(conn):
+    return [tuple(row) for row in conn.execute("""
+        SELECT sensor_id, reading_id, soil_moisture, timestamp FROM sensor_latest ORDER BY sensor_id
+    """)]
+
+class TestValidation:
+    def test_rejects_what_the_api_rejects(self):
+        rows, rejects = validate_chunk({
+            "sensor_id": ["A", "", "B", "C", "D", "E"],
+            "soil_moisture": ["40", "40", "140", "x", "40", "40"],
+            "temperature": ["20", "20", "20", "20", "20", "20"],
+            "humidity": ["50", "50", "50", "50", "50", "50"],
+            "timestamp": ["2025-06-01T10:00:00", "2025-06-01 10:00", "2025-06-01 10:00",
+                          "2025-06-01 10:00", "yesterday", "2025-06-01T12:00:00+02:00"],
+        })
+        assert rows == [("A", 40.0, 20.0, 50.0, "2025-06-01 10:00:00"),
+                        ("E", 40.0, 20.0, 50.0, "2025-06-01 10:00:00")]
+        assert [(index, reason.split(":")[0]) for index, reason in rejects] == [
+            (1, "sensor_id"), (2, "soil_moisture"), (3, "soil_moisture"), (4, "timestamp")]
+
+class TestReadingImporter:
+    def test_deferred_load_matches_ingest_state(self, db_path, tmp_path):
+        with database.get_db() as conn:
+            DataService(conn).upsert_sensor_metadata("S0", zone="north")
+        rows = _rows()
+        rows[4] = ["S1", "-3", "21", "60", rows[4][4]]  # out of range
+        rows.append(rows[0])  # retried row, several chunks later
+        rejected = []
+        conn = connect(str(db_path))
+        importer = ReadingImporter(conn, chunk_rows=7,
+                                   on_reject=lambda *reject: rejected.append(reject[1:3]))
+        result = importer.import_file(_write(tmp_path / "history.csv", rows))
+        assert conn.execute("SELECT COUNT(*) FROM import_deferred_indexes").fetchone()[0] == 1
+
+        summary = importer.finish()
+        assert (result["rows_read"], result["rows_loaded"], result["rows_rejected"]) == (31, 30, 1)
+        assert rejected == [(5, "soil_moisture: not a number within [0, 100]")]
+        assert summary["duplicates_removed"] == 1 and summary["forecasts_refit"] == 3
+        assert _count(conn) == 29
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'sensor_readings' AND type = 'index'")}
+        assert "idx_sensor_readings_unique" in indexes
+
+        incremental = _latest(conn)
+        database.refresh_latest_state(conn)
+        assert incremental == _latest(conn)
+        assert incremental[0][2:] == (39.0, "2025-06-01 02:15:00")
+        zone = conn.execute("SELECT reporting_count, moisture_sum FROM zone_state").fetchone()
+        assert tuple(zone) == (1, 39.0)
+        conn.close()
+
+    def test_interrupted_import_resumes_exactly_once(self, db_path, tmp_path, monkeypatch):
+        path = _write(tmp_path / "history.csv", _rows(sensors=4, per_sensor=25))
+        load = ReadingImporter._load
+        calls = []
+
+        def failing(self, rows, deferred):
+            calls.append(len(rows))
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return load(self, rows, deferred)
+
+        conn = connect(str(db_path))
+        monkeypatch.setattr(ReadingImporter, "_load", failing)
+        with pytest.raises(KeyboardInterrupt):
+            ReadingImporter(conn, chunk_rows=30).import_file(path)
+        assert _count(conn) == 60
+        monkeypatch.setattr(ReadingImporter, "_load", load)
+
+        importer = ReadingImporter(conn, chunk_rows=30)
+        result = importer.import_file(path)
+        importer.finish()
+        assert (result["rows_read"], result["rows_loaded"]) == (100, 100)
+        assert _count(conn) == 100 and importer.finish()["duplicates_removed"] == 0
+        assert ReadingImporter(conn).import_file(path)["skipped"]
+        conn.close()
+
+    def test_keeps_indexes_next_to_existing_data(self, db_path, tmp_path):
+        with database.get_db() as conn:
+            stored = DataService(conn).save_sensor_reading("S0", 12.0, 20.0, 50.0,
+                                                           T0 + timedelta(days=1))
+        rows = _rows(sensors=2, per_sensor=5)
+        rows.append(["S0", "99", "20", "50", (T0 + timedelta(days=1)).isoformat()])
+
+        conn = connect(str(db_path))
+        importer = ReadingImporter(conn, chunk_rows=4)
+        result = importer.import_file(_write(tmp_path / "history.csv", rows))
+        importer.finish()
+        assert (result["rows_loaded"], result["rows_duplicate"]) == (10, 1)
+        assert conn.execute("SELECT COUNT(*) FROM import_deferred_indexes").fetchone()[0] == 0
+        assert _latest(conn)[0] == ("S0", stored["id"], 12.0, stored["timestamp"].isoformat(" "))
+        conn.close()
+
+    def test_column_mapping_and_missing_columns(self, db_path, tmp_path):
+        header = ["probe", "vwc", "temperature", "humidity", "timestamp"]
+        path = _write(tmp_path / "logger.csv", _rows(sensors=1, per_sensor=3), header)
+        conn = connect(str(db_path))
+        with pytest.raises(ValueError, match="missing column"):
+            ReadingImporter(conn).import_file(path)
+        result = ReadingImporter(conn).import_file(
+            path, columns={"sensor_id": "probe", "soil_moisture": "vwc"})
+        assert result["rows_loaded"] == 3
+        with pytest.raises(ValueError, match="unsupported"):
+            ReadingImporter(conn).import_file(_write(tmp_path / "data.txt", []))
+        conn.close()
+
+    def test_parquet(self, db_path, tmp_path):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        rows = _rows(sensors=2, per_sensor=6)
+        table = pa.table({"sensor_id": [r[0] for r in rows],
+                          "soil_moisture": [float(r[1]) for r in rows],
+                          "temperature": [21.5] * len(rows), "humidity": [60.0] * len(rows),
+                          "timestamp": [datetime.fromisoformat(r[4]) for r in rows]})
+        pq.write_table(table, tmp_path / "history.parquet")
+        conn = connect(str(db_path))
+        result = ReadingImporter(conn, chunk_rows=5).import_file(tmp_path / "history.parquet")
+        assert result["rows_loaded"] == 12
+        conn.close()
+
+class TestImportCli:
+    def test_import_with_rejects_file(self, db_path, tmp_path, capsys):
+        rows = _rows(sensors=2, per_sensor=3) + [["S9", "50", "99", "50", T0.isoformat()]]
+        path = _write(tmp_path / "history.csv", rows)
+        import_readings.main([str(path), "--rejects", str(tmp_path / "rejects.csv")])
+        output = json.loads(capsys.readouterr().out)
+        assert output["files"][0]["rows_loaded"] == 6
+        with open(tmp_path / "rejects.csv") as f:
+            rejects = list(csv.reader(f))
+        assert rejects[0][:3] == ["source", "row", "reason"]
+        assert rejects[1][1:3] == ["7", "temperature: not a number within [-50, 60]"]
+
+        import_readings.main(["--status"])
+        status = json.loads(capsys.readouterr().out)
+        assert status["files"][0]["done"] == 1 and status["deferred_indexes"] == []
+
+def test_module_bounds_match_api():
+    from main import SensorDataRequest
+    fields = SensorDataRequest.__fields__
+    for name, (low, high) in bulk_import.METRIC_RANGES.items():
+        assert (fields[name].field_info.ge, fields[name].field_info.le) == (low, high)
+    assert fields["sensor_id"].field_info.max_length == bulk_import.SENSOR_ID_MAX_LENGTH
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import migrations
+from config.settings import get_settings
+from migrations import migrate, migration_status
+from services.backtesting import run_backtest
+from services.bulk_import import ReadingImporter, connect
+from services.compact_storage import readings_layout
+from services.data_service import DataService
+
+T0 = datetime(2026, 3, 1)
+
+def _fill(conn, sensors=3, per_sensor=40):
+    conn.executemany("""
+        INSERT INTO sensor_readings (sensor_id, soil_moisture, temperature, humidity, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(f"S{s}", 20 + (i * 7 + s) % 60 / 2, -5 + i % 30 * 1.5, 40 + i % 11 * 0.1,
+           (T0 + timedelta(minutes=15 * i)).isoformat(" "))
+          for s in range(sensors) for i in range(per_sensor)])
+    database.refresh_latest_state(conn)
+
+def _answers(conn):
+    service = DataService(conn, hot=None)
+    service.hot = None
+    strip = lambda rows: [{k: v for k, v in row.items() if k != "created_at"} for row in rows]
+    return {
+        "history": strip(service.get_sensor_history("S1", 25)),
+        "recent": {s: strip(h) for s, h in service.get_recent_histories(["S0", "S2"], 5).items()},
+        "latest": strip(service.get_latest_readings(["S0", "S1"]).values()),
+        "stats": service.get_sensor_stats("S2", start=T0 + timedelta(hours=1, microseconds=1),
+                                          end=T0 + timedelta(hours=6)),
+        "chart": service.get_sensor_history_downsampled("S0", 10, start=T0),
+        "keys": service.get_readings_by_keys([("S1", (T0 + timedelta(minutes=30)).isoformat(" "))]),
+    }
+
+class _Interrupt(Exception):
+    pass
+
+@pytest.fixture
+def compact(db_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "compact_storage", True)
+    database.init_db()
+    return db_path
+
+class TestConversion:
+    def test_reads_match_the_row_layout(self, db_path, monkeypatch):
+        with database.get_db() as conn:
+            _fill(conn)
+            conn.execute("DELETE FROM sensor_readings WHERE id = (SELECT MAX(id) FROM sensor_readings)")
+            before = _answers(conn)
+        assert migrate(str(db_path)) == []  # optional: off by default
+        monkeypatch.setattr(get_settings(), "compact_storage", True)
+        assert migrate(str(db_path), chunk_rows=50, pause_seconds=0) == [7]
+        assert migrate(str(db_path)) == []
+
+        with database.get_db() as conn:
+            assert readings_layout(conn).compact
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == migrations.latest_version()
+            assert conn.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0] == 119
+            assert _answers(conn) == before
+            conn.execute("""
+                INSERT INTO sensor_readings (sensor_id, soil_moisture, temperature, humidity, timestamp)
+                VALUES ('NEW', 33.33, 20, 50, '2026-03-02 10:00:00.5+01:00')
+            """)
+            row = conn.execute("SELECT * FROM sensor_readings WHERE sensor_id = 'NEW'").fetchone()
+        assert row["id"] == 121  # AUTOINCREMENT does not reuse the deleted id
+        assert (row["soil_moisture"], row["timestamp"]) == (33.3, "2026-03-02 09:00:00")
+
+    def test_online_conversion_keeps_concurrent_writes(self, db_path, monkeypatch):
+        with database.get_db() as conn:
+            _fill(conn)
+        monkeypatch.setattr(get_settings(), "compact_storage", True)
+        pauses = []
+
+        def ingest_between_chunks(seconds):
+            pauses.append(seconds)
+            if len(pauses) == 2:
+                with database.get_db() as conn:
+                    service = DataService(conn, hot=None)
+                    service.save_sensor_reading("LIVE", 30.0, 20.0, 50.0, T0)
+                    # Same second as a stored reading not copied yet: first copy wins
+                    service.save_sensor_reading("S2", 99.0, 20.0, 50.0,
+                                                T0 + timedelta(microseconds=500))
+                    conn.execute("DELETE FROM sensor_readings WHERE id = 2")
+            if len(pauses) == 3:
+                raise _Interrupt()
+
+        monkeypatch.setattr(migrations.time, "sleep", ingest_between_chunks)
+        with pytest.raises(_Interrupt):
+            migrate(str(db_path), chunk_rows=30)
+        assert migration_status(str(db_path))["in_progress"][0]["phase"] == "copy"
+        monkeypatch.setattr(migrations.time, "sleep", lambda seconds: None)
+        assert migrate(str(db_path), chunk_rows=30) == [7]
+
+        with database.get_db() as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM sensor_readings ORDER BY id")]
+            assert ids == [i for i in range(1, 122) if i != 2]
+            assert conn.execute("SELECT soil_moisture FROM sensor_readings WHERE id = 81"
+                                ).fetchone()[0] != 99.0
+            latest = DataService(conn, hot=None).get_latest_readings(["LIVE", "S0"])
+            assert latest["LIVE"]["id"] == 121
+            objects = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert not any("__" in name or name.startswith("readings_compact_") for name in objects)
+        assert migration_status(str(db_path))["in_progress"] == []
+
+    def test_resume_after_swap_drops_retired_table(self, db_path, monkeypatch):
+        with database.get_db() as conn:
+            _fill(conn)
+        monkeypatch.setattr(get_settings(), "compact_storage", True)
+
+        def interrupt_once_swapped(seconds):
+            with database.get_db() as conn:
+                if conn.execute("SELECT 1 FROM sqlite_master "
+                                "WHERE name = 'sensor_readings__retired'").fetchone():
+                    raise _Interrupt()
+
+        monkeypatch.setattr(migrations.time, "sleep", interrupt_once_swapped)
+        with pytest.raises(_Interrupt):
+            migrate(str(db_path), chunk_rows=30)
+        assert migration_status(str(db_path))["in_progress"][0]["phase"] == "drop"
+        monkeypatch.setattr(migrations.time, "sleep", lambda seconds: None)
+        assert migrate(str(db_path), chunk_rows=30) == [7]
+        with database.get_db() as conn:
+            objects = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert "sensor_readings__retired" not in objects
+
+    def test_same_second_readings_collapse(self, db_path, monkeypatch):
+        with database.get_db() as conn:
+            for fraction in (0.1, 0.6):
+                DataService(conn).save_sensor_reading("S", 30.0, 20.0, 50.0,
+                                                      T0 + timedelta(seconds=fraction))
+        monkeypatch.setattr(get_settings(), "compact_storage", True)
+        migrate(str(db_path))
+        with database.get_db() as conn:
+            rows = conn.execute("SELECT id, timestamp FROM sensor_readings").fetchall()
+            assert [tuple(row) for row in rows] == [(1, "2026-03-01 00:00:00")]
+            assert conn.execute("SELECT reading_id FROM sensor_latest").fetchone()[0] == 1
+
+class TestCompactService:
+    def test_ingest_is_transparent(self, compact, api_client):
+        payload = {"sensor_id": "C1", "soil_moisture": 41.26, "temperature": 19.94,
+                   "humidity": 60.0, "timestamp": "2026-03-01T12:00:00.250+02:00"}
+        first = api_client.post("/api/sensors/data", json=payload)
+        assert first.status_code == 201
+        assert (first.json()["soil_moisture"], first.json()["timestamp"]) == (41.3, "2026-03-01T10:00:00")
+        retry = api_client.post("/api/sensors/data", json=dict(payload, timestamp="2026-03-01T10:00:00.9"))
+        assert retry.status_code == 200 and retry.json()["id"] == first.json()["id"]
+
+        history = api_client.get("/api/sensors/history/C1").json()["readings"]
+        assert [(r["soil_moisture"], r["temperature"], r["timestamp"]) for r in history] == [
+            (41.3, 19.9, "2026-03-01 10:00:00")]
+        assert api_client.get("/api/sensors/stats/C1").json()["count"] == 1
+        assert api_client.get("/api/recommendations/C1").status_code == 200
+
+    def test_bulk_import_and_backtest(self, compact, tmp_path):
+        path = tmp_path / "history.csv"
+        path.write_text("sensor_id,soil_moisture,temperature,humidity,timestamp\n" + "".join(
+            f"S{i % 2},{10 + i * 0.55},25,50,{(T0 + timedelta(hours=i)).isoformat()}.7\n"
+            for i in range(20)))
+        conn = connect(str(compact))
+        importer = ReadingImporter(conn, chunk_rows=6)
+        assert importer.import_file(path)["rows_loaded"] == 20
+        importer.finish()
+        latest = conn.execute("SELECT soil_moisture, timestamp FROM sensor_latest ORDER BY sensor_id")
+        assert [tuple(row) for row in latest] == [(19.9, "2026-03-01 18:00:00"),
+                                                 (20.5, "2026-03-01 19:00:00")]
+        conn.close()
+
+        report = run_backtest(str(compact), {"SOIL_MOISTURE_CRITICAL": 15}, workers=1)
+        assert report["readings"] == 20
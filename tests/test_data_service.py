@@ -0,0 +1,210 @@
+from datetime import datetime, timedelta
+
+from services.data_service import DataService
+from services.ingest_guard import IngestGuard
+
+def _save(service, ts, moisture=50.0, sensor_id="S1"):
+    return service.save_sensor_reading(sensor_id, moisture, 25.0, 60.0, ts)
+
+class TestIngestDedup:
+    def test_retry_returns_stored_reading(self, db):
+        service = DataService(db, IngestGuard())
+        ts = datetime(2026, 1, 1, 12, 0)
+        first = _save(service, ts)
+        retry = _save(service, ts)
+        assert retry["duplicate"] is True
+        assert retry["id"] == first["id"]
+        count = db.execute("SELECT COUNT(*) FROM sensor_readings").fetchone()[0]
+        assert count == 1
+    
+    def test_duplicate_detected_after_lru_eviction(self, db):
+        service = DataService(db, IngestGuard(capacity=1))
+        t0 = datetime(2026, 1, 1, 12, 0)
+        _save(service, t0)
+        _save(service, t0 + timedelta(minutes=5))
+        assert _save(service, t0)["duplicate"] is True
+    
+    def test_out_of_order_reading_flagged_late(self, db):
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1, 12, 0)
+        assert _save(service, t0)["late"] is False
+        assert _save(service, t0 - timedelta(minutes=10))["late"] is True
+    
+    def test_late_detection_survives_restart(self, db):
+        t0 = datetime(2026, 1, 1, 12, 0)
+        _save(DataService(db, IngestGuard()), t0)
+        fresh_process = DataService(db, IngestGuard())
+        assert _save(fresh_process, t0 - timedelta(hours=1))["late"] is True
+    
+    def test_listeners_receive_new_readings_only(self, db):
+        guard = IngestGuard()
+        received = []
+        guard.subscribe(received.append)
+        service = DataService(db, guard)
+        ts = datetime(2026, 1, 1, 12, 0)
+        _save(service, ts)
+        _save(service, ts)
+        assert received == []  # not committed yet
+        db.commit()
+        assert len(received) == 1
+
+class TestSensorStats:
+    def test_stats_match_numpy_over_window(self, db):
+        import numpy as np
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1)
+        values = [float(v) for v in range(1, 101)]
+        for i, v in enumerate(values):
+            _save(service, t0 + timedelta(hours=i), moisture=v)
+        
+        stats = service.get_sensor_stats("S1")
+        moisture = stats["metrics"]["soil_moisture"]
+        assert stats["count"] == 100
+        assert moisture["mean"] == 50.5
+        assert moisture["std"] == round(float(np.std(values)), 2)
+        assert (moisture["min"], moisture["p50"], moisture["max"]) == (1.0, 50.0, 100.0)
+        
+        window = service.get_sensor_stats("S1", start=t0 + timedelta(hours=90))
+        assert window["count"] == 10
+        assert window["metrics"]["soil_moisture"]["min"] == 91.0
+    
+    def test_std_does_not_cancel_for_large_values(self, db):
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1)
+        for i, v in enumerate((1e9, 1e9 + 1, 1e9 + 2)):
+            _save(service, t0 + timedelta(hours=i), moisture=v)
+        
+        moisture = service.get_sensor_stats("S1")["metrics"]["soil_moisture"]
+        assert moisture["std"] == 0.82  # sum_sq / n - mean^2 loses every digit here
+        assert moisture["p50"] == 1e9 + 1
+    
+    def test_empty_window(self, db):
+        stats = DataService(db, IngestGuard()).get_sensor_stats("NONE")
+        assert stats["count"] == 0
+        assert stats["metrics"]["temperature"] is None
+
+class TestLatestState:
+    def test_late_reading_does_not_replace_latest(self, db):
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1, 12, 0)
+        _save(service, t0, moisture=55.0)
+        _save(service, t0 - timedelta(hours=1), moisture=15.0)
+        sensors = service.get_all_sensors()
+        assert [s["soil_moisture"] for s in sensors] == [55.0]
+    
+    def test_overview_is_columnar_with_status(self, db):
+        service = DataService(db, IngestGuard())
+        ts = datetime(2026, 1, 1, 12, 0)
+        _save(service, ts, moisture=10.0, sensor_id="A")
+        _save(service, ts, moisture=30.0, sensor_id="B")
+        _save(service, ts, moisture=60.0, sensor_id="C")
+        service.save_recommendation("C", {"irrigation": {"action": "none", "priority": "low"},
+                                          "alerts": ["spike"]})
+        overview = service.get_overview(critical=20.0, low=40.0)
+        assert overview["sensor_id"] == ["A", "B", "C"]
+        assert overview["status"] == ["critical", "warning", "warning"]
+        assert overview["action"] == [None, None, "none"]
+        assert overview["alert_count"] == [0, 0, 1]
+
+class TestBatchReads:
+    def test_batch_reads_match_single_sensor_queries(self, db):
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1, 12, 0)
+        for sensor_id, count in [("A", 15), ("B", 3)]:
+            for i in range(count):
+                _save(service, t0 + timedelta(minutes=15 * i), moisture=30.0 + i, sensor_id=sensor_id)
+        
+        latest = service.get_latest_readings(["A", "B", "NONE"])
+        assert set(latest) == {"A", "B"}
+        assert latest["A"] == service.get_latest_reading("A")
+        
+        histories = service.get_recent_histories(["A", "B", "NONE"], limit=10)
+        assert histories["A"] == service.get_sensor_history("A", 10)
+        assert histories["B"] == service.get_sensor_history("B", 10)
+        assert histories["NONE"] == []
+
+class TestZoneState:
+    def _zone_rows(self, db):
+        return [tuple(row) for row in db.execute("SELECT * FROM zone_state ORDER BY zone")]
+    
+    def test_triggers_match_full_recompute(self, db):
+        import database
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1, 12, 0)
+        service.upsert_sensor_metadata("A", zone="north")
+        _save(service, t0, moisture=30.0, sensor_id="A")
+        _save(service, t0, moisture=50.0, sensor_id="B")
+        service.upsert_sensor_metadata("B", zone="north")
+        service.upsert_sensor_metadata("C", zone="south")
+        _save(service, t0 + timedelta(minutes=15), moisture=40.0, sensor_id="A")
+        service.save_recommendation("B", {"irrigation": {}, "alerts": ["x"]})
+        service.upsert_sensor_metadata("B", zone="south")
+        
+        summary = service.get_zone_summary("south", 100.0, 0.3)
+        assert summary["sensor_count"] == 2
+        assert summary["reporting_count"] == 1
+        assert summary["alerting_count"] == 1
+        assert summary["avg_soil_moisture"] == 50.0
+        assert service.get_zone_summary("north", 100.0, 0.3)["avg_soil_moisture"] == 40.0
+        
+        incremental = [row[:-1] for row in self._zone_rows(db)]
+        database.refresh_zone_state(db)
+        assert [row[:-1] for row in self._zone_rows(db)] == incremental
+    
+    def test_plot_geometry_defaults(self, db):
+        service = DataService(db, IngestGuard())
+        service.upsert_sensor_metadata("A", zone="z", plot_area_m2=250.0, root_depth_m=0.5)
+        service.upsert_sensor_metadata("B", zone="z")
+        summary = service.get_zone_summary("z", 100.0, 0.3)
+        assert summary["plot_area_m2"] == 350.0
+        assert summary["avg_root_depth_m"] == 0.4
+        assert summary["reporting_count"] == 0
+        assert summary["avg_soil_moisture"] is None
+
+class TestRecommendationColumns:
+    def _recommendation(self, action, amount, alerts=(), fertilize=False):
+        return {
+            "irrigation": {"action": action, "amount_ml": amount, "priority": "high",
+                           "explanation": f"{action} now"},
+            "fertilization": {"needed": fertilize, "type": "balanced_NPK" if fertilize else None,
+                              "amount_kg": 2.5 if fertilize else 0, "explanation": "npk"},
+            "alerts": list(alerts),
+        }
+    
+    def test_typed_columns_round_trip(self, db):
+        service = DataService(db, IngestGuard())
+        service.save_recommendation("A", self._recommendation(
+            "water_immediately", 5000, ["⚠️ DROUGHT RISK: dry", "🔧 STUCK PROBE: flat"], True))
+        service.save_recommendations({
+            "A": self._recommendation("monitor", 0),
+            "B": self._recommendation("water", 3000, ["💨 LOW HUMIDITY: 30%"]),
+        })
+        
+        newest, oldest = service.get_recommendations_history("A")
+        assert newest["action"] == "monitor" and newest["alerts"] == []
+        assert oldest["amount_ml"] == 5000 and oldest["fertilization_needed"] is True
+        assert oldest["alerts"] == ["drought", "stuck_probe"]
+        assert oldest["alert_messages"] == ["⚠️ DROUGHT RISK: dry", "🔧 STUCK PROBE: flat"]
+        assert oldest["irrigation_explanation"] == "water_immediately now"
+        assert [r["sensor_id"] for r in service.query_recommendations(alert="low_humidity")] == ["B"]
+    
+    def test_analytics_per_zone(self, db):
+        service = DataService(db, IngestGuard())
+        service.upsert_sensor_metadata("A", zone="north")
+        service.upsert_sensor_metadata("B", zone="south")
+        service.save_recommendations({
+            "A": self._recommendation("water_immediately", 5000, ["⚠️ DROUGHT RISK: dry"]),
+            "B": self._recommendation("water", 3000),
+        })
+        service.save_recommendation("A", self._recommendation("water_immediately", 5000))
+        
+        groups = service.get_recommendation_analytics(group_by="zone")
+        north, south = groups
+        assert north["zone"] == "north" and north["recommendations"] == 2
+        assert north["actions"]["water_immediately"] == 2 and north["water_l"] == 10.0
+        assert north["alerts"]["drought"] == 1 and north["alerted"] == 1
+        assert south["actions"]["water"] == 1
+        filtered = service.get_recommendation_analytics(
+            group_by="zone", action="water_immediately",
+            start=datetime.utcnow() - timedelta(days=7))
+        assert [(g["zone"], g["recommendations"]) for g in filtered] == [("north", 2)]
@@ -46,3 +46,13 @@ class TestIrrigationStrategy:
         }
         result = self.strategy.calculate(reading, [])
         assert result['action'] == expected_action
+
+class TestPlotGeometry:
+    def test_volume_scales_with_sensor_plot(self):
+        from services.strategies.strategy_factory import StrategyFactory
+        default = StrategyFactory.for_sensor(None).required_volume_l(30.0, 25.0)
+        larger = StrategyFactory.for_sensor(
+            {"crop_type": "tomato", "plot_area_m2": 200.0, "root_depth_m": 0.6}
+        ).required_volume_l(30.0, 25.0)
+        assert larger == pytest.approx(default * 4)
+        assert StrategyFactory.for_sensor(None).required_volume_l(95.0, 25.0) == 0
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.data_service import DataService
+from services.downsampling import lttb_indices, minmax_indices
+from services.ingest_guard import IngestGuard
+
+class TestDownsampling:
+    def test_lttb_keeps_endpoints_and_peak(self):
+        x = np.arange(1000)
+        y = np.sin(x / 50.0)
+        y[500] = 10.0  # isolated spike must survive
+        idx = lttb_indices(x, y, 100)
+        assert len(idx) == 100
+        assert idx[0] == 0 and idx[-1] == 999
+        assert 500 in idx
+        assert np.all(np.diff(idx) > 0)
+    
+    def test_short_series_is_returned_unchanged(self):
+        assert list(lttb_indices(np.arange(5), np.ones(5), 10)) == [0, 1, 2, 3, 4]
+    
+    def test_minmax_keeps_every_bucket_extreme(self):
+        y = np.random.default_rng(1).normal(size=1000)
+        idx = minmax_indices(y, 100)
+        assert len(idx) <= 100
+        assert y.argmax() in idx and y.argmin() in idx
+    
+    def test_history_downsampled_from_database(self, db):
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1)
+        for i in range(300):
+            service.save_sensor_reading("S1", 50 + (i % 7), 25.0, 60.0, t0 + timedelta(minutes=i))
+        result = service.get_sensor_history_downsampled("S1", max_points=50, limit=200)
+        assert result["source_points"] == 200
+        assert result["downsampled"] is True
+        assert len(result["readings"]) == 50
+        stamps = [r["timestamp"] for r in result["readings"]]
+        assert stamps == sorted(stamps, reverse=True)
+        assert stamps[0] == str(t0 + timedelta(minutes=299))
+    
+    def test_window_scan_is_capped(self, db):
+        service = DataService(db, IngestGuard())
+        t0 = datetime(2026, 1, 1)
+        for i in range(300):
+            service.save_sensor_reading("S1", 50 + (i % 7), 25.0, 60.0, t0 + timedelta(minutes=i))
+        result = service.get_sensor_history_downsampled("S1", max_points=50, limit=120, start=t0)
+        assert result["source_points"] == 120
+        assert result["truncated"] is True
+        stamps = [r["timestamp"] for r in result["readings"]]
+        assert stamps[0] == str(t0 + timedelta(minutes=299))
+        assert stamps[-1] == str(t0 + timedelta(minutes=180))
+        
+        result = service.get_sensor_history_downsampled("S1", max_points=50, limit=300, start=t0)
+        assert result["source_points"] == 300
+        assert result["truncated"] is False
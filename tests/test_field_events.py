@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+from services.data_service import DataService
+from services.decision_engine import DecisionEngine
+
+NOW = datetime.utcnow().replace(microsecond=0)
+
+def _event(sensor_id="S1", days_ago=0, kind="fertilization", amount_kg=10.0, **extra):
+    return dict({"sensor_id": sensor_id, "kind": kind, "timestamp": NOW - timedelta(days=days_ago),
+                 "product": None, "amount_kg": amount_kg, "n_kg": 1.0, "p_kg": 0.5, "k_kg": 0.5,
+                 "volume_l": 0, "note": None}, **extra)
+
+def _reading(sensor_id="S1"):
+    return {"sensor_id": sensor_id, "soil_moisture": 50.0, "temperature": 22.0, "humidity": 60.0}
+
+class TestFieldEventState:
+    def test_triggers_keep_last_event_and_totals(self, db):
+        service = DataService(db)
+        first, latest, _ = service.record_field_events([
+            _event(days_ago=20, product="NPK 10-5-5"), _event(days_ago=3, product="urea"),
+            _event(days_ago=40, product="compost")])  # logged late
+        service.record_field_events([_event("S2", kind="irrigation", amount_kg=0, volume_l=300)])
+
+        state = service.get_field_state("S1")["fertilization"]
+        assert (state["last_event_id"], state["last_product"]) == (latest["id"], "urea")
+        assert (state["event_count"], state["total_amount_kg"], state["total_n_kg"]) == (3, 30.0, 3.0)
+
+        service.delete_field_event(latest["id"])
+        state = service.get_field_state("S1")["fertilization"]
+        assert (state["last_event_id"], state["event_count"]) == (first["id"], 2)
+        assert set(service.get_field_states(["S1", "S2", "S3"])) == {"S1", "S2"}
+
+        for event in service.get_field_events("S1"):
+            service.delete_field_event(event["id"])
+        assert service.get_field_state("S1") == {}
+
+class TestFertilizationAdvice:
+    def _advice(self, db, events):
+        service = DataService(db)
+        service.record_field_events(events)
+        return DecisionEngine().generate_recommendation(
+            _reading(), [], field_state=service.get_field_state("S1"))["fertilization"]
+
+    def test_days_since_last_application(self, db):
+        advice = self._advice(db, [_event(days_ago=20), _event(days_ago=5)])
+        assert advice["needed"] is False and advice["days_since_application"] == 5.0
+        assert advice["nutrients_applied_kg"] == {"N": 2.0, "P": 1.0, "K": 1.0}
+
+    def test_due_after_interval(self, db):
+        advice = self._advice(db, [_event(days_ago=15)])
+        assert advice["needed"] is True and advice["applications"] == 1
+
+    def test_history_length_no_longer_counts(self):
+        history = [_reading()] * 30
+        advice = DecisionEngine().generate_recommendation(_reading(), history)["fertilization"]
+        assert advice["needed"] is False and advice["days_since_application"] is None
+
+class TestFieldEventApi:
+    def test_events_drive_batch_recommendations(self, api_key, api_client):
+        for sensor_id in ("A", "B"):
+            assert api_client.post("/api/sensors/data", json={
+                "sensor_id": sensor_id, "soil_moisture": 50, "temperature": 22,
+                "humidity": 60}).status_code == 201
+        before = api_client.get("/api/recommendations", params={"ids": "A,B"}).json()
+        assert before["recommendations"]["A"]["fertilization"]["days_since_application"] is None
+
+        response = api_client.post("/api/events/batch", json={"events": [
+            {"sensor_id": "A", "kind": "fertilization", "amount_kg": 5, "n_kg": 1,
+             "timestamp": (NOW - timedelta(days=20)).isoformat() + "+02:00"},
+            {"sensor_id": "B", "kind": "fertilization", "amount_kg": 5,
+             "timestamp": (NOW - timedelta(days=2)).isoformat()},
+        ]}, headers=api_key)
+        assert response.status_code == 201
+        recommendations = api_client.get("/api/recommendations",
+                                         params={"ids": "A,B"}).json()["recommendations"]
+        assert recommendations["A"]["fertilization"]["needed"] is True  # cache invalidated
+        assert recommendations["B"]["fertilization"]["needed"] is False
+        single = api_client.get("/api/recommendations/A").json()["fertilization"]
+        assert single["days_since_application"] == 20.1  # +02:00 stored as UTC
+
+        summary = api_client.get("/api/sensors/A/events/summary").json()
+        assert summary["fertilization"]["total_n_kg"] == 1 and summary["irrigation"] is None
+        event_id = api_client.get("/api/sensors/A/events").json()["events"][0]["id"]
+        assert api_client.delete(f"/api/events/{event_id}").status_code == 401
+        assert api_client.delete(f"/api/events/{event_id}", headers=api_key).status_code == 204
+        assert api_client.delete(f"/api/events/{event_id}", headers=api_key).status_code == 404
+        assert api_client.get("/api/sensors/A/events/summary").json()["fertilization"] is None
+
+    def test_rejects_invalid_or_unauthenticated_events(self, api_key, api_client):
+        for event in ({"sensor_id": "A", "kind": "fertilization"},
+                      {"sensor_id": "A", "kind": "irrigation", "volume_l": 0},
+                      {"sensor_id": "A", "kind": "mowing", "amount_kg": 1}):
+            assert api_client.post("/api/events", json=event, headers=api_key).status_code == 422
+        assert api_client.post("/api/events", json={
+            "sensor_id": "A", "kind": "irrigation", "volume_l": 10}).status_code == 401
+        assert api_client.post("/api/events/batch", json={"events": [
+            {"sensor_id": "A", "kind": "irrigation", "volume_l": 10}]}).status_code == 401
+        assert api_client.get("/api/sensors/A/events").json()["count"] == 0
+
+    def test_cache_is_invalidated_after_the_event_commits(self, api_key, api_client,
+                                                           monkeypatch):
+        import database
+        from services.shared_cache import get_shared_cache
+        committed = []
+
+        def invalidate(sensor_id):
+            with database.get_db() as conn:  # what another worker would read now
+                committed.append(conn.execute("SELECT COUNT(*) FROM field_events").fetchone()[0])
+
+        monkeypatch.setattr(get_shared_cache(), "invalidate_sensor", invalidate)
+        response = api_client.post("/api/events", json={
+            "sensor_id": "A", "kind": "irrigation", "volume_l": 10}, headers=api_key)
+        assert api_client.delete(f"/api/events/{response.json()['id']}",
+                                 headers=api_key).status_code == 204
+        assert committed == [1, 0]
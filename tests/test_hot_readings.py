@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from config.settings import get_settings
+from services.data_service import DataService
+from services.hot_readings import READING_BYTES, HotReadings, get_hot_readings
+
+T0 = datetime(2026, 3, 1, 6, 0)
+
+def _reading(sensor_id, minute, reading_id=None, moisture=40.1):
+    return {"id": reading_id or minute + 1, "sensor_id": sensor_id, "soil_moisture": moisture,
+            "temperature": 21.3, "humidity": 55.7,
+            "timestamp": (T0 + timedelta(minutes=minute)).isoformat(" "),
+            "created_at": "2026-03-01 06:00:00"}
+
+def _minutes(history):
+    return [datetime.fromisoformat(r["timestamp"]).minute for r in history]
+
+class TestHotReadings:
+    def test_ring_keeps_newest_readings(self):
+        hot = HotReadings(per_sensor=4, max_sensors=2)
+        for minute in range(6):
+            hot.add(_reading("A", minute), new_sensor=minute == 0)
+        assert _minutes(hot.history("A", 4)) == [5, 4, 3, 2]
+        assert hot.history("A", 5) is None  # older ones were overwritten
+        assert hot.history("A", 1)[0] == _reading("A", 5)
+        assert hot.nbytes == 2 * 4 * READING_BYTES
+
+    def test_partial_ring_answers_only_what_it_holds(self):
+        hot = HotReadings(per_sensor=8)
+        hot.add(_reading("OLD", 10))  # history before it is in SQLite only
+        hot.add(_reading("OLD", 11))
+        assert _minutes(hot.history("OLD", 2)) == [11, 10]
+        assert hot.history("OLD", 3) is None
+        hot.add(_reading("NEW", 0), new_sensor=True)
+        assert _minutes(hot.history("NEW", 50)) == [0]
+
+    def test_late_readings_are_slotted_by_timestamp(self):
+        hot = HotReadings(per_sensor=3)
+        for minute in (1, 3, 5):
+            hot.add(_reading("A", minute), new_sensor=minute == 1)
+        hot.add(_reading("A", 4))
+        assert _minutes(hot.history("A", 3)) == [5, 4, 3]
+        hot.add(_reading("A", 0))  # older than the newest three
+        assert _minutes(hot.history("A", 3)) == [5, 4, 3]
+
+    def test_least_recently_used_sensor_is_evicted(self):
+        hot = HotReadings(per_sensor=2, max_sensors=2)
+        hot.add(_reading("A", 0))
+        hot.add(_reading("B", 0))
+        hot.history("A", 1)
+        hot.add(_reading("C", 0))
+        assert "B" not in hot and "A" in hot and "C" in hot
+        assert hot.evictions == 1
+
+    def test_unrepresentable_timestamps_fall_back(self):
+        hot = HotReadings(per_sensor=2)
+        hot.add(_reading("A", 0))
+        hot.add(dict(_reading("A", 1), timestamp="2026-03-01 06:01:00.000000+00:00 (UTC)"))
+        assert "A" not in hot and hot.history("A", 1) is None
+
+class TestHotTierDataService:
+    def test_off_unless_single_process_is_confirmed(self, db_path, monkeypatch):
+        assert get_hot_readings() is None
+        monkeypatch.setattr(get_settings(), "hot_readings_enabled", True)
+        monkeypatch.setattr(get_settings(), "workers", 4)
+        get_hot_readings.cache_clear()
+        assert get_hot_readings() is None
+    
+    def test_answers_match_sqlite(self, hot_readings, db):
+        hot = hot_readings
+        service = DataService(db)
+        for minute in (0, 1, 2, 4, 3):  # one late reading
+            service.save_sensor_reading("H1", 30.25 + minute, 20.5, 60.0,
+                                        T0 + timedelta(minutes=minute, microseconds=minute))
+        service.save_sensor_reading("H2", 44.4, 19.9, 70.1, T0)
+        assert "H1" not in hot  # rings are fed on commit
+        db.commit()
+        cold = DataService(db, hot=HotReadings(per_sensor=1, max_sensors=1))
+
+        assert service.get_sensor_history("H1", 10) == cold.get_sensor_history("H1", 10)
+        assert service.get_latest_reading("H1") == cold.get_latest_reading("H1")
+        assert (service.get_recent_histories(["H1", "H2", "NONE"], 3)
+                == cold.get_recent_histories(["H1", "H2", "NONE"], 3))
+        assert service.get_latest_readings(["H2", "NONE"]) == cold.get_latest_readings(["H2", "NONE"])
+        assert "H1" in hot and "H2" in hot
+
+    def test_warm_from_database(self, db):
+        service = DataService(db, hot=HotReadings(per_sensor=3, max_sensors=10))
+        for minute in range(5):
+            service.save_sensor_reading("LONG", 50.0, 20.0, 60.0, T0 + timedelta(minutes=minute))
+        service.save_sensor_reading("SHORT", 50.0, 20.0, 60.0, T0)
+
+        warmed = DataService(db, hot=HotReadings(per_sensor=3, max_sensors=10))
+        assert warmed.warm_hot_readings() == 2
+        assert _minutes(warmed.hot.history("LONG", 3)) == [4, 3, 2]
+        assert warmed.hot.history("LONG", 4) is None
+        assert _minutes(warmed.hot.history("SHORT", 100)) == [0]
@@ -0,0 +1,38 @@
+import math
+
+import numpy as np
+
+from services.irrigation_scheduler import priority_rank, schedule_irrigation
+
+class TestScheduleIrrigation:
+    def test_priority_then_deadline_order(self):
+        plan = schedule_irrigation(
+            deficit_l=[100, 100, 100, 100],
+            priority=[1, 3, 3, 2],
+            hours_to_critical=[math.inf, 10.0, 2.0, 1.0],
+            budget_l=1000, pump_l_per_hour=100, horizon_hours=24)
+        assert plan["start_hour"].tolist() == [3, 1, 0, 2]
+        assert plan["allocated_l"].tolist() == [100, 100, 100, 100]
+    
+    def test_budget_and_pump_capacity(self):
+        plan = schedule_irrigation(
+            deficit_l=[250, 250, 250, 0],
+            priority=[3, 2, 1, 3],
+            hours_to_critical=[math.inf] * 4,
+            budget_l=400, pump_l_per_hour=100, horizon_hours=24)
+        # First unit spans hours 0-2; the second gets the remaining 150 L
+        assert plan["allocated_l"].tolist() == [250, 150, 0, 0]
+        assert plan["start_hour"].tolist() == [0, 2, -1, -1]
+        assert plan["end_hour"].tolist() == [2, 3, -1, -1]
+        np.testing.assert_allclose(plan["hourly_l"][:5], [100, 100, 100, 100, 0])
+    
+    def test_horizon_limits_allocation(self):
+        plan = schedule_irrigation([500, 500], [3, 3], [math.inf, math.inf],
+                                   budget_l=10_000, pump_l_per_hour=100, horizon_hours=6)
+        assert plan["allocated_l"].sum() == 600
+    
+    def test_priority_rank_fallback(self):
+        assert priority_rank("high", 60.0, 20.0, 40.0) == 3
+        assert priority_rank(None, 15.0, 20.0, 40.0) == 3
+        assert priority_rank(None, 30.0, 20.0, 40.0) == 2
+        assert priority_rank(None, 60.0, 20.0, 40.0) == 1
@@ -0,0 +1,21 @@
+from utils.metrics import Registry
+
+class TestMetrics:
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram("t_seconds", "test", ["route"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, route="/a")
+        text = registry.render()
+        assert 't_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 't_seconds_bucket{route="/a",le="1"} 2' in text
+        assert 't_seconds_bucket{route="/a",le="+Inf"} 3' in text
+        assert 't_seconds_count{route="/a"} 3' in text
+    
+    def test_metrics_endpoint_labels_by_route_template(self, api_client):
+        api_client.get("/api/sensors/current/UNKNOWN_1")
+        api_client.get("/api/sensors/current/UNKNOWN_2")
+        body = api_client.get("/metrics").text
+        assert 'route="/api/sensors/current/{sensor_id}"' in body
+        assert "UNKNOWN_1" not in body
+        assert 'agri_db_query_duration_seconds_count{method="get_latest_reading"}' in body
@@ -0,0 +1,288 @@
+import sqlite3
+
+import pytest
+
+import database
+import migrations
+from migrations import Backfill, Migration, RebuildTable, Transactional, migrate
+
+LATEST = migrations.latest_version()
+NEXT = migrations.MIGRATIONS[-1].version + 1
+
+READINGS_V2 = """
+    CREATE TABLE {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sensor_id TEXT NOT NULL,
+        soil_moisture REAL NOT NULL,
+        temperature REAL NOT NULL,
+        humidity REAL NOT NULL,
+        timestamp DATETIME NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        quality INTEGER NOT NULL DEFAULT 1
+    )
+"""
+
+def _retry_readings(path, ids):
+    """Store copies of readings, as a gateway retry did before dedup"""
+    conn = sqlite3.connect(path)
+    conn.execute(f"""
+        INSERT INTO sensor_readings (sensor_id, soil_moisture, temperature, humidity, timestamp)
+        SELECT sensor_id, soil_moisture, temperature, humidity, timestamp FROM sensor_readings
+        WHERE id IN ({", ".join(map(str, ids))}) ORDER BY id
+    """)
+    conn.commit()
+    conn.close()
+
+def _insert_readings(path, start, count):
+    conn = sqlite3.connect(path)
+    conn.executemany("""
+        INSERT INTO sensor_readings (sensor_id, soil_moisture, temperature, humidity, timestamp)
+        VALUES (?, 50, 25, 60, ?)
+    """, [(f"S{i % 3}", f"2024-01-01 00:00:{i:02d}.{start}") for i in range(start, start + count)])
+    conn.commit()
+    conn.close()
+
+class _Interrupt(Exception):
+    pass
+
+class TestMigrations:
+    def test_fresh_database_is_current(self, db_path):
+        status = migrations.migration_status(str(db_path))
+        assert status["version"] == status["latest"] == LATEST
+        assert [m["version"] for m in status["applied"]] == list(range(1, LATEST + 1))
+        assert status["pending"] == [] and status["in_progress"] == []
+
+    def test_current_schema_runs_no_ddl(self, db_path, monkeypatch):
+        statements = []
+        connect = sqlite3.connect
+
+        def traced(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        monkeypatch.setattr(migrations.sqlite3, "connect", traced)
+        database.init_db()
+        assert statements == ["PRAGMA user_version"]
+
+    def test_unversioned_database_is_adopted(self, tmp_path):
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        database.create_baseline_schema(conn)
+        conn.commit()
+        conn.close()
+        _insert_readings(path, 0, 5)
+        _retry_readings(path, [4])
+
+        assert migrate(path) == list(range(1, LATEST + 1))
+        conn = sqlite3.connect(path)
+        assert [row[0] for row in conn.execute("SELECT id FROM sensor_readings ORDER BY id")
+                ] == [1, 2, 3, 4, 5]
+        assert conn.execute("SELECT sensor_id, reading_id FROM sensor_latest ORDER BY sensor_id"
+                            ).fetchall() == [("S0", 4), ("S1", 5), ("S2", 3)]
+        conn.close()
+    
+    def test_dedup_rebuild_keeps_concurrent_writes(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        database.create_baseline_schema(conn)
+        conn.commit()
+        conn.close()
+        _insert_readings(path, 0, 30)
+        _retry_readings(path, [3, 4])  # ids 31-32
+        
+        def ingest_during_copy(seconds):
+            writer = sqlite3.connect(path)
+            copying = writer.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sensor_readings__rebuild'").fetchone()
+            if copying and not ingested:
+                # A retry of a reading not copied yet, and a new reading
+                writer.executemany("""
+                    INSERT OR IGNORE INTO sensor_readings
+                        (sensor_id, soil_moisture, temperature, humidity, timestamp)
+                    VALUES (?, 11, 25, 60, ?)
+                """, [("S1", "2024-01-01 00:00:25.0"), ("S1", "2024-01-02 00:00:00")])
+                writer.commit()
+                ingested.append(seconds)
+            writer.close()
+        
+        ingested = []
+        monkeypatch.setattr(migrations.time, "sleep", ingest_during_copy)
+        assert migrate(path, chunk_rows=10) == list(range(1, LATEST + 1))
+        assert ingested
+        
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT id, soil_moisture FROM sensor_readings ORDER BY id").fetchall()
+        assert [row[0] for row in rows] == list(range(1, 31)) + [34]
+        assert rows[24] == (25, 50)  # the stored reading, not its retry
+        assert conn.execute("SELECT reading_id FROM sensor_latest WHERE sensor_id = 'S1'"
+                            ).fetchone() == (34,)
+        objects = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert "idx_sensor_readings_unique" in objects
+        assert not any("__" in name for name in objects)
+        conn.close()
+
+    def test_backfill_resumes_after_interruption(self, db_path, monkeypatch):
+        _insert_readings(str(db_path), 0, 25)
+        steps = migrations.MIGRATIONS + [Migration(NEXT, "reading quality", [
+            Transactional("ALTER TABLE sensor_readings ADD COLUMN quality INTEGER"),
+            # Not idempotent: a chunk applied twice would show up as 2
+            Backfill("sensor_readings", "quality = COALESCE(quality, 0) + 1"),
+        ])]
+
+        def interrupt(seconds):
+            raise _Interrupt()
+
+        monkeypatch.setattr(migrations.time, "sleep", interrupt)
+        with pytest.raises(_Interrupt):
+            migrate(str(db_path), chunk_rows=10, migrations=steps)
+        progress = migrations.migration_status(str(db_path), steps)
+        assert progress["version"] == LATEST
+        assert [p["position"] for p in progress["in_progress"]] == [0, 10]
+
+        monkeypatch.setattr(migrations.time, "sleep", lambda seconds: None)
+        assert migrate(str(db_path), chunk_rows=10, migrations=steps) == [NEXT]
+        conn = sqlite3.connect(str(db_path))
+        assert conn.execute(
+            "SELECT quality, COUNT(*) FROM sensor_readings GROUP BY quality"
+        ).fetchall() == [(1, 25)]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == NEXT
+        conn.close()
+
+    def test_online_rebuild_keeps_concurrent_writes(self, db_path, monkeypatch):
+        path = str(db_path)
+        _insert_readings(path, 0, 30)
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            CREATE TRIGGER trg_test_count AFTER INSERT ON sensor_readings
+            BEGIN UPDATE sensor_latest SET alert_count = alert_count + 1; END
+        """)
+        conn.commit()
+        conn.close()
+
+        steps = migrations.MIGRATIONS + [Migration(NEXT, "rebuild readings", [
+            RebuildTable("sensor_readings", READINGS_V2, [
+                "CREATE UNIQUE INDEX idx_readings_v2_unique ON {table}(sensor_id, timestamp)",
+                "CREATE INDEX idx_readings_v2_quality ON {table}(quality)",
+            ]),
+        ])]
+        chunks = []
+
+        def ingest_between_chunks(seconds):
+            # Another writer ingests and edits rows while the copy is running
+            chunks.append(seconds)
+            if len(chunks) == 2:
+                _insert_readings(path, 40, 5)
+                writer = sqlite3.connect(path)
+                writer.execute("UPDATE sensor_readings SET soil_moisture = 12 WHERE id = 2")
+                writer.execute("DELETE FROM sensor_readings WHERE id = 25")
+                writer.commit()
+                writer.close()
+
+        monkeypatch.setattr(migrations.time, "sleep", ingest_between_chunks)
+        assert migrate(path, chunk_rows=10, migrations=steps) == [NEXT]
+
+        conn = sqlite3.connect(path)
+        ids = [row[0] for row in conn.execute("SELECT id FROM sensor_readings ORDER BY id")]
+        assert ids == [i for i in range(1, 36) if i != 25]
+        assert conn.execute("SELECT soil_moisture, quality FROM sensor_readings WHERE id = 2"
+                            ).fetchone() == (12, 1)
+        objects = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert {"idx_readings_v2_unique", "idx_readings_v2_quality", "trg_test_count"} <= objects
+        assert not any("__" in name for name in objects)
+        # AUTOINCREMENT continues after the highest copied id
+        conn.execute("""
+            INSERT INTO sensor_readings (sensor_id, soil_moisture, temperature, humidity, timestamp)
+            VALUES ('S9', 1, 1, 1, '2024-02-01')
+        """)
+        assert conn.execute("SELECT MAX(id) FROM sensor_readings").fetchone()[0] == 36
+        conn.close()
+
+    def test_json_recommendations_become_columns(self, tmp_path):
+        import json
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        database.create_baseline_schema(conn)
+        conn.execute("""
+            INSERT INTO recommendations (sensor_id, recommendation_data, timestamp)
+            VALUES ('A', ?, '2024-01-01 00:00:00')
+        """, (json.dumps({
+            "irrigation": {"action": "water", "amount_ml": 3150, "priority": "medium",
+                           "explanation": "Soil moisture low"},
+            "fertilization": {"needed": True, "type": "balanced_NPK", "amount_kg": 2.5,
+                              "explanation": "Time elapsed"},
+            "alerts": ["🌡️ HEAT STRESS: hot", "💨 LOW HUMIDITY: dry"],
+        }),))
+        conn.commit()
+        conn.close()
+
+        migrate(path)
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        row = dict(conn.execute("""
+            SELECT * FROM recommendations r
+            JOIN recommendation_explanations e ON e.recommendation_id = r.id
+        """).fetchone())
+        assert "recommendation_data" not in row
+        assert (row["action"], row["amount_ml"], row["priority"]) == ("water", 3150, "medium")
+        assert row["fertilization_needed"] == 1 and row["fertilization_kg"] == 2.5
+        from services.decision_engine import alert_types
+        assert alert_types(row["alert_mask"]) == ["heat_stress", "low_humidity"]
+        assert row["alerts"] == "🌡️ HEAT STRESS: hot\n💨 LOW HUMIDITY: dry"
+        assert row["irrigation"] == "Soil moisture low"
+        conn.close()
+    
+    def test_old_release_writes_during_rebuild_are_typed(self, tmp_path, monkeypatch):
+        import json
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        database.create_baseline_schema(conn)
+        conn.commit()
+        conn.close()
+        
+        def write_json(writer, sensor_id, action):
+            # What the previous release stores: the JSON blob only
+            writer.execute("""
+                INSERT INTO recommendations (sensor_id, recommendation_data, timestamp)
+                VALUES (?, ?, '2024-01-01 00:00:00')
+            """, (sensor_id, json.dumps({
+                "irrigation": {"action": action, "amount_ml": 100, "explanation": action},
+                "fertilization": {"needed": False},
+                "alerts": ["🌵 DROUGHT RISK: dry"],
+            })))
+        
+        writer = sqlite3.connect(path)
+        for i in range(25):
+            write_json(writer, f"S{i}", "monitor")
+        writer.commit()
+        writer.close()
+        
+        def old_server_writes(seconds):
+            writer = sqlite3.connect(path)
+            if len(written) < 2 and writer.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'recommendations__rebuild'").fetchone():
+                write_json(writer, "LIVE", "water")
+                writer.commit()
+                written.append(seconds)
+            writer.close()
+        
+        written = []
+        monkeypatch.setattr(migrations.time, "sleep", old_server_writes)
+        migrate(path, chunk_rows=10)
+        
+        conn = sqlite3.connect(path)
+        live = conn.execute("""
+            SELECT r.action, r.amount_ml, r.alert_mask, e.irrigation FROM recommendations r
+            JOIN recommendation_explanations e ON e.recommendation_id = r.id
+            WHERE r.sensor_id = 'LIVE'
+        """).fetchall()
+        assert len(live) == 2
+        from services.decision_engine import alert_types
+        assert all(row[:2] == ("water", 100) and alert_types(row[2]) == ["drought"]
+                   and row[3] == "water" for row in live)
+        assert conn.execute("SELECT COUNT(*) FROM recommendations WHERE action IS NULL"
+                            ).fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM recommendation_explanations").fetchone()[0] == \
+            conn.execute("SELECT COUNT(*) FROM recommendations").fetchone()[0]
+        conn.close()
+
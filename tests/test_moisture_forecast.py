@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.data_service import DataService
+from services.ingest_guard import IngestGuard
+from services.moisture_forecast import ForecastModel
+
+T0 = datetime(2026, 1, 1)
+
+def _replay(model, readings):
+    state = None
+    for ts, moisture in readings:
+        state = model.update(state, ts, moisture)
+    return state
+
+class TestForecastModel:
+    def setup_method(self):
+        self.model = ForecastModel(critical=20.0, low=40.0, min_points=4)
+    
+    def test_linear_drying_crossing_times(self):
+        readings = [(T0 + timedelta(hours=h), 50.0 - 2.0 * h) for h in range(6)]
+        state = _replay(self.model, readings)
+        assert state["slope_per_hour"] == pytest.approx(-2.0)
+        # 40% at hour 5 -> low now; 20% ten hours later
+        assert state["low_at"] == "2026-01-01 05:00:00"
+        assert state["critical_at"] == "2026-01-01 15:00:00"
+    
+    def test_irrigation_restarts_fit(self):
+        readings = [(T0 + timedelta(hours=h), 50.0 - 2.0 * h) for h in range(6)]
+        readings += [(T0 + timedelta(hours=6 + h), 80.0 - 0.5 * h) for h in range(2)]
+        state = _replay(self.model, readings)
+        assert state["n_points"] == 2
+        assert state["slope_per_hour"] is None and state["critical_at"] is None
+    
+    def test_out_of_order_reading_keeps_the_fit(self):
+        readings = [(T0 + timedelta(hours=h), 50.0 - 2.0 * h) for h in range(6)]
+        state = _replay(self.model, readings)
+        assert self.model.update(state, T0 - timedelta(hours=1), 60.0) is state
+    
+    def test_batch_fit_matches_incremental(self):
+        readings = [(T0 + timedelta(minutes=15 * i), 70.0 - 0.3 * i + (i % 3) * 0.2)
+                    for i in range(40)]
+        incremental = _replay(self.model, readings)
+        history = [{"timestamp": str(ts), "soil_moisture": m} for ts, m in reversed(readings)]
+        batch = self.model.fit_histories([history, []])
+        assert batch[1] is None
+        for key in ("sw", "st", "sm", "stt", "stm", "slope_per_hour"):
+            assert batch[0][key] == pytest.approx(incremental[key], rel=1e-9, abs=1e-9)
+        assert batch[0]["critical_at"] == incremental["critical_at"]
+
+class TestForecastStorage:
+    def test_crossing_range_query(self, db):
+        service = DataService(db, IngestGuard())
+        now = datetime.utcnow().replace(microsecond=0)
+        for h in range(6):
+            ts = now - timedelta(hours=5 - h)
+            service.save_sensor_reading("FAST", 35.0 - 2.0 * h, 25.0, 60.0, ts)  # 25% now
+            service.save_sensor_reading("SLOW", 60.0 - 0.1 * h, 25.0, 60.0, ts)
+        service.save_sensor_reading("FAST", 36.0, 25.0, 60.0, now - timedelta(hours=9))  # late
+        
+        soon = service.get_sensors_crossing("critical", before=now + timedelta(hours=6), after=now)
+        assert [row["sensor_id"] for row in soon] == ["FAST"]
+        assert soon[0]["slope_per_hour"] == pytest.approx(-2.0)
+        
+        before = service.get_forecast("FAST")
+        assert service.rebuild_forecasts(window_readings=50) == 2
+        after = service.get_forecast("FAST")
+        assert after["n_points"] == 7  # late reading included by the refit
+        assert after["soil_moisture"] == before["soil_moisture"]
+    
+    def test_late_reading_missed_by_the_guard_keeps_the_forecast(self, db):
+        writer = DataService(db, IngestGuard())
+        for h in range(6):
+            writer.save_sensor_reading("W", 50.0 - 2.0 * h, 25.0, 60.0, T0 + timedelta(hours=h))
+        before = writer.get_forecast("W")
+        # Another worker's guard has never seen the sensor's newer readings
+        other = DataService(db, IngestGuard())
+        other.guard.seed_latest("W", str(T0 - timedelta(hours=5)))
+        other.save_sensor_reading("W", 70.0, 25.0, 60.0, T0 - timedelta(hours=1))
+        assert writer.get_forecast("W") == before
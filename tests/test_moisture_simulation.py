@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.moisture_simulation import (
+    evaporation_factor, fit_drying_rates, simulate, summarize)
+
+def _history(rate, hours=24, start=60.0, refill_at=None):
+    t0 = datetime(2026, 1, 1)
+    rows, moisture = [], start
+    for h in range(hours):
+        if h == refill_at:
+            moisture = start
+        rows.append({"timestamp": str(t0 + timedelta(hours=h)), "soil_moisture": moisture,
+                     "temperature": 25.0, "humidity": 60.0})
+        moisture -= rate
+    return rows[::-1]  # newest first
+
+class TestFitDryingRates:
+    def test_recovers_rate_and_ignores_irrigation(self):
+        rates = fit_drying_rates([_history(0.5), _history(0.2, refill_at=12), []], 0.3)
+        np.testing.assert_allclose(rates, [0.5, 0.2, 0.3])
+
+class TestSimulate:
+    def test_drying_irrigation_and_saturation(self):
+        irrigation = np.zeros((3, 10))
+        irrigation[1, 4] = 300.0    # +10 points at hour 5
+        irrigation[2, 0] = 30000.0  # saturates
+        trajectory = simulate(np.array([50.0, 30.0]), np.array([25.0, 25.0]),
+                              np.array([60.0, 60.0]), np.array([1.0, 2.0]),
+                              np.array([30.0, 30.0]), irrigation)
+        assert trajectory.shape == (3, 2, 11)
+        np.testing.assert_allclose(trajectory[0, :, -1], [40.0, 10.0])
+        np.testing.assert_allclose(trajectory[1, :, -1], [50.0, 20.0])
+        assert trajectory[2].max() == 100.0
+        
+        outcome = summarize(trajectory, irrigation, critical=20.0, excess=85.0)
+        assert outcome["hours_to_critical"][0].tolist() == [-1, 6]
+        assert outcome["hours_to_critical"][1].tolist() == [-1, -1]
+        assert outcome["water_l"][1].tolist() == [300.0, 300.0]
+    
+    def test_heat_dries_faster(self):
+        assert evaporation_factor(np.array(35.0), np.array(40.0)) > evaporation_factor(
+            np.array(25.0), np.array(60.0)) == 1.0
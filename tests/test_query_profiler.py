@@ -0,0 +1,51 @@
+import sqlite3
+
+from query_profiler import QueryProfiler, ProfilingConnection, fingerprint
+
+class TestQueryProfiler:
+    def test_fingerprint_strips_literals_and_in_lists(self):
+        a = fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10")
+        b = fingerprint("SELECT *  FROM t\n WHERE id IN (?) AND name = 'yy' LIMIT 5")
+        assert a == b == "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?"
+    
+    def test_slow_statements_capture_query_plan(self, monkeypatch):
+        profiler = QueryProfiler(slow_threshold_ms=0.0)
+        monkeypatch.setattr("query_profiler.get_query_profiler", lambda: profiler)
+        conn = sqlite3.connect(":memory:", factory=ProfilingConnection)
+        conn.execute("CREATE TABLE r (sensor_id TEXT, ts TEXT)")
+        conn.execute("CREATE INDEX idx_r ON r(sensor_id, ts)")
+        conn.execute("SELECT * FROM r WHERE sensor_id = ? ORDER BY ts DESC", ("S1",))
+        
+        report = profiler.report()
+        select = next(s for s in report["statements"] if s["statement"].startswith("SELECT"))
+        assert select["calls"] == 1
+        assert any("idx_r" in line for line in select["plan"])
+    
+    def test_slow_executemany_plan_binds_first_parameters(self, monkeypatch):
+        profiler = QueryProfiler(slow_threshold_ms=0.0)
+        monkeypatch.setattr("query_profiler.get_query_profiler", lambda: profiler)
+        conn = sqlite3.connect(":memory:", factory=ProfilingConnection)
+        conn.execute("CREATE TABLE r (sensor_id TEXT, ts TEXT)")
+        conn.executemany("INSERT INTO r VALUES (?, ?)", ((f"S{i}", "t") for i in range(3)))
+        
+        insert = next(s for s in profiler.report()["statements"]
+                      if s["statement"].startswith("INSERT"))
+        assert insert["plan"] is not None
+        assert not any("EXPLAIN failed" in line for line in insert["plan"])
+        assert conn.execute("SELECT COUNT(*) FROM r").fetchone()[0] == 3
+    
+    def test_report_endpoint_aggregates_requests(self, api_key, api_client, monkeypatch):
+        from config.settings import get_settings
+        from query_profiler import get_query_profiler
+        monkeypatch.setattr(get_settings(), "query_profiling_enabled", True)
+        get_query_profiler().reset()
+        for _ in range(3):
+            api_client.get("/api/sensors/history/S1")
+        
+        assert api_client.get("/api/admin/query-profile").status_code == 401
+        assert api_client.delete("/api/admin/query-profile").status_code == 401
+        report = api_client.get("/api/admin/query-profile", headers=api_key).json()
+        history = [s for s in report["statements"] if "LIMIT ?" in s["statement"]]
+        assert history and history[0]["calls"] == 3
+        assert api_client.delete("/api/admin/query-profile", headers=api_key).status_code == 204
+        assert api_client.get("/api/admin/query-profile", headers=api_key).json()["statements"] == []
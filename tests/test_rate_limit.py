@@ -0,0 +1,97 @@
+from config.settings import get_settings
+from middleware.rate_limit import ApiKeySet, TokenBuckets, get_rate_limiter
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenBuckets:
+    def test_burst_then_refill(self):
+        clock = _Clock()
+        buckets = TokenBuckets(rate=2.0, burst=3.0, clock=clock)
+        assert [buckets.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert buckets.acquire("a") == 0.5
+        assert buckets.acquire("b") == 0.0  # independent key
+        clock.now += 0.5
+        assert buckets.acquire("a") == 0.0
+        assert buckets.acquire("a") == 0.5
+
+    def test_refund_is_capped_at_burst(self):
+        clock = _Clock()
+        buckets = TokenBuckets(rate=1.0, burst=2.0, clock=clock)
+        buckets.acquire("a")
+        buckets.acquire("a")
+        buckets.refund("a")
+        assert buckets.acquire("a") == 0.0 and buckets.acquire("a") == 1.0
+        buckets.refund("a", cost=5.0)
+        buckets.refund("unknown")
+        assert len(buckets) == 1 and buckets.acquire("a") == 0.0 and buckets.acquire("a") == 0.0
+
+    def test_sweep_drops_idle_buckets(self):
+        clock = _Clock()
+        buckets = TokenBuckets(rate=1.0, burst=5.0, sweep_interval=10.0, clock=clock)
+        buckets.acquire("idle")
+        clock.now += 8
+        buckets.acquire("active")
+        clock.now += 2  # idle: full again after 5s; active: 2s old
+        buckets.acquire("active")
+        assert len(buckets) == 1
+
+class TestRateLimiter:
+    def test_limits_are_shared_between_workers(self, monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "workers", 4)
+        monkeypatch.setattr(settings, "rate_limit_sensor_per_second", 0.2)
+        monkeypatch.setattr(settings, "rate_limit_sensor_burst", 2.0)
+        get_rate_limiter.cache_clear()
+        try:
+            sensors = get_rate_limiter().sensors
+            assert sensors.rate == 0.05 and sensors.burst == 1.0
+        finally:
+            get_rate_limiter.cache_clear()
+
+class TestApiKeySet:
+    def test_membership(self):
+        keys = ApiKeySet(["key-1", "key-2"])
+        assert "key-1" in keys and "key-3" not in keys and None not in keys
+        assert len(keys) == 2
+
+class TestRateLimitApi:
+    def test_client_limit_returns_429_with_retry_after(self, api_client, monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "rate_limit_client_burst", 3.0)
+        monkeypatch.setattr(settings, "rate_limit_client_per_second", 0.5)
+        monkeypatch.setattr(settings, "api_keys", ["gateway-key"])
+        get_rate_limiter.cache_clear()
+
+        statuses = [api_client.get("/api/sensors/current/X").status_code for _ in range(4)]
+        assert statuses == [404, 404, 404, 429]
+        limited = api_client.get("/api/sensors/current/X",
+                                 headers={"X-API-Key": "made-up", "Origin": "http://dash.test"})
+        assert limited.status_code == 429 and limited.headers["Retry-After"] == "2"
+        assert "access-control-allow-origin" in limited.headers  # browsers can read the 429
+        # A valid key has its own bucket
+        assert api_client.get("/api/sensors/current/X",
+                              headers={"X-API-Key": "gateway-key"}).status_code == 404
+        assert api_client.get("/health").status_code == 200
+        assert ('agri_rate_limit_requests_total{scope="client",result="limited"}'
+                in api_client.get("/metrics").text)
+
+    def test_sensor_limit_on_ingest(self, api_client, monkeypatch):
+        monkeypatch.setattr(get_settings(), "rate_limit_sensor_burst", 2.0)
+        get_rate_limiter.cache_clear()
+
+        def post(sensor_id, minute):
+            return api_client.post("/api/sensors/data", json={
+                "sensor_id": sensor_id, "soil_moisture": 50.0, "temperature": 25.0,
+                "humidity": 60.0, "timestamp": f"2026-01-01T12:{minute:02d}:00"})
+
+        assert [post("NOISY", m).status_code for m in range(3)] == [201, 201, 429]
+        # Retries of stored readings are refunded and don't drain the budget
+        assert [post("RETRIED", 0).status_code for _ in range(4)] == [201, 200, 200, 200]
+        assert post("RETRIED", 1).status_code == 201
+        assert post("NOISY", 3).headers["Retry-After"] == "5"
+        assert post("QUIET", 0).status_code == 201
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from services.sensor_health import SensorHealthTracker, get_sensor_health
+
+T0 = datetime(2026, 5, 1, 8, 0)
+
+class _Clock:
+    def __init__(self):
+        self.now = (T0 - datetime(1970, 1, 1)).total_seconds()
+
+    def __call__(self):
+        return self.now
+
+def _report(tracker, clock, sensor_id):
+    """The sensor reports now (reading timestamped at the clock)"""
+    tracker.observe_reading({"sensor_id": sensor_id,
+                             "timestamp": datetime(1970, 1, 1) + timedelta(seconds=clock.now)})
+
+class TestSensorHealthTracker:
+    def _tracker(self, **kwargs):
+        clock = _Clock()
+        options = dict(expected_interval=300.0, missed_reports=3.0, min_silence=600.0)
+        options.update(kwargs)
+        return SensorHealthTracker(clock=clock, **options), clock
+
+    def test_silent_sensor_goes_offline_and_comes_back(self):
+        tracker, clock = self._tracker()
+        _report(tracker, clock, "QUIET")
+        _report(tracker, clock, "CHATTY")
+        clock.now += 600
+        _report(tracker, clock, "CHATTY")
+        assert tracker.check() == []  # QUIET is due at +900s
+
+        clock.now += 400
+        events = tracker.check()
+        assert [(e["sensor_id"], e["event"], e["silent_seconds"]) for e in events] == [
+            ("QUIET", "offline", 1000)]
+        assert tracker.status("QUIET")["status"] == "offline"
+        assert "SENSOR OFFLINE" in tracker.alerts_for("QUIET")[0]
+        assert tracker.check() == []  # reported once
+
+        clock.now += 3600
+        assert [e["sensor_id"] for e in tracker.check()] == ["CHATTY"]
+        _report(tracker, clock, "QUIET")
+        assert "BACK ONLINE" in tracker.alerts_for("QUIET")[0]
+        summary = tracker.summary()
+        assert summary["events"][0]["event"] == "back_online"
+        assert summary["offline"] == 1 and summary["offline_sensors"][0]["sensor_id"] == "CHATTY"
+        clock.now += 300
+        _report(tracker, clock, "QUIET")
+        assert tracker.alerts_for("QUIET") == []
+
+    def test_learns_each_sensors_cadence(self):
+        tracker, clock = self._tracker(alpha=1.0)
+        _report(tracker, clock, "HOURLY")
+        clock.now += 3600
+        _report(tracker, clock, "HOURLY")
+        clock.now += 2 * 3600
+        assert tracker.check() == []  # 3 missed hourly reports = 3h
+        clock.now += 3600
+        assert [e["sensor_id"] for e in tracker.check()] == ["HOURLY"]
+
+    def test_readings_stored_by_another_worker_are_confirmed(self):
+        tracker, clock = self._tracker()
+        _report(tracker, clock, "ELSEWHERE")
+        clock.now += 1000
+        elsewhere = (T0 + timedelta(seconds=900)).isoformat(" ")
+        assert tracker.check(lambda ids: {s: elsewhere for s in ids}) == []
+        assert tracker.status("ELSEWHERE")["status"] == "online"
+        clock.now += 1500
+        assert len(tracker.check(lambda ids: {s: elsewhere for s in ids})) == 1
+
+    def test_offline_sensor_heard_by_another_worker_comes_back(self):
+        tracker, clock = self._tracker()
+        _report(tracker, clock, "A")
+        clock.now += 1000
+        assert [e["event"] for e in tracker.check(lambda ids: {})] == ["offline"]
+        clock.now += 600
+        newer = (T0 + timedelta(seconds=1500)).isoformat(" ")
+        events = tracker.check(lambda ids: {"A": newer} if "A" in ids else {})
+        assert [(e["sensor_id"], e["event"]) for e in events] == [("A", "back_online")]
+        assert tracker.status("A")["status"] == "online" and tracker.offline_count == 0
+        assert "BACK ONLINE" in tracker.alerts_for("A")[0]
+    
+    def test_seed_starts_long_silent_sensors_offline_without_events(self):
+        tracker, clock = self._tracker()
+        tracker.seed([("DEAD", (T0 - timedelta(days=3)).isoformat(" ")),
+                      ("ALIVE", (T0 - timedelta(minutes=1)).isoformat(" "))])
+        assert tracker.check() == [] and tracker.summary()["events"] == []
+        assert (tracker.offline_count, len(tracker)) == (1, 2)
+
+    def test_heap_stays_bounded_at_scale(self):
+        tracker, clock = self._tracker()
+        sensors = [f"S{i}" for i in range(100_000)]
+        for _ in range(3):
+            clock.now += 300
+            for sensor_id in sensors:
+                _report(tracker, clock, sensor_id)
+        assert len(tracker._heap) <= 2 * len(sensors) + 1024
+        clock.now += 901
+        assert len(tracker.check()) == 100_000
+
+class TestSensorHealthApi:
+    def _post(self, api_client, sensor_id, timestamp):
+        return api_client.post("/api/sensors/data", json={
+            "sensor_id": sensor_id, "soil_moisture": 50.0, "temperature": 25.0,
+            "humidity": 60.0, "timestamp": timestamp.isoformat()})
+
+    def test_health_endpoints_and_offline_alert(self, api_client):
+        now = datetime.utcnow()
+        assert self._post(api_client, "SILENT", now - timedelta(hours=2)).status_code == 201
+        assert self._post(api_client, "LIVE", now).status_code == 201
+
+        health = api_client.get("/api/sensors/health").json()
+        assert (health["sensors"], health["online"], health["offline"]) == (2, 1, 1)
+        assert health["offline_sensors"][0]["sensor_id"] == "SILENT"
+        assert health["events"][0]["event"] == "offline"
+        assert api_client.get("/api/sensors/LIVE/health").json()["status"] == "online"
+        assert api_client.get("/api/sensors/NOPE/health").status_code == 404
+
+        alerts = api_client.get("/api/recommendations/SILENT").json()["alerts"]
+        assert any("SENSOR OFFLINE" in alert for alert in alerts)
+
+        assert self._post(api_client, "SILENT", now).status_code == 201
+        assert get_sensor_health().status("SILENT")["status"] == "online"
+        assert 'agri_sensor_health_events_total{event="back_online"}' in api_client.get("/metrics").text
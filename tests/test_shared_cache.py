@@ -0,0 +1,32 @@
+from services.shared_cache import SharedCache
+
+class TestSharedCache:
+    def test_invalidation_is_visible_to_other_workers(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        worker_a, worker_b = SharedCache(path), SharedCache(path)
+        worker_a.set("recommendation:S1", {"action": "water"}, sensor_id="S1")
+        worker_a.set("recommendation:S2", {"action": "monitor"}, sensor_id="S2")
+        assert worker_b.get("recommendation:S1") == {"action": "water"}
+        
+        worker_b.invalidate_sensor("S1")
+        assert worker_a.get("recommendation:S1") is None
+        assert worker_a.get("recommendation:S2") == {"action": "monitor"}
+    
+    def test_set_computed_before_invalidation_is_refused(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        worker_a, worker_b = SharedCache(path), SharedCache(path)
+        generation = worker_a.generation("S1")
+        worker_b.invalidate_sensor("S1")  # new reading lands mid-computation
+        assert worker_a.set("recommendation:S1", {"action": "water"},
+                            sensor_id="S1", generation=generation) is False
+        assert worker_b.get("recommendation:S1") is None
+        
+        assert worker_a.set("recommendation:S1", {"action": "water"}, sensor_id="S1",
+                            generation=worker_a.generation("S1")) is True
+        assert worker_b.get("recommendation:S1") == {"action": "water"}
+    
+    def test_expired_entries_are_misses(self, tmp_path):
+        cache = SharedCache(str(tmp_path / "cache.db"))
+        cache.set("k", 1, ttl_seconds=-1)
+        assert cache.get("k") is None
+        assert cache.misses == 1
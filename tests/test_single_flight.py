@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.single_flight import SingleFlight, get_single_flight
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+class TestSingleFlight:
+    def _blocked_call(self, result=None, error=None):
+        """(release event, calls made, fn blocking until released)"""
+        release, calls = threading.Event(), []
+
+        def fn():
+            calls.append(1)
+            release.wait()
+            if error:
+                raise error
+            return result
+
+        return release, calls, fn
+
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight()
+        release, calls, fn = self._blocked_call(result={"v": 1})
+        with ThreadPoolExecutor(6) as pool:
+            leader = pool.submit(flight.do, "k", fn)
+            _wait_for(lambda: calls)
+            followers = [pool.submit(flight.do, "k", fn) for _ in range(5)]
+            other = pool.submit(flight.do, "other", lambda: "x")
+            _wait_for(lambda: flight.coalesced == 5)
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+        assert len(calls) == 1
+        assert all(r is results[0] for r in results)
+        assert other.result() == "x"
+        assert (flight.executed, flight.coalesced, flight.in_flight()) == (2, 5, 0)
+        # Finished calls are not cached
+        assert flight.do("k", lambda: "again") == "again"
+
+    def test_error_reaches_every_waiter(self):
+        flight = SingleFlight()
+        release, calls, fn = self._blocked_call(error=LookupError("gone"))
+        with ThreadPoolExecutor(3) as pool:
+            futures = [pool.submit(flight.do, "k", fn)]
+            _wait_for(lambda: calls)
+            futures += [pool.submit(flight.do, "k", fn) for _ in range(2)]
+            _wait_for(lambda: flight.coalesced == 2)
+            release.set()
+            for future in futures:
+                with pytest.raises(LookupError):
+                    future.result()
+        assert flight.in_flight() == 0
+
+class TestCoalescedEndpoints:
+    def test_identical_history_requests_share_one_query(self, api_client, monkeypatch):
+        from services.data_service import DataService
+        calls, original = [], DataService.get_sensor_history
+
+        def slow_history(self, sensor_id, limit=100):
+            calls.append(sensor_id)
+            time.sleep(0.3)
+            return original(self, sensor_id, limit)
+
+        monkeypatch.setattr(DataService, "get_sensor_history", slow_history)
+        with ThreadPoolExecutor(4) as pool:
+            responses = list(pool.map(
+                lambda _: api_client.get("/api/sensors/history/SF?limit=5"), range(4)))
+        assert [r.status_code for r in responses] == [200] * 4
+        assert len(calls) < 4
+        assert get_single_flight().coalesced == 4 - len(calls)
+        assert ('agri_single_flight_requests_total{route="/api/sensors/history/{sensor_id}",'
+                'result="coalesced"}' in api_client.get("/metrics").text)
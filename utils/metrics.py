@@ -0,0 +1,250 @@
+"""
+Minimal Prometheus-style metrics (text exposition format 0.0.4)
+
+Counters, gauges and fixed-bucket histograms keyed by label values.
+Recording is a dict lookup, a bisect and a few additions under a lock, so
+it stays in the low-microsecond range. Label values must come from bounded
+sets (route templates, method names), never raw paths or sensor ids.
+Metrics are per process: with several workers, scrape each one.
+"""
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; tuned for API requests and SQLite statements
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...],
+                   extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Exposition lines of every label combination"""
+        pass
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+                for key, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._callback = callback  # unlabelled gauge read at scrape time
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        if self._callback is not None:
+            return [f"{self.name} {_format_value(self._callback())}"]
+        return super()._samples()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager / decorator recording elapsed seconds"""
+        return _Timer(self, labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series[0]), series[1]) for key, series in self._series.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._started, **self.labels)
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.histogram.observe(time.perf_counter() - started, **self.labels)
+        return wrapper
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback=callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# ===== Application metrics =====
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "agri_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"])
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "agri_db_query_duration_seconds",
+    "Time spent in DataService methods",
+    ["method"])
+ENGINE_EVALUATION_SECONDS = REGISTRY.histogram(
+    "agri_decision_engine_duration_seconds",
+    "DecisionEngine recommendation evaluation time")
+CACHE_REQUESTS = REGISTRY.counter(
+    "agri_cache_requests_total",
+    "Shared cache lookups by result (hit/miss)",
+    ["result"])
+
+def _cache_hit_ratio() -> float:
+    hits = CACHE_REQUESTS.value(result="hit")
+    total = hits + CACHE_REQUESTS.value(result="miss")
+    return hits / total if total else 0.0
+
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "agri_cache_hit_ratio",
+    "Shared cache hits / lookups since start",
+    callback=_cache_hit_ratio)
+INGEST_IN_FLIGHT = REGISTRY.gauge(
+    "agri_ingest_in_flight",
+    "Sensor readings currently being ingested (ingest queue depth)")
+RATE_LIMIT_REQUESTS = REGISTRY.counter(
+    "agri_rate_limit_requests_total",
+    "Rate limit checks by scope (client/sensor) and result (allowed/limited)",
+    ["scope", "result"])
+SINGLE_FLIGHT_REQUESTS = REGISTRY.counter(
+    "agri_single_flight_requests_total",
+    "Coalescable reads by route and result (executed / coalesced into an in-flight one)",
+    ["route", "result"])
+HOT_READINGS_REQUESTS = REGISTRY.counter(
+    "agri_hot_readings_requests_total",
+    "Recent-reading lookups by result (hit: answered from memory / miss: SQLite)",
+    ["result"])
+SENSOR_HEALTH_EVENTS = REGISTRY.counter(
+    "agri_sensor_health_events_total",
+    "Sensor status changes by event (offline / back_online)",
+    ["event"])
+BACKUPS = REGISTRY.counter(
+    "agri_backups_total",
+    "Completed online database copies by kind (backup / snapshot)",
+    ["kind"])
+DB_CONNECTIONS_OPEN = REGISTRY.gauge(
+    "agri_db_connections_open",
+    "SQLite connections currently open")
+DB_CONNECTIONS_OPENED = REGISTRY.counter(
+    "agri_db_connections_opened_total",
+    "SQLite connections opened since start")
+
+def timed_method(histogram: Histogram):
+    """Method decorator: observe duration labelled with the method name"""
+    def decorator(func):
+        return histogram.time(method=func.__name__)(func)
+    return decorator